@@ -0,0 +1,72 @@
+"""批量发送吞吐基准测试
+
+对比逐条调用 ``send_message`` 与 ``send_bulk`` 并发发送的吞吐，
+以及按用户投递的 ``batch_send_to_users``。上游为 ``fake_upstreams``。
+
+用法::
+
+    python benchmarks/bench_bulk_send.py --targets 100 --latency-ms 50 --concurrency 8
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+from fake_upstreams import start_fake_upstreams
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from feishu_ai_bot.bot.feishu import FeishuBot  # noqa: E402
+
+
+def measure(name: str, targets: int, func: Callable[[], Any]) -> Dict[str, Any]:
+    """执行一次发送并计算吞吐"""
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": name,
+        "targets": targets,
+        "seconds": round(elapsed, 3),
+        "per_second": round(targets / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量发送吞吐基准测试")
+    parser.add_argument("--targets", type=int, default=100, help="目标群聊/用户数")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="模拟上游延迟")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate-limit", type=float, default=0, help="出站限速（每秒），0 表示不限速")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    server = start_fake_upstreams(latency_ms=args.latency_ms)
+    bot = FeishuBot(
+        app_id="cli_fake",
+        app_secret="fake",
+        api_base=f"http://127.0.0.1:{server.port}/open-apis",
+        rate_limit=args.rate_limit,
+        bulk_concurrency=args.concurrency
+    )
+    bot.get_tenant_access_token()
+
+    chats = [(f"oc_bench_{i}", f"公告 {i}") for i in range(args.targets)]
+    users = [f"ou_bench_{i}" for i in range(args.targets)]
+
+    results = [
+        measure("sequential", args.targets, lambda: [bot.send_message(c, t) for c, t in chats]),
+        measure("send_bulk", args.targets, lambda: bot.send_bulk(chats)),
+        measure("batch_send_to_users", args.targets, lambda: bot.batch_send_to_users(users, "公告")),
+    ]
+    server.shutdown()
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""事件签名校验与解密开销基准测试
+
+分别测量单次操作的耗时：
+
+- ``verify_signature``：签名计算与常量时间比较
+- ``EventCipher.decrypt``：AES-CBC 解密（需要安装 cryptography）
+- 通过 Flask 测试客户端提交 ``/webhook/event`` 的完整请求：明文 / 签名 / 签名 + 加密
+
+用法::
+
+    python benchmarks/bench_event_crypto.py --iterations 5000
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from feishu_ai_bot.config import AppConfig  # noqa: E402
+from feishu_ai_bot.security import crypto  # noqa: E402
+from feishu_ai_bot.server import create_app  # noqa: E402
+
+ENCRYPT_KEY = "bench-encrypt-key"
+
+
+def encrypt(plaintext: bytes) -> str:
+    """按飞书规范加密（仅用于构造测试数据）"""
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+    iv = os.urandom(16)
+    pad = 16 - len(plaintext) % 16
+    encryptor = Cipher(algorithms.AES(crypto.derive_key(ENCRYPT_KEY)), modes.CBC(iv)).encryptor()
+    body = encryptor.update(plaintext + bytes([pad]) * pad) + encryptor.finalize()
+    return base64.b64encode(iv + body).decode("ascii")
+
+
+def per_op_us(iterations: int, func: Callable[[], Any]) -> float:
+    """单次操作平均耗时（微秒）"""
+    for _ in range(min(100, iterations)):
+        func()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def build_event() -> bytes:
+    """构造一个不会触发下游处理的事件"""
+    return json.dumps({
+        "schema": "2.0",
+        "header": {"event_id": "bench", "event_type": "bench.ignored", "token": ""},
+        "event": {"message": {"content": json.dumps({"text": "x" * 200})}}
+    }).encode("utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="事件签名校验与解密开销基准测试")
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    plain = build_event()
+    timestamp, nonce = str(int(time.time())), "bench-nonce"
+    signature = crypto.compute_signature(timestamp, nonce, ENCRYPT_KEY, plain)
+
+    results: Dict[str, float] = {
+        "verify_signature_us": per_op_us(
+            args.iterations,
+            lambda: crypto.verify_signature(timestamp, nonce, ENCRYPT_KEY, plain, signature)
+        ),
+    }
+
+    has_crypto = crypto.Cipher is not None
+    encrypted_body = b""
+    if has_crypto:
+        encrypted = encrypt(plain)
+        cipher = crypto.EventCipher(ENCRYPT_KEY)
+        results["decrypt_us"] = per_op_us(args.iterations, lambda: cipher.decrypt(encrypted))
+        encrypted_body = json.dumps({"encrypt": encrypted}).encode("utf-8")
+
+    config = AppConfig()
+    config.server.log_file = os.path.join(tempfile.mkdtemp(prefix="bench-crypto-"), "bot.log")
+    config.server.log_level = "WARNING"
+    config.openclaw.enabled = False
+    config.feishu.encrypt_key = ENCRYPT_KEY
+    client = create_app(config, warm_up=False).test_client()
+
+    def post(body: bytes, signed: bool) -> None:
+        headers: Dict[str, str] = {"Content-Type": "application/json"}
+        if signed:
+            headers[crypto.TIMESTAMP_HEADER] = timestamp
+            headers[crypto.NONCE_HEADER] = nonce
+            headers[crypto.SIGNATURE_HEADER] = crypto.compute_signature(
+                timestamp, nonce, ENCRYPT_KEY, body
+            )
+        response = client.post("/webhook/event", data=body, headers=headers)
+        assert response.status_code == 200, response.get_json()
+
+    iterations = max(1, args.iterations // 10)
+    cases: List[tuple] = [("request_signed_us", plain, True)]
+    if has_crypto:
+        cases.append(("request_signed_encrypted_us", encrypted_body, True))
+    for name, body, signed in cases:
+        results[name] = per_op_us(iterations, lambda: post(body, signed))
+
+    config.feishu.encrypt_key = ""
+    results["request_plain_us"] = per_op_us(iterations, lambda: post(plain, False))
+
+    report = {key: round(value, 2) for key, value in results.items()}
+    if not has_crypto:
+        report["note"] = "未安装 cryptography，跳过解密相关测量"
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""冷启动基准测试
+
+在全新的子进程中分别测量：
+
+- ``import feishu_ai_bot.server`` 耗时
+- ``create_app(config)`` 耗时（应只包含 Flask 初始化）
+- 预热完成（``/ready`` 可用）耗时，上游为 ``fake_upstreams``
+
+用法::
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from fake_upstreams import start_fake_upstreams
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+from feishu_ai_bot.server import create_app, EXTENSION_KEY
+t1 = time.perf_counter()
+from feishu_ai_bot.config import load_config
+app = create_app(load_config())
+t2 = time.perf_counter()
+services = app.extensions[EXTENSION_KEY]
+services.ready.wait(60)
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "create_app_ms": (t2 - t1) * 1000,
+    "ready_ms": (t3 - t1) * 1000,
+}))
+"""
+
+
+def run_once(env: Dict[str, str]) -> Dict[str, float]:
+    """在子进程中执行一次冷启动"""
+    output = subprocess.check_output([sys.executable, "-c", CHILD], env=env, cwd=str(ROOT))
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="冷启动基准测试")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="模拟上游延迟")
+    args = parser.parse_args()
+
+    server = start_fake_upstreams(latency_ms=args.latency_ms)
+    base = f"http://127.0.0.1:{server.port}"
+    log_dir = tempfile.mkdtemp(prefix="bench-startup-")
+
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": str(ROOT / "src"),
+        "LOG_FILE": os.path.join(log_dir, "bot.log"),
+        "LOG_LEVEL": "WARNING",
+        "FEISHU_APP_ID": "cli_fake",
+        "FEISHU_APP_SECRET": "fake",
+        "FEISHU_API_BASE": f"{base}/open-apis",
+        "AI_API_KEY": "fake",
+        "AI_API_BASE": f"{base}/v1",
+        "OPENCLAW_GATEWAY_URL": base,
+    })
+
+    samples: Dict[str, List[float]] = {"import_ms": [], "create_app_ms": [], "ready_ms": []}
+    for _ in range(args.runs):
+        result = run_once(env)
+        for key in samples:
+            samples[key].append(result[key])
+
+    server.shutdown()
+
+    report = {
+        key: {
+            "median": round(statistics.median(values), 2),
+            "min": round(min(values), 2),
+            "max": round(max(values), 2),
+        }
+        for key, values in samples.items()
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
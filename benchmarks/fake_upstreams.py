@@ -0,0 +1,185 @@
+"""本地模拟上游服务
+
+在一个端口上同时模拟飞书开放平台、OpenAI 兼容的大模型接口和 OpenClaw 网关，
+用于回放压测和基准测试，避免压测流量打到真实服务。
+
+用法::
+
+    python benchmarks/fake_upstreams.py --port 18000 --latency-ms 50 --jitter-ms 20
+
+被测实例需要指向该服务::
+
+    FEISHU_API_BASE=http://127.0.0.1:18000/open-apis
+    AI_API_BASE=http://127.0.0.1:18000/v1
+    AI_API_KEY=fake
+    OPENCLAW_GATEWAY_URL=http://127.0.0.1:18000
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import BaseWSGIServer, make_server
+
+_ids = itertools.count(1)
+
+
+def create_fake_app(latency_ms: float = 0.0, jitter_ms: float = 0.0) -> Flask:
+    """创建模拟上游 Flask 应用
+
+    Args:
+        latency_ms: 每个请求的基础延迟（毫秒）
+        jitter_ms: 随机抖动上限（毫秒）
+
+    Returns:
+        Flask 应用
+    """
+    app = Flask("fake_upstreams")
+    app.config["calls"] = {}
+    calls_lock = threading.Lock()
+
+    def delay(name: str) -> None:
+        with calls_lock:
+            app.config["calls"][name] = app.config["calls"].get(name, 0) + 1
+        wait = latency_ms + random.uniform(0, jitter_ms)
+        if wait > 0:
+            time.sleep(wait / 1000.0)
+
+    def message_data() -> Dict[str, Any]:
+        message_id = f"om_fake_{next(_ids)}"
+        return {"message_id": message_id, "thread_id": f"omt_{message_id}"}
+
+    @app.route("/open-apis/auth/v3/tenant_access_token/internal", methods=["POST"])
+    def tenant_access_token() -> Any:
+        delay("feishu.token")
+        return jsonify({"code": 0, "tenant_access_token": "t-fake", "expire": 7200})
+
+    @app.route("/open-apis/im/v1/messages", methods=["POST"])
+    def send_message() -> Any:
+        delay("feishu.send")
+        data = message_data()
+        return jsonify({"code": 0, "msg": "success", "data": data, **data})
+
+    @app.route("/open-apis/im/v1/messages/<message_id>/reply", methods=["POST"])
+    def reply_message(message_id: str) -> Any:
+        delay("feishu.reply")
+        data = message_data()
+        return jsonify({"code": 0, "msg": "success", "data": data, **data})
+
+    @app.route("/open-apis/im/v1/messages/<message_id>", methods=["PUT", "PATCH"])
+    def update_message(message_id: str) -> Any:
+        delay("feishu.update")
+        return jsonify({"code": 0, "msg": "success", "data": {"message_id": message_id}})
+
+    @app.route("/open-apis/message/v4/batch_send/", methods=["POST"])
+    def batch_send() -> Any:
+        delay("feishu.batch_send")
+        return jsonify({
+            "code": 0,
+            "msg": "success",
+            "data": {"message_id": f"bm_fake_{next(_ids)}", "invalid_open_ids": []}
+        })
+
+    @app.route("/v1/models", methods=["GET"])
+    def list_models() -> Any:
+        delay("llm.models")
+        return jsonify({"object": "list", "data": [{"id": "fake-chat"}]})
+
+    def stream_chunks(prompt: str) -> Iterator[str]:
+        # 首个分块在基础延迟之后到达，后续分块间隔为基础延迟的十分之一
+        words = f"fake streamed reply for {len(prompt)} chars".split()
+        for index, word in enumerate(words):
+            if index:
+                time.sleep(latency_ms / 10000.0)
+            chunk = {"choices": [{"index": 0, "delta": {"content": word + " "}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.route("/v1/chat/completions", methods=["POST"])
+    def chat_completions() -> Any:
+        delay("llm.chat")
+        body: Optional[Dict[str, Any]] = request.get_json(silent=True) or {}
+        messages = body.get("messages") or [{}]
+        prompt = str(messages[-1].get("content", ""))
+        if body.get("stream"):
+            return Response(stream_chunks(prompt), mimetype="text/event-stream")
+        return jsonify({
+            "id": f"chatcmpl-{next(_ids)}",
+            "object": "chat.completion",
+            "model": body.get("model", "fake-chat"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"fake reply ({len(prompt)} chars)"},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt),
+                "completion_tokens": 8,
+                "total_tokens": len(prompt) + 8
+            }
+        })
+
+    @app.route("/rpc", methods=["POST"])
+    def openclaw_rpc() -> Any:
+        delay("openclaw.rpc")
+        return jsonify({"jsonrpc": "2.0", "id": 1, "result": {"reply": "fake openclaw reply"}})
+
+    @app.route("/health", methods=["GET"])
+    def health() -> Any:
+        return jsonify({"status": "ok"})
+
+    @app.route("/_calls", methods=["GET"])
+    def calls() -> Any:
+        with calls_lock:
+            return jsonify(dict(app.config["calls"]))
+
+    return app
+
+
+def start_fake_upstreams(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0
+) -> BaseWSGIServer:
+    """在后台线程中启动模拟上游
+
+    Args:
+        host: 监听地址
+        port: 监听端口，0 表示随机端口
+        latency_ms: 基础延迟（毫秒）
+        jitter_ms: 随机抖动上限（毫秒）
+
+    Returns:
+        已启动的服务器，``server.port`` 为实际端口，用完调用 ``shutdown()``
+    """
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server(
+        host, port, create_fake_app(latency_ms, jitter_ms), threaded=True
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地模拟上游服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = create_fake_app(args.latency_ms, args.jitter_ms)
+    print(f"模拟上游已启动: http://{args.host}:{args.port}")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
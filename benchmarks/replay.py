@@ -0,0 +1,202 @@
+"""录制流量回放工具
+
+把 ``CAPTURE_ENABLED=true`` 录制的事件按原始到达间隔回放到本地实例，
+统计 webhook 延迟分布，并可与上一次构建的结果对比。
+
+用法::
+
+    # 按原速回放
+    python benchmarks/replay.py capture.jsonl --speed 1 --output new.json
+
+    # 10 倍速回放，并与旧构建对比
+    python benchmarks/replay.py capture.jsonl --speed 10 --output new.json --compare old.json
+
+    # 不等待，尽可能快
+    python benchmarks/replay.py capture.jsonl --speed max
+
+被测实例应指向 ``benchmarks/fake_upstreams.py``，避免回放流量打到真实服务。
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from feishu_ai_bot.monitoring.capture import read_capture  # noqa: E402
+
+_seq = itertools.count(1)
+
+
+def rebuild_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """根据脱敏后的形态特征还原一条可回放的事件
+
+    文本按原始长度填充，复杂任务会带上关键词以保证分类结果与线上一致；
+    message_id 重新生成，避免被去重逻辑吞掉。
+    """
+    event = json.loads(json.dumps(event))
+    message = event.get("event", {}).get("message")
+    if not isinstance(message, dict):
+        return event
+
+    try:
+        shape = json.loads(message.get("content", "{}"))
+    except ValueError:
+        shape = {}
+
+    if "text" not in shape:
+        length = int(shape.get("len", 0))
+        prefix = "@_user_1 " if shape.get("mention") else ""
+        body = "分析" if shape.get("complex") else ""
+        text = prefix + body + "x" * max(0, length - len(prefix) - len(body))
+        message["content"] = json.dumps({"text": text}, ensure_ascii=False)
+
+    message["message_id"] = f"om_replay_{next(_seq)}"
+    header = event.setdefault("header", {})
+    header["event_id"] = f"replay-{message['message_id']}"
+    return event
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], errors: int, wall_time: float) -> Dict[str, Any]:
+    """汇总延迟分布（毫秒）"""
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_rps": round(len(latencies) / wall_time, 2) if wall_time > 0 else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0,
+    }
+
+
+def replay(
+    records: List[Dict[str, Any]],
+    target: str,
+    speed: Optional[float],
+    concurrency: int = 32,
+    timeout: float = 30.0
+) -> Dict[str, Any]:
+    """回放录制记录
+
+    Args:
+        records: 录制记录列表
+        target: 被测实例的 webhook 地址
+        speed: 回放倍速，None 表示不等待
+        concurrency: 最大并发请求数
+        timeout: 单个请求超时（秒）
+
+    Returns:
+        延迟分布汇总
+    """
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    def send(event: Dict[str, Any]) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            response = session.post(target, json=event, timeout=timeout)
+            ok = response.status_code < 500
+        except requests.exceptions.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    if not records:
+        return summarize([], 0, 0.0)
+
+    first_arrival = records[0]["t"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for record in records:
+            if speed:
+                due = started + (record["t"] - first_arrival) / speed
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+            pool.submit(send, rebuild_event(record["e"]))
+
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """对比两次回放结果，返回各指标的变化"""
+    delta: Dict[str, Any] = {}
+    for key in ("p50_ms", "p90_ms", "p99_ms", "max_ms", "throughput_rps"):
+        old, new = baseline.get(key, 0), current.get(key, 0)
+        change = round((new - old) / old * 100, 1) if old else None
+        delta[key] = {"baseline": old, "current": new, "change_pct": change}
+    return delta
+
+
+def parse_speed(value: str) -> Optional[float]:
+    """解析倍速参数，max/0 表示不等待"""
+    if value.lower() in ("max", "0"):
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("倍速必须大于0")
+    return speed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="回放录制的飞书事件")
+    parser.add_argument("captures", nargs="+", help="录制文件（按时间顺序）")
+    parser.add_argument("--target", default="http://127.0.0.1:8081/webhook/event")
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="倍速，max 表示不等待")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=0, help="最多回放的事件数")
+    parser.add_argument("--output", help="保存结果的 JSON 文件")
+    parser.add_argument("--compare", help="与之对比的历史结果 JSON 文件")
+    args = parser.parse_args()
+
+    records: List[Dict[str, Any]] = []
+    for path in args.captures:
+        records.extend(read_capture(path))
+    records.sort(key=lambda r: r["t"])
+    if args.limit:
+        records = records[:args.limit]
+
+    print(f"回放 {len(records)} 条事件 -> {args.target}")
+    result = replay(records, args.target, args.speed, args.concurrency)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print("与基线对比:")
+        print(json.dumps(compare(result, baseline), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
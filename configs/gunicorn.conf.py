@@ -0,0 +1,32 @@
+"""gunicorn 多进程部署配置
+
+用法::
+
+    gunicorn -c configs/gunicorn.conf.py
+
+应用在 master 中预加载（不启动预热线程），fork 之前预取访问令牌并创建共享统计内存，
+每个 worker 在 fork 之后重建连接池、加载最新配置并开始预热。
+``kill -HUP <master pid>`` 或 ``POST /admin/reload`` 会平滑重启所有 worker 以应用新配置。
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = "feishu_ai_bot.server:create_app(warm_up=False)"
+bind = f"{os.getenv('SERVER_HOST', '0.0.0.0')}:{os.getenv('SERVER_PORT', '8081')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = True
+
+
+def when_ready(server):
+    """master 启动完成、fork worker 之前"""
+    from feishu_ai_bot.server import prepare_prefork
+    prepare_prefork(server.app.wsgi(), server.cfg.workers)
+
+
+def post_fork(server, worker):
+    """worker fork 之后"""
+    from feishu_ai_bot.server import init_worker
+    init_worker(server.app.wsgi())
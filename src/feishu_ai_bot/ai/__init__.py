@@ -1,5 +1,6 @@
 """AI处理模块"""
 
+from feishu_ai_bot.ai.limiter import AdaptiveLimiter
 from feishu_ai_bot.ai.processor import AITaskProcessor
 
-__all__ = ["AITaskProcessor"]
+__all__ = ["AITaskProcessor", "AdaptiveLimiter"]
@@ -0,0 +1,478 @@
+"""大模型用量与费用统计
+
+每次大模型调用的 ``usage``（输入、输出、前缀缓存命中 token）按提供商/模型累计并折算费用，
+同时按群聊 ``chat_id``、用户 ``open_id`` 和任务类别（``_classify_task``）汇总：
+
+- 调用方在 ``attribute`` 代码块内处理任务，用量计入该块声明的群聊、用户和类别；
+  微批处理合并的请求由同一批的各调用方平分（见 ``shared``）
+- 计数先累加在内存中，由后台线程每隔 ``flush_seconds`` 合并写入一个 JSON 文件；
+  写入时加文件锁并与文件中已有的合计相加，多个 worker 共用同一个文件，重启后合计不丢失。
+  没有 ``fcntl`` 的平台（Windows）不加锁，只适合单进程部署。
+  写入线程在当前进程第一次记录用量时才启动，gunicorn master 中不启动任何线程
+- 群聊和用户维度只保留用量最多的 ``max_keys`` 个键，其余合并到 ``_other``，
+  合计文件和内存中的计数（包括未配置文件时）都不会随群聊、用户数无限增长；
+  每日用量只保留当天
+- 可选的每群每日 token 预算：群聊当天用量超过预算后，该群的调用改用 ``budget_model``（更便宜的模型）
+
+价格按模型配置，单位为每百万 token 的费用（输入/输出/缓存命中输入），未配置价格的模型费用记为 0。
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from feishu_ai_bot import codec
+from feishu_ai_bot.ai.prompts import cached_prompt_tokens
+from feishu_ai_bot.config import UsageConfig
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - 非 POSIX 平台
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 计数字段（内存与文件中均以列表保存）
+FIELDS = ("requests", "prompt_tokens", "completion_tokens", "cached_tokens", "cost")
+DIMENSIONS = ("models", "tiers", "chats", "users", "categories")
+
+# 按键数量限制的维度，超出上限时用量最少的键合并到 OTHER_KEY
+CAPPED_DIMENSIONS = ("chats", "users")
+OTHER_KEY = "_other"
+
+Price = Tuple[float, float, float]
+Counters = Dict[str, Dict[str, List[float]]]
+
+
+class Attribution(NamedTuple):
+    """用量归属"""
+    chat_id: str
+    user_id: str
+    category: str
+
+
+_current: contextvars.ContextVar[Tuple[Attribution, ...]] = contextvars.ContextVar(
+    "feishu_ai_bot_usage_attribution", default=()
+)
+
+
+@contextmanager
+def attribute(chat_id: str = "", user_id: str = "", category: str = "") -> Iterator[None]:
+    """代码块内的大模型用量计入指定的群聊、用户和任务类别"""
+    token = _current.set((Attribution(chat_id, user_id, category),))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def shared(attributions: Tuple[Attribution, ...]) -> Iterator[None]:
+    """代码块内的大模型用量由多个归属平分（合并请求用）"""
+    token = _current.set(attributions)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current() -> Tuple[Attribution, ...]:
+    """当前的用量归属"""
+    return _current.get()
+
+
+def parse_prices(values: Dict[str, str]) -> Dict[str, Price]:
+    """解析模型价格
+    
+    Args:
+        values: {模型: "输入/输出[/缓存命中输入]"}，单位为每百万 token 的费用
+    
+    Returns:
+        {模型: (输入, 输出, 缓存命中输入)}，未给出缓存价格时按输入价格计
+    
+    Raises:
+        ValueError: 价格格式错误
+    """
+    prices: Dict[str, Price] = {}
+    for model, text in values.items():
+        try:
+            parts = [float(part) for part in text.split("/")]
+        except ValueError:
+            raise ValueError(f"模型 {model} 的价格格式错误: {text}") from None
+        if len(parts) not in (2, 3) or any(part < 0 for part in parts):
+            raise ValueError(f"模型 {model} 的价格应为 输入/输出[/缓存命中输入]: {text}")
+        prices[model] = (parts[0], parts[1], parts[2] if len(parts) == 3 else parts[0])
+    return prices
+
+
+def _split(value: float, count: int, index: int) -> float:
+    """把 value 分给 count 个归属时第 index 个的份额（整数部分余数给第一个）"""
+    if isinstance(value, int):
+        share, remainder = divmod(value, count)
+        return share + (remainder if index == 0 else 0)
+    return value / count
+
+
+def _add(counters: Counters, dimension: str, key: str, values: List[float]) -> None:
+    """累加一组计数"""
+    row = counters.setdefault(dimension, {}).setdefault(key, [0] * len(FIELDS))
+    for index, value in enumerate(values):
+        row[index] += value
+
+
+def _tokens(values: List[float]) -> float:
+    """一组计数中的 token 数（输入加输出）"""
+    return values[1] + values[2]
+
+
+def _cap(counters: Dict[str, Any], max_keys: int) -> None:
+    """群聊、用户维度只保留 token 最多的 max_keys 个键，其余合并到 OTHER_KEY"""
+    for dimension in CAPPED_DIMENSIONS:
+        rows = counters.get(dimension)
+        if not rows or len(rows) <= max_keys:
+            continue
+        other = rows.pop(OTHER_KEY, None)
+        ranked = sorted(rows.items(), key=lambda item: _tokens(item[1]), reverse=True)
+        counters[dimension] = dict(ranked[:max_keys])
+        for _, values in ranked[max_keys:]:
+            _add(counters, dimension, OTHER_KEY, values)
+        if other is not None:
+            _add(counters, dimension, OTHER_KEY, other)
+
+
+def _merge(target: Dict[str, Any], source: Dict[str, Any]) -> None:
+    """把 source 中的计数与每日用量加到 target 上"""
+    for dimension in DIMENSIONS:
+        for key, values in source.get(dimension, {}).items():
+            _add(target, dimension, key, values)
+    for day, chats in source.get("daily", {}).items():
+        daily = target.setdefault("daily", {}).setdefault(day, {})
+        for chat_id, tokens in chats.items():
+            daily[chat_id] = daily.get(chat_id, 0) + tokens
+
+
+class UsageLedger:
+    """大模型用量账本
+    
+    Attributes:
+        path: 合计文件路径，为空时只在内存中累计
+        flush_seconds: 写入间隔（秒）
+        prices: 各模型的价格
+        chat_daily_tokens: 每个群聊每天的 token 预算，0 表示不限制
+        budget_model: 超出预算后改用的模型，为空时只计数不降级
+        max_keys: 群聊、用户维度各保留的键数
+        stats: 计数（flushes 写入次数、flush_errors 写入失败次数、downgraded 降级的调用数）
+    """
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        flush_seconds: float = 60.0,
+        prices: Optional[Dict[str, Price]] = None,
+        chat_daily_tokens: int = 0,
+        budget_model: str = "",
+        max_keys: int = 1000
+    ):
+        """初始化用量账本
+        
+        Args:
+            path: 合计文件路径，为空时只在内存中累计
+            flush_seconds: 写入间隔（秒）
+            prices: 各模型的价格（见 ``parse_prices``）
+            chat_daily_tokens: 每个群聊每天的 token 预算，0 表示不限制
+            budget_model: 超出预算后改用的模型
+            max_keys: 群聊、用户维度各保留的键数（其余合并到 ``_other``）
+        """
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.prices = prices or {}
+        self.chat_daily_tokens = chat_daily_tokens
+        self.budget_model = budget_model
+        self.max_keys = max_keys
+        self.stats = {"flushes": 0, "flush_errors": 0, "downgraded": 0}
+        self._stored: Dict[str, Any] = {}
+        self._pending: Dict[str, Any] = {}
+        self._last_flush: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+    
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> float:
+        """按模型价格折算一次调用的费用"""
+        price = self.prices.get(model)
+        if price is None:
+            return 0.0
+        input_price, output_price, cached_price = price
+        return (
+            (prompt_tokens - cached_tokens) * input_price
+            + cached_tokens * cached_price
+            + completion_tokens * output_price
+        ) / 1_000_000
+    
+    def record(self, provider: str, model: str, usage: Dict[str, Any], tier: str = "") -> None:
+        """记录一次调用的用量（归属见 ``current``）
+        
+        Args:
+            provider: 提供商
+            model: 实际使用的模型
+            usage: 响应中的 ``usage``
+            tier: 模型档位（见 ``AITaskProcessor.resolve_profile``）
+        """
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        cached = cached_prompt_tokens(usage)
+        values = [
+            1, prompt_tokens, completion_tokens, cached,
+            self.cost(model, prompt_tokens, completion_tokens, cached)
+        ]
+        attributions = current() or (Attribution("", "", ""),)
+        day = self._today()
+        
+        with self._lock:
+            _add(self._pending, "models", f"{provider}/{model}", values)
+            if tier:
+                _add(self._pending, "tiers", tier, values)
+            for index, attribution in enumerate(attributions):
+                share = [1] + [_split(value, len(attributions), index) for value in values[1:]]
+                if attribution.chat_id:
+                    _add(self._pending, "chats", attribution.chat_id, share)
+                    days = self._pending.setdefault("daily", {})
+                    if day not in days:
+                        # 预算只看当天，跨天后丢弃前一天的每日用量
+                        days.clear()
+                    daily = days.setdefault(day, {})
+                    daily[attribution.chat_id] = daily.get(attribution.chat_id, 0) + share[1] + share[2]
+                if attribution.user_id:
+                    _add(self._pending, "users", attribution.user_id, share)
+                _add(self._pending, "categories", attribution.category or "other", share)
+            # 未配置文件（或写入一直失败）时 pending 不会清空，超出上限一倍时裁剪
+            if any(
+                len(self._pending.get(dimension, ())) > 2 * self.max_keys
+                for dimension in CAPPED_DIMENSIONS
+            ):
+                _cap(self._pending, self.max_keys)
+        if self._thread_pid != os.getpid():
+            self.start()
+    
+    def chat_tokens_today(self, chat_id: str) -> int:
+        """群聊当天已用的 token 数（含其他 worker 上次写入时的合计）"""
+        day = self._today()
+        with self._lock:
+            return (
+                self._stored.get("daily", {}).get(day, {}).get(chat_id, 0)
+                + self._pending.get("daily", {}).get(day, {}).get(chat_id, 0)
+            )
+    
+    def select_model(self, model: str) -> str:
+        """当前归属的群聊超出当日预算时返回降级模型，否则返回 model"""
+        if not self.chat_daily_tokens or not self.budget_model or self.budget_model == model:
+            return model
+        for attribution in current():
+            if attribution.chat_id and self.chat_tokens_today(attribution.chat_id) >= self.chat_daily_tokens:
+                with self._lock:
+                    self.stats["downgraded"] += 1
+                return self.budget_model
+        return model
+    
+    def flush(self) -> bool:
+        """把内存中的计数合并写入合计文件
+        
+        Returns:
+            是否写入成功（未配置文件时返回 False）
+        """
+        if not self.path:
+            return False
+        
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return True
+            try:
+                merged = self._merge_into_file(pending)
+            except (OSError, ValueError) as e:
+                logger.error("用量统计写入失败: %s", e)
+                with self._lock:
+                    _merge(pending, self._pending)
+                    self._pending = pending
+                    self.stats["flush_errors"] += 1
+                return False
+            with self._lock:
+                self._stored = merged
+                self._last_flush = time.time()
+                self.stats["flushes"] += 1
+            return True
+    
+    def _merge_into_file(self, pending: Dict[str, Any]) -> Dict[str, Any]:
+        """加锁读取合计文件，加上 pending 后原子替换，返回新的合计"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                merged: Dict[str, Any] = {}
+                if os.path.exists(self.path):
+                    with open(self.path, "rb") as f:
+                        merged = codec.loads(f.read())
+                _merge(merged, pending)
+                _cap(merged, self.max_keys)
+                # 每日用量只用于预算判断，只保留当天
+                today = self._today()
+                merged["daily"] = {today: merged.get("daily", {}).get(today, {})}
+                merged["updated_at"] = time.time()
+                
+                temp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(codec.dumps_bytes(merged))
+                os.replace(temp_path, self.path)
+                return merged
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def load(self) -> None:
+        """读取合计文件中已有的计数（文件不存在或无法解析时忽略）"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                stored = codec.loads(f.read())
+        except (OSError, ValueError) as e:
+            logger.warning("用量统计文件无法读取: %s", e)
+            return
+        with self._lock:
+            self._stored = stored
+    
+    def start(self) -> None:
+        """启动后台写入线程（未配置文件或当前进程中已启动时无操作）
+        
+        第一次记录用量时自动调用；线程不会随 fork 复制，子进程中会重新启动。
+        """
+        if not self.path:
+            return
+        pid = os.getpid()
+        with self._lock:
+            if self._thread_pid == pid:
+                return
+            self._stop = threading.Event()
+            thread = self._thread = threading.Thread(target=self._run, name="usage-flush", daemon=True)
+            self._thread_pid = pid
+        thread.start()
+    
+    def stop(self) -> None:
+        """停止后台写入线程并写入剩余计数"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and self._thread_pid == os.getpid():
+            thread.join(timeout=5)
+        self._thread = None
+        self._thread_pid = None
+        self.flush()
+    
+    def _run(self) -> None:
+        """后台写入循环"""
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+    
+    def snapshot(self, top: int = 10) -> Dict[str, Any]:
+        """用量汇总（已写入的合计加上内存中的计数）
+        
+        Args:
+            top: 群聊与用户各列出用量最多的前几个
+        """
+        with self._lock:
+            totals: Dict[str, Any] = {}
+            _merge(totals, self._stored)
+            _merge(totals, self._pending)
+            stats = dict(self.stats)
+            last_flush = self._last_flush
+        
+        def rows(dimension: str, limit: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+            items = sorted(
+                totals.get(dimension, {}).items(),
+                key=lambda item: item[1][1] + item[1][2],
+                reverse=True
+            )
+            return {
+                key: {name: round(value, 6) if name == "cost" else value for name, value in zip(FIELDS, values)}
+                for key, values in items[:limit]
+            }
+        
+        models = rows("models")
+        day = self._today()
+        return {
+            "total": {
+                name: round(sum(item[name] for item in models.values()), 6)
+                for name in FIELDS
+            },
+            "models": models,
+            "tiers": rows("tiers"),
+            "categories": rows("categories"),
+            "top_chats": rows("chats", top),
+            "top_users": rows("users", top),
+            "budget": {
+                "chat_daily_tokens": self.chat_daily_tokens,
+                "budget_model": self.budget_model,
+                "over_budget_chats": sorted(
+                    chat_id for chat_id, tokens in totals.get("daily", {}).get(day, {}).items()
+                    if self.chat_daily_tokens and tokens >= self.chat_daily_tokens
+                ),
+            },
+            "file": self.path,
+            "last_flush": last_flush,
+            **stats,
+        }
+    
+    @staticmethod
+    def _today() -> str:
+        """当天日期（本地时间）"""
+        return time.strftime("%Y-%m-%d")
+
+
+def create_ledger(config: UsageConfig) -> Optional[UsageLedger]:
+    """根据配置创建用量账本，未启用时返回 None"""
+    if not config.enabled:
+        return None
+    
+    return UsageLedger(
+        path=config.file or None,
+        flush_seconds=config.flush_seconds,
+        prices=parse_prices(config.prices),
+        chat_daily_tokens=config.chat_daily_tokens,
+        budget_model=config.budget_model,
+        max_keys=config.max_keys
+    )
+
+
+_ledger: Optional[UsageLedger] = None
+
+
+def get_ledger() -> Optional[UsageLedger]:
+    """获取当前的用量账本"""
+    return _ledger
+
+
+def install(ledger: Optional[UsageLedger]) -> Optional[UsageLedger]:
+    """替换当前的用量账本并读取已有合计，旧账本写入剩余计数后停止
+    
+    Args:
+        ledger: 新的账本，为 None 时关闭用量统计
+    
+    Returns:
+        生效的账本
+    """
+    global _ledger
+    previous, _ledger = _ledger, ledger
+    if previous is not None:
+        previous.stop()
+    if ledger is not None:
+        ledger.load()
+    return ledger
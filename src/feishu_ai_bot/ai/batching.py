@@ -0,0 +1,262 @@
+"""大模型调用的微批处理
+
+群聊里短时间内涌入多个简单问题时，把系统提示词相同的调用在 ``window`` 内收集起来
+（最多 ``max_size`` 个、合计不超过 ``MAX_BATCH_CHARS`` 字符），用一次结构化的多问题提示词
+请求上游，再把回答按顺序拆分给各个等待方：
+
+- 第一个到达的调用方负责等待窗口结束（或批次已满）并发出请求，其他调用方等待结果
+- 批次只有一个调用，或回答无法解析为数量一致的 JSON 数组时，各调用方改为单独请求
+- 合并请求在批次中最紧的截止时间内发出；因截止时间、上游超时或连接失败
+  （``DeadlineExceeded``/``UpstreamUnavailable``）失败时，自己的截止时间尚未到达的调用方
+  改为单独请求，其他请求失败时同一批的调用方都收到该异常
+- 合并请求的用量由同一批的调用方平分（见 ``accounting.shared``）
+
+OpenAI 兼容接口没有同步的批量接口，因此统一使用多问题提示词合并请求。
+每个调用因等待窗口增加的延迟记录为 ``llm.batch_wait``，批次大小分布见 ``snapshot``。
+"""
+
+import contextvars
+import re
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from feishu_ai_bot import codec, deadline
+from feishu_ai_bot.ai import accounting
+from feishu_ai_bot.deadline import DeadlineExceeded
+from feishu_ai_bot.monitoring.stats import record_latency
+
+# 单个批次合并后的问题总长度上限（字符），超过时提前发出
+MAX_BATCH_CHARS = 6000
+# 合并请求的回答 token 上限
+MAX_BATCH_TOKENS = 8000
+
+BATCH_INSTRUCTION = (
+    "下面的 JSON 数组包含 {count} 个相互独立的问题。请逐一回答，"
+    "只输出一个长度为 {count} 的 JSON 字符串数组，第 i 个元素是第 i 个问题的完整回答，不要输出其他内容。\n\n"
+)
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+# 单独请求的标记：批次只有一个调用、回答无法拆分，或合并请求超时而该调用仍有剩余时间
+_SINGLE = object()
+
+
+
+class UpstreamUnavailable(Exception):
+    """上游调用超时或连接失败（合并请求失败时可以改为单独请求）"""
+
+
+# 合并请求因这些异常失败时，截止时间未到的调用方改为单独请求
+_RETRY_SINGLE = (DeadlineExceeded, UpstreamUnavailable)
+
+_batchable: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "feishu_ai_bot_batchable", default=False
+)
+
+
+@contextmanager
+def batchable(enabled: bool = True) -> Iterator[None]:
+    """在代码块内允许（或禁止）合并大模型调用"""
+    token = _batchable.set(enabled)
+    try:
+        yield
+    finally:
+        _batchable.reset(token)
+
+
+def is_batchable() -> bool:
+    """当前调用是否允许合并"""
+    return _batchable.get()
+
+
+def build_batch_prompt(prompts: List[str]) -> str:
+    """合并多个问题为一个结构化提示词"""
+    return BATCH_INSTRUCTION.format(count=len(prompts)) + codec.dumps(prompts)
+
+
+def parse_batch_reply(reply: str, count: int) -> Optional[List[str]]:
+    """拆分合并请求的回答
+    
+    Args:
+        reply: 上游返回的文本
+        count: 问题个数
+    
+    Returns:
+        按顺序的回答；不是长度为 count 的字符串数组时返回 None
+    """
+    try:
+        answers = codec.loads(_FENCE.sub("", reply.strip()))
+    except ValueError:
+        return None
+    if not isinstance(answers, list) or len(answers) != count:
+        return None
+    if not all(isinstance(answer, str) and answer.strip() for answer in answers):
+        return None
+    return answers
+
+
+class _Pending:
+    """一个等待中的调用"""
+    
+    __slots__ = ("prompt", "enqueued", "future", "attribution", "deadline")
+    
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.enqueued = time.monotonic()
+        self.future: Future = Future()
+        self.attribution = accounting.current()
+        self.deadline = deadline.current()
+
+
+class _Batch:
+    """一个正在收集的批次"""
+    
+    __slots__ = ("items", "chars", "full")
+    
+    def __init__(self):
+        self.items: List[_Pending] = []
+        self.chars = 0
+        self.full = threading.Event()
+
+
+class MicroBatcher:
+    """按系统提示词合并大模型调用
+    
+    Attributes:
+        window: 收集窗口（秒）
+        max_size: 单个批次的最大调用数
+        stats: 计数（batches 合并请求数、items 合并的调用数、fallbacks 回答无法拆分的批次数）
+    """
+    
+    def __init__(
+        self,
+        complete: Callable[[str, Optional[str], int], str],
+        window: float = 0.02,
+        max_size: int = 8,
+        max_tokens: int = 2000
+    ):
+        """初始化微批处理器
+        
+        Args:
+            complete: 单次上游调用 ``complete(prompt, system_prompt, max_tokens)``
+            window: 收集窗口（秒）
+            max_size: 单个批次的最大调用数
+            max_tokens: 单个问题的回答 token 上限，合并请求按问题数放大（不超过 ``MAX_BATCH_TOKENS``）
+        """
+        self.complete = complete
+        self.window = window
+        self.max_size = max(1, max_size)
+        self.max_tokens = max_tokens
+        self.stats = {"batches": 0, "items": 0, "fallbacks": 0}
+        self._sizes: Dict[int, int] = {}
+        self._open: Dict[Optional[str], _Batch] = {}
+        self._lock = threading.Lock()
+    
+    def submit(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        single: Optional[Callable[[], str]] = None
+    ) -> str:
+        """提交一次调用并等待回答
+        
+        Args:
+            prompt: 用户提示词
+            system_prompt: 系统提示词（相同的调用才会合并）
+            single: 改为单独请求时的调用（在调用方线程中执行，保留调用方的提示词标识和模型档位），
+                为空时使用 ``complete``
+        
+        Returns:
+            回答文本
+        
+        Raises:
+            DeadlineExceeded: 等待期间当前截止时间已过
+        """
+        item = _Pending(prompt)
+        with self._lock:
+            batch = self._open.get(system_prompt)
+            leader = batch is None
+            if leader:
+                batch = self._open[system_prompt] = _Batch()
+            batch.items.append(item)
+            batch.chars += len(prompt)
+            if len(batch.items) >= self.max_size or batch.chars >= MAX_BATCH_CHARS:
+                del self._open[system_prompt]
+                batch.full.set()
+        
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._open.get(system_prompt) is batch:
+                    del self._open[system_prompt]
+            self._dispatch(batch, system_prompt)
+        
+        result = self._wait(item)
+        if result is _SINGLE:
+            if single is not None:
+                return single()
+            return self.complete(prompt, system_prompt, self.max_tokens)
+        return result
+    
+    @staticmethod
+    def _wait(item: _Pending) -> Any:
+        """等待批次结果，不超过当前截止时间"""
+        current = deadline.current()
+        try:
+            return item.future.result(timeout=current.remaining() if current is not None else None)
+        except FutureTimeout:
+            deadline.record_exceeded("llm")
+            raise DeadlineExceeded("llm")
+    
+    def _dispatch(self, batch: _Batch, system_prompt: Optional[str]) -> None:
+        """发出合并请求并分发回答（在收集该批次的调用方线程中执行）"""
+        items = batch.items
+        now = time.monotonic()
+        for item in items:
+            record_latency("llm.batch_wait", (now - item.enqueued) * 1000)
+        with self._lock:
+            self._sizes[len(items)] = self._sizes.get(len(items), 0) + 1
+        
+        if len(items) == 1:
+            items[0].future.set_result(_SINGLE)
+            return
+        
+        attributions = tuple(attribution for item in items for attribution in item.attribution)
+        deadlines = [item.deadline for item in items if item.deadline is not None]
+        tightest = min(deadlines, key=lambda d: d.expires_at) if deadlines else None
+        try:
+            with deadline.scope(tightest), accounting.shared(attributions):
+                reply = self.complete(
+                    build_batch_prompt([item.prompt for item in items]),
+                    system_prompt,
+                    min(self.max_tokens * len(items), MAX_BATCH_TOKENS)
+                )
+        except BaseException as e:
+            for item in items:
+                if isinstance(e, _RETRY_SINGLE) and not (item.deadline is not None and item.deadline.expired):
+                    item.future.set_result(_SINGLE)
+                else:
+                    item.future.set_exception(e)
+            return
+        
+        answers = parse_batch_reply(reply, len(items))
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["items"] += len(items)
+            if answers is None:
+                self.stats["fallbacks"] += 1
+        for index, item in enumerate(items):
+            item.future.set_result(_SINGLE if answers is None else answers[index])
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """当前计数与批次大小分布"""
+        with self._lock:
+            return {
+                "window_ms": round(self.window * 1000, 1),
+                "max_size": self.max_size,
+                **self.stats,
+                "sizes": {str(size): count for size, count in sorted(self._sizes.items())},
+            }
@@ -0,0 +1,285 @@
+"""大模型调用的自适应并发限制
+
+每个提供商一个 ``AdaptiveLimiter``，按 AIMD（加性增、乘性减）根据观察到的结果调整在途请求上限：
+
+- 成功且延迟不高于基线的 ``tolerance`` 倍：上限 +1/上限（约每轮满载 +1），
+  只在在途请求达到上限一半以上时增长，避免空闲时虚增
+- 延迟超过基线的 ``tolerance`` 倍或请求超时：上限 × ``backoff_ratio``
+- 429 限流：上限 × ``throttle_ratio``；带 ``Retry-After`` 时暂停放行直到该时间
+
+超出上限的调用方排队等待，超过各自的等待时间仍未获得名额时抛出 ``LimiterTimeout``。
+基线延迟为成功请求延迟的慢速指数移动平均，大模型响应时长差异较大，不使用固定阈值。
+多进程部署时每个 worker 独立限流。
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+# Retry-After 的最长遵从时间（秒），防止异常响应让整个进程长时间停止调用
+MAX_RETRY_AFTER = 60.0
+
+
+class LimiterTimeout(Exception):
+    """排队超时，未获得调用名额"""
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """解析 ``Retry-After`` 响应头
+    
+    Args:
+        value: 响应头的值（秒数或 HTTP 日期）
+        now: 当前时间戳（测试用）
+    
+    Returns:
+        需要等待的秒数（不超过 ``MAX_RETRY_AFTER``），无法解析时返回 None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - (now or time.time())
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class LimiterSlot:
+    """一次调用占用的名额，退出时根据结果调整上限"""
+    
+    __slots__ = ("dropped", "ignored")
+    
+    def __init__(self):
+        self.dropped = False
+        self.ignored = False
+    
+    def drop(self) -> None:
+        """标记为过载信号（限流、超时），上限乘性减小"""
+        self.dropped = True
+    
+    def ignore(self) -> None:
+        """不参与调整（与上游负载无关的失败）"""
+        self.ignored = True
+
+
+class AdaptiveLimiter:
+    """AIMD 自适应并发限制器
+    
+    Attributes:
+        name: 名称（提供商）
+        limit: 当前在途请求上限（浮点，取整后生效）
+        min_limit: 上限的下界
+        max_limit: 上限的上界
+        inflight: 在途请求数
+        queued: 排队中的调用方数
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff_ratio: float = 0.9,
+        throttle_ratio: float = 0.5,
+        tolerance: float = 2.0
+    ):
+        """初始化限制器
+        
+        Args:
+            name: 名称（提供商）
+            initial_limit: 初始上限
+            min_limit: 上限的下界
+            max_limit: 上限的上界
+            backoff_ratio: 延迟过高或超时时的乘数
+            throttle_ratio: 收到 429 时的乘数
+            tolerance: 延迟超过基线多少倍视为过载
+        """
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.backoff_ratio = backoff_ratio
+        self.throttle_ratio = throttle_ratio
+        self.tolerance = tolerance
+        self.inflight = 0
+        self.queued = 0
+        self.stats = {"acquired": 0, "timeouts": 0, "dropped": 0, "throttled": 0}
+        self._baseline: Optional[float] = None
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+    
+    def configure(self, min_limit: int, max_limit: int) -> None:
+        """更新上下界（热加载），当前上限截断到新的范围内"""
+        with self._cond:
+            self.min_limit = max(1, min_limit)
+            self.max_limit = max(self.min_limit, max_limit)
+            self.limit = min(max(self.limit, self.min_limit), self.max_limit)
+            self._cond.notify_all()
+    
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """获取一个名额，必要时排队等待
+        
+        Args:
+            timeout: 最长等待时间（秒），为空时一直等待
+        
+        Returns:
+            是否获取成功（超时返回 False）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self.queued += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._paused_until - now
+                    if wait <= 0 and self.inflight < int(self.limit):
+                        self.inflight += 1
+                        self.stats["acquired"] += 1
+                        return True
+                    if deadline is not None:
+                        if now >= deadline:
+                            self.stats["timeouts"] += 1
+                            return False
+                        wait = min(wait, deadline - now) if wait > 0 else deadline - now
+                    self._cond.wait(wait if wait > 0 else None)
+            finally:
+                self.queued -= 1
+    
+    def release(self, latency: Optional[float] = None, dropped: bool = False) -> None:
+        """归还名额并调整上限
+        
+        Args:
+            latency: 本次请求延迟（秒），为空时不参与调整
+            dropped: 是否为过载信号（超时等）
+        """
+        with self._cond:
+            inflight = self.inflight
+            self.inflight -= 1
+            if dropped:
+                self.stats["dropped"] += 1
+                self._decrease(self.backoff_ratio)
+            elif latency is not None:
+                self._on_sample(latency, inflight)
+            self._cond.notify_all()
+    
+    def throttle(self, retry_after: Optional[float] = None) -> None:
+        """收到 429：减小上限，并在 ``retry_after`` 秒内暂停放行
+        
+        Args:
+            retry_after: 上游要求的等待时间（秒）
+        """
+        with self._cond:
+            self.stats["throttled"] += 1
+            self._decrease(self.throttle_ratio)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                logger.warning("大模型限流，%s 暂停调用 %.1f 秒", self.name, retry_after)
+    
+    @contextmanager
+    def slot(
+        self,
+        timeout: Optional[float] = None,
+        drop_on: Tuple[Type[BaseException], ...] = ()
+    ) -> Iterator[LimiterSlot]:
+        """占用一个名额执行调用，退出时按结果和延迟调整上限
+        
+        Args:
+            timeout: 排队的最长等待时间（秒）
+            drop_on: 视为过载信号的异常类型（如请求超时），其他异常不参与调整
+        
+        Raises:
+            LimiterTimeout: 排队超时
+        """
+        if not self.acquire(timeout):
+            raise LimiterTimeout(f"{self.name} 并发已满（上限 {int(self.limit)}），排队超时")
+        
+        slot = LimiterSlot()
+        started = time.monotonic()
+        try:
+            yield slot
+        except drop_on:
+            slot.drop()
+            raise
+        except BaseException:
+            slot.ignore()
+            raise
+        finally:
+            latency = None if slot.ignored or slot.dropped else time.monotonic() - started
+            self.release(latency, dropped=slot.dropped)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """当前状态"""
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "inflight": self.inflight,
+                "queued": self.queued,
+                "baseline_ms": round(self._baseline * 1000, 1) if self._baseline else None,
+                "paused_for_s": round(max(0.0, self._paused_until - time.monotonic()), 3),
+                **self.stats,
+            }
+    
+    def _on_sample(self, latency: float, inflight: int) -> None:
+        """根据成功请求的延迟调整上限（调用方需持有锁）"""
+        baseline = self._baseline
+        if baseline is None:
+            self._baseline = latency
+            return
+        if latency > baseline * self.tolerance:
+            self._decrease(self.backoff_ratio)
+        elif inflight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        # 基线跟随正常延迟缓慢变化，过载时的慢样本只占很小权重
+        self._baseline = baseline + 0.05 * (min(latency, baseline * self.tolerance) - baseline)
+    
+    def _decrease(self, ratio: float) -> None:
+        """乘性减小上限（调用方需持有锁）"""
+        self.limit = max(self.min_limit, self.limit * ratio)
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(
+    name: str,
+    initial_limit: int = 8,
+    min_limit: int = 1,
+    max_limit: int = 64
+) -> AdaptiveLimiter:
+    """获取（不存在时创建）某个提供商的限制器
+    
+    AI 处理器重建（如热加载）时沿用同一个限制器，已学到的上限不会丢失。
+    
+    Args:
+        name: 提供商名称
+        initial_limit: 初始上限（仅创建时使用）
+        min_limit: 上限的下界
+        max_limit: 上限的上界
+    
+    Returns:
+        限制器
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = AdaptiveLimiter(name, initial_limit, min_limit, max_limit)
+        else:
+            limiter.configure(min_limit, max_limit)
+        return limiter
+
+
+def limiter_snapshots() -> Dict[str, Dict[str, Any]]:
+    """所有限制器的当前状态（按提供商）"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.snapshot() for limiter in limiters}
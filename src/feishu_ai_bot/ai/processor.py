@@ -1,16 +1,35 @@
 """AI任务处理器模块"""
 
-import json
+import contextvars
 import logging
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Any, Dict, Optional
+from functools import partial
+from typing import Any, Dict, Iterator, Optional, Tuple
 
 import requests
 
-from feishu_ai_bot.config import AIConfig
+from feishu_ai_bot import codec, deadline
+from feishu_ai_bot.ai import accounting, batching, prompts
+from feishu_ai_bot.ai.batching import MicroBatcher, UpstreamUnavailable
+from feishu_ai_bot.ai.limiter import LimiterTimeout, get_limiter, parse_retry_after
+from feishu_ai_bot.config import PROFILE_ROUTES, AIConfig, ModelProfile
+from feishu_ai_bot.deadline import Deadline, DeadlineExceeded
+from feishu_ai_bot.monitoring import tracing
+from feishu_ai_bot.monitoring.stats import record_latency
+from feishu_ai_bot.monitoring.tracing import TracedSession
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_TOKENS = 2000
+DEFAULT_TEMPERATURE = 0.7
+
+# 当前任务使用的模型档位（档位名称, 模型配置），由 process_task 设置
+_profile: contextvars.ContextVar[Optional[Tuple[str, ModelProfile]]] = contextvars.ContextVar(
+    "feishu_ai_bot_model_profile", default=None
+)
+
 
 class AITaskProcessor:
     """AI任务处理器
@@ -25,6 +44,11 @@ class AITaskProcessor:
         api_base: API基础地址
         model_name: 模型名称
         timeout: 请求超时时间
+        session: HTTP 会话（连接池）
+        limiter: 按提供商共享的自适应并发限制器
+        batcher: 简单任务的微批处理器（未启用时为 None）
+        prompts: 编译后的提示词模板
+        model_profiles: 按路由、任务类型配置的模型档位（见 ``resolve_profile``）
     """
     
     def __init__(self, workspace_dir: str, config: AIConfig):
@@ -59,34 +83,107 @@ class AITaskProcessor:
                 if not self.model_name:
                     self.model_name = 'gpt-3.5-turbo'
         
+        # 复用连接池，避免每次调用重新建立 TLS 连接
+        self.session = TracedSession("llm")
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=32)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        self.limiter = get_limiter(
+            self.ai_provider,
+            initial_limit=config.concurrency_initial,
+            min_limit=config.concurrency_min,
+            max_limit=config.concurrency_max
+        )
+        self.prompts = prompts.build_registry(config.prompt_file, config.prompt_versions)
+        self.model_profiles = config.model_profiles
+        self.batcher: Optional[MicroBatcher] = None
+        if config.batch_enabled:
+            # 只有群聊简单任务参与合并，单个问题的回答上限取简单任务档位
+            self.batcher = MicroBatcher(
+                partial(self._complete, prompt_label="batch"),
+                window=config.batch_window_ms / 1000,
+                max_size=config.batch_max_size,
+                max_tokens=self.resolve_profile("simple")[1].max_tokens
+            )
+        
         logger.info(
-            f"AI处理器初始化完成 - "
-            f"提供商: {self.ai_provider}, 模型: {self.model_name}"
+            "AI处理器初始化完成 - "
+            "提供商: %s, 模型: %s",
+            self.ai_provider,
+            self.model_name
+        )
+    
+    def warm_up(self) -> bool:
+        """预热到AI服务的连接
+        
+        通过一次轻量的模型列表请求提前建立连接池中的 TLS 连接，
+        让第一条用户消息不再承担握手开销。
+        
+        Returns:
+            是否成功连通
+        """
+        try:
+            ok = self.ping()
+            logger.info("AI服务连接预热完成: ok=%s", ok)
+            return ok
+        except requests.exceptions.RequestException as e:
+            logger.warning("AI服务连接预热失败: %s", e)
+            return False
+    
+    def ping(self) -> bool:
+        """探测AI服务是否可达（模型列表请求，不消耗 token）
+        
+        Returns:
+            是否成功连通
+        
+        Raises:
+            requests.exceptions.RequestException: 网络错误
+        """
+        if not self.api_key:
+            return False
+        
+        response = self.session.get(
+            f"{self.api_base}/models",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=5
         )
+        return response.status_code < 500
     
     def process_task(
         self,
         task_description: str,
-        user_info: Dict[str, str]
+        user_info: Dict[str, str],
+        task_deadline: Optional[Deadline] = None,
+        batch: bool = False,
+        route: str = ""
     ) -> Dict[str, Any]:
         """处理用户任务
         
+        大模型调用使用按 ``route`` 与任务类型选出的模型档位（见 ``resolve_profile``）。
+        
         Args:
             task_description: 任务描述
-            user_info: 用户信息 {"name": "用户名", "open_id": "open_id"}
+            user_info: 用户信息 {"name": "用户名", "open_id": "open_id", "chat_id": "群聊ID（可选）"}
+            task_deadline: 任务截止时间，大模型调用的超时与重试不超过剩余预算
+            batch: 是否允许与同时到达的其他任务合并调用大模型（启用微批处理时生效）
+            route: 路由（simple/complex），为空时只按任务类型选择模型档位
             
         Returns:
             处理结果字典
         """
         try:
-            logger.info(f"AI开始处理任务: {task_description}")
+            logger.info("AI开始处理任务: %s", task_description)
             
             # 分析任务类型
             task_type = self._classify_task(task_description)
-            logger.info(f"任务类型: {task_type}")
+            logger.info("任务类型: %s", task_type)
             
-            # 根据任务类型处理
-            result = self._process_by_type(task_type, task_description, user_info)
+            # 根据任务类型处理（大模型用量计入所在群聊、用户和任务类型）
+            with deadline.scope(task_deadline), batching.batchable(batch), accounting.attribute(
+                user_info.get("chat_id", ""), user_info.get("open_id", ""), task_type
+            ), self._use_profile(route, task_type):
+                result = self._process_by_type(task_type, task_description, user_info)
             
             return {
                 "success": True,
@@ -96,13 +193,61 @@ class AITaskProcessor:
             }
             
         except Exception as e:
-            logger.error(f"AI处理任务失败: {str(e)}", exc_info=True)
+            logger.error("AI处理任务失败: %s", e, exc_info=True)
             return {
                 "success": False,
                 "error": str(e),
                 "timestamp": datetime.now().isoformat()
             }
     
+    def resolve_profile(self, route: str = "", category: str = "") -> Tuple[str, ModelProfile]:
+        """按路由和任务类型选择模型档位
+        
+        依次叠加路由（如 ``simple``）、任务类型（如 ``code``）和两者组合（如 ``simple.code``）
+        的配置，后者覆盖前者中已设置的字段，未设置的字段沿用 AI 配置的默认值。
+        
+        Args:
+            route: 路由（simple/complex）
+            category: 任务类型（``_classify_task`` 的结果）
+            
+        Returns:
+            (档位名称, 模型配置)，档位名称为最具体的已配置档位，没有时为 ``default``
+        """
+        tier = "default"
+        resolved = ModelProfile(self.model_name, DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, self.timeout)
+        keys = (route, category, f"{route}.{category}" if route and category else "")
+        for key in keys:
+            profile = self.model_profiles.get(key) if key else None
+            if profile is None:
+                continue
+            tier = key
+            resolved = ModelProfile(
+                model=profile.model or resolved.model,
+                max_tokens=profile.max_tokens or resolved.max_tokens,
+                temperature=resolved.temperature if profile.temperature is None else profile.temperature,
+                timeout=profile.timeout or resolved.timeout
+            )
+        return tier, resolved
+    
+    @contextmanager
+    def _use_profile(self, route: str, category: str) -> Iterator[None]:
+        """代码块内的大模型调用使用该路由与任务类型的模型档位"""
+        token = _profile.set(self.resolve_profile(route, category))
+        try:
+            yield
+        finally:
+            _profile.reset(token)
+    
+    def tier_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """各已配置档位（及默认档位）生效的模型配置"""
+        tiers = {"default": self.resolve_profile()[1]}
+        for name in self.model_profiles:
+            route, _, category = name.partition(".")
+            if not category:
+                route, category = (name, "") if name in PROFILE_ROUTES else ("", name)
+            tiers[name] = self.resolve_profile(route, category)[1]
+        return {name: vars(profile).copy() for name, profile in tiers.items()}
+    
     def _classify_task(self, task_description: str) -> str:
         """分类任务类型
         
@@ -163,17 +308,55 @@ class AITaskProcessor:
     def _call_ai_api(
         self,
         prompt: str,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        prompt_label: str = "adhoc"
     ) -> str:
-        """调用AI API（带重试机制）
+        """调用AI API
+        
+        启用微批处理且当前任务允许合并时（见 ``batching.batchable``），与同时到达的
+        相同系统提示词的调用合并为一次请求，否则直接请求。
         
         Args:
             prompt: 用户提示词
             system_prompt: 系统提示词
+            prompt_label: 提示词模板标识（前缀缓存统计用）
             
         Returns:
             AI返回的结果
         """
+        single = partial(self._complete, prompt, system_prompt, prompt_label=prompt_label)
+        if self.batcher is not None and batching.is_batchable():
+            return self.batcher.submit(prompt, system_prompt, single)
+        return single()
+    
+    def _complete(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        prompt_label: str = "adhoc"
+    ) -> str:
+        """请求一次对话补全（带重试机制）
+        
+        模型、回答上限、temperature 和超时取当前任务的模型档位（见 ``process_task``），
+        成功调用的总耗时按档位记录为 ``llm.tier.<档位>`` 延迟，用量按档位计入用量账本。
+        处于截止时间内时（见 ``deadline.scope``），排队、每次尝试的超时和重试退避
+        都不超过剩余预算，预算用完时抛出 ``DeadlineExceeded``。
+        响应中的前缀缓存命中 token 数按 ``prompt_label`` 累计，用量与费用计入用量账本
+        （见 ``accounting.attribute``）；所在群聊超出当日 token 预算时改用降级模型。
+        
+        Args:
+            prompt: 用户提示词
+            system_prompt: 系统提示词
+            max_tokens: 回答的 token 上限，为空时取模型档位的设置
+            prompt_label: 提示词模板标识
+            
+        Returns:
+            AI返回的结果
+        
+        Raises:
+            UpstreamUnavailable: 重试后仍然超时或无法连接
+        """
         if not self.api_key:
             raise ValueError("AI API密钥未配置")
         
@@ -183,126 +366,140 @@ class AITaskProcessor:
         messages.append({"role": "user", "content": prompt})
         
         max_retries = self.config.max_retries
+        tier, profile = _profile.get() or self.resolve_profile()
+        started = time.monotonic()
+        
+        # 请求体只序列化一次，重试时复用
+        url = f"{self.api_base}/chat/completions"
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": codec.JSON_CONTENT_TYPE
+        }
+        ledger = accounting.get_ledger()
+        model = ledger.select_model(profile.model) if ledger is not None else profile.model
+        body = codec.dumps_bytes({
+            "model": model,
+            "messages": messages,
+            "temperature": profile.temperature,
+            "max_tokens": max_tokens or profile.max_tokens
+        })
         
         for attempt in range(max_retries):
+            retry_after = None
             try:
-                url = f"{self.api_base}/chat/completions"
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                }
-                data = {
-                    "model": self.model_name,
-                    "messages": messages,
-                    "temperature": 0.7,
-                    "max_tokens": 2000
-                }
-                
-                response = requests.post(
-                    url, headers=headers, json=data, timeout=self.timeout
-                )
-                response.raise_for_status()
+                # 超时被剩余预算截短时，请求超时不代表上游过载，不参与并发上限调整
+                truncated = deadline.timeout(profile.timeout, "llm") < profile.timeout
+                with self.limiter.slot(
+                    deadline.timeout(self.config.queue_timeout, "llm"),
+                    drop_on=() if truncated else (requests.exceptions.Timeout,)
+                ) as slot, tracing.span("llm.attempt", attempt=attempt + 1, model=model, tier=tier):
+                    response = self.session.post(
+                        url, headers=headers, data=body,
+                        timeout=deadline.timeout(profile.timeout, "llm")
+                    )
+                    if response.status_code == 429:
+                        # 限流由限制器统一处理：减小并发上限，按 Retry-After 暂停所有调用方
+                        slot.ignore()
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        self.limiter.throttle(retry_after)
+                    response.raise_for_status()
                 
-                result = response.json()
-                content = result['choices'][0]['message']['content']
+                    result = codec.loads(response.content)
+                    content = result['choices'][0]['message']['content']
+                    usage = result.get('usage')
+                    if usage:
+                        prompts.record_cache_usage(prompt_label, usage)
+                        if ledger is not None:
+                            ledger.record(self.ai_provider, model, usage, tier)
+                        tracing.annotate(
+                            prompt=prompt_label, cached_tokens=prompts.cached_prompt_tokens(usage)
+                        )
                 
-                logger.info(f"AI API调用成功，返回长度: {len(content)}")
+                record_latency(f"llm.tier.{tier}", (time.monotonic() - started) * 1000)
+                logger.info("AI API调用成功，返回长度: %s", len(content))
                 return content
+            
+            except LimiterTimeout as e:
+                logger.warning("AI API排队超时: %s", e)
+                current = deadline.current()
+                if current is not None:
+                    current.check("llm")
+                raise Exception("AI服务繁忙，请稍后重试")
                 
             except requests.exceptions.Timeout:
-                logger.warning(f"AI API调用超时 (尝试 {attempt + 1}/{max_retries})")
+                logger.warning("AI API调用超时 (尝试 %s/%s)", attempt + 1, max_retries)
+                if truncated:
+                    # 超时被截短为剩余预算，超时即预算用完
+                    deadline.record_exceeded("llm")
+                    raise DeadlineExceeded("llm")
                 if attempt < max_retries - 1:
-                    import time
-                    time.sleep(2 ** attempt)
+                    deadline.backoff(2 ** attempt, "llm")
                     continue
-                raise Exception("AI服务响应超时")
+                raise UpstreamUnavailable("AI服务响应超时")
                 
             except requests.exceptions.RequestException as e:
-                logger.warning(f"AI API调用失败: {str(e)}")
+                logger.warning("AI API调用失败: %s", e)
                 if attempt < max_retries - 1:
-                    import time
-                    time.sleep(2 ** attempt)
+                    # 有 Retry-After 时限制器已暂停放行，排队即等待，不再额外退避
+                    if retry_after is None:
+                        deadline.backoff(2 ** attempt, "llm")
                     continue
+                if isinstance(e, requests.exceptions.ConnectionError):
+                    raise UpstreamUnavailable(f"AI服务调用失败: {str(e)}")
                 raise Exception(f"AI服务调用失败: {str(e)}")
                 
-            except (KeyError, IndexError) as e:
-                logger.error(f"AI API响应格式错误: {str(e)}")
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                logger.error("AI API响应格式错误: %s", e)
                 raise Exception("AI服务返回数据格式错误")
         
         return ""  # 应该不会执行到这里
     
     def _handle_search(self, task: str, user_info: Dict[str, str]) -> str:
         """处理搜索任务"""
-        system_prompt = """你是一个智能搜索助手。当用户要求搜索时，请：
-1. 理解用户的搜索需求
-2. 提供相关的搜索建议和关键词
-3. 给出清晰、有条理的回答"""
-        
-        prompt = f"用户{user_info.get('name', '用户')}要求搜索：{task}\n\n请提供搜索建议。"
+        rendered = self.prompts.render("search", task, user_info.get('name', '用户'))
         
         try:
-            result = self._call_ai_api(prompt, system_prompt)
+            result = self._call_ai_api(rendered.user, rendered.system, rendered.label)
             return f"🔍 搜索结果\n\n{result}\n\n💡 提示：如需更详细的搜索，可以提供更多关键词"
         except Exception as e:
             return f"❌ 搜索处理失败：{str(e)}"
     
     def _handle_file(self, task: str, user_info: Dict[str, str]) -> str:
         """处理文件任务"""
-        system_prompt = """你是一个文件操作助手。当用户要求创建或操作文件时，请：
-1. 理解文件的需求和用途
-2. 提供合适的文件内容建议
-3. 给出文件保存的建议路径和名称"""
-        
-        prompt = f"用户{user_info.get('name', '用户')}要求：{task}\n\n请提供文件内容建议。"
+        rendered = self.prompts.render("file", task, user_info.get('name', '用户'))
         
         try:
-            result = self._call_ai_api(prompt, system_prompt)
+            result = self._call_ai_api(rendered.user, rendered.system, rendered.label)
             return f"📁 文件操作结果\n\n{result}\n\n💡 提示：文件将保存在工作目录中"
         except Exception as e:
             return f"❌ 文件操作失败：{str(e)}"
     
     def _handle_analysis(self, task: str, user_info: Dict[str, str]) -> str:
         """处理分析任务"""
-        system_prompt = """你是一个数据分析助手。当用户要求分析数据时，请：
-1. 理解分析的目的和需求
-2. 提供分析方法和步骤
-3. 给出可能的结论和建议"""
-        
-        prompt = f"用户{user_info.get('name', '用户')}要求分析：{task}\n\n请提供分析方案。"
+        rendered = self.prompts.render("analysis", task, user_info.get('name', '用户'))
         
         try:
-            result = self._call_ai_api(prompt, system_prompt)
+            result = self._call_ai_api(rendered.user, rendered.system, rendered.label)
             return f"📊 数据分析结果\n\n{result}\n\n💡 提示：如需更深入的分析，请提供更多数据"
         except Exception as e:
             return f"❌ 数据分析失败：{str(e)}"
     
     def _handle_code(self, task: str, user_info: Dict[str, str]) -> str:
         """处理代码任务"""
-        system_prompt = """你是一个编程助手。当用户要求执行代码或编程任务时，请：
-1. 理解任务需求和目标
-2. 提供完整、可运行的代码
-3. 添加必要的注释说明
-4. 解释代码的工作原理"""
-        
-        prompt = f"用户{user_info.get('name', '用户')}要求：{task}\n\n请提供代码和执行结果。"
+        rendered = self.prompts.render("code", task, user_info.get('name', '用户'))
         
         try:
-            result = self._call_ai_api(prompt, system_prompt)
+            result = self._call_ai_api(rendered.user, rendered.system, rendered.label)
             return f"💻 代码执行结果\n\n{result}\n\n💡 提示：代码已准备好，可以直接运行"
         except Exception as e:
             return f"❌ 代码执行失败：{str(e)}"
     
     def _handle_general(self, task: str, user_info: Dict[str, str]) -> str:
         """处理通用任务"""
-        system_prompt = """你是一个智能助手，能够帮助用户处理各种任务。请：
-1. 理解用户的需求
-2. 提供有帮助、准确的信息
-3. 用清晰、友好的方式回答"""
-        
-        prompt = f"用户{user_info.get('name', '用户')}说：{task}\n\n请提供帮助。"
+        rendered = self.prompts.render("general", task, user_info.get('name', '用户'))
         
         try:
-            result = self._call_ai_api(prompt, system_prompt)
+            result = self._call_ai_api(rendered.user, rendered.system, rendered.label)
             return f"✨ 处理结果\n\n{result}\n\n💡 如需更多帮助，请继续提问"
         except Exception as e:
             return f"❌ 处理失败：{str(e)}"
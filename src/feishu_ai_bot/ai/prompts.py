@@ -0,0 +1,271 @@
+"""提示词模板
+
+每类任务（``_classify_task`` 的类别）一个提示词模板，处理器创建时编译一次，每次调用只做字段拼接。
+
+模板按"稳定内容在前"的顺序排列：系统提示词和任务说明对同一类任务完全相同，
+用户名、任务描述等变化的内容放在最后。DeepSeek、OpenAI 等支持前缀缓存的提供商
+可以复用相同的前缀，缓存命中的 token 数（``prompt_cache_hit_tokens`` /
+``prompt_tokens_details.cached_tokens``）按模板统计，见 ``cache_stats``。
+
+模板可以通过 JSON 文件（``AI_PROMPT_FILE``）新增版本，``AI_PROMPT_VERSIONS`` 选择每类任务使用的版本::
+
+    {"search": {"v2": {"system": "...", "user": "...{user_name}...{task}"}}}
+"""
+
+import threading
+from string import Formatter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from feishu_ai_bot import codec
+
+DEFAULT_VERSION = "v1"
+
+# 用户提示词模板可用的字段
+TEMPLATE_FIELDS = ("task", "user_name")
+
+BUILTIN_PROMPTS: Dict[str, Dict[str, Dict[str, str]]] = {
+    "search": {
+        DEFAULT_VERSION: {
+            "system": (
+                "你是一个智能搜索助手。当用户要求搜索时，请：\n"
+                "1. 理解用户的搜索需求\n"
+                "2. 提供相关的搜索建议和关键词\n"
+                "3. 给出清晰、有条理的回答"
+            ),
+            "user": "请根据下面的搜索需求提供搜索建议。\n\n用户：{user_name}\n搜索需求：{task}",
+        },
+    },
+    "file": {
+        DEFAULT_VERSION: {
+            "system": (
+                "你是一个文件操作助手。当用户要求创建或操作文件时，请：\n"
+                "1. 理解文件的需求和用途\n"
+                "2. 提供合适的文件内容建议\n"
+                "3. 给出文件保存的建议路径和名称"
+            ),
+            "user": "请根据下面的要求提供文件内容建议。\n\n用户：{user_name}\n要求：{task}",
+        },
+    },
+    "analysis": {
+        DEFAULT_VERSION: {
+            "system": (
+                "你是一个数据分析助手。当用户要求分析数据时，请：\n"
+                "1. 理解分析的目的和需求\n"
+                "2. 提供分析方法和步骤\n"
+                "3. 给出可能的结论和建议"
+            ),
+            "user": "请根据下面的分析需求提供分析方案。\n\n用户：{user_name}\n分析需求：{task}",
+        },
+    },
+    "code": {
+        DEFAULT_VERSION: {
+            "system": (
+                "你是一个编程助手。当用户要求执行代码或编程任务时，请：\n"
+                "1. 理解任务需求和目标\n"
+                "2. 提供完整、可运行的代码\n"
+                "3. 添加必要的注释说明\n"
+                "4. 解释代码的工作原理"
+            ),
+            "user": "请根据下面的要求提供代码和执行结果。\n\n用户：{user_name}\n要求：{task}",
+        },
+    },
+    "general": {
+        DEFAULT_VERSION: {
+            "system": (
+                "你是一个智能助手，能够帮助用户处理各种任务。请：\n"
+                "1. 理解用户的需求\n"
+                "2. 提供有帮助、准确的信息\n"
+                "3. 用清晰、友好的方式回答"
+            ),
+            "user": "请根据下面的消息提供帮助。\n\n用户：{user_name}\n消息：{task}",
+        },
+    },
+}
+
+
+class RenderedPrompt(NamedTuple):
+    """渲染后的提示词"""
+    name: str
+    version: str
+    system: str
+    user: str
+    
+    @property
+    def label(self) -> str:
+        """统计用的模板标识（``名称@版本``）"""
+        return f"{self.name}@{self.version}"
+
+
+class PromptTemplate:
+    """编译后的提示词模板
+    
+    Attributes:
+        name: 模板名称（任务类别）
+        version: 版本
+        system: 系统提示词（不含变量）
+    """
+    
+    def __init__(self, name: str, version: str, system: str, user: str):
+        """编译模板
+        
+        Args:
+            name: 模板名称
+            version: 版本
+            system: 系统提示词
+            user: 用户提示词模板，可使用 ``TEMPLATE_FIELDS`` 中的字段
+        
+        Raises:
+            ValueError: 模板格式错误或使用了未知字段
+        """
+        self.name = name
+        self.version = version
+        self.system = system
+        try:
+            parsed = list(Formatter().parse(user))
+        except ValueError as e:
+            raise ValueError(f"提示词模板 {name}@{version} 格式错误: {e}") from e
+        
+        self._parts: List[Tuple[str, Optional[str]]] = []
+        for literal, field, spec, conversion in parsed:
+            if field is not None and (field not in TEMPLATE_FIELDS or spec or conversion):
+                raise ValueError(f"提示词模板 {name}@{version} 包含不支持的字段: {{{field}}}")
+            self._parts.append((literal, field))
+    
+    def render(self, **values: str) -> RenderedPrompt:
+        """填入字段生成提示词"""
+        user = "".join(
+            literal + (values[field] if field is not None else "")
+            for literal, field in self._parts
+        )
+        return RenderedPrompt(self.name, self.version, self.system, user)
+
+
+class PromptRegistry:
+    """提示词模板注册表（每个名称可有多个版本，各选用一个）"""
+    
+    def __init__(self):
+        self._templates: Dict[str, Dict[str, PromptTemplate]] = {}
+        self._active: Dict[str, str] = {}
+    
+    def register(self, name: str, version: str, system: str, user: str) -> PromptTemplate:
+        """编译并注册一个模板版本"""
+        template = PromptTemplate(name, version, system, user)
+        self._templates.setdefault(name, {})[version] = template
+        self._active.setdefault(name, version)
+        return template
+    
+    def use(self, name: str, version: str) -> None:
+        """选用某个版本
+        
+        Raises:
+            ValueError: 模板或版本不存在
+        """
+        if version not in self._templates.get(name, {}):
+            raise ValueError(f"提示词模板 {name} 没有版本 {version}")
+        self._active[name] = version
+    
+    def get(self, name: str) -> PromptTemplate:
+        """当前选用的模板，未知名称使用 general"""
+        if name not in self._active:
+            name = "general"
+        return self._templates[name][self._active[name]]
+    
+    def render(self, name: str, task: str, user_name: str) -> RenderedPrompt:
+        """渲染某类任务的提示词"""
+        return self.get(name).render(task=task, user_name=user_name)
+    
+    def active_versions(self) -> Dict[str, str]:
+        """各模板当前选用的版本"""
+        return dict(self._active)
+
+
+def load_prompt_file(path: str) -> Dict[str, Dict[str, Dict[str, str]]]:
+    """读取提示词模板文件
+    
+    Raises:
+        ValueError: 文件无法读取或格式错误
+    """
+    try:
+        with open(path, "rb") as f:
+            data = codec.loads(f.read())
+    except OSError as e:
+        raise ValueError(f"提示词模板文件无法读取: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("提示词模板文件应为 {名称: {版本: {system, user}}} 格式")
+    return data
+
+
+def build_registry(
+    prompt_file: str = "",
+    versions: Optional[Dict[str, str]] = None
+) -> PromptRegistry:
+    """编译内置模板与模板文件中的模板，并按配置选用版本
+    
+    Args:
+        prompt_file: 模板文件路径（可选）
+        versions: 各模板选用的版本，未指定的使用 ``DEFAULT_VERSION``
+    
+    Returns:
+        模板注册表
+    
+    Raises:
+        ValueError: 模板文件或版本配置错误
+    """
+    sources = [BUILTIN_PROMPTS]
+    if prompt_file:
+        sources.append(load_prompt_file(prompt_file))
+    
+    registry = PromptRegistry()
+    for source in sources:
+        for name, template_versions in source.items():
+            if not isinstance(template_versions, dict):
+                raise ValueError(f"提示词模板 {name} 应为 {{版本: {{system, user}}}} 格式")
+            for version, template in template_versions.items():
+                try:
+                    registry.register(name, version, template["system"], template["user"])
+                except (KeyError, TypeError) as e:
+                    raise ValueError(f"提示词模板 {name}@{version} 缺少 system 或 user") from e
+    for name, version in (versions or {}).items():
+        registry.use(name, version)
+    return registry
+
+
+def cached_prompt_tokens(usage: Dict[str, Any]) -> int:
+    """响应 ``usage`` 中命中前缀缓存的输入 token 数（DeepSeek / OpenAI 两种字段）"""
+    if "prompt_cache_hit_tokens" in usage:
+        return int(usage["prompt_cache_hit_tokens"] or 0)
+    details = usage.get("prompt_tokens_details") or {}
+    return int(details.get("cached_tokens") or 0)
+
+
+_cache_stats: Dict[str, Dict[str, int]] = {}
+_cache_lock = threading.Lock()
+
+
+def record_cache_usage(label: str, usage: Dict[str, Any]) -> None:
+    """按模板累计输入 token 与缓存命中 token
+    
+    Args:
+        label: 模板标识（``名称@版本``）
+        usage: 响应中的 ``usage``
+    """
+    prompt_tokens = int(usage.get("prompt_tokens") or 0)
+    cached = cached_prompt_tokens(usage)
+    with _cache_lock:
+        stats = _cache_stats.setdefault(label, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0})
+        stats["requests"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["cached_tokens"] += cached
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """各模板的前缀缓存命中情况"""
+    with _cache_lock:
+        return {
+            label: {
+                **stats,
+                "hit_ratio": round(stats["cached_tokens"] / stats["prompt_tokens"], 4)
+                if stats["prompt_tokens"] else 0.0,
+            }
+            for label, stats in _cache_stats.items()
+        }
@@ -4,5 +4,6 @@
 """
 
 from feishu_ai_bot.bot.feishu import FeishuBot
+from feishu_ai_bot.bot.streaming import StreamingReply
 
-__all__ = ["FeishuBot"]
+__all__ = ["FeishuBot", "StreamingReply"]
@@ -1,15 +1,23 @@
 """飞书机器人API交互模块"""
 
-import hashlib
-import json
 import logging
 import time
-from typing import Any, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import requests
 
+from feishu_ai_bot import codec, deadline
+from feishu_ai_bot.bot.ratelimit import RateGovernor
+from feishu_ai_bot.deadline import DeadlineExceeded
+from feishu_ai_bot.monitoring.tracing import TracedSession
+from feishu_ai_bot.security.crypto import EventCipher, EventDecryptError, verify_signature
+
 logger = logging.getLogger(__name__)
 
+# 批量发送接口单次最多接收的用户数
+BATCH_SEND_LIMIT = 200
+
 
 class FeishuBot:
     """飞书机器人类
@@ -23,6 +31,11 @@ class FeishuBot:
         token_expire_time: 令牌过期时间
         encrypt_key: 事件加密密钥
         verification_token: 验证令牌
+        api_base: 开放平台API地址
+        session: HTTP 会话（连接池）
+        rate_governor: 出站写请求限速器（未启用时为 None）
+        bulk_concurrency: 批量发送的并发数
+        request_timeout: 单次请求的默认超时（秒），处于任务截止时间内时取剩余预算与其中的较小值
     """
     
     def __init__(
@@ -30,7 +43,11 @@ class FeishuBot:
         app_id: str,
         app_secret: str,
         encrypt_key: str = "",
-        verification_token: str = ""
+        verification_token: str = "",
+        api_base: str = "https://open.feishu.cn/open-apis",
+        rate_limit: float = 0,
+        bulk_concurrency: int = 8,
+        request_timeout: float = 10.0
     ):
         """初始化飞书机器人
         
@@ -39,7 +56,12 @@ class FeishuBot:
             app_secret: 飞书应用密钥
             encrypt_key: 事件加密密钥（可选）
             verification_token: 验证令牌（可选）
+            api_base: 开放平台API地址（可选，压测时可指向本地模拟服务）
+            rate_limit: 出站写请求每秒上限，0 表示不限速
+            bulk_concurrency: 批量发送的并发数
+            request_timeout: 单次请求的默认超时（秒）
         """
+        self.api_base = api_base.rstrip('/')
         self.app_id = app_id
         self.app_secret = app_secret
         self.access_token: Optional[str] = None
@@ -47,27 +69,65 @@ class FeishuBot:
         self.encrypt_key = encrypt_key
         self.verification_token = verification_token
         
-    def get_tenant_access_token(self) -> Optional[str]:
+        # 复用连接池，避免每次请求重新建立 TLS 连接
+        self.session = self._create_session()
+        self._token_body: Optional[bytes] = None
+        self.rate_governor = RateGovernor(rate_limit) if rate_limit > 0 else None
+        self.bulk_concurrency = max(1, bulk_concurrency)
+        self.request_timeout = request_timeout
+        self._cipher: Optional[EventCipher] = None
+        
+    @staticmethod
+    def _create_session() -> requests.Session:
+        """创建带连接池的会话"""
+        session = TracedSession("feishu")
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    
+    def reset_connections(self, rate_limit: Optional[float] = None) -> None:
+        """fork 后重建连接池和限速器，保留已缓存的访问令牌
+        
+        父进程的连接不能在子进程中复用，否则多个进程会在同一个 socket 上读写。
+        
+        Args:
+            rate_limit: 新的每秒上限（多进程时按 worker 数均分），为空时沿用原值
+        """
+        self.session = self._create_session()
+        if rate_limit is None and self.rate_governor is not None:
+            rate_limit = self.rate_governor.rate
+        self.rate_governor = RateGovernor(rate_limit) if rate_limit else None
+        
+    def get_tenant_access_token(self, force_refresh: bool = False) -> Optional[str]:
         """获取tenant_access_token
         
         自动管理令牌缓存，在过期前300秒刷新。
         
+        Args:
+            force_refresh: 忽略缓存强制请求（健康探测使用）
+        
         Returns:
             访问令牌，失败返回None
         """
-        if self.access_token and time.time() < self.token_expire_time:
+        if not force_refresh and self.access_token and time.time() < self.token_expire_time:
             return self.access_token
             
-        url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
-        headers = {"Content-Type": "application/json"}
-        data = {
-            "app_id": self.app_id,
-            "app_secret": self.app_secret
-        }
+        url = f"{self.api_base}/auth/v3/tenant_access_token/internal"
+        headers = {"Content-Type": codec.JSON_CONTENT_TYPE}
+        
+        # 请求体不变，只序列化一次
+        if self._token_body is None:
+            self._token_body = codec.dumps_bytes({
+                "app_id": self.app_id,
+                "app_secret": self.app_secret
+            })
         
         try:
-            response = requests.post(url, headers=headers, json=data)
-            result = response.json()
+            response = self.session.post(
+                url, headers=headers, data=self._token_body, timeout=self._timeout()
+            )
+            result = codec.loads(response.content)
             
             if result.get("code") == 0:
                 self.access_token = result.get("tenant_access_token")
@@ -76,10 +136,10 @@ class FeishuBot:
                 logger.info("成功获取tenant_access_token")
                 return self.access_token
             else:
-                logger.error(f"获取token失败: {result}")
+                logger.error("获取token失败: %s", result)
                 return None
         except Exception as e:
-            logger.error(f"获取token异常: {str(e)}")
+            logger.error("获取token异常: %s", e)
             return None
     
     def send_message(
@@ -102,23 +162,10 @@ class FeishuBot:
         Returns:
             API响应结果，失败返回None
         """
-        token = self.get_tenant_access_token()
-        if not token:
-            logger.error("无法获取access_token，消息发送失败")
-            return None
-            
-        url = "https://open.feishu.cn/open-apis/im/v1/messages"
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
-        params = {"receive_id_type": "chat_id"}
-        
         data: Dict[str, Any] = {
             "receive_id": chat_id,
             "msg_type": msg_type,
-            "content": json.dumps({"text": content}) if msg_type == "text" else content
+            "content": codec.dumps({"text": content}) if msg_type == "text" else content
         }
         
         # 如果指定了root_id，则回复到话题中
@@ -129,19 +176,220 @@ class FeishuBot:
         if reply_in_thread:
             data["reply_in_thread"] = True
         
+        result, error = self._create_message(data)
+        if result is not None:
+            logger.info("消息发送成功: chat_id=%s, msg_type=%s", chat_id, msg_type)
+            return result
+        
+        logger.error("消息发送失败: chat_id=%s, %s", chat_id, error)
+        return None
+    
+    def _create_message(
+        self,
+        data: Dict[str, Any],
+        receive_id_type: str = "chat_id"
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        """调用发送消息接口
+        
+        Args:
+            data: 请求体
+            receive_id_type: 接收者ID类型
+        
+        Returns:
+            (API响应结果或 None, 失败原因)
+        """
+        token = self.get_tenant_access_token()
+        if not token:
+            return None, "无法获取access_token"
+        
+        url = f"{self.api_base}/im/v1/messages"
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": codec.JSON_CONTENT_TYPE
+        }
+        params = {"receive_id_type": receive_id_type}
+        
         try:
-            response = requests.post(url, headers=headers, params=params, json=data)
-            result = response.json()
+            self._throttle()
+            response = self.session.post(
+                url, headers=headers, params=params, data=codec.dumps_bytes(data),
+                timeout=self._timeout()
+            )
+            result = codec.loads(response.content)
+        except Exception as e:
+            return None, f"发送消息异常: {e}"
+            
+        if result.get("code") == 0:
+            return result, ""
+        return None, f"code={result.get('code')}, msg={result.get('msg')}"
+    
+    def _timeout(self) -> float:
+        """本次请求的超时（截止时间已过时抛出 ``DeadlineExceeded``，由调用处按请求失败处理）"""
+        return deadline.timeout(self.request_timeout, "feishu")
+    
+    def _throttle(self) -> None:
+        """出站写请求限速
+        
+        处于截止时间内时最多等到截止时间，等不到令牌时计数并抛出 ``DeadlineExceeded``
+        （与 ``_timeout`` 一样由调用处按请求失败处理）。
+        """
+        if self.rate_governor is None:
+            return
+        current = deadline.current()
+        if current is None:
+            self.rate_governor.acquire()
+            return
+        current.check("feishu")
+        if not self.rate_governor.acquire(current.remaining()):
+            deadline.record_exceeded("feishu")
+            raise DeadlineExceeded("feishu")
+    
+    def send_bulk(
+        self,
+        messages: Sequence[Tuple[str, str]],
+        msg_type: str = "text",
+        max_workers: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """批量发送消息到多个群聊
+        
+        通过共享连接池并发发送，受出站限速器约束。
+        
+        Args:
+            messages: (chat_id, 内容) 列表
+            msg_type: 消息类型
+            max_workers: 并发数，默认使用 bulk_concurrency
+        
+        Returns:
+            与输入顺序一致的结果列表，每项包含 chat_id、success、message_id、error
+        """
+        if not messages:
+            return []
+        
+        def send_one(item: Tuple[str, str]) -> Dict[str, Any]:
+            chat_id, content = item
+            data = {
+                "receive_id": chat_id,
+                "msg_type": msg_type,
+                "content": codec.dumps({"text": content}) if msg_type == "text" else content
+            }
+            result, error = self._create_message(data)
+            return {
+                "chat_id": chat_id,
+                "success": result is not None,
+                "message_id": ((result or {}).get("data") or {}).get("message_id"),
+                "error": error or None
+            }
+        
+        # 预先获取令牌，避免并发线程同时刷新
+        self.get_tenant_access_token()
+        
+        workers = min(max_workers or self.bulk_concurrency, len(messages))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="feishu-bulk") as executor:
+            results = list(executor.map(send_one, messages))
+        
+        failed = sum(1 for r in results if not r["success"])
+        logger.info("批量发送完成: 共 %d 条, 失败 %d 条", len(results), failed)
+        return results
+    
+    def send_card_to_chats(
+        self,
+        chat_ids: Sequence[str],
+        card_content: str,
+        max_workers: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """把同一张卡片发送到多个群聊
+        
+        Args:
+            chat_ids: 群聊ID列表
+            card_content: 卡片内容（JSON字符串）
+            max_workers: 并发数
+        
+        Returns:
+            每个群聊的发送结果
+        """
+        return self.send_bulk(
+            [(chat_id, card_content) for chat_id in chat_ids],
+            msg_type="interactive",
+            max_workers=max_workers
+        )
+    
+    def batch_send_to_users(
+        self,
+        open_ids: Sequence[str],
+        content: str,
+        msg_type: str = "text"
+    ) -> Dict[str, Any]:
+        """使用批量消息接口发送给多个用户
+        
+        飞书的批量发送接口（``/message/v4/batch_send/``）按用户投递，
+        一次调用最多 200 人，超过时自动分批。
+        
+        Args:
+            open_ids: 用户 open_id 列表
+            content: 文本内容，或卡片内容（JSON字符串，msg_type 为 interactive）
+            msg_type: text 或 interactive
+        
+        Returns:
+            {"success": bool, "message_ids": [...], "invalid_open_ids": [...], "errors": [...]}
+        """
+        token = self.get_tenant_access_token()
+        if not token:
+            return {
+                "success": False,
+                "message_ids": [],
+                "invalid_open_ids": [],
+                "errors": ["无法获取access_token"]
+            }
+        
+        url = f"{self.api_base}/message/v4/batch_send/"
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": codec.JSON_CONTENT_TYPE
+        }
+        
+        message_ids: List[str] = []
+        invalid_open_ids: List[str] = []
+        errors: List[str] = []
+        
+        for start in range(0, len(open_ids), BATCH_SEND_LIMIT):
+            data: Dict[str, Any] = {
+                "open_ids": list(open_ids[start:start + BATCH_SEND_LIMIT]),
+                "msg_type": msg_type
+            }
+            if msg_type == "interactive":
+                data["card"] = codec.loads(content)
+            else:
+                data["content"] = {"text": content}
+            
+            try:
+                self._throttle()
+                response = self.session.post(
+                    url, headers=headers, data=codec.dumps_bytes(data), timeout=self._timeout()
+                )
+                result = codec.loads(response.content)
+            except Exception as e:
+                errors.append(f"批量发送异常: {e}")
+                continue
             
             if result.get("code") == 0:
-                logger.info(f"消息发送成功: chat_id={chat_id}, msg_type={msg_type}")
-                return result
+                payload = result.get("data") or {}
+                if payload.get("message_id"):
+                    message_ids.append(payload["message_id"])
+                invalid_open_ids.extend(payload.get("invalid_open_ids") or [])
             else:
-                logger.error(f"消息发送失败: {result}")
-                return None
-        except Exception as e:
-            logger.error(f"发送消息异常: {str(e)}")
-            return None
+                errors.append(f"code={result.get('code')}, msg={result.get('msg')}")
+        
+        if errors:
+            logger.error("批量发送部分失败: %s", errors)
+        else:
+            logger.info("批量发送成功: %d 个用户", len(open_ids))
+        
+        return {
+            "success": not errors,
+            "message_ids": message_ids,
+            "invalid_open_ids": invalid_open_ids,
+            "errors": errors
+        }
     
     def send_card_message(
         self,
@@ -184,41 +432,149 @@ class FeishuBot:
             logger.error("无法获取access_token，回复失败")
             return None
             
-        url = f"https://open.feishu.cn/open-apis/im/v1/messages/{message_id}/reply"
+        url = f"{self.api_base}/im/v1/messages/{message_id}/reply"
         headers = {
             "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
+            "Content-Type": codec.JSON_CONTENT_TYPE
         }
         
         data: Dict[str, Any] = {
             "msg_type": msg_type,
-            "content": json.dumps({"text": content}) if msg_type == "text" else content
+            "content": codec.dumps({"text": content}) if msg_type == "text" else content
         }
         
         if reply_in_thread:
             data["reply_in_thread"] = True
         
         try:
-            response = requests.post(url, headers=headers, json=data)
-            result = response.json()
+            self._throttle()
+            response = self.session.post(
+                url, headers=headers, data=codec.dumps_bytes(data), timeout=self._timeout()
+            )
+            result = codec.loads(response.content)
+            
+            if result.get("code") == 0:
+                logger.info("回复消息成功: message_id=%s", message_id)
+                return result
+            else:
+                logger.error("回复消息失败: %s", result)
+                return None
+        except Exception as e:
+            logger.error("回复消息异常: %s", e)
+            return None
+    
+    def update_message(
+        self,
+        message_id: str,
+        content: str,
+        msg_type: str = "text"
+    ) -> Optional[Dict[str, Any]]:
+        """编辑已发送的消息
+        
+        飞书限制单条消息的编辑次数（20 次），调用方需自行控制编辑频率。
+        
+        Args:
+            message_id: 消息ID
+            content: 新的消息内容
+            msg_type: 消息类型（text/post）
+            
+        Returns:
+            API响应结果，失败返回None
+        """
+        token = self.get_tenant_access_token()
+        if not token:
+            logger.error("无法获取access_token，编辑消息失败")
+            return None
+        
+        url = f"{self.api_base}/im/v1/messages/{message_id}"
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": codec.JSON_CONTENT_TYPE
+        }
+        
+        data = {
+            "msg_type": msg_type,
+            "content": codec.dumps({"text": content}) if msg_type == "text" else content
+        }
+        
+        try:
+            self._throttle()
+            response = self.session.put(
+                url, headers=headers, data=codec.dumps_bytes(data), timeout=self._timeout()
+            )
+            result = codec.loads(response.content)
             
             if result.get("code") == 0:
-                logger.info(f"回复消息成功: message_id={message_id}")
+                logger.debug("编辑消息成功: message_id=%s", message_id)
                 return result
             else:
-                logger.error(f"回复消息失败: {result}")
+                logger.error("编辑消息失败: %s", result)
                 return None
         except Exception as e:
-            logger.error(f"回复消息异常: {str(e)}")
+            logger.error("编辑消息异常: %s", e)
             return None
     
-    def verify_event_signature(self, data: str, signature: str, timestamp: str) -> bool:
+    def update_card_message(
+        self,
+        message_id: str,
+        card_content: str
+    ) -> Optional[Dict[str, Any]]:
+        """原地更新已发送的卡片消息
+        
+        卡片需设置 ``config.update_multi`` 为 true，更新才会对所有人生效。
+        
+        Args:
+            message_id: 卡片消息ID
+            card_content: 新的卡片内容（JSON字符串）
+            
+        Returns:
+            API响应结果，失败返回None
+        """
+        token = self.get_tenant_access_token()
+        if not token:
+            logger.error("无法获取access_token，更新卡片失败")
+            return None
+        
+        url = f"{self.api_base}/im/v1/messages/{message_id}"
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": codec.JSON_CONTENT_TYPE
+        }
+        
+        try:
+            self._throttle()
+            response = self.session.patch(
+                url, headers=headers, data=codec.dumps_bytes({"content": card_content}),
+                timeout=self._timeout()
+            )
+            result = codec.loads(response.content)
+            
+            if result.get("code") == 0:
+                logger.debug("更新卡片成功: message_id=%s", message_id)
+                return result
+            else:
+                logger.error("更新卡片失败: %s", result)
+                return None
+        except Exception as e:
+            logger.error("更新卡片异常: %s", e)
+            return None
+    
+    def verify_event_signature(
+        self,
+        data: Union[str, bytes],
+        signature: str,
+        timestamp: str,
+        nonce: str = ""
+    ) -> bool:
         """验证飞书事件签名
         
+        签名为 ``sha256(timestamp + nonce + encrypt_key + body)``，以常量时间比较。
+        
         Args:
-            data: 事件数据
-            signature: 签名
-            timestamp: 时间戳
+            data: 原始请求体
+            signature: 签名（X-Lark-Signature）
+            timestamp: 时间戳（X-Lark-Request-Timestamp）
+            nonce: 随机数（X-Lark-Request-Nonce）
             
         Returns:
             是否验证通过
@@ -228,24 +584,41 @@ class FeishuBot:
             return True
         
         try:
-            # 构建签名字符串
-            sign_str = f"{timestamp}{data}"
-            
-            # 计算签名
-            computed_signature = hashlib.sha256(sign_str.encode('utf-8')).hexdigest()
-            
-            # 验证签名
-            is_valid = computed_signature == signature
+            is_valid = verify_signature(timestamp, nonce, self.encrypt_key, data, signature)
             
             if not is_valid:
-                logger.warning(f"签名验证失败: computed={computed_signature}, received={signature}")
+                logger.warning("签名验证失败: timestamp=%s, nonce=%s", timestamp, nonce)
             
             return is_valid
             
         except Exception as e:
-            logger.error(f"签名验证异常: {str(e)}")
+            logger.error("签名验证异常: %s", e)
             return False
     
+    def decrypt_event(self, encrypted: str) -> Dict[str, Any]:
+        """解密加密事件
+        
+        Args:
+            encrypted: 请求体中的 ``encrypt`` 字段
+            
+        Returns:
+            解密后的事件
+            
+        Raises:
+            EventDecryptError: 解密失败
+            RuntimeError: 未配置加密密钥或未安装 cryptography
+        """
+        if self._cipher is None:
+            if not self.encrypt_key:
+                raise RuntimeError("收到加密事件，但未配置 FEISHU_ENCRYPT_KEY")
+            self._cipher = EventCipher(self.encrypt_key)
+        
+        plaintext = self._cipher.decrypt(encrypted)
+        try:
+            return codec.loads(plaintext)
+        except ValueError as e:
+            raise EventDecryptError(f"解密结果不是有效的 JSON: {e}") from e
+    
     def verify_verification_token(self, token: str) -> bool:
         """验证飞书验证令牌
         
@@ -262,6 +635,6 @@ class FeishuBot:
         is_valid = token == self.verification_token
         
         if not is_valid:
-            logger.warning(f"验证令牌失败: received={token}")
+            logger.warning("验证令牌失败: received=%s", token)
         
         return is_valid
@@ -0,0 +1,62 @@
+"""出站限速模块
+
+飞书开放平台对发送消息等接口按应用限频（如 50 次/秒），超出后返回限流错误。
+``RateGovernor`` 是进程内共享的令牌桶，所有出站写请求在发出前先取令牌，
+批量发送时并发线程会自动排队，不会打满限额。
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class RateGovernor:
+    """令牌桶限速器
+    
+    Attributes:
+        rate: 每秒补充的令牌数
+        burst: 桶容量（允许的瞬时突发数）
+    """
+    
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        """初始化限速器
+        
+        Args:
+            rate: 每秒允许的请求数
+            burst: 桶容量，默认等于 rate（至少为 1）
+        """
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.rate = rate
+        self.burst = max(1, burst if burst is not None else int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        # 累计等待时间（秒），用于观察限速是否成为瓶颈
+        self.waited = 0.0
+    
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """获取一个令牌，必要时等待
+        
+        Args:
+            timeout: 最长等待时间（秒），为空时一直等待
+        
+        Returns:
+            是否获取成功（超时返回 False）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+                if deadline is not None and now + wait > deadline:
+                    return False
+                self.waited += wait
+            
+            time.sleep(wait)
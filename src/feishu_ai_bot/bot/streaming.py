@@ -0,0 +1,227 @@
+"""流式回复模块
+
+把逐段到达的回复文本合并成一条不断更新的飞书消息（``StreamingReply``），
+以及把任务的多个阶段合并到一张原地更新的状态卡片（``CardUpdater``）。
+
+飞书限制单条消息最多编辑 20 次，并对编辑接口限频，因此这里按最小间隔合并
+更新，并为最终结果预留一次编辑；编辑次数用完后只在结束时写入完整文本。
+"""
+
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from feishu_ai_bot.bot.feishu import FeishuBot
+
+logger = logging.getLogger(__name__)
+
+CURSOR = " ▌"
+
+
+class StreamingReply:
+    """渐进更新的飞书消息
+    
+    Attributes:
+        chat_id: 会话ID
+        message_id: 占位消息ID（发送失败时为 None）
+        text: 当前累积的文本
+        edits: 已执行的编辑次数
+    """
+    
+    def __init__(
+        self,
+        bot: "FeishuBot",
+        chat_id: str,
+        min_interval: float = 1.0,
+        max_edits: int = 18
+    ):
+        """初始化流式回复
+        
+        Args:
+            bot: 飞书机器人实例
+            chat_id: 会话ID
+            min_interval: 两次编辑之间的最小间隔（秒）
+            max_edits: 单条消息最多编辑次数（含最终结果）
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.min_interval = min_interval
+        self.max_edits = max(1, max_edits)
+        self.message_id: Optional[str] = None
+        self.text = ""
+        self.edits = 0
+        self._shown = ""
+        self._last_flush = 0.0
+        self._broken = False
+    
+    def start(self, placeholder: str) -> bool:
+        """发送占位消息
+        
+        Args:
+            placeholder: 占位文本
+        
+        Returns:
+            是否发送成功
+        """
+        result = self.bot.send_message(self.chat_id, placeholder)
+        if result:
+            self.message_id = (result.get("data") or {}).get("message_id")
+        self._shown = placeholder
+        self._last_flush = time.monotonic()
+        return self.message_id is not None
+    
+    def feed(self, delta: str) -> None:
+        """追加一段文本，必要时更新消息
+        
+        Args:
+            delta: 新到达的文本片段
+        """
+        self.text += delta
+        if self.message_id is None or self._broken:
+            return
+        # 为最终结果保留一次编辑
+        if self.edits >= self.max_edits - 1:
+            return
+        if time.monotonic() - self._last_flush < self.min_interval:
+            return
+        self._flush(self.text + CURSOR)
+    
+    def finish(self, text: Optional[str] = None) -> bool:
+        """写入最终结果
+        
+        占位消息不可用或编辑失败时改为发送一条新消息。
+        
+        Args:
+            text: 最终文本，为空时使用已累积的文本
+        
+        Returns:
+            是否成功送达
+        """
+        if text is not None:
+            self.text = text
+        final = self.text or "（无回复内容）"
+        
+        if self.message_id is not None and not self._broken and self.edits < self.max_edits:
+            if final == self._shown or self._flush(final):
+                return True
+        
+        return self.bot.send_message(self.chat_id, final) is not None
+    
+    def _flush(self, content: str) -> bool:
+        """编辑消息为指定内容"""
+        if content == self._shown:
+            return True
+        
+        self._last_flush = time.monotonic()
+        self.edits += 1
+        if self.bot.update_message(self.message_id, content) is None:
+            logger.warning("流式更新失败，停止编辑: message_id=%s", self.message_id)
+            self._broken = True
+            return False
+        
+        self._shown = content
+        return True
+
+
+class CardUpdater:
+    """原地更新的状态卡片
+    
+    第一次写入时发送卡片，之后通过 ``update_card_message`` 原地更新。
+    ``update`` 只记录待写入的卡片，距离上次写入不足 ``min_interval`` 时由定时器
+    延后写入；期间到达的多个阶段合并为一次写入。若任务在第一次写入前就已结束，
+    ``finish`` 直接发送最终卡片，整个生命周期只产生一次写入。
+    
+    Attributes:
+        chat_id: 会话ID
+        root_id: 话题根消息ID
+        message_id: 状态卡片消息ID（尚未发送时为 None）
+        writes: 已执行的写入次数
+    """
+    
+    def __init__(
+        self,
+        bot: "FeishuBot",
+        chat_id: str,
+        root_id: Optional[str] = None,
+        min_interval: float = 1.0
+    ):
+        """初始化状态卡片
+        
+        Args:
+            bot: 飞书机器人实例
+            chat_id: 会话ID
+            root_id: 话题根消息ID（可选）
+            min_interval: 两次写入之间的最小间隔（秒），也是第一次写入的延迟
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.root_id = root_id
+        self.min_interval = min_interval
+        self.message_id: Optional[str] = None
+        self.writes = 0
+        self._pending: Optional[str] = None
+        self._last_write = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._finished = False
+    
+    def update(self, card_content: str) -> None:
+        """提交一个中间阶段（可能与后续阶段合并）
+        
+        Args:
+            card_content: 卡片内容（JSON字符串）
+        """
+        with self._lock:
+            if self._finished:
+                return
+            self._pending = card_content
+            if self._timer is not None:
+                return
+            
+            delay = max(0.0, self._last_write + self.min_interval - time.monotonic())
+            self._timer = threading.Timer(delay, self._flush_pending)
+            self._timer.daemon = True
+            self._timer.start()
+    
+    def finish(self, card_content: str) -> bool:
+        """写入最终卡片（丢弃尚未写入的中间阶段）
+        
+        Args:
+            card_content: 最终卡片内容（JSON字符串）
+        
+        Returns:
+            是否成功送达
+        """
+        with self._lock:
+            self._finished = True
+            self._pending = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            return self._write(card_content)
+    
+    def _flush_pending(self) -> None:
+        """定时器回调：写入最新的中间阶段"""
+        with self._lock:
+            self._timer = None
+            card_content, self._pending = self._pending, None
+            if card_content is not None and not self._finished:
+                self._write(card_content)
+    
+    def _write(self, card_content: str) -> bool:
+        """发送或更新卡片（调用方需持有锁）"""
+        self._last_write = time.monotonic()
+        self.writes += 1
+        
+        if self.message_id is not None:
+            if self.bot.update_card_message(self.message_id, card_content) is not None:
+                return True
+            logger.warning("更新状态卡片失败，改为发送新卡片: message_id=%s", self.message_id)
+        
+        result = self.bot.send_card_message(self.chat_id, card_content, root_id=self.root_id)
+        if result is None:
+            return False
+        self.message_id = (result.get("data") or {}).get("message_id")
+        return True
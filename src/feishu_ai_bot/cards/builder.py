@@ -1,9 +1,10 @@
 """飞书卡片构建器模块"""
 
-import json
 import time
 from typing import Any, Dict
 
+from feishu_ai_bot import codec
+
 
 def create_simple_response_card(task_description: str, result: str) -> str:
     """创建简单问答的卡片
@@ -28,7 +29,7 @@ def create_simple_response_card(task_description: str, result: str) -> str:
             }
         ]
     }
-    return json.dumps(card)
+    return codec.dumps(card)
 
 
 def create_thread_header_card(task_description: str, user_name: str) -> str:
@@ -91,7 +92,7 @@ def create_thread_header_card(task_description: str, user_name: str) -> str:
             }
         ]
     }
-    return json.dumps(card)
+    return codec.dumps(card)
 
 
 def create_progress_card(status: str, message: str) -> str:
@@ -113,7 +114,8 @@ def create_progress_card(status: str, message: str) -> str:
     config = template_map.get(status, template_map["processing"])
     
     card: Dict[str, Any] = {
-        "config": {"wide_screen_mode": True},
+        # update_multi: 允许通过 update_card_message 原地更新（对所有人生效）
+        "config": {"wide_screen_mode": True, "update_multi": True},
         "header": {
             "template": config["template"],
             "title": {"content": f"{config['icon']} {config['title']}", "tag": "plain_text"}
@@ -125,7 +127,7 @@ def create_progress_card(status: str, message: str) -> str:
             }
         ]
     }
-    return json.dumps(card)
+    return codec.dumps(card)
 
 
 class CardBuilder:
@@ -7,7 +7,7 @@ import logging
 import sys
 
 from feishu_ai_bot.config import load_config, validate_config
-from feishu_ai_bot.server import app
+from feishu_ai_bot.server import create_app
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +27,7 @@ def main():
     print(f"🚀 启动飞书AI机器人 v{config.version}")
     print(f"📡 服务地址: http://{config.server.host}:{config.server.port}")
     
+    app = create_app(config)
     app.run(
         host=config.server.host,
         port=config.server.port,
@@ -0,0 +1,144 @@
+"""JSON 编解码模块
+
+全项目统一的 JSON 编解码入口。安装了 orjson 时自动使用 orjson，
+否则回退到标准库 json；也可以通过 ``set_codec`` 或 ``JSON_CODEC`` 环境变量
+（auto/orjson/json）显式指定。
+
+出站请求体应使用 ``dumps_bytes`` 序列化一次后以 ``data=`` 发送，
+重试时复用同一份字节串，避免 ``requests`` 的 ``json=`` 再次序列化。
+"""
+
+import json
+import os
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+
+
+class JsonCodec:
+    """基于标准库 json 的编解码器
+    
+    输出紧凑格式且不转义非 ASCII 字符，与 orjson 的输出保持一致。
+    """
+    
+    name = "json"
+    
+    def dumps(
+        self,
+        obj: Any,
+        pretty: bool = False,
+        default: Optional[Callable[[Any], Any]] = None
+    ) -> str:
+        """序列化为字符串"""
+        if pretty:
+            return json.dumps(obj, ensure_ascii=False, indent=2, default=default)
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=default)
+    
+    def dumps_bytes(
+        self,
+        obj: Any,
+        default: Optional[Callable[[Any], Any]] = None
+    ) -> bytes:
+        """序列化为 UTF-8 字节串"""
+        return self.dumps(obj, default=default).encode("utf-8")
+    
+    def loads(self, data: Union[str, bytes, bytearray]) -> Any:
+        """反序列化，格式错误时抛出 ValueError"""
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """基于 orjson 的编解码器
+    
+    与标准库一样接受非字符串键（int、float、bool、None），序列化时转为字符串。
+    """
+    
+    name = "orjson"
+    
+    def dumps(
+        self,
+        obj: Any,
+        pretty: bool = False,
+        default: Optional[Callable[[Any], Any]] = None
+    ) -> str:
+        """序列化为字符串"""
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, default=default, option=option).decode("utf-8")
+    
+    def dumps_bytes(
+        self,
+        obj: Any,
+        default: Optional[Callable[[Any], Any]] = None
+    ) -> bytes:
+        """序列化为 UTF-8 字节串（零拷贝，orjson 原生输出）"""
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+    
+    def loads(self, data: Union[str, bytes, bytearray]) -> Any:
+        """反序列化，格式错误时抛出 ValueError"""
+        return orjson.loads(data)
+
+
+def create_codec(name: str = "auto") -> JsonCodec:
+    """按名称创建编解码器
+    
+    Args:
+        name: auto/orjson/json，auto 表示优先使用 orjson
+    
+    Returns:
+        编解码器实例
+    """
+    if name == "json":
+        return JsonCodec()
+    if name == "orjson" and orjson is None:
+        raise ValueError("orjson 未安装")
+    if orjson is not None and name in ("auto", "orjson"):
+        return OrjsonCodec()
+    if name != "auto":
+        raise ValueError(f"不支持的 JSON 编解码器: {name}")
+    return JsonCodec()
+
+
+_codec: JsonCodec = create_codec(os.getenv("JSON_CODEC", "auto"))
+
+
+def get_codec() -> JsonCodec:
+    """获取当前编解码器"""
+    return _codec
+
+
+def set_codec(codec: Union[str, JsonCodec]) -> JsonCodec:
+    """替换全局编解码器
+    
+    Args:
+        codec: 编解码器实例或名称
+    
+    Returns:
+        生效的编解码器
+    """
+    global _codec
+    _codec = create_codec(codec) if isinstance(codec, str) else codec
+    return _codec
+
+
+def dumps(
+    obj: Any,
+    pretty: bool = False,
+    default: Optional[Callable[[Any], Any]] = None
+) -> str:
+    """序列化为字符串"""
+    return _codec.dumps(obj, pretty=pretty, default=default)
+
+
+def dumps_bytes(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """序列化为 UTF-8 字节串"""
+    return _codec.dumps_bytes(obj, default=default)
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """反序列化，格式错误时抛出 ValueError"""
+    return _codec.loads(data)
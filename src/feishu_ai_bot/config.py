@@ -1,14 +1,24 @@
 """配置管理模块
 
 使用 dataclass 管理应用配置，替代原来的全局变量方式。
+
+``ConfigStore`` 持有当前生效的配置快照，可在不重启进程的情况下重新加载：
+新配置先校验，通过后整体替换引用，读取方无需加锁。
 """
 
+import ipaddress
+import logging
 import os
-from dataclasses import dataclass, field
+import threading
+from dataclasses import dataclass, field, fields
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import find_dotenv, load_dotenv
 
-from dotenv import load_dotenv
+from feishu_ai_bot import codec
+
+logger = logging.getLogger(__name__)
 
 # 加载环境变量
 env_path = Path(__file__).parent.parent.parent.parent / ".env"
@@ -27,6 +37,10 @@ class FeishuConfig:
     verification_token: str = ""
     bot_open_id: str = ""
     target_chat_id: str = ""
+    api_base: str = "https://open.feishu.cn/open-apis"
+    rate_limit: float = 50.0
+    bulk_concurrency: int = 8
+    request_timeout: float = 10.0
 
 
 @dataclass
@@ -37,6 +51,28 @@ class ServerConfig:
     log_level: str = "INFO"
     log_file: str = "/var/log/feishu-ai-bot/bot.log"
     debug: bool = False
+    log_format: str = "text"
+    log_queue_size: int = 10000
+    log_sampling: Dict[str, float] = field(default_factory=dict)
+    admin_token: str = ""
+    enable_metrics: bool = True
+    enable_profiler: bool = False
+    profiler_max_seconds: float = 30.0
+    task_deadline: float = 120.0
+
+
+# 模型配置可按路由（群聊简单/复杂任务）、任务类型或两者组合（如 simple.code）指定
+PROFILE_ROUTES = ("simple", "complex")
+TASK_CATEGORIES = ("search", "file", "analysis", "code", "general")
+
+
+@dataclass
+class ModelProfile:
+    """一档模型配置（空值/0 表示沿用上一级）"""
+    model: str = ""
+    max_tokens: int = 0
+    temperature: Optional[float] = None
+    timeout: float = 0
 
 
 @dataclass
@@ -48,6 +84,16 @@ class AIConfig:
     model_name: str = ""
     timeout: int = 30
     max_retries: int = 3
+    concurrency_initial: int = 8
+    concurrency_min: int = 1
+    concurrency_max: int = 64
+    queue_timeout: float = 30.0
+    batch_enabled: bool = False
+    batch_window_ms: float = 20.0
+    batch_max_size: int = 8
+    prompt_file: str = ""
+    prompt_versions: Dict[str, str] = field(default_factory=dict)
+    model_profiles: Dict[str, ModelProfile] = field(default_factory=dict)
 
 
 @dataclass
@@ -58,6 +104,13 @@ class OpenClawConfig:
     token: str = ""
     agent_id: str = "main"
     timeout: int = 90
+    stream: bool = True
+    stream_interval: float = 1.0
+    stream_max_edits: int = 18
+    discovery_fanout: int = 8
+    probe_timeout: float = 2.0
+    session_max: int = 1000
+    session_ttl: float = 1800.0
 
 
 @dataclass
@@ -67,6 +120,79 @@ class SecurityConfig:
     rate_limit_per_minute: int = 30
     enable_ip_whitelist: bool = False
     ip_whitelist: List[str] = field(default_factory=list)
+    trusted_proxies: List[str] = field(default_factory=list)
+    replay_window: float = 300.0
+    replay_max_nonces: int = 100000
+    replay_shared_dir: str = ""
+
+
+@dataclass
+class CaptureConfig:
+    """流量录制配置"""
+    enabled: bool = False
+    file: str = "/var/log/feishu-ai-bot/capture.jsonl"
+    max_bytes: int = 64 * 1024 * 1024
+    backup_count: int = 5
+    redact_mode: str = "hash"
+    salt: str = ""
+
+
+@dataclass
+class TracingConfig:
+    """链路追踪配置"""
+    sample_rate: float = 0.01
+    buffer_size: int = 200
+    export_file: str = ""
+
+
+@dataclass
+class SlowLogConfig:
+    """慢操作记录配置（开启后每个事件都记录完整 span，默认关闭）"""
+    enabled: bool = False
+    webhook_ms: float = 1000.0
+    task_ms: float = 30000.0
+    upstream_ms: float = 5000.0
+    file: str = "/var/log/feishu-ai-bot/slow-{pid}.jsonl"
+    max_bytes: int = 8 * 1024 * 1024
+    backup_count: int = 3
+    sample_rate: float = 1.0
+    max_per_minute: int = 60
+    buffer_size: int = 100
+
+
+@dataclass
+class SchedulerConfig:
+    """任务调度配置（私聊、群聊简单任务、群聊复杂任务三个类别）"""
+    enabled: bool = True
+    workers: int = 16
+    p2p_weight: float = 8.0
+    simple_weight: float = 4.0
+    complex_weight: float = 1.0
+    p2p_reserved: int = 2
+    simple_reserved: int = 2
+    complex_reserved: int = 0
+    aging_seconds: float = 15.0
+
+
+@dataclass
+class UsageConfig:
+    """大模型用量与费用统计配置"""
+    enabled: bool = True
+    file: str = "/var/log/feishu-ai-bot/usage.json"
+    flush_seconds: float = 60.0
+    prices: Dict[str, str] = field(default_factory=dict)
+    chat_daily_tokens: int = 0
+    budget_model: str = ""
+    max_keys: int = 1000
+
+
+@dataclass
+class HealthConfig:
+    """依赖健康监控配置"""
+    enabled: bool = True
+    interval: float = 30.0
+    jitter: float = 0.2
+    window_size: int = 20
 
 
 @dataclass
@@ -102,9 +228,78 @@ class AppConfig:
     ai: AIConfig = field(default_factory=AIConfig)
     openclaw: OpenClawConfig = field(default_factory=OpenClawConfig)
     security: SecurityConfig = field(default_factory=SecurityConfig)
+    capture: CaptureConfig = field(default_factory=CaptureConfig)
+    health: HealthConfig = field(default_factory=HealthConfig)
+    tracing: TracingConfig = field(default_factory=TracingConfig)
+    slow_log: SlowLogConfig = field(default_factory=SlowLogConfig)
+    scheduler: SchedulerConfig = field(default_factory=SchedulerConfig)
+    usage: UsageConfig = field(default_factory=UsageConfig)
     messages: MessageTemplates = field(default_factory=MessageTemplates)
 
 
+def parse_rate_map(value: str) -> Dict[str, float]:
+    """解析 ``name=rate`` 形式的逗号分隔配置
+    
+    Args:
+        value: 如 ``feishu_ai_bot.server=0.1,feishu_ai_bot.bot=0.5``
+        
+    Returns:
+        {名称: 比例}，比例限制在 0~1 之间
+    """
+    rates: Dict[str, float] = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        name, rate = item.split("=", 1)
+        rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+def parse_name_map(value: str) -> Dict[str, str]:
+    """解析 ``name=value`` 形式的逗号分隔配置
+    
+    Args:
+        value: 如 ``search=v2,general=v1``
+        
+    Returns:
+        {名称: 值}
+    """
+    items: Dict[str, str] = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        name, text = item.split("=", 1)
+        items[name.strip()] = text.strip()
+    return items
+
+
+def parse_model_profiles(value: str) -> Dict[str, ModelProfile]:
+    """解析模型配置
+    
+    Args:
+        value: JSON，如 ``{"simple": {"model": "deepseek-chat", "max_tokens": 800}}``
+        
+    Returns:
+        {档位: 模型配置}
+    
+    Raises:
+        ValueError: JSON 格式错误或包含未知字段
+    """
+    if not value.strip():
+        return {}
+    
+    data = codec.loads(value)
+    if not isinstance(data, dict):
+        raise ValueError("AI_MODEL_PROFILES 应为 {档位: {model, max_tokens, temperature, timeout}}")
+    profiles: Dict[str, ModelProfile] = {}
+    for name, options in data.items():
+        try:
+            profiles[name] = ModelProfile(**options)
+        except TypeError as e:
+            raise ValueError(f"模型配置 {name} 格式错误: {e}") from None
+    return profiles
+
+
 def load_config() -> AppConfig:
     """从环境变量加载配置
     
@@ -127,6 +322,10 @@ def load_config() -> AppConfig:
         verification_token=os.getenv("FEISHU_VERIFICATION_TOKEN", ""),
         bot_open_id=os.getenv("FEISHU_BOT_OPEN_ID", ""),
         target_chat_id=os.getenv("TARGET_CHAT_ID", ""),
+        api_base=os.getenv("FEISHU_API_BASE", "https://open.feishu.cn/open-apis"),
+        rate_limit=float(os.getenv("FEISHU_RATE_LIMIT", "50")),
+        bulk_concurrency=int(os.getenv("FEISHU_BULK_CONCURRENCY", "8")),
+        request_timeout=float(os.getenv("FEISHU_TIMEOUT", "10")),
     )
     
     # 服务器配置
@@ -136,6 +335,14 @@ def load_config() -> AppConfig:
         log_level=os.getenv("LOG_LEVEL", "INFO"),
         log_file=os.getenv("LOG_FILE", "/var/log/feishu-ai-bot/bot.log"),
         debug=os.getenv("APP_ENV", "development") == "development",
+        log_format=os.getenv("LOG_FORMAT", "text"),
+        log_queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        log_sampling=parse_rate_map(os.getenv("LOG_SAMPLING", "")),
+        admin_token=os.getenv("ADMIN_TOKEN", ""),
+        enable_metrics=os.getenv("ENABLE_METRICS", "true").lower() == "true",
+        enable_profiler=os.getenv("ENABLE_PROFILER", "false").lower() == "true",
+        profiler_max_seconds=float(os.getenv("PROFILER_MAX_SECONDS", "30")),
+        task_deadline=float(os.getenv("TASK_DEADLINE_SECONDS", "120")),
     )
     
     # AI配置
@@ -146,6 +353,16 @@ def load_config() -> AppConfig:
         model_name=os.getenv("AI_MODEL_NAME", ""),
         timeout=int(os.getenv("AI_TIMEOUT", "30")),
         max_retries=int(os.getenv("AI_MAX_RETRIES", "3")),
+        concurrency_initial=int(os.getenv("AI_CONCURRENCY_INITIAL", "8")),
+        concurrency_min=int(os.getenv("AI_CONCURRENCY_MIN", "1")),
+        concurrency_max=int(os.getenv("AI_CONCURRENCY_MAX", "64")),
+        queue_timeout=float(os.getenv("AI_QUEUE_TIMEOUT", "30")),
+        batch_enabled=os.getenv("AI_BATCH_ENABLED", "false").lower() == "true",
+        batch_window_ms=float(os.getenv("AI_BATCH_WINDOW_MS", "20")),
+        batch_max_size=int(os.getenv("AI_BATCH_MAX_SIZE", "8")),
+        prompt_file=os.getenv("AI_PROMPT_FILE", ""),
+        prompt_versions=parse_name_map(os.getenv("AI_PROMPT_VERSIONS", "")),
+        model_profiles=parse_model_profiles(os.getenv("AI_MODEL_PROFILES", "")),
     )
     
     # 设置默认API地址和模型
@@ -169,15 +386,89 @@ def load_config() -> AppConfig:
         token=os.getenv("OPENCLAW_TOKEN", ""),
         agent_id=os.getenv("OPENCLAW_AGENT_ID", "main"),
         timeout=int(os.getenv("OPENCLAW_TIMEOUT", "90")),
+        stream=os.getenv("OPENCLAW_STREAM", "true").lower() == "true",
+        stream_interval=float(os.getenv("OPENCLAW_STREAM_INTERVAL", "1.0")),
+        stream_max_edits=int(os.getenv("OPENCLAW_STREAM_MAX_EDITS", "18")),
+        discovery_fanout=int(os.getenv("OPENCLAW_DISCOVERY_FANOUT", "8")),
+        probe_timeout=float(os.getenv("OPENCLAW_PROBE_TIMEOUT", "2.0")),
+        session_max=int(os.getenv("OPENCLAW_SESSION_MAX", "1000")),
+        session_ttl=float(os.getenv("OPENCLAW_SESSION_TTL", "1800")),
     )
     
     # 安全配置
     ip_whitelist_str = os.getenv("IP_WHITELIST", "")
+    trusted_proxies_str = os.getenv("TRUSTED_PROXIES", "")
     config.security = SecurityConfig(
         enable_event_verification=os.getenv("ENABLE_EVENT_VERIFICATION", "true").lower() == "true",
         rate_limit_per_minute=int(os.getenv("RATE_LIMIT_PER_MINUTE", "30")),
         enable_ip_whitelist=os.getenv("ENABLE_IP_WHITELIST", "false").lower() == "true",
-        ip_whitelist=ip_whitelist_str.split(",") if ip_whitelist_str else [],
+        ip_whitelist=[ip.strip() for ip in ip_whitelist_str.split(",") if ip.strip()],
+        trusted_proxies=[ip.strip() for ip in trusted_proxies_str.split(",") if ip.strip()],
+        replay_window=float(os.getenv("REPLAY_WINDOW", "300")),
+        replay_max_nonces=int(os.getenv("REPLAY_MAX_NONCES", "100000")),
+        replay_shared_dir=os.getenv("REPLAY_SHARED_DIR", ""),
+    )
+    
+    # 流量录制配置
+    config.capture = CaptureConfig(
+        enabled=os.getenv("CAPTURE_ENABLED", "false").lower() == "true",
+        file=os.getenv("CAPTURE_FILE", "/var/log/feishu-ai-bot/capture.jsonl"),
+        max_bytes=int(os.getenv("CAPTURE_MAX_BYTES", str(64 * 1024 * 1024))),
+        backup_count=int(os.getenv("CAPTURE_BACKUP_COUNT", "5")),
+        redact_mode=os.getenv("CAPTURE_REDACT_MODE", "hash"),
+        salt=os.getenv("CAPTURE_SALT", ""),
+    )
+    
+    # 依赖健康监控配置
+    config.health = HealthConfig(
+        enabled=os.getenv("HEALTH_CHECK_ENABLED", "true").lower() == "true",
+        interval=float(os.getenv("HEALTH_CHECK_INTERVAL", "30")),
+        jitter=float(os.getenv("HEALTH_CHECK_JITTER", "0.2")),
+        window_size=int(os.getenv("HEALTH_CHECK_WINDOW", "20")),
+    )
+    
+    # 链路追踪配置
+    config.tracing = TracingConfig(
+        sample_rate=min(1.0, max(0.0, float(os.getenv("TRACE_SAMPLE_RATE", "0.01")))),
+        buffer_size=int(os.getenv("TRACE_BUFFER_SIZE", "200")),
+        export_file=os.getenv("TRACE_EXPORT_FILE", ""),
+    )
+    
+    # 慢操作记录配置
+    config.slow_log = SlowLogConfig(
+        enabled=os.getenv("SLOW_LOG_ENABLED", "false").lower() == "true",
+        webhook_ms=float(os.getenv("SLOW_WEBHOOK_MS", "1000")),
+        task_ms=float(os.getenv("SLOW_TASK_MS", "30000")),
+        upstream_ms=float(os.getenv("SLOW_UPSTREAM_MS", "5000")),
+        file=os.getenv("SLOW_LOG_FILE", "/var/log/feishu-ai-bot/slow-{pid}.jsonl"),
+        max_bytes=int(os.getenv("SLOW_LOG_MAX_BYTES", str(8 * 1024 * 1024))),
+        backup_count=int(os.getenv("SLOW_LOG_BACKUP_COUNT", "3")),
+        sample_rate=min(1.0, max(0.0, float(os.getenv("SLOW_LOG_SAMPLE_RATE", "1.0")))),
+        max_per_minute=int(os.getenv("SLOW_LOG_MAX_PER_MINUTE", "60")),
+        buffer_size=int(os.getenv("SLOW_LOG_BUFFER_SIZE", "100")),
+    )
+    
+    # 任务调度配置
+    config.scheduler = SchedulerConfig(
+        enabled=os.getenv("SCHEDULER_ENABLED", "true").lower() == "true",
+        workers=int(os.getenv("SCHEDULER_WORKERS", "16")),
+        p2p_weight=float(os.getenv("SCHEDULER_P2P_WEIGHT", "8")),
+        simple_weight=float(os.getenv("SCHEDULER_SIMPLE_WEIGHT", "4")),
+        complex_weight=float(os.getenv("SCHEDULER_COMPLEX_WEIGHT", "1")),
+        p2p_reserved=int(os.getenv("SCHEDULER_P2P_RESERVED", "2")),
+        simple_reserved=int(os.getenv("SCHEDULER_SIMPLE_RESERVED", "2")),
+        complex_reserved=int(os.getenv("SCHEDULER_COMPLEX_RESERVED", "0")),
+        aging_seconds=float(os.getenv("SCHEDULER_AGING_SECONDS", "15")),
+    )
+    
+    config.usage = UsageConfig(
+        enabled=os.getenv("USAGE_ENABLED", "true").lower() == "true",
+        file=os.getenv("USAGE_FILE", "/var/log/feishu-ai-bot/usage.json"),
+        flush_seconds=float(os.getenv("USAGE_FLUSH_SECONDS", "60")),
+        prices=parse_name_map(os.getenv("USAGE_PRICES", "")),
+        chat_daily_tokens=int(os.getenv("USAGE_CHAT_DAILY_TOKENS", "0")),
+        budget_model=os.getenv("USAGE_BUDGET_MODEL", ""),
+        max_keys=int(os.getenv("USAGE_MAX_KEYS", "1000")),
     )
     
     return config
@@ -228,6 +519,243 @@ def validate_config(config: AppConfig) -> Tuple[bool, List[str]]:
     return len(errors) == 0, errors
 
 
+def check_config_values(config: AppConfig) -> List[str]:
+    """检查配置取值是否合法（热加载前调用，不产生副作用）
+    
+    Args:
+        config: 应用配置对象
+        
+    Returns:
+        错误列表，为空表示通过
+    """
+    errors = []
+    
+    if not 0 < config.server.port < 65536:
+        errors.append(f"SERVER_PORT 超出范围: {config.server.port}")
+    if config.server.profiler_max_seconds <= 0:
+        errors.append("PROFILER_MAX_SECONDS 必须大于 0")
+    if config.server.task_deadline <= 0:
+        errors.append("TASK_DEADLINE_SECONDS 必须大于 0")
+    
+    if config.feishu.rate_limit < 0:
+        errors.append("FEISHU_RATE_LIMIT 不能为负数")
+    if config.feishu.bulk_concurrency < 1:
+        errors.append("FEISHU_BULK_CONCURRENCY 至少为 1")
+    if config.feishu.request_timeout <= 0:
+        errors.append("FEISHU_TIMEOUT 必须大于 0")
+    
+    if config.ai.timeout <= 0:
+        errors.append("AI_TIMEOUT 必须大于 0")
+    if config.ai.max_retries < 0:
+        errors.append("AI_MAX_RETRIES 不能为负数")
+    if not 1 <= config.ai.concurrency_min <= config.ai.concurrency_max:
+        errors.append("AI_CONCURRENCY_MIN 至少为 1 且不能大于 AI_CONCURRENCY_MAX")
+    if config.ai.queue_timeout <= 0:
+        errors.append("AI_QUEUE_TIMEOUT 必须大于 0")
+    if config.ai.batch_window_ms < 0 or config.ai.batch_max_size < 1:
+        errors.append("AI_BATCH_WINDOW_MS 不能为负数，AI_BATCH_MAX_SIZE 至少为 1")
+    if config.ai.prompt_file or config.ai.prompt_versions:
+        from feishu_ai_bot.ai.prompts import build_registry
+        try:
+            build_registry(config.ai.prompt_file, config.ai.prompt_versions)
+        except ValueError as e:
+            errors.append(f"AI_PROMPT_FILE / AI_PROMPT_VERSIONS 配置错误: {e}")
+    for name, profile in config.ai.model_profiles.items():
+        route, _, category = name.partition(".")
+        if category:
+            known = route in PROFILE_ROUTES and category in TASK_CATEGORIES
+        else:
+            known = name in PROFILE_ROUTES or name in TASK_CATEGORIES
+        if not known:
+            errors.append(f"AI_MODEL_PROFILES 的档位 {name} 应为路由、任务类型或 路由.任务类型")
+        if profile.max_tokens < 0 or profile.timeout < 0:
+            errors.append(f"AI_MODEL_PROFILES 的档位 {name}: max_tokens 与 timeout 不能为负数")
+        if profile.temperature is not None and not 0 <= profile.temperature <= 2:
+            errors.append(f"AI_MODEL_PROFILES 的档位 {name}: temperature 应在 0~2 之间")
+    if config.ai.api_base and not config.ai.api_base.startswith(("http://", "https://")):
+        errors.append(f"AI_API_BASE 不是有效的 URL: {config.ai.api_base}")
+    
+    openclaw = config.openclaw
+    if openclaw.enabled:
+        if not openclaw.gateway_url.startswith(("http://", "https://")):
+            errors.append(f"OPENCLAW_GATEWAY_URL 不是有效的 URL: {openclaw.gateway_url}")
+        if openclaw.timeout <= 0 or openclaw.probe_timeout <= 0:
+            errors.append("OPENCLAW_TIMEOUT / OPENCLAW_PROBE_TIMEOUT 必须大于 0")
+        if openclaw.discovery_fanout < 1 or openclaw.session_max < 1:
+            errors.append("OPENCLAW_DISCOVERY_FANOUT / OPENCLAW_SESSION_MAX 至少为 1")
+    
+    security = config.security
+    if security.rate_limit_per_minute < 1:
+        errors.append("RATE_LIMIT_PER_MINUTE 至少为 1")
+    if security.replay_window <= 0:
+        errors.append("REPLAY_WINDOW 必须大于 0")
+    for entry in security.ip_whitelist + security.trusted_proxies:
+        try:
+            ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            errors.append(f"无效的 IP/CIDR: {entry}")
+    
+    health = config.health
+    if health.interval <= 0 or health.window_size < 1:
+        errors.append("HEALTH_CHECK_INTERVAL 必须大于 0，HEALTH_CHECK_WINDOW 至少为 1")
+    if not 0 <= health.jitter < 1:
+        errors.append("HEALTH_CHECK_JITTER 必须在 [0, 1) 之间")
+    
+    if config.tracing.buffer_size < 1:
+        errors.append("TRACE_BUFFER_SIZE 至少为 1")
+    
+    slow_log = config.slow_log
+    if min(slow_log.webhook_ms, slow_log.task_ms, slow_log.upstream_ms) <= 0:
+        errors.append("SLOW_WEBHOOK_MS / SLOW_TASK_MS / SLOW_UPSTREAM_MS 必须大于 0")
+    if slow_log.buffer_size < 1 or slow_log.max_per_minute < 0:
+        errors.append("SLOW_LOG_BUFFER_SIZE 至少为 1，SLOW_LOG_MAX_PER_MINUTE 不能为负数")
+    
+    scheduler = config.scheduler
+    if scheduler.workers < 1:
+        errors.append("SCHEDULER_WORKERS 至少为 1")
+    if min(scheduler.p2p_weight, scheduler.simple_weight, scheduler.complex_weight) <= 0:
+        errors.append("SCHEDULER_*_WEIGHT 必须大于 0")
+    reserved = (scheduler.p2p_reserved, scheduler.simple_reserved, scheduler.complex_reserved)
+    if min(reserved) < 0 or sum(reserved) > scheduler.workers:
+        errors.append("SCHEDULER_*_RESERVED 不能为负数，且合计不能超过 SCHEDULER_WORKERS")
+    if scheduler.aging_seconds <= 0:
+        errors.append("SCHEDULER_AGING_SECONDS 必须大于 0")
+    
+    usage = config.usage
+    if usage.flush_seconds <= 0:
+        errors.append("USAGE_FLUSH_SECONDS 必须大于 0")
+    if usage.chat_daily_tokens < 0:
+        errors.append("USAGE_CHAT_DAILY_TOKENS 不能为负数")
+    if usage.max_keys <= 0:
+        errors.append("USAGE_MAX_KEYS 必须大于 0")
+    if usage.prices:
+        from feishu_ai_bot.ai.accounting import parse_prices
+        try:
+            parse_prices(usage.prices)
+        except ValueError as e:
+            errors.append(f"USAGE_PRICES 配置错误: {e}")
+    
+    return errors
+
+
+# 修改后需要重启进程才能生效的配置节
+RESTART_REQUIRED_SECTIONS = ("server", "capture", "health")
+
+ReloadCallback = Callable[[AppConfig, AppConfig, List[str]], None]
+
+
+def diff_sections(old: AppConfig, new: AppConfig) -> List[str]:
+    """比较两份配置，返回有变化的配置节名称（顶层字段记为 app）"""
+    changed = []
+    for item in fields(AppConfig):
+        before, after = getattr(old, item.name), getattr(new, item.name)
+        if before != after:
+            changed.append(item.name if hasattr(before, "__dataclass_fields__") else "app")
+    return sorted(set(changed))
+
+
+class ConfigStore:
+    """可热加载的配置快照
+    
+    ``get()`` 直接返回当前快照的引用，读取路径没有锁；``reload()`` 在锁内
+    重新读取 .env 文件和环境变量、校验，通过后一次性替换引用并通知订阅者。
+    快照在替换后不应再被修改。
+    
+    Attributes:
+        env_file: 重新加载时读取的 .env 文件
+        version: 快照版本号，每次成功加载加一
+    """
+    
+    def __init__(self, config: Optional[AppConfig] = None, env_file: Optional[str] = None):
+        """初始化配置存储
+        
+        Args:
+            config: 初始配置，为空时从环境变量加载
+            env_file: .env 文件路径，默认依次取 CONFIG_FILE、项目根目录 .env
+        """
+        self._config = config if config is not None else load_config()
+        self.env_file = env_file or os.getenv("CONFIG_FILE") or (
+            str(env_path) if env_path.exists() else find_dotenv()
+        )
+        self.version = 1
+        self._callbacks: List[ReloadCallback] = []
+        self._lock = threading.Lock()
+    
+    def get(self) -> AppConfig:
+        """获取当前配置快照"""
+        return self._config
+    
+    def subscribe(self, callback: ReloadCallback) -> None:
+        """订阅配置变更
+        
+        Args:
+            callback: 回调 ``(旧配置, 新配置, 变化的配置节)``
+        """
+        self._callbacks.append(callback)
+    
+    def reload(self) -> Dict[str, Any]:
+        """重新加载配置
+        
+        .env 文件中的值覆盖当前环境变量；文件中删除的键不会从环境中移除。
+        
+        Returns:
+            结果字典，包含 success、version、changed、restart_required、errors
+        """
+        with self._lock:
+            if self.env_file and os.path.exists(self.env_file):
+                load_dotenv(self.env_file, override=True)
+            try:
+                new = load_config()
+            except ValueError as e:
+                return self._rejected([f"配置解析失败: {e}"])
+            
+            errors = check_config_values(new)
+            if errors:
+                return self._rejected(errors)
+            
+            old = self._config
+            changed = diff_sections(old, new)
+            if not changed:
+                return {"success": True, "version": self.version, "changed": [],
+                        "restart_required": [], "errors": []}
+            
+            self._config = new
+            self.version += 1
+            restart_required = [name for name in changed if name in RESTART_REQUIRED_SECTIONS]
+            logger.info("🔄 配置已重新加载: version=%s, changed=%s", self.version, changed)
+            if restart_required:
+                logger.warning("以下配置需要重启后生效: %s", restart_required)
+            
+            for callback in list(self._callbacks):
+                try:
+                    callback(old, new, changed)
+                except Exception as e:
+                    logger.error("配置变更回调失败: %s", e, exc_info=True)
+            
+            return {"success": True, "version": self.version, "changed": changed,
+                    "restart_required": restart_required, "errors": []}
+    
+    def _rejected(self, errors: List[str]) -> Dict[str, Any]:
+        """校验失败，保留当前配置"""
+        logger.error("配置重新加载被拒绝: %s", errors)
+        return {"success": False, "version": self.version, "changed": [],
+                "restart_required": [], "errors": errors}
+
+
+_store: Optional[ConfigStore] = None
+_store_lock = threading.Lock()
+
+
+def get_config_store() -> ConfigStore:
+    """获取进程级配置存储（首次调用时从环境变量加载）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ConfigStore()
+    return _store
+
+
 def get_ai_config_dict(config: AIConfig) -> Dict[str, Any]:
     """获取AI配置字典（兼容旧代码）
     
@@ -0,0 +1,177 @@
+"""截止时间模块
+
+每个事件在接入时创建一个 ``Deadline``（总预算 ``TASK_DEADLINE``），后台任务函数显式接收它，
+并在处理期间通过 ``scope`` 设为当前截止时间；大模型、OpenClaw 和飞书客户端从
+``contextvars`` 读取当前截止时间，每次调用的超时取剩余预算与各自默认超时中的较小值，
+预算用完时停止重试并抛出 ``DeadlineExceeded``。
+
+不在任何截止时间内的调用（健康探测、失败通知等）使用各自的默认超时。
+后台任务函数用 ``detached`` 装饰：提交任务时复制的上下文（``tracing.bind``）会带上事件的截止时间，
+任务开始时清除，只在显式的 ``scope`` 内生效，结果与失败通知的写入因此不受限制。
+超时次数按阶段计数，见 ``exceeded_counts``。
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class DeadlineExceeded(Exception):
+    """截止时间已过"""
+    
+    def __init__(self, stage: str):
+        super().__init__(f"处理超时（{stage}）")
+        self.stage = stage
+
+
+_exceeded: Dict[str, int] = {}
+_exceeded_lock = threading.Lock()
+
+
+def record_exceeded(stage: str) -> None:
+    """记录一次超出截止时间"""
+    with _exceeded_lock:
+        _exceeded[stage] = _exceeded.get(stage, 0) + 1
+
+
+def exceeded_counts() -> Dict[str, int]:
+    """各阶段超出截止时间的次数"""
+    with _exceeded_lock:
+        return dict(_exceeded)
+
+
+class Deadline:
+    """截止时间
+    
+    Attributes:
+        budget: 总预算（秒）
+        expires_at: 截止时刻（``time.monotonic``）
+    """
+    
+    __slots__ = ("budget", "expires_at")
+    
+    def __init__(self, budget: float, started: Optional[float] = None):
+        """创建截止时间
+        
+        Args:
+            budget: 总预算（秒）
+            started: 开始时刻（``time.monotonic``），默认为当前
+        """
+        self.budget = budget
+        self.expires_at = (started if started is not None else time.monotonic()) + budget
+    
+    def remaining(self) -> float:
+        """剩余时间（秒），已过期时为 0"""
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    @property
+    def expired(self) -> bool:
+        """是否已过期"""
+        return time.monotonic() >= self.expires_at
+    
+    def check(self, stage: str) -> None:
+        """已过期时计数并抛出 ``DeadlineExceeded``
+        
+        Args:
+            stage: 当前阶段（llm/openclaw/feishu 等）
+        """
+        if self.expired:
+            record_exceeded(stage)
+            raise DeadlineExceeded(stage)
+    
+    def timeout(self, default: float, stage: str) -> float:
+        """本次调用的超时：剩余时间与默认超时中的较小值
+        
+        Args:
+            default: 调用的默认超时（秒）
+            stage: 当前阶段
+        
+        Returns:
+            超时（秒）
+        
+        Raises:
+            DeadlineExceeded: 已过期
+        """
+        self.check(stage)
+        return min(default, self.remaining())
+    
+    @contextmanager
+    def scope(self) -> Iterator["Deadline"]:
+        """在代码块内设为当前截止时间"""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    "feishu_ai_bot_deadline", default=None
+)
+
+
+def current() -> Optional[Deadline]:
+    """当前截止时间（不在任何截止时间内时为 None）"""
+    return _current.get()
+
+
+def timeout(default: float, stage: str) -> float:
+    """按当前截止时间计算调用超时，不在截止时间内时返回默认值
+    
+    Args:
+        default: 调用的默认超时（秒）
+        stage: 当前阶段
+    
+    Raises:
+        DeadlineExceeded: 已过期
+    """
+    deadline = _current.get()
+    return default if deadline is None else deadline.timeout(default, stage)
+
+
+def backoff(seconds: float, stage: str) -> None:
+    """重试前等待；剩余时间不足以等待并再次尝试时不再等待，直接抛出
+    
+    Args:
+        seconds: 等待时间（秒）
+        stage: 当前阶段
+    
+    Raises:
+        DeadlineExceeded: 剩余时间不足
+    """
+    deadline = _current.get()
+    if deadline is not None and deadline.remaining() <= seconds:
+        record_exceeded(stage)
+        raise DeadlineExceeded(stage)
+    time.sleep(seconds)
+
+
+@contextmanager
+def scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """在代码块内使用给定的截止时间（为 None 时不改变当前截止时间）"""
+    if deadline is None:
+        yield None
+        return
+    with deadline.scope():
+        yield deadline
+
+
+def detached(func: F) -> F:
+    """装饰后台任务函数：执行期间清除继承的当前截止时间
+    
+    截止时间只通过参数传入并在显式的 ``scope`` 内生效。
+    """
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        token = _current.set(None)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    
+    return wrapper  # type: ignore[return-value]
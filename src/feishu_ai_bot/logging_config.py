@@ -0,0 +1,235 @@
+"""日志管道模块
+
+请求线程只把日志记录放入有界队列，格式化和磁盘写入由后台线程完成：
+
+- ``NonBlockingQueueHandler``：非阻塞入队，队列满时丢弃并计数，不阻塞请求
+- ``SamplingFilter``：按 logger 名称前缀对 WARNING 以下的日志采样
+- ``JsonFormatter``：输出结构化 JSON Lines（安装了 structlog 时由其渲染）
+
+通过 ``setup_logging(config)`` 统一配置，``LOG_FORMAT``、``LOG_QUEUE_SIZE``、
+``LOG_SAMPLING`` 等环境变量控制行为。
+
+后台线程不会随 fork 复制：子进程（gunicorn worker）中由 ``restart_after_fork`` 换用新的队列
+并重新启动写入线程，fork 时自动调用，``BotServices.after_fork`` 也会调用（重复调用无副作用）。
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from feishu_ai_bot import codec
+from feishu_ai_bot.config import ServerConfig
+
+try:
+    import structlog
+except ImportError:  # pragma: no cover - 可选依赖
+    structlog = None
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_pid: Optional[int] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+_setup_lock = threading.Lock()
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """非阻塞的队列日志处理器
+    
+    队列满时直接丢弃记录并计数，保证日志背压永远不会阻塞请求线程。
+    记录不在请求线程中格式化，消息拼接和异常堆栈渲染都留给后台线程。
+    
+    Attributes:
+        dropped: 因队列已满被丢弃的记录数
+    """
+    
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        """初始化处理器
+        
+        Args:
+            log_queue: 有界日志队列
+        """
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """进程内队列无需序列化，原样传递以推迟格式化"""
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """非阻塞入队"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """按 logger 名称采样的过滤器
+    
+    WARNING 及以上级别始终保留；其余级别按最长匹配的前缀规则采样。
+    
+    Attributes:
+        rates: {logger 名称前缀: 保留比例}
+    """
+    
+    def __init__(self, rates: Dict[str, float]):
+        """初始化采样过滤器
+        
+        Args:
+            rates: {logger 名称前缀: 保留比例(0~1)}
+        """
+        super().__init__()
+        self.rates = dict(rates)
+        self._cache: Dict[str, float] = {}
+    
+    def rate_for(self, name: str) -> float:
+        """获取 logger 对应的保留比例（结果按名称缓存）"""
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            best = -1
+            for prefix, value in self.rates.items():
+                if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+                    rate, best = value, len(prefix)
+            self._cache[name] = rate
+        return rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON Lines 格式化器（未安装 structlog 时使用）"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return codec.dumps(entry, default=str)
+
+
+def create_formatter(log_format: str) -> logging.Formatter:
+    """创建格式化器
+    
+    Args:
+        log_format: text 或 json
+    
+    Returns:
+        日志格式化器
+    """
+    if log_format != "json":
+        return logging.Formatter(TEXT_FORMAT)
+    
+    if structlog is None:
+        return JsonFormatter()
+    
+    return structlog.stdlib.ProcessorFormatter(
+        processor=structlog.processors.JSONRenderer(ensure_ascii=False),
+        foreign_pre_chain=[
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.add_logger_name,
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.format_exc_info,
+        ],
+    )
+
+
+def setup_logging(config: ServerConfig) -> None:
+    """配置异步日志管道（进程内只执行一次）
+    
+    Args:
+        config: 服务器配置
+    """
+    global _listener, _listener_pid, _queue_handler
+    
+    with _setup_lock:
+        if _listener is not None:
+            return
+        
+        # 确保日志目录存在
+        log_path = Path(config.log_file)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        formatter = create_formatter(config.log_format)
+        handlers: List[logging.Handler] = [
+            logging.FileHandler(config.log_file, encoding='utf-8'),
+            logging.StreamHandler(sys.stdout)
+        ]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(config.log_queue_size)
+        _queue_handler = NonBlockingQueueHandler(log_queue)
+        if config.log_sampling:
+            _queue_handler.addFilter(SamplingFilter(config.log_sampling))
+        
+        root = logging.getLogger()
+        root.setLevel(getattr(logging, config.log_level))
+        for handler in list(root.handlers):
+            if isinstance(handler, NonBlockingQueueHandler):
+                root.removeHandler(handler)
+        root.addHandler(_queue_handler)
+        
+        _listener = logging.handlers.QueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        _listener.start()
+        _listener_pid = os.getpid()
+        atexit.register(stop_logging)
+
+
+def restart_after_fork() -> None:
+    """在 fork 出的子进程中重新启动后台写入线程（已在当前进程启动时无操作）
+    
+    父进程的写入线程没有被复制到子进程，继续使用原队列会在队列写满后丢弃所有日志；
+    原队列的锁可能在 fork 时被其他线程持有，因此换用新的队列。
+    """
+    global _listener, _listener_pid, _setup_lock
+    
+    if _listener is None or _listener_pid == os.getpid():
+        return
+    _setup_lock = threading.Lock()
+    with _setup_lock:
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(_queue_handler.queue.maxsize)
+        _queue_handler.queue = log_queue
+        _listener = logging.handlers.QueueListener(
+            log_queue, *_listener.handlers, respect_handler_level=True
+        )
+        _listener.start()
+        _listener_pid = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=restart_after_fork)
+
+
+def stop_logging() -> None:
+    """停止后台写入线程并刷新剩余日志"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            if _listener_pid == os.getpid():
+                _listener.stop()
+            _listener = None
+
+
+def get_dropped_count() -> int:
+    """获取因背压被丢弃的日志条数"""
+    return _queue_handler.dropped if _queue_handler else 0
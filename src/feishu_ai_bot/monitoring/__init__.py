@@ -1,5 +1,7 @@
 """监控模块"""
 
 from feishu_ai_bot.monitoring.stats import StatsCollector
+from feishu_ai_bot.monitoring.health import HealthMonitor
+from feishu_ai_bot.monitoring.shared import SharedStats
 
-__all__ = ["StatsCollector"]
+__all__ = ["StatsCollector", "HealthMonitor", "SharedStats"]
@@ -0,0 +1,318 @@
+"""流量录制模块
+
+将线上收到的飞书事件以紧凑的 JSON Lines 格式追加写入滚动文件，
+供 ``benchmarks/replay.py`` 回放压测使用。
+
+录制文件每行一条记录::
+
+    {"t": 1760000000.123, "e": {...脱敏后的事件...}}
+
+用户文本不会落盘：``hash`` 模式下替换为带盐的摘要并保留长度、
+复杂度等回放所需的形态特征；``redact`` 模式下只保留形态特征。
+用户、会话、消息和租户标识替换为带盐摘要，校验令牌直接丢弃。
+
+写文件由后台线程完成（见 ``monitoring.writer``），请求线程只做脱敏和序列化后放入有界队列，
+队列满时丢弃记录并计数。
+"""
+
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+from feishu_ai_bot import codec
+from feishu_ai_bot.monitoring.writer import BackgroundWriter
+from feishu_ai_bot.tasks.processor import is_complex_task
+
+logger = logging.getLogger(__name__)
+
+REDACT_MODES = ("hash", "redact")
+
+# 提及列表中需要替换为摘要的字段
+_MENTION_FIELDS = ("name", "tenant_key")
+
+
+class RotatingFile:
+    """只追加写入的滚动文件
+    
+    线程安全，文件超过 ``max_bytes`` 后按 ``<path>.1 ... <path>.N`` 的方式滚动。
+    
+    Attributes:
+        path: 文件路径
+        max_bytes: 单个文件最大字节数
+        backup_count: 保留的历史文件个数
+        lines_written: 已写入行数
+    """
+    
+    def __init__(self, path: str, max_bytes: int, backup_count: int):
+        """打开文件（目录不存在时创建）
+        
+        Args:
+            path: 文件路径
+            max_bytes: 单个文件最大字节数
+            backup_count: 保留的历史文件个数
+        
+        Raises:
+            OSError: 无法创建目录或打开文件
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.lines_written = 0
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+    
+    def write(self, line: bytes) -> bool:
+        """追加一行（需自带换行符）
+        
+        Args:
+            line: 要写入的内容
+        
+        Returns:
+            是否写入成功，写入失败只记录日志
+        """
+        with self._lock:
+            if self._file.closed:
+                return False
+            try:
+                if self._size + len(line) > self.max_bytes and self._size > 0:
+                    self._rotate()
+                self._file.write(line)
+                self._file.flush()
+            except OSError as e:
+                logger.warning("写入文件失败: %s: %s", self.path, e)
+                return False
+            self._size += len(line)
+            self.lines_written += 1
+            return True
+    
+    def _rotate(self) -> None:
+        """滚动文件（调用方需持有锁）"""
+        self._file.close()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab")
+        self._size = 0
+        logger.info("文件已滚动: %s", self.path)
+    
+    def close(self) -> None:
+        """关闭文件"""
+        with self._lock:
+            self._file.close()
+
+
+class EventRecorder:
+    """事件录制器
+
+    线程安全、只追加写入，文件超过 ``max_bytes`` 后按
+    ``capture.jsonl.1 ... capture.jsonl.N`` 的方式滚动。
+    写入由后台线程完成，不阻塞请求线程。
+
+    Attributes:
+        path: 录制文件路径
+        redact_mode: 脱敏模式（hash/redact）
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        backup_count: int = 5,
+        redact_mode: str = "hash",
+        salt: str = "",
+        queue_size: int = 10000
+    ):
+        """初始化事件录制器
+
+        Args:
+            path: 录制文件路径
+            max_bytes: 单个文件最大字节数
+            backup_count: 保留的历史文件个数
+            redact_mode: 脱敏模式（hash/redact）
+            salt: 摘要盐值，为空时每个进程随机生成
+            queue_size: 待写入队列长度上限
+        """
+        if redact_mode not in REDACT_MODES:
+            raise ValueError(f"不支持的脱敏模式: {redact_mode}")
+
+        self.path = path
+        self.redact_mode = redact_mode
+        self._salt = (salt or secrets.token_hex(16)).encode("utf-8")
+        self._file = RotatingFile(path, max_bytes, backup_count)
+        self._writer = BackgroundWriter(self._file.write, "capture-writer", queue_size)
+
+    @property
+    def records_written(self) -> int:
+        """已写入记录数"""
+        return self._file.lines_written
+
+    @property
+    def dropped(self) -> int:
+        """队列已满被丢弃的记录数"""
+        return self._writer.dropped
+
+    def record(self, event: Dict[str, Any], arrival: float) -> None:
+        """录制一条事件（放入写入队列后立即返回）
+
+        Args:
+            event: 飞书原始事件
+            arrival: 到达时间戳（time.time()）
+        """
+        line = codec.dumps_bytes({"t": round(arrival, 6), "e": self.redact(event)}) + b"\n"
+        # 录制失败不能影响正常请求处理
+        self._writer.put(line)
+
+    def redact(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """对事件做脱敏处理
+
+        只复制需要改写的层级，原始事件不会被修改。
+
+        Args:
+            event: 飞书原始事件
+
+        Returns:
+            脱敏后的事件
+        """
+        redacted = dict(event)
+
+        # 校验令牌不落盘，租户标识替换为摘要
+        redacted.pop("token", None)
+        header = event.get("header")
+        if isinstance(header, dict):
+            header = dict(header)
+            redacted["header"] = header
+            header.pop("token", None)
+            if header.get("tenant_key"):
+                header["tenant_key"] = self._digest(header["tenant_key"])
+
+        body = event.get("event")
+        if not isinstance(body, dict):
+            return redacted
+
+        body = dict(body)
+        redacted["event"] = body
+
+        message = body.get("message")
+        if isinstance(message, dict):
+            message = dict(message)
+            body["message"] = message
+            message["content"] = self._redact_content(message.get("content", "{}"))
+            # 标识替换为摘要后仍能区分同一会话、同一话题
+            for key in ("chat_id", "message_id", "root_id", "parent_id"):
+                if message.get(key):
+                    message[key] = self._digest(message[key])
+            if isinstance(message.get("mentions"), list):
+                message["mentions"] = [self._redact_mention(m) for m in message["mentions"]]
+
+        sender = body.get("sender")
+        if isinstance(sender, dict) and isinstance(sender.get("sender_id"), dict):
+            sender = dict(sender)
+            body["sender"] = sender
+            sender["sender_id"] = {
+                key: self._digest(value) if isinstance(value, str) else value
+                for key, value in sender["sender_id"].items()
+            }
+            if sender.get("tenant_key"):
+                sender["tenant_key"] = self._digest(sender["tenant_key"])
+
+        return redacted
+
+    def _redact_mention(self, mention: Any) -> Any:
+        """把提及中的用户标识和名称替换为摘要（保留 ``@_user_N`` 占位符）"""
+        if not isinstance(mention, dict):
+            return mention
+        mention = dict(mention)
+        for key in _MENTION_FIELDS:
+            if isinstance(mention.get(key), str):
+                mention[key] = self._digest(mention[key])
+        if isinstance(mention.get("id"), dict):
+            mention["id"] = {
+                key: self._digest(value) if isinstance(value, str) else value
+                for key, value in mention["id"].items()
+            }
+        return mention
+
+    def _redact_content(self, content: str) -> str:
+        """把消息内容替换为形态特征"""
+        try:
+            text = codec.loads(content).get("text", "")
+        except (ValueError, AttributeError):
+            text = ""
+
+        shape: Dict[str, Any] = {
+            "len": len(text),
+            "complex": is_complex_task(text),
+            "mention": "@_user_1" in text,
+        }
+        if self.redact_mode == "hash":
+            shape["sha"] = self._digest(text)
+        return codec.dumps(shape)
+
+    def _digest(self, value: str) -> str:
+        """计算带盐摘要（截断为16位十六进制）"""
+        return hmac.new(self._salt, value.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+    def close(self) -> None:
+        """写完队列中的记录后关闭录制文件"""
+        self._writer.close()
+        self._file.close()
+
+
+def read_capture(path: str) -> Iterator[Dict[str, Any]]:
+    """按行读取录制文件
+
+    Args:
+        path: 录制文件路径
+
+    Yields:
+        录制记录 {"t": 到达时间, "e": 事件}
+    """
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield codec.loads(line)
+            except ValueError:
+                # 进程异常退出时最后一行可能不完整
+                logger.warning("跳过损坏的录制记录: %s", path)
+
+
+def create_event_recorder(
+    enabled: bool,
+    path: str,
+    max_bytes: int = 64 * 1024 * 1024,
+    backup_count: int = 5,
+    redact_mode: str = "hash",
+    salt: str = ""
+) -> Optional[EventRecorder]:
+    """根据配置创建事件录制器，未启用或创建失败时返回 None"""
+    if not enabled:
+        return None
+
+    try:
+        recorder = EventRecorder(
+            path=path,
+            max_bytes=max_bytes,
+            backup_count=backup_count,
+            redact_mode=redact_mode,
+            salt=salt
+        )
+        logger.info("📼 流量录制已启用: %s", path)
+        return recorder
+    except (OSError, ValueError) as e:
+        logger.error("流量录制初始化失败: %s", e)
+        return None
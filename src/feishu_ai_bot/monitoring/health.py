@@ -0,0 +1,230 @@
+"""依赖健康监控模块
+
+后台线程按固定间隔（带随机抖动）探测飞书鉴权、大模型 API 和 OpenClaw 网关，
+为每个依赖保留最近 N 次探测的滚动窗口（可用率、延迟分位数）。
+
+健康检查端点只读取预先生成好的快照字典，不触发任何上游请求。
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from feishu_ai_bot.monitoring.stats import percentile
+
+logger = logging.getLogger(__name__)
+
+ProbeFunc = Callable[[], bool]
+
+
+class DependencyHealth:
+    """单个依赖的滚动健康窗口
+    
+    Attributes:
+        name: 依赖名称
+        window: 最近的探测结果 (时间戳, 是否成功, 延迟毫秒)
+        last_error: 最近一次失败原因
+        consecutive_failures: 连续失败次数
+    """
+    
+    def __init__(self, name: str, window_size: int = 20):
+        """初始化依赖健康窗口
+        
+        Args:
+            name: 依赖名称
+            window_size: 保留的探测结果个数
+        """
+        self.name = name
+        self.window: Deque[Tuple[float, bool, float]] = deque(maxlen=window_size)
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+    
+    def record(self, ok: bool, latency_ms: float, error: Optional[str] = None) -> None:
+        """记录一次探测结果"""
+        self.window.append((time.time(), ok, latency_ms))
+        if ok:
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+            self.last_error = error
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """生成当前窗口的统计快照"""
+        if not self.window:
+            return {"available": None, "checked": False}
+        
+        last_time, last_ok, last_latency = self.window[-1]
+        latencies: List[float] = sorted(latency for _, ok, latency in self.window if ok)
+        successes = sum(1 for _, ok, _ in self.window if ok)
+        
+        return {
+            "available": last_ok,
+            "checked": True,
+            "last_checked": last_time,
+            "last_latency_ms": round(last_latency, 2),
+            "availability": round(successes / len(self.window), 4),
+            "samples": len(self.window),
+            "p50_latency_ms": round(percentile(latencies, 50), 2),
+            "p95_latency_ms": round(percentile(latencies, 95), 2),
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+        }
+
+
+class HealthMonitor:
+    """后台依赖健康监控器
+    
+    每个依赖独立调度，下次探测时间为 ``interval × (1 ± jitter)``，
+    避免多实例同时探测造成上游尖峰。探测结果写入滚动窗口后立即重建快照，
+    ``snapshot()`` 只返回已生成的字典。
+    
+    Attributes:
+        interval: 探测间隔（秒）
+        jitter: 抖动比例（0~1）
+        window_size: 滚动窗口大小
+    """
+    
+    def __init__(
+        self,
+        interval: float = 30.0,
+        jitter: float = 0.2,
+        window_size: int = 20
+    ):
+        """初始化健康监控器
+        
+        Args:
+            interval: 探测间隔（秒）
+            jitter: 抖动比例（0~1）
+            window_size: 滚动窗口大小
+        """
+        self.interval = interval
+        self.jitter = jitter
+        self.window_size = window_size
+        self._probes: Dict[str, ProbeFunc] = {}
+        self._health: Dict[str, DependencyHealth] = {}
+        self._next_due: Dict[str, float] = {}
+        self._snapshot: Dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def register(self, name: str, probe: ProbeFunc) -> None:
+        """注册依赖探测函数
+        
+        Args:
+            name: 依赖名称
+            probe: 探测函数，返回是否健康，抛出异常视为失败
+        """
+        with self._lock:
+            self._probes[name] = probe
+            self._health[name] = DependencyHealth(name, self.window_size)
+            self._next_due[name] = time.monotonic()
+            self._rebuild_snapshot()
+    
+    def record(
+        self,
+        name: str,
+        ok: bool,
+        latency_ms: float,
+        error: Optional[str] = None
+    ) -> None:
+        """记录一次外部得到的探测结果（如启动预热时的探测）
+        
+        Args:
+            name: 依赖名称
+            ok: 是否成功
+            latency_ms: 延迟（毫秒）
+            error: 失败原因
+        """
+        with self._lock:
+            health = self._health.get(name)
+            if health is None:
+                return
+            health.record(ok, latency_ms, error)
+            self._next_due[name] = time.monotonic() + self._next_interval()
+            self._rebuild_snapshot()
+    
+    def probe(self, name: str) -> bool:
+        """立即执行一次探测
+        
+        Args:
+            name: 依赖名称
+        
+        Returns:
+            是否健康
+        """
+        probe = self._probes[name]
+        started = time.perf_counter()
+        try:
+            ok = bool(probe())
+            error = None if ok else "探测未通过"
+        except Exception as e:
+            ok = False
+            error = str(e)
+        latency_ms = (time.perf_counter() - started) * 1000
+        
+        if not ok:
+            logger.warning("依赖探测失败: %s: %s", name, error)
+        self.record(name, ok, latency_ms, error)
+        return ok
+    
+    def run_once(self) -> None:
+        """探测所有到期的依赖"""
+        now = time.monotonic()
+        due = [name for name, at in list(self._next_due.items()) if at <= now]
+        for name in due:
+            if self._stop.is_set():
+                return
+            self.probe(name)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """获取缓存的健康快照（不触发任何探测）"""
+        return self._snapshot
+    
+    def get(self, name: str) -> Dict[str, Any]:
+        """获取单个依赖的缓存快照"""
+        return self._snapshot.get("dependencies", {}).get(name, {"available": None})
+    
+    def start(self) -> None:
+        """启动后台探测线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="health-monitor", daemon=True
+            )
+            self._thread.start()
+        logger.info("🩺 依赖健康监控已启动，间隔 %.0fs", self.interval)
+    
+    def stop(self) -> None:
+        """停止后台探测线程"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+        self._thread = None
+    
+    def _run(self) -> None:
+        """后台探测循环"""
+        while not self._stop.is_set():
+            self.run_once()
+            next_due = min(self._next_due.values(), default=time.monotonic() + self.interval)
+            self._stop.wait(max(0.05, next_due - time.monotonic()))
+    
+    def _next_interval(self) -> float:
+        """带抖动的下次探测间隔"""
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+    
+    def _rebuild_snapshot(self) -> None:
+        """重建快照（调用方需持有锁）"""
+        dependencies = {name: health.snapshot() for name, health in self._health.items()}
+        checked = [dep for dep in dependencies.values() if dep.get("checked")]
+        self._snapshot = {
+            "healthy": all(dep["available"] for dep in checked),
+            "generated_at": time.time(),
+            "dependencies": dependencies,
+        }
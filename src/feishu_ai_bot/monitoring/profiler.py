@@ -0,0 +1,188 @@
+"""采样分析器模块
+
+在进程内按固定间隔读取所有线程的调用栈（``sys._current_frames``），
+汇总为折叠栈格式（``线程;帧1;帧2 次数``，可直接交给 flamegraph.pl / speedscope），
+并生成带任务上下文的线程快照。
+
+- 只读取栈帧，不安装 ``sys.setprofile`` 钩子，未运行时没有任何开销；
+  运行时开销约为每次采样遍历一遍所有线程的栈
+- 同一进程同一时间只允许一个采样任务，采样时长有上限
+- 任务线程通过 ``thread_context`` / ``bind_context`` 登记当前处理的任务，线程快照中一并给出
+
+多进程部署时只分析处理该请求的 worker。
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from feishu_ai_bot.monitoring import tracing
+
+MAX_STACK_DEPTH = 64
+THREAD_DUMP_DEPTH = 20
+
+_contexts: Dict[int, Dict[str, Any]] = {}
+
+
+@contextmanager
+def thread_context(**info: Any) -> Iterator[Dict[str, Any]]:
+    """登记当前线程正在处理的任务（退出时清除）
+    
+    Args:
+        **info: 任务信息，如 task_type、chat_id、message_id
+    """
+    ident = threading.get_ident()
+    span = tracing.current_span()
+    context = {"started_at": time.time(), **info}
+    if span is not None:
+        context["trace_id"] = span.trace.trace_id
+    previous = _contexts.get(ident)
+    _contexts[ident] = context
+    try:
+        yield context
+    finally:
+        if previous is None:
+            _contexts.pop(ident, None)
+        else:
+            _contexts[ident] = previous
+
+
+def bind_context(func: Callable[..., Any], **info: Any) -> Callable[..., Any]:
+    """包装线程函数，执行期间登记任务上下文
+    
+    Args:
+        func: 目标函数
+        **info: 任务信息
+    
+    Returns:
+        包装后的函数
+    """
+    def run(*args: Any, **kwargs: Any) -> Any:
+        with thread_context(**info):
+            return func(*args, **kwargs)
+    return run
+
+
+def _frame_label(frame, current_line: bool) -> str:
+    """栈帧标签：``函数 (文件:行号)``
+    
+    采样时使用函数定义行，同一函数的样本合并为一帧；线程快照使用当前执行行。
+    """
+    code = frame.f_code
+    line = frame.f_lineno if current_line else code.co_firstlineno
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{line})"
+
+
+def _walk(frame, depth: int, current_line: bool = False) -> List[str]:
+    """从最外层到最内层的帧标签（最多 depth 层，保留最内层）"""
+    labels = []
+    while frame is not None and len(labels) < depth:
+        labels.append(_frame_label(frame, current_line))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def thread_dump(depth: int = THREAD_DUMP_DEPTH) -> List[Dict[str, Any]]:
+    """当前所有线程的快照
+    
+    Args:
+        depth: 每个线程保留的栈帧数（最内层）
+    
+    Returns:
+        线程列表，包含名称、ident、是否守护线程、任务上下文和调用栈
+    """
+    frames = sys._current_frames()
+    now = time.time()
+    dump = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        context = _contexts.get(thread.ident)
+        if context is not None:
+            context = {**context, "running_s": round(now - context["started_at"], 3)}
+        dump.append({
+            "name": thread.name,
+            "ident": thread.ident,
+            "daemon": thread.daemon,
+            "context": context,
+            "stack": _walk(frame, depth, current_line=True) if frame is not None else [],
+        })
+    return dump
+
+
+class StackSampler:
+    """调用栈采样器（同一时间只运行一个采样）"""
+    
+    def __init__(self):
+        self._running = threading.Lock()
+    
+    @property
+    def busy(self) -> bool:
+        """是否有采样正在进行"""
+        return self._running.locked()
+    
+    def sample(self, seconds: float, interval: float = 0.01) -> Optional[Dict[str, Any]]:
+        """在调用线程中采样所有其他线程
+        
+        Args:
+            seconds: 采样时长（秒）
+            interval: 采样间隔（秒，不小于 1ms）
+        
+        Returns:
+            采样结果；已有采样在进行时返回 None
+        """
+        if not self._running.acquire(blocking=False):
+            return None
+        
+        try:
+            return self._sample(max(seconds, 0.0), max(interval, 0.001))
+        finally:
+            self._running.release()
+    
+    def _sample(self, seconds: float, interval: float) -> Dict[str, Any]:
+        """采样循环"""
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        started = time.monotonic()
+        deadline = started + seconds
+        
+        while True:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = _walk(frame, MAX_STACK_DEPTH)
+                labels.insert(0, names.get(ident, f"thread-{ident}"))
+                stacks[";".join(labels)] += 1
+            samples += 1
+            
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            time.sleep(min(interval, deadline - now))
+        
+        return {
+            "pid": os.getpid(),
+            "duration_s": round(time.monotonic() - started, 3),
+            "interval_s": interval,
+            "samples": samples,
+            "stacks": dict(stacks.most_common()),
+        }
+
+
+def collapsed(stacks: Dict[str, int]) -> str:
+    """折叠栈文本（每行 ``栈 次数``）"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+
+
+_sampler = StackSampler()
+
+
+def get_sampler() -> StackSampler:
+    """获取进程内的采样器"""
+    return _sampler
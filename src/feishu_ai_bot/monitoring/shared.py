@@ -0,0 +1,147 @@
+"""多进程共享统计模块
+
+gunicorn 多 worker 部署时，由 master 在 fork 之前创建一块匿名共享内存（``mmap``），
+worker 继承同一映射。每个 worker 在 fork 后认领一行计数槽，只写自己的行，
+读取时汇总所有行，``/stats`` 和 ``/metrics`` 因此能返回整个实例的合计值。
+
+内存布局（均为 8 字节）::
+
+    [master 启动时间][槽位 0..N-1 的 pid][槽位 0 的计数字段 ...][槽位 1 ...]...
+
+worker 重启后认领已退出进程的槽位并在原计数上累加，合计值不会回退。
+"""
+
+import logging
+import mmap
+import multiprocessing
+import os
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATS_FIELDS: Tuple[str, ...] = (
+    "total_requests",
+    "successful_requests",
+    "failed_requests",
+    "tasks_processed",
+)
+
+_CELL = struct.Struct("q")
+_TIME = struct.Struct("d")
+
+
+def _pid_alive(pid: int) -> bool:
+    """检查进程是否存在"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedStats:
+    """跨进程共享的计数器
+    
+    Attributes:
+        max_workers: 最多可认领的槽位数
+        slot: 当前进程认领的槽位，未认领时为 None
+    """
+    
+    def __init__(self, max_workers: int = 64):
+        """在当前进程（应为 master）中创建共享内存
+        
+        Args:
+            max_workers: 最多可认领的槽位数，应不小于 worker 数（含重启）
+        """
+        self.max_workers = max_workers
+        self._fields = {name: index for index, name in enumerate(STATS_FIELDS)}
+        self._pids_offset = _TIME.size
+        self._rows_offset = self._pids_offset + max_workers * _CELL.size
+        size = self._rows_offset + max_workers * len(STATS_FIELDS) * _CELL.size
+        self._buffer = mmap.mmap(-1, size, flags=mmap.MAP_SHARED)
+        _TIME.pack_into(self._buffer, 0, time.time())
+        # fork 前创建，所有 worker 共享；只在认领槽位时使用
+        self._claim_lock = multiprocessing.Lock()
+        self._lock = threading.Lock()
+        self._owner_pid: Optional[int] = None
+        self.slot: Optional[int] = None
+    
+    @property
+    def start_time(self) -> float:
+        """master 创建共享内存的时间"""
+        return _TIME.unpack_from(self._buffer, 0)[0]
+    
+    def attach(self) -> int:
+        """为当前进程认领槽位（fork 后调用，重复调用返回同一槽位）
+        
+        Returns:
+            槽位编号
+        
+        Raises:
+            RuntimeError: 没有空闲槽位
+        """
+        pid = os.getpid()
+        if self._owner_pid == pid and self.slot is not None:
+            return self.slot
+        
+        with self._claim_lock:
+            for slot in range(self.max_workers):
+                offset = self._pids_offset + slot * _CELL.size
+                owner = _CELL.unpack_from(self._buffer, offset)[0]
+                if owner == 0 or owner == pid or not _pid_alive(owner):
+                    _CELL.pack_into(self._buffer, offset, pid)
+                    break
+            else:
+                raise RuntimeError(f"共享统计槽位已满（{self.max_workers}）")
+        
+        # fork 后继承的线程锁状态不可信，重新创建
+        self._lock = threading.Lock()
+        self._owner_pid = pid
+        self.slot = slot
+        logger.info("共享统计槽位已认领: pid=%s, slot=%s", pid, slot)
+        return slot
+    
+    def incr(self, name: str, value: int = 1) -> None:
+        """累加当前进程的计数
+        
+        Args:
+            name: 计数字段，见 ``STATS_FIELDS``
+            value: 增量
+        """
+        if self._owner_pid != os.getpid():
+            self.attach()
+        offset = self._cell(self.slot, self._fields[name])
+        with self._lock:
+            current = _CELL.unpack_from(self._buffer, offset)[0]
+            _CELL.pack_into(self._buffer, offset, current + value)
+    
+    def totals(self) -> Dict[str, int]:
+        """所有槽位的合计"""
+        totals = dict.fromkeys(STATS_FIELDS, 0)
+        for slot in range(self.max_workers):
+            for name, index in self._fields.items():
+                totals[name] += _CELL.unpack_from(self._buffer, self._cell(slot, index))[0]
+        return totals
+    
+    def workers(self) -> List[Dict[str, int]]:
+        """各 worker 的计数（只包含已认领的槽位）"""
+        result = []
+        for slot in range(self.max_workers):
+            pid = _CELL.unpack_from(self._buffer, self._pids_offset + slot * _CELL.size)[0]
+            if pid == 0:
+                continue
+            row = {
+                name: _CELL.unpack_from(self._buffer, self._cell(slot, index))[0]
+                for name, index in self._fields.items()
+            }
+            result.append({"slot": slot, "pid": pid, "alive": _pid_alive(pid), **row})
+        return result
+    
+    def _cell(self, slot: int, index: int) -> int:
+        """计数单元的偏移量"""
+        return self._rows_offset + (slot * len(STATS_FIELDS) + index) * _CELL.size
@@ -0,0 +1,260 @@
+"""慢操作记录模块
+
+作为 ``Tracer`` 的回调接收每条完成的 trace，webhook 请求、后台任务或上游调用
+（飞书、大模型、OpenClaw）超过阈值时生成一条紧凑的诊断记录：各阶段耗时、
+重试次数、请求/响应大小和选中的 OpenClaw 路由。
+
+记录保存在内存环形缓冲区（``/debug/slow``），并由后台线程（``monitoring.writer``）追加写入滚动文件，
+请求线程不做文件 I/O。
+超过阈值的操作按比例采样，且每分钟记录数有上限；正常负载下没有操作超过阈值，不产生任何磁盘写入。
+
+注册回调后 ``Tracer`` 为每个事件记录完整的 span（采样率只决定哪些 trace 进入缓冲区和导出文件），
+因此默认关闭（``SLOW_LOG_ENABLED``），需要排查延迟时再开启。
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from feishu_ai_bot import codec
+from feishu_ai_bot.config import SlowLogConfig
+from feishu_ai_bot.monitoring import tracing
+from feishu_ai_bot.monitoring.capture import RotatingFile
+from feishu_ai_bot.monitoring.tracing import Span, Trace
+from feishu_ai_bot.monitoring.writer import BackgroundWriter
+
+logger = logging.getLogger(__name__)
+
+TASK_SPANS = ("task.", "openclaw.relay")
+UPSTREAM_SPANS = ("feishu.", "llm.", "openclaw.request")
+STAGE_ATTRIBUTES = ("status", "path", "endpoint", "request_bytes", "response_bytes", "attempt", "route")
+
+
+def span_category(name: str) -> Optional[str]:
+    """span 所属的阈值类别（webhook/task/upstream），不参与判断时返回 None"""
+    if name == "webhook.event":
+        return "webhook"
+    if name.startswith(TASK_SPANS):
+        return "task"
+    if name.startswith(UPSTREAM_SPANS):
+        return "upstream"
+    return None
+
+
+class SlowLog:
+    """慢操作记录器
+    
+    Attributes:
+        thresholds: 各类别的阈值（毫秒）
+        path: 记录文件路径，为空时只保留在内存中
+        sample_rate: 超过阈值的操作被记录的比例
+        max_per_minute: 每分钟最多记录数
+        stats: 计数（detected 超过阈值、recorded 已记录、dropped 被采样或限流丢弃）
+    """
+    
+    def __init__(
+        self,
+        thresholds: Dict[str, float],
+        path: Optional[str] = None,
+        max_bytes: int = 8 * 1024 * 1024,
+        backup_count: int = 3,
+        sample_rate: float = 1.0,
+        max_per_minute: int = 60,
+        buffer_size: int = 100
+    ):
+        """初始化慢操作记录器
+        
+        Args:
+            thresholds: 各类别的阈值（毫秒），键为 webhook/task/upstream
+            path: 记录文件路径，``{pid}`` 替换为进程号；首次记录时才创建文件
+            max_bytes: 单个文件最大字节数
+            backup_count: 保留的历史文件个数
+            sample_rate: 超过阈值的操作被记录的比例
+            max_per_minute: 每分钟最多记录数
+            buffer_size: 内存中保留的记录数
+        """
+        self.thresholds = thresholds
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.sample_rate = sample_rate
+        self.max_per_minute = max_per_minute
+        self.stats = {"detected": 0, "recorded": 0, "dropped": 0}
+        self._records: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self._file: Optional[RotatingFile] = None
+        self._writer = BackgroundWriter(self._write, "slowlog-writer", max_queue=max(1, max_per_minute))
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, trace: Trace) -> None:
+        """检查一条完成的 trace（注册为 ``Tracer`` 回调）"""
+        slow = []
+        for span in trace.spans:
+            category = span_category(span.name)
+            if category is None or span.end_ns is None:
+                continue
+            threshold = self.thresholds[category]
+            if span.duration_ms >= threshold:
+                slow.append({
+                    "span": span.name,
+                    "category": category,
+                    "duration_ms": round(span.duration_ms, 1),
+                    "threshold_ms": threshold,
+                })
+        if not slow:
+            return
+        
+        with self._lock:
+            self.stats["detected"] += 1
+            if not self._admit():
+                self.stats["dropped"] += 1
+                return
+            self.stats["recorded"] += 1
+        
+        record = self.build_record(trace, slow)
+        self._records.append(record)
+        if self.path:
+            self._writer.put(record)
+    
+    def _admit(self) -> bool:
+        """采样和每分钟限流（调用方需持有锁）"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        now = time.monotonic()
+        if now - self._window_start >= 60:
+            self._window_start = now
+            self._window_count = 0
+        if self._window_count >= self.max_per_minute:
+            return False
+        self._window_count += 1
+        return True
+    
+    @staticmethod
+    def build_record(trace: Trace, slow: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """生成诊断记录
+        
+        Args:
+            trace: 完成的 trace
+            slow: 超过阈值的 span
+        
+        Returns:
+            记录字典
+        """
+        spans: List[Span] = trace.spans
+        llm_attempts = sum(1 for span in spans if span.name == "llm.attempt")
+        openclaw = [span for span in spans if span.name == "openclaw.request"]
+        route = next((span.attributes["route"] for span in spans if "route" in span.attributes), None)
+        if route is None:
+            route = next(
+                (span.attributes.get("endpoint") for span in reversed(openclaw) if span.error is None),
+                None
+            )
+        
+        stages = []
+        for span in spans:
+            stage = {
+                "name": span.name,
+                "offset_ms": round((span.start_ns - trace.start_ns) / 1e6, 1),
+                "duration_ms": round(span.duration_ms, 1),
+            }
+            for key in STAGE_ATTRIBUTES:
+                if span.attributes.get(key) is not None:
+                    stage[key] = span.attributes[key]
+            if span.error:
+                stage["error"] = span.error
+            stages.append(stage)
+        
+        return {
+            "time": round(trace.start_ns / 1e9, 3),
+            "trace_id": trace.trace_id,
+            "name": trace.name,
+            "duration_ms": round(trace.duration_ms, 1),
+            "slow": slow,
+            "retries": {
+                "llm": max(0, llm_attempts - 1),
+                "openclaw": sum(1 for span in openclaw if span.error),
+            },
+            "openclaw_route": route,
+            "stages": stages,
+        }
+    
+    def _write(self, record: Dict[str, Any]) -> None:
+        """追加写入记录文件（在写入线程中执行，首次写入时打开）"""
+        with self._lock:
+            if self._file is None:
+                path = self.path.replace("{pid}", str(os.getpid()))
+                try:
+                    self._file = RotatingFile(path, self.max_bytes, self.backup_count)
+                except OSError as e:
+                    logger.error("慢操作记录文件无法打开，只保留在内存中: %s", e)
+                    self.path = None
+                    return
+        self._file.write(codec.dumps_bytes(record) + b"\n")
+    
+    def records(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """最近的记录（新的在前）"""
+        records = list(reversed(self._records))
+        return records[:limit] if limit is not None else records
+    
+    def flush(self) -> None:
+        """等待已记录的条目写入文件"""
+        self._writer.flush()
+    
+    def close(self) -> None:
+        """写完待写入的记录后关闭记录文件"""
+        self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def create_slow_log(config: SlowLogConfig) -> Optional[SlowLog]:
+    """根据配置创建慢操作记录器，未启用时返回 None"""
+    if not config.enabled:
+        return None
+    
+    return SlowLog(
+        thresholds={
+            "webhook": config.webhook_ms,
+            "task": config.task_ms,
+            "upstream": config.upstream_ms,
+        },
+        path=config.file or None,
+        max_bytes=config.max_bytes,
+        backup_count=config.backup_count,
+        sample_rate=config.sample_rate,
+        max_per_minute=config.max_per_minute,
+        buffer_size=config.buffer_size
+    )
+
+
+_slow_log: Optional[SlowLog] = None
+
+
+def get_slow_log() -> Optional[SlowLog]:
+    """获取当前的慢操作记录器"""
+    return _slow_log
+
+
+def install(slow_log: Optional[SlowLog]) -> Optional[SlowLog]:
+    """替换当前的慢操作记录器，并注册为全局追踪器的回调
+    
+    Args:
+        slow_log: 新的记录器，为 None 时关闭慢操作记录
+    
+    Returns:
+        生效的记录器
+    """
+    global _slow_log
+    tracer = tracing.get_tracer()
+    if _slow_log is not None:
+        tracer.remove_listener(_slow_log.observe)
+        _slow_log.close()
+    _slow_log = slow_log
+    if slow_log is not None:
+        tracer.add_listener(slow_log.observe)
+    return _slow_log
@@ -3,14 +3,20 @@
 提供服务状态监控和统计功能
 """
 
+import os
 import time
 import logging
+import threading
+from collections import deque
 from datetime import datetime
-from typing import TYPE_CHECKING, Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional
+
+from feishu_ai_bot.deadline import exceeded_counts
 
 if TYPE_CHECKING:
     from feishu_ai_bot.ai.processor import AITaskProcessor
     from feishu_ai_bot.config import AppConfig
+    from feishu_ai_bot.monitoring.shared import SharedStats
 
 logger = logging.getLogger(__name__)
 
@@ -124,6 +130,9 @@ class StatsCollector:
             },
             "tasks": {
                 "processed": self.tasks_processed
+            },
+            "deadlines": {
+                "exceeded": exceeded_counts()
             }
         }
         
@@ -133,6 +142,22 @@ class StatsCollector:
                 "model": getattr(ai_processor, 'model_name', 'unknown'),
                 "api_key_configured": bool(getattr(ai_processor, 'api_key', None))
             }
+            limiter = getattr(ai_processor, 'limiter', None)
+            if limiter is not None:
+                result["ai"]["concurrency"] = limiter.snapshot()
+            if hasattr(ai_processor, 'tier_snapshot'):
+                result["ai"]["tiers"] = ai_processor.tier_snapshot()
+            batcher = getattr(ai_processor, 'batcher', None)
+            if batcher is not None:
+                result["ai"]["batching"] = batcher.snapshot()
+            registry = getattr(ai_processor, 'prompts', None)
+            if registry is not None:
+                from feishu_ai_bot.ai.prompts import cache_stats
+                
+                result["ai"]["prompts"] = {
+                    "versions": registry.active_versions(),
+                    "cache": cache_stats(),
+                }
         
         if config:
             result["config"] = {
@@ -155,12 +180,39 @@ _service_stats = {
 }
 
 
+# 多进程模式下的共享计数（由 enable_shared_stats 设置）
+_shared_stats: Optional["SharedStats"] = None
+
+
+def enable_shared_stats(shared: Optional["SharedStats"]) -> None:
+    """启用（或关闭）多进程共享计数
+    
+    启用后计数写入共享内存，``get_global_collector`` 返回所有 worker 的合计。
+    
+    Args:
+        shared: 共享计数器，为空时恢复进程内计数
+    """
+    global _shared_stats
+    _shared_stats = shared
+
+
+def get_shared_stats() -> Optional["SharedStats"]:
+    """获取共享计数器（未启用时为 None）"""
+    return _shared_stats
+
+
 def update_stats(success: bool = True) -> None:
     """更新服务统计信息（全局函数版本）
     
     Args:
         success: 是否成功
     """
+    shared = _shared_stats
+    if shared is not None:
+        shared.incr('total_requests')
+        shared.incr('successful_requests' if success else 'failed_requests')
+        return
+    
     _service_stats['total_requests'] += 1
     if success:
         _service_stats['successful_requests'] += 1
@@ -170,16 +222,42 @@ def update_stats(success: bool = True) -> None:
 
 def increment_tasks_processed() -> None:
     """增加已处理任务数（全局函数版本）"""
+    shared = _shared_stats
+    if shared is not None:
+        shared.incr('tasks_processed')
+        return
     _service_stats['tasks_processed'] += 1
 
 
+def get_global_collector() -> StatsCollector:
+    """获取全局统计数据的快照（多进程模式下为所有 worker 的合计）
+    
+    Returns:
+        填充了当前计数的统计收集器
+    """
+    collector = StatsCollector()
+    shared = _shared_stats
+    if shared is not None:
+        counts = shared.totals()
+        collector.start_time = datetime.fromtimestamp(shared.start_time)
+    else:
+        counts = _service_stats
+        collector.start_time = _service_stats['start_time']
+    
+    collector.total_requests = counts['total_requests']
+    collector.successful_requests = counts['successful_requests']
+    collector.failed_requests = counts['failed_requests']
+    collector.tasks_processed = counts['tasks_processed']
+    return collector
+
+
 def get_uptime() -> float:
     """获取服务运行时间（秒）（全局函数版本）
     
     Returns:
         运行时间秒数
     """
-    return (datetime.now() - _service_stats['start_time']).total_seconds()
+    return get_global_collector().get_uptime()
 
 
 def get_health_status(ai_processor=None) -> Dict[str, Any]:
@@ -191,36 +269,173 @@ def get_health_status(ai_processor=None) -> Dict[str, Any]:
     Returns:
         健康状态字典
     """
-    collector = StatsCollector()
-    # 复制全局统计数据
-    collector.start_time = _service_stats['start_time']
-    collector.total_requests = _service_stats['total_requests']
-    collector.successful_requests = _service_stats['successful_requests']
-    collector.failed_requests = _service_stats['failed_requests']
-    collector.tasks_processed = _service_stats['tasks_processed']
+    collector = get_global_collector()
     
     return collector.get_health_status(ai_processor)
 
 
-def get_stats(ai_processor=None, server_port: int = 8081) -> Dict[str, Any]:
+def get_stats(ai_processor=None, server_port: int = 8081, config=None) -> Dict[str, Any]:
     """获取详细统计信息（全局函数版本）
     
     Args:
         ai_processor: AI处理器实例
         server_port: 服务器端口
+        config: 应用配置，为空时使用进程级配置快照（不会重新读取环境变量）
         
     Returns:
         统计信息字典
     """
-    from feishu_ai_bot.config import load_config
+    from feishu_ai_bot.config import get_config_store
     
-    collector = StatsCollector()
-    # 复制全局统计数据
-    collector.start_time = _service_stats['start_time']
-    collector.total_requests = _service_stats['total_requests']
-    collector.successful_requests = _service_stats['successful_requests']
-    collector.failed_requests = _service_stats['failed_requests']
-    collector.tasks_processed = _service_stats['tasks_processed']
-    
-    config = load_config()
+    collector = get_global_collector()
+    
+    if config is None:
+        config = get_config_store().get()
     return collector.get_detailed_stats(ai_processor, config)
+
+
+# 延迟采样窗口（按名称，保留最近 LATENCY_WINDOW_SIZE 个样本）
+LATENCY_WINDOW_SIZE = 1000
+_latency_windows: Dict[str, Deque[float]] = {}
+_latency_counts: Dict[str, int] = {}
+_latency_lock = threading.Lock()
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """已排序列表的百分位数（最近秩法）
+    
+    Args:
+        ordered: 升序排列的样本
+        pct: 百分位（0~100）
+        
+    Returns:
+        百分位数，样本为空时返回0
+    """
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def record_latency(name: str, latency_ms: float) -> None:
+    """记录一次延迟样本
+    
+    Args:
+        name: 指标名称，如 ``openclaw.first_byte``
+        latency_ms: 延迟（毫秒）
+    """
+    with _latency_lock:
+        window = _latency_windows.get(name)
+        if window is None:
+            window = _latency_windows[name] = deque(maxlen=LATENCY_WINDOW_SIZE)
+            _latency_counts[name] = 0
+        window.append(latency_ms)
+        _latency_counts[name] += 1
+
+
+def get_latency_stats() -> Dict[str, Dict[str, float]]:
+    """获取各延迟指标的分位数统计
+    
+    Returns:
+        {指标名称: {count, p50, p95, p99, max}}
+    """
+    with _latency_lock:
+        samples = {name: sorted(window) for name, window in _latency_windows.items()}
+        counts = dict(_latency_counts)
+    
+    return {
+        name: {
+            "count": counts[name],
+            "p50": round(percentile(ordered, 50), 2),
+            "p95": round(percentile(ordered, 95), 2),
+            "p99": round(percentile(ordered, 99), 2),
+            "max": round(ordered[-1], 2) if ordered else 0.0,
+        }
+        for name, ordered in samples.items()
+    }
+
+
+def render_prometheus() -> str:
+    """以 Prometheus 文本格式输出统计信息
+    
+    请求与任务计数为整个实例的合计（多进程模式下汇总所有 worker），
+    延迟分位数只包含当前进程，以 ``pid`` 标签区分。
+    
+    Returns:
+        Prometheus 文本格式的指标
+    """
+    collector = get_global_collector()
+    pid = os.getpid()
+    lines = [
+        "# TYPE feishu_bot_requests_total counter",
+        f'feishu_bot_requests_total{{result="success"}} {collector.successful_requests}',
+        f'feishu_bot_requests_total{{result="failure"}} {collector.failed_requests}',
+        "# TYPE feishu_bot_tasks_processed_total counter",
+        f"feishu_bot_tasks_processed_total {collector.tasks_processed}",
+        "# TYPE feishu_bot_uptime_seconds gauge",
+        f"feishu_bot_uptime_seconds {collector.get_uptime():.3f}",
+    ]
+    
+    shared = _shared_stats
+    if shared is not None:
+        lines.append("# TYPE feishu_bot_worker_requests_total counter")
+        for worker in shared.workers():
+            lines.append(
+                f'feishu_bot_worker_requests_total{{pid="{worker["pid"]}"}} {worker["total_requests"]}'
+            )
+    
+    lines.extend(_render_limiters(pid))
+    lines.extend(_render_prompt_cache(pid))
+    
+    lines.append("# TYPE feishu_bot_deadline_exceeded_total counter")
+    for stage, count in sorted(exceeded_counts().items()):
+        lines.append(f'feishu_bot_deadline_exceeded_total{{stage="{stage}",pid="{pid}"}} {count}')
+    
+    lines.append("# TYPE feishu_bot_latency_ms summary")
+    for name, stats in sorted(get_latency_stats().items()):
+        for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+            lines.append(
+                f'feishu_bot_latency_ms{{name="{name}",pid="{pid}",quantile="{quantile}"}} {stats[key]}'
+            )
+        lines.append(f'feishu_bot_latency_ms_count{{name="{name}",pid="{pid}"}} {stats["count"]}')
+    
+    return "\n".join(lines) + "\n"
+
+
+def _render_limiters(pid: int) -> List[str]:
+    """大模型并发限制器的指标（每个 worker 独立）"""
+    from feishu_ai_bot.ai.limiter import limiter_snapshots
+    
+    snapshots = limiter_snapshots()
+    if not snapshots:
+        return []
+    
+    lines = []
+    for metric, key in (("limit", "limit"), ("inflight", "inflight"), ("queued", "queued")):
+        lines.append(f"# TYPE feishu_bot_llm_concurrency_{metric} gauge")
+        for provider, snapshot in sorted(snapshots.items()):
+            lines.append(
+                f'feishu_bot_llm_concurrency_{metric}{{provider="{provider}",pid="{pid}"}} {snapshot[key]}'
+            )
+    lines.append("# TYPE feishu_bot_llm_throttled_total counter")
+    for provider, snapshot in sorted(snapshots.items()):
+        lines.append(
+            f'feishu_bot_llm_throttled_total{{provider="{provider}",pid="{pid}"}} {snapshot["throttled"]}'
+        )
+    return lines
+
+
+def _render_prompt_cache(pid: int) -> List[str]:
+    """各提示词模板的输入 token 与前缀缓存命中 token（每个 worker 独立）"""
+    from feishu_ai_bot.ai.prompts import cache_stats
+    
+    stats = cache_stats()
+    if not stats:
+        return []
+    
+    lines = []
+    for metric, key in (("prompt_tokens", "prompt_tokens"), ("cached_prompt_tokens", "cached_tokens")):
+        lines.append(f"# TYPE feishu_bot_llm_{metric}_total counter")
+        for label, item in sorted(stats.items()):
+            lines.append(f'feishu_bot_llm_{metric}_total{{prompt="{label}",pid="{pid}"}} {item[key]}')
+    return lines
@@ -0,0 +1,513 @@
+"""链路追踪模块
+
+为每个进入的事件创建一条 trace，解析、分类、排队等待、每次飞书调用、
+每次大模型尝试和每次 OpenClaw 探测都记录为其中的 span。
+
+- 采用头部采样：事件到达时按 ``TRACE_SAMPLE_RATE`` 决定是否记录，未采样的事件
+  只有一次随机数判断和若干次 ``ContextVar`` 读取的开销
+- 当前 span 保存在 ``contextvars`` 中；后台线程通过 ``bind`` 继承上下文，
+  trace 在所有 span（包括后台任务）结束后才算完成
+- 完成的 trace 保存在有界环形缓冲区中（``/debug/traces``），可选以 OTLP JSON
+  （每行一个 ``resourceSpans`` 对象）追加写入文件；导出由后台线程完成
+  （见 ``monitoring.writer``），请求线程只把 trace 放入有界队列
+- 注册了回调（如慢操作记录器）时，所有事件都记录 span 并交给回调，
+  只有采样的 trace 进入缓冲区和导出文件
+
+与 ``codec`` 相同，模块级函数委托给全局 ``Tracer``，通过 ``set_tracer`` 替换。
+"""
+
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+
+from feishu_ai_bot import codec
+from feishu_ai_bot.monitoring.writer import BackgroundWriter
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "feishu-ai-bot"
+MAX_SPANS_PER_TRACE = 256
+
+TraceListener = Callable[["Trace"], None]
+
+
+class Span:
+    """一段计时区间"""
+    
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns",
+                 "attributes", "error")
+    
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+    
+    @property
+    def duration_ms(self) -> float:
+        """耗时（毫秒），未结束时计算到当前"""
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+    
+    def set(self, **attributes: Any) -> None:
+        """设置属性"""
+        self.attributes.update(attributes)
+    
+    def fail(self, error: Union[str, BaseException]) -> None:
+        """标记为失败"""
+        self.error = str(error)[:200]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为便于阅读的字典（时间为相对 trace 开始的毫秒数）"""
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "offset_ms": round((self.start_ns - self.trace.start_ns) / 1e6, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """未采样时使用的空 span"""
+    
+    __slots__ = ()
+    trace = None
+    
+    def set(self, **attributes: Any) -> None:
+        pass
+    
+    def fail(self, error: Union[str, BaseException]) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+AnySpan = Union[Span, _NoopSpan]
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "feishu_ai_bot_span", default=None
+)
+
+
+class Trace:
+    """一次事件处理的所有 span
+    
+    ``_open`` 统计尚未结束的 span 与尚未开始的后台任务，归零时 trace 完成。
+    
+    Attributes:
+        trace_id: 32 位十六进制 trace ID
+        name: 根 span 名称
+        sampled: 是否被头部采样选中（未选中的 trace 只交给回调）
+        spans: 已创建的 span（按创建顺序）
+        dropped_spans: 超出单条 trace 上限而未记录的 span 数
+    """
+    
+    def __init__(self, tracer: "Tracer", name: str, sampled: bool = True):
+        self.tracer = tracer
+        self.trace_id = os.urandom(16).hex()
+        self.name = name
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+        self.finished = False
+        self._open = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def duration_ms(self) -> float:
+        """从第一个 span 开始到最后一个 span 结束的耗时（毫秒）"""
+        end = max((span.end_ns or span.start_ns for span in self.spans), default=self.start_ns)
+        return (end - self.start_ns) / 1e6
+    
+    def open_span(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Optional[Span]:
+        """创建 span，trace 已完成或超出上限时返回 None"""
+        with self._lock:
+            if self.finished:
+                return None
+            if len(self.spans) >= MAX_SPANS_PER_TRACE:
+                self.dropped_spans += 1
+                return None
+            span = Span(self, name, parent_id, attributes)
+            self.spans.append(span)
+            self._open += 1
+        return span
+    
+    def hold(self) -> None:
+        """为即将开始的后台任务占位，防止 trace 提前完成"""
+        with self._lock:
+            self._open += 1
+    
+    def release(self) -> None:
+        """结束一个 span 或占位，全部结束时通知 tracer"""
+        with self._lock:
+            self._open -= 1
+            done = self._open == 0 and not self.finished
+            if done:
+                self.finished = True
+        if done:
+            self.tracer.finish(self)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为便于阅读的字典"""
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start_time": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "dropped_spans": self.dropped_spans,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """转换为 OTLP AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(traces: List[Trace]) -> Dict[str, Any]:
+    """转换为 OTLP/JSON 的 ``ExportTraceServiceRequest``
+    
+    Args:
+        traces: 已完成的 trace
+    
+    Returns:
+        可直接发送到 OTLP/HTTP ``/v1/traces`` 或写入文件的字典
+    """
+    spans = []
+    for trace in traces:
+        for span in trace.spans:
+            item = {
+                "traceId": trace.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                "attributes": [
+                    {"key": key, "value": _otlp_value(value)}
+                    for key, value in span.attributes.items() if value is not None
+                ],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            }
+            if span.parent_id:
+                item["parentSpanId"] = span.parent_id
+            spans.append(item)
+    
+    return {
+        "resourceSpans": [{
+            "resource": {
+                "attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]
+            },
+            "scopeSpans": [{"scope": {"name": "feishu_ai_bot"}, "spans": spans}],
+        }]
+    }
+
+
+class Tracer:
+    """链路追踪器
+    
+    Attributes:
+        sample_rate: 采样比例（0 表示关闭）
+        export_file: OTLP JSON 导出文件，为空时不导出
+    """
+    
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        buffer_size: int = 200,
+        export_file: Optional[str] = None
+    ):
+        """初始化追踪器
+        
+        Args:
+            sample_rate: 采样比例（0~1）
+            buffer_size: 保留的已完成 trace 数
+            export_file: OTLP JSON 导出文件
+        """
+        self.sample_rate = sample_rate
+        self.export_file = export_file
+        self._buffer: Deque[Trace] = deque(maxlen=buffer_size)
+        self._listeners: List[TraceListener] = []
+        self._exporter = BackgroundWriter(self._export, "trace-exporter", max_queue=1000)
+    
+    def configure(
+        self,
+        sample_rate: float,
+        buffer_size: int,
+        export_file: Optional[str] = None
+    ) -> None:
+        """更新配置（保留已完成的 trace 和回调）"""
+        if export_file:
+            os.makedirs(os.path.dirname(os.path.abspath(export_file)), exist_ok=True)
+        self.sample_rate = sample_rate
+        self.export_file = export_file or None
+        if buffer_size != self._buffer.maxlen:
+            self._buffer = deque(self._buffer, maxlen=buffer_size)
+    
+    def add_listener(self, listener: TraceListener) -> None:
+        """注册 trace 完成时的回调（注册后每个事件都会记录 span）"""
+        self._listeners.append(listener)
+    
+    def remove_listener(self, listener: TraceListener) -> None:
+        """移除回调"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    def should_sample(self) -> bool:
+        """头部采样决策"""
+        rate = self.sample_rate
+        return rate >= 1.0 or (rate > 0 and random.random() < rate)
+    
+    @contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[AnySpan]:
+        """开始一条 trace（已在 trace 中时等同于 ``span``）
+        
+        Args:
+            name: 根 span 名称
+            **attributes: 根 span 属性
+        """
+        if _current_span.get() is not None:
+            with self.span(name, **attributes) as span:
+                yield span
+            return
+        
+        sampled = self.should_sample()
+        if not sampled and not self._listeners:
+            yield NOOP_SPAN
+            return
+        
+        trace = Trace(self, name, sampled)
+        with self._enter(trace, name, None, attributes) as span:
+            yield span
+    
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[AnySpan]:
+        """在当前 trace 中记录一个 span（不在采样的 trace 中时为空操作）
+        
+        Args:
+            name: span 名称
+            **attributes: span 属性
+        """
+        parent = _current_span.get()
+        if parent is None:
+            yield NOOP_SPAN
+            return
+        
+        with self._enter(parent.trace, name, parent.span_id, attributes) as span:
+            yield span
+    
+    @contextmanager
+    def _enter(
+        self,
+        trace: Trace,
+        name: str,
+        parent_id: Optional[str],
+        attributes: Dict[str, Any]
+    ) -> Iterator[AnySpan]:
+        """创建 span 并设为当前 span"""
+        span = trace.open_span(name, parent_id, attributes)
+        if span is None:
+            yield NOOP_SPAN
+            return
+        
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            trace.release()
+    
+    def bind(self, func: Callable[..., Any], name: str) -> Callable[..., Any]:
+        """包装将在其他线程中执行的函数，使其继承当前 trace
+        
+        执行时先记录一个 ``queue.wait`` span（从包装到开始执行的等待时间），
+        再在名为 name 的 span 中运行函数。不在采样的 trace 中时原样返回。
+        
+        Args:
+            func: 目标函数
+            name: 函数执行期间的 span 名称
+        
+        Returns:
+            包装后的函数
+        """
+        parent = _current_span.get()
+        if parent is None:
+            return func
+        
+        trace = parent.trace
+        trace.hold()
+        context = contextvars.copy_context()
+        enqueued_ns = time.time_ns()
+        
+        def run(*args: Any, **kwargs: Any) -> Any:
+            def call() -> Any:
+                wait = trace.open_span("queue.wait", parent.span_id, {"task": name})
+                if wait is not None:
+                    wait.start_ns = enqueued_ns
+                    wait.end_ns = time.time_ns()
+                    trace.release()
+                try:
+                    with self._enter(trace, name, parent.span_id, {}):
+                        return func(*args, **kwargs)
+                finally:
+                    trace.release()
+            return context.run(call)
+        
+        return run
+    
+    def finish(self, trace: Trace) -> None:
+        """trace 完成：写入缓冲区、导出并通知回调"""
+        if trace.sampled:
+            self._buffer.append(trace)
+            if self.export_file:
+                self._exporter.put((self.export_file, trace))
+        for listener in list(self._listeners):
+            try:
+                listener(trace)
+            except Exception as e:
+                logger.warning("trace 回调失败: %s", e)
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待已完成的 trace 全部写入导出文件"""
+        return self._exporter.flush(timeout)
+    
+    def _export(self, item: Tuple[str, Trace]) -> None:
+        """以 OTLP JSON Lines 追加写入导出文件（在导出线程中执行）"""
+        path, trace = item
+        line = codec.dumps_bytes(to_otlp([trace])) + b"\n"
+        try:
+            with open(path, "ab") as f:
+                f.write(line)
+        except OSError as e:
+            logger.warning("trace 导出失败: %s", e)
+    
+    def traces(self) -> List[Trace]:
+        """已完成的 trace（新的在前）"""
+        return list(reversed(self._buffer))
+    
+    def get(self, trace_id: str) -> Optional[Trace]:
+        """按 ID 查找已完成的 trace"""
+        return next((t for t in self._buffer if t.trace_id == trace_id), None)
+
+
+class TracedSession(requests.Session):
+    """为每个请求记录 span 的 requests 会话
+    
+    span 名称为 ``<service>.<METHOD>``，属性包含路径、状态码和请求/响应体大小。
+    """
+    
+    def __init__(self, service: str):
+        """初始化会话
+        
+        Args:
+            service: 服务名称，作为 span 名称前缀
+        """
+        super().__init__()
+        self.service = service
+    
+    def request(self, method: str, url: Union[str, bytes], *args: Any, **kwargs: Any) -> requests.Response:
+        if _current_span.get() is None:
+            return super().request(method, url, *args, **kwargs)
+        
+        body = kwargs.get("data")
+        with span(
+            f"{self.service}.{method.upper()}",
+            path=urlsplit(url if isinstance(url, str) else url.decode()).path,
+            request_bytes=len(body) if isinstance(body, (bytes, str)) else None
+        ) as current:
+            response = super().request(method, url, *args, **kwargs)
+            current.set(
+                status=response.status_code,
+                response_bytes=response.headers.get("Content-Length")
+            )
+            return response
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """获取全局追踪器"""
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> Tracer:
+    """替换全局追踪器
+    
+    Args:
+        tracer: 新的追踪器
+    
+    Returns:
+        生效的追踪器
+    """
+    global _tracer
+    _tracer = tracer
+    return _tracer
+
+
+def configure(sample_rate: float, buffer_size: int = 200, export_file: Optional[str] = None) -> Tracer:
+    """配置全局追踪器
+    
+    Args:
+        sample_rate: 采样比例（0~1），0 表示关闭
+        buffer_size: 保留的已完成 trace 数
+        export_file: OTLP JSON 导出文件
+    
+    Returns:
+        全局追踪器
+    """
+    _tracer.configure(sample_rate, buffer_size, export_file)
+    return _tracer
+
+
+def trace(name: str, **attributes: Any):
+    """在全局追踪器中开始一条 trace"""
+    return _tracer.trace(name, **attributes)
+
+
+def span(name: str, **attributes: Any):
+    """在当前 trace 中记录一个 span"""
+    return _tracer.span(name, **attributes)
+
+
+def bind(func: Callable[..., Any], name: str) -> Callable[..., Any]:
+    """包装后台任务函数，使其继承当前 trace"""
+    return _tracer.bind(func, name)
+
+
+def annotate(**attributes: Any) -> None:
+    """为当前 span 设置属性（不在 trace 中时为空操作）"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def current_span() -> Optional[Span]:
+    """当前 span（不在采样的 trace 中时为 None）"""
+    return _current_span.get()
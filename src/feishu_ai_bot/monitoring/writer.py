@@ -0,0 +1,116 @@
+"""后台写入模块
+
+流量录制、慢操作记录等写文件的诊断功能共用的后台写入线程：请求线程只把待写入的
+条目放入有界队列后立即返回，由后台线程调用 ``sink`` 完成序列化和写盘；
+队列满时丢弃条目并计数，不阻塞请求线程。
+
+线程不会随 fork 复制，因此在当前进程第一次写入时才启动：gunicorn master 中不启动
+任何线程，forked worker 第一次写入时重建队列并启动自己的线程。
+"""
+
+import logging
+import os
+import queue
+import threading
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 关闭线程的标记
+_STOP = object()
+
+
+class BackgroundWriter:
+    """有界队列加后台写入线程
+    
+    Attributes:
+        name: 写入线程名称
+        dropped: 队列已满被丢弃的条目数
+    """
+    
+    def __init__(self, sink: Callable[[Any], None], name: str, max_queue: int = 10000):
+        """初始化后台写入器（线程在第一次写入时启动）
+        
+        Args:
+            sink: 在写入线程中处理一个条目，抛出的异常只记录日志
+            name: 写入线程名称
+            max_queue: 待写入队列长度上限
+        """
+        self.name = name
+        self.dropped = 0
+        self._sink = sink
+        self._max_queue = max_queue
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+    
+    def put(self, item: Any) -> bool:
+        """放入一个待写入条目，不等待
+        
+        Returns:
+            是否放入队列（队列已满时丢弃并返回 False）
+        """
+        if self._thread_pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待此前放入的条目全部写完
+        
+        Returns:
+            是否在超时前写完（当前进程尚未启动写入线程时直接返回 True）
+        """
+        if self._thread_pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+    
+    def close(self, timeout: float = 5.0) -> None:
+        """写完队列中的条目后停止写入线程（之后再写入会重新启动）"""
+        thread = self._thread
+        if thread is not None and self._thread_pid == os.getpid():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+                thread.join(timeout)
+            except queue.Full:
+                logger.warning("后台写入队列已满，未写完即关闭: %s", self.name)
+        self._thread = None
+        self._thread_pid = None
+    
+    def _start(self) -> None:
+        """在当前进程中启动写入线程（fork 后重建队列）"""
+        with self._lock:
+            pid = os.getpid()
+            if self._thread_pid == pid:
+                return
+            if self._thread_pid is not None:
+                self._queue = queue.Queue(maxsize=self._max_queue)
+            thread = self._thread = threading.Thread(
+                target=self._run, args=(self._queue,), name=self.name, daemon=True
+            )
+            self._thread_pid = pid
+        thread.start()
+    
+    def _run(self, items: "queue.Queue[Any]") -> None:
+        """写入循环，收到停止标记时退出"""
+        while True:
+            item = items.get()
+            if item is _STOP:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            try:
+                self._sink(item)
+            except Exception as e:
+                logger.warning("后台写入失败: %s: %s", self.name, e)
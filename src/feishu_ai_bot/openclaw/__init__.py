@@ -1,5 +1,6 @@
 """OpenClaw集成模块"""
 
 from feishu_ai_bot.openclaw.bridge import OpenClawBridge, create_openclaw_bridge
+from feishu_ai_bot.openclaw.session import SessionStore
 
-__all__ = ["OpenClawBridge", "create_openclaw_bridge"]
+__all__ = ["OpenClawBridge", "create_openclaw_bridge", "SessionStore"]
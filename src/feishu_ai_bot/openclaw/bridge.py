@@ -1,16 +1,79 @@
 """OpenClaw 桥接模块
 
 通过 HTTP API 与 OpenClaw 网关通信，用于私聊消息处理。
+``stream_message`` 以流式方式调用 ``/v1/chat/completions``，逐段返回回复文本；
+网关不支持流式（404/405 或返回非 SSE 响应）时记住这一结果，之后不再尝试流式调用。
+
+网关版本不同，可用的 API 端点和请求格式也不同。没有已知可用路由时，
+``send_message`` 先用不带消息的 OPTIONS 请求并行探测哪些候选端点存在（路由发现），
+再按优先级把消息逐个发往存在的端点，直到某个端点接受并缓存该路由。消息只在网关
+明确未处理（连接失败、404/405 或请求格式被拒绝）时才换下一个端点，同一条消息不会
+被多个端点同时处理；之后的请求直接发往已知路由，只有路由失效时才重新发现。
+
+网关返回的会话ID按用户记录在 ``SessionStore`` 中，后续请求携带 ``sessionId``
+以复用网关侧的代理上下文。
 """
 
-import json
+import contextvars
 import logging
-from typing import Any, Callable, Dict, List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 import requests
 
+from feishu_ai_bot import codec, deadline
+from feishu_ai_bot.deadline import DeadlineExceeded
+from feishu_ai_bot.monitoring import tracing
+from feishu_ai_bot.monitoring.stats import record_latency
+from feishu_ai_bot.openclaw.session import SESSION_FIELDS, SESSION_HEADERS, SessionStore
+
 logger = logging.getLogger(__name__)
 
+STREAM_ENDPOINT = "/v1/chat/completions"
+
+HEALTH_ENDPOINTS = ["/health", "/status", "/api/health", "/api/status", "/"]
+
+# 请求失败类型
+FAILURE_AUTH = "auth"
+FAILURE_TIMEOUT = "timeout"
+FAILURE_CONNECT = "connect"
+FAILURE_NOT_FOUND = "not_found"
+FAILURE_METHOD = "method_not_allowed"
+FAILURE_STATUS = "status"
+FAILURE_SERVER = "server_error"
+
+# 已知路由返回这些失败类型时说明路由已失效，需要重新发现
+REDISCOVER_FAILURES = (FAILURE_CONNECT, FAILURE_NOT_FOUND, FAILURE_METHOD)
+
+# 这些失败说明消息没有被网关处理，可以换下一个端点或请求格式重发
+UNPROCESSED_FAILURES = (FAILURE_CONNECT, FAILURE_NOT_FOUND, FAILURE_METHOD, FAILURE_STATUS)
+
+
+class RouteCandidate(NamedTuple):
+    """路由发现的候选端点
+    
+    Attributes:
+        api_name: API 名称（用于日志）
+        endpoint: 端点路径
+        bodies: 依次尝试的请求体（已序列化）
+    """
+    api_name: str
+    endpoint: str
+    bodies: Tuple[bytes, ...]
+
+
+class OpenClawStreamError(Exception):
+    """流式调用失败
+    
+    Attributes:
+        unprocessed: 网关确定没有处理该请求（连接失败、404/405），可以改用普通调用重发
+    """
+    
+    def __init__(self, message: str, unprocessed: bool = False):
+        super().__init__(message)
+        self.unprocessed = unprocessed
+
 
 class OpenClawBridge:
     """OpenClaw 桥接器
@@ -24,14 +87,42 @@ class OpenClawBridge:
         gateway_url: str = "http://localhost:18789",
         token: str = "",
         agent_id: str = "main",
-        timeout: int = 90
+        timeout: int = 90,
+        discovery_fanout: int = 8,
+        probe_timeout: float = 2.0,
+        session_max: int = 1000,
+        session_ttl: float = 1800.0
     ):
+        """初始化桥接器
+        
+        Args:
+            gateway_url: 网关地址
+            token: 网关访问令牌
+            agent_id: 代理ID
+            timeout: 请求读超时（秒）
+            discovery_fanout: 路由发现时的最大并发探测数（1 表示逐个探测）
+            probe_timeout: 连接超时和路由探测的读超时（秒），不可达的端点在此时间内失败
+            session_max: 最多保留的用户会话数
+            session_ttl: 会话空闲过期时间（秒）
+        """
         self.gateway_url = gateway_url.rstrip('/')
         self.token = token
         self.agent_id = agent_id
         self.timeout = timeout
+        self.discovery_fanout = max(1, discovery_fanout)
+        self.probe_timeout = probe_timeout
+        # 已知可用路由：(API 名称, 端点, 请求体序号)
+        self._route: Optional[Tuple[str, str, int]] = None
+        # 网关是否支持流式调用（与路由一样在进程内缓存）
+        self._stream_supported = True
+        self.sessions = SessionStore(max_sessions=session_max, ttl=session_ttl)
         
-        logger.info(f"OpenClaw 桥接器初始化 - 网关: {self.gateway_url}")
+        logger.info("OpenClaw 桥接器初始化 - 网关: %s", self.gateway_url)
+    
+    @property
+    def stream_supported(self) -> bool:
+        """网关是否支持流式调用（确认不支持后为 False）"""
+        return self._stream_supported
     
     def send_message(
         self,
@@ -42,63 +133,360 @@ class OpenClawBridge:
         message_id: str = ""
     ) -> Dict[str, Any]:
         """发送消息到 OpenClaw 处理"""
-        logger.info(f"发送消息到 OpenClaw: user={user_name}, message={user_message[:50]}...")
+        logger.info("发送消息到 OpenClaw: user=%s, message=%s...", user_name, user_message[:50])
+        
+        session_id = self.sessions.get(user_id)
+        started = time.perf_counter()
+        candidates = self._build_candidates(
+            user_message, user_id, user_name, chat_id, message_id, session_id
+        )
+        result = self._send(candidates)
         
-        # 策略：尝试多种可能的 API 端点
-        strategies = [
-            self._try_rpc_api,
-            self._try_webhook_api,
-            self._try_message_api,
-            self._try_chat_api
-        ]
+        if result.get("success"):
+            record_latency(
+                "openclaw.request.warm" if session_id else "openclaw.request.cold",
+                (time.perf_counter() - started) * 1000
+            )
+            if result.get("session_id"):
+                self.sessions.put(user_id, result["session_id"])
+        elif session_id:
+            # 会话可能已在网关侧失效，下次重新建立
+            self.sessions.discard(user_id)
         
-        for strategy in strategies:
-            result = strategy(user_message, user_id, user_name, chat_id, message_id)
-            if result.get("success"):
-                return result
+        return result
+    
+    def _send(self, candidates: List[RouteCandidate]) -> Dict[str, Any]:
+        """发往已知路由，没有已知路由或路由失效时重新发现"""
+        route = self._route
+        if route is not None:
+            api_name, endpoint, variant = route
+            candidate = next(
+                (c for c in candidates if c.api_name == api_name and c.endpoint == endpoint),
+                None
+            )
+            if candidate is not None:
+                response, failure = self._request(
+                    f"{self.gateway_url}{endpoint}", candidate.bodies[variant]
+                )
+                if response is not None:
+                    return self._process_response(response, api_name)
+                if failure not in REDISCOVER_FAILURES:
+                    return self._failure_result([failure])
+                logger.warning("OpenClaw 已知路由失效（%s），重新发现: %s", failure, endpoint)
+            self._route = None
+        
+        with tracing.span("openclaw.discover", candidates=len(candidates)):
+            return self._discover(candidates)
+    
+    def _discover(self, candidates: List[RouteCandidate]) -> Dict[str, Any]:
+        """探测存在的候选端点，再按优先级逐个发送消息
+        
+        探测阶段只发送 OPTIONS 请求（读超时为 ``probe_timeout``），不会触发代理处理；
+        发送阶段一次只发往一个端点，只有网关明确未处理时才换下一个。
+        
+        Args:
+            candidates: 候选端点
+        
+        Returns:
+            处理结果字典
+        """
+        failures: List[str] = []
+        available: List[RouteCandidate] = []
+        for candidate, failure in zip(candidates, self._probe_routes(candidates)):
+            if failure is None:
+                available.append(candidate)
+            else:
+                failures.append(failure)
+                
+        for candidate in available:
+            url = f"{self.gateway_url}{candidate.endpoint}"
+            for variant, body in enumerate(candidate.bodies):
+                response, failure = self._request(url, body)
+                if response is not None:
+                    self._route = (candidate.api_name, candidate.endpoint, variant)
+                    tracing.annotate(route=f"{candidate.api_name} {candidate.endpoint}")
+                    logger.info(
+                        "✅ OpenClaw 路由发现完成: %s %s",
+                        candidate.api_name, candidate.endpoint
+                    )
+                    return self._process_response(response, candidate.api_name)
+                failures.append(failure)
+                if failure not in UNPROCESSED_FAILURES:
+                    # 网关可能已经开始处理，换端点重发会重复执行代理
+                    logger.warning("OpenClaw 请求失败（%s），不再尝试其他端点: %s", failure, url)
+                    return self._failure_result(failures)
+                # 端点不存在或不可达时换请求格式也无济于事
+                if failure != FAILURE_STATUS:
+                    break
         
         logger.warning("所有 OpenClaw API 调用策略都失败")
+        return self._failure_result(failures)
+    
+    def _probe_routes(self, candidates: List[RouteCandidate]) -> List[Optional[str]]:
+        """并行发送 OPTIONS 请求，判断各候选端点是否存在
+        
+        只区分 404 与其他响应：端点存在但不接受 OPTIONS 时（405 等）同样视为存在。
+        
+        Returns:
+            与 candidates 一一对应的失败类型，端点存在时为 None
+        """
+        def probe(candidate: RouteCandidate) -> Optional[str]:
+            response, failure = self._request(
+                f"{self.gateway_url}{candidate.endpoint}",
+                method="OPTIONS",
+                read_timeout=self.probe_timeout
+            )
+            if response is not None:
+                response.close()
+            if failure in (FAILURE_NOT_FOUND, FAILURE_AUTH, FAILURE_CONNECT, FAILURE_TIMEOUT):
+                return failure
+            return None
+        
+        with ThreadPoolExecutor(
+            max_workers=min(self.discovery_fanout, len(candidates)),
+            thread_name_prefix="openclaw-discovery"
+        ) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, probe, candidate)
+                for candidate in candidates
+            ]
+            return [future.result() for future in futures]
+    
+    def _failure_result(self, failures: List[str]) -> Dict[str, Any]:
+        """根据失败类型构建失败结果"""
+        if FAILURE_AUTH in failures:
+            reason = "OpenClaw 认证失败，请检查 OPENCLAW_TOKEN"
+        elif FAILURE_TIMEOUT in failures:
+            reason = "OpenClaw 请求超时"
+        elif FAILURE_SERVER in failures:
+            reason = "OpenClaw 处理失败"
+        else:
+            reason = "无法连接到 OpenClaw 服务"
+        
         return {
             "success": False,
-            "error": "无法连接到 OpenClaw 服务",
-            "result": self._build_error_message()
+            "error": reason,
+            "result": self._build_error_message(reason)
         }
     
-    def _make_request(
+    def stream_message(
+        self,
+        user_message: str,
+        user_id: str,
+        user_name: str = "用户",
+        chat_id: str = "",
+        message_id: str = ""
+    ) -> Iterator[str]:
+        """以流式方式发送消息到 OpenClaw，逐段返回回复文本
+        
+        请求 ``/v1/chat/completions`` 并设置 ``stream: true``。网关返回
+        SSE（``text/event-stream``）时按 ``delta.content`` 逐段产出；
+        返回分块的纯文本时按块产出；返回普通 JSON 时一次性产出完整回复。
+        
+        Args:
+            user_message: 用户消息
+            user_id: 用户ID
+            user_name: 用户名
+            chat_id: 会话ID
+            message_id: 消息ID
+        
+        Yields:
+            回复文本片段
+        
+        Raises:
+            OpenClawStreamError: 调用失败；``unprocessed`` 表示网关没有处理该请求
+        """
+        if not self._stream_supported:
+            raise OpenClawStreamError("OpenClaw 网关不支持流式调用", unprocessed=True)
+        
+        session_id = self.sessions.get(user_id)
+        payload = {
+            "model": f"openclaw:{self.agent_id}",
+            "messages": [{"role": "user", "content": user_message}],
+            "stream": True,
+            "user": user_id,
+            "metadata": {
+                "userName": user_name,
+                "chatId": chat_id,
+                "messageId": message_id,
+                "channel": "feishu",
+                "agentId": self.agent_id
+            }
+        }
+        if session_id:
+            payload["sessionId"] = session_id
+        headers = self._build_headers()
+        headers["Accept"] = "text/event-stream"
+        started = time.perf_counter()
+        
+        try:
+            # 读超时作用于相邻两个数据块之间
+            read_timeout = deadline.timeout(self.timeout, "openclaw")
+            response = requests.post(
+                f"{self.gateway_url}{STREAM_ENDPOINT}",
+                data=codec.dumps_bytes(payload),
+                headers=headers,
+                stream=True,
+                timeout=(min(self.probe_timeout, read_timeout), read_timeout)
+            )
+        except DeadlineExceeded as e:
+            raise OpenClawStreamError(str(e)) from e
+        except requests.exceptions.ConnectionError as e:
+            # 连接失败（含连接超时）时请求没有到达网关
+            raise OpenClawStreamError(f"无法连接 OpenClaw: {e}", unprocessed=True) from e
+        except requests.exceptions.RequestException as e:
+            # 读超时等情况下网关可能已在处理，不能重发
+            raise OpenClawStreamError(f"OpenClaw 流式请求失败: {e}") from e
+        
+        if response.status_code not in [200, 201]:
+            response.close()
+            if session_id:
+                self.sessions.discard(user_id)
+            unsupported = response.status_code in (404, 405)
+            if unsupported:
+                logger.warning("OpenClaw 网关不支持流式调用（%d），改用普通调用", response.status_code)
+                self._stream_supported = False
+            raise OpenClawStreamError(
+                f"OpenClaw 返回状态码 {response.status_code}", unprocessed=unsupported
+            )
+        
+        if "text/event-stream" not in response.headers.get("Content-Type", ""):
+            # 本次响应照常转发，之后直接走普通调用
+            logger.info("OpenClaw 网关未返回 SSE 响应，之后改用普通调用")
+            self._stream_supported = False
+        
+        new_session_id = self._extract_session_id(response)
+        if new_session_id:
+            self.sessions.put(user_id, new_session_id)
+        
+        first_byte_metric = (
+            "openclaw.stream_first_byte.warm" if session_id
+            else "openclaw.stream_first_byte.cold"
+        )
+        try:
+            for index, chunk in enumerate(self._iter_stream_text(response)):
+                if index == 0:
+                    record_latency(first_byte_metric, (time.perf_counter() - started) * 1000)
+                yield chunk
+        except requests.exceptions.RequestException as e:
+            raise OpenClawStreamError(f"读取流式响应失败: {e}") from e
+        finally:
+            response.close()
+    
+    def _iter_stream_text(self, response: requests.Response) -> Iterator[str]:
+        """按响应类型产出文本片段"""
+        content_type = response.headers.get("Content-Type", "")
+        if "text/event-stream" in content_type:
+            yield from self._iter_sse_text(response)
+        elif "application/json" in content_type:
+            yield self._extract_reply(codec.loads(response.content))
+        else:
+            response.encoding = response.encoding or "utf-8"
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if chunk:
+                    yield chunk
+    
+    def _iter_sse_text(self, response: requests.Response) -> Iterator[str]:
+        """解析 OpenAI 兼容的 SSE 响应，产出增量文本"""
+        for line in response.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                return
+            
+            try:
+                chunk = codec.loads(data)
+            except ValueError:
+                logger.debug("忽略无法解析的 SSE 数据: %r", data[:100])
+                continue
+            
+            text = (
+                self._get_nested_value(chunk, "choices.0.delta.content")
+                or self._get_nested_value(chunk, "choices.0.message.content")
+            )
+            if text:
+                yield str(text)
+    
+    def _request(
+        self,
+        url: str,
+        body: Optional[bytes] = None,
+        method: str = "POST",
+        read_timeout: Optional[float] = None
+    ) -> Tuple[Optional[requests.Response], Optional[str]]:
+        """执行 HTTP 请求并记录 span（参数和返回值同 ``_perform_request``）"""
+        with tracing.span(
+            "openclaw.request",
+            method=method.upper(),
+            endpoint=url[len(self.gateway_url):]
+        ) as span:
+            response, failure = self._perform_request(url, body, method, read_timeout)
+            if failure:
+                span.fail(failure)
+            else:
+                span.set(status=response.status_code)
+            return response, failure
+    
+    def _perform_request(
         self,
         url: str,
-        payload: Dict[str, Any],
-        method: str = "POST"
-    ) -> Optional[requests.Response]:
+        body: Optional[bytes] = None,
+        method: str = "POST",
+        read_timeout: Optional[float] = None
+    ) -> Tuple[Optional[requests.Response], Optional[str]]:
         """执行 HTTP 请求的通用方法
         
+        连接超时使用 ``probe_timeout``，读超时默认使用 ``timeout``，
+        不可达的端点很快失败，正常处理中的长请求不会被打断。
+        处于任务截止时间内时两者都不超过剩余预算，预算已用完时不发请求，按超时失败处理。
+        
         Args:
             url: 请求地址
-            payload: 请求体
-            method: 请求方法 (GET/POST)
-            
+            body: 已序列化的请求体（POST）
+            method: 请求方法 (GET/POST/OPTIONS)
+            read_timeout: 读超时（秒）
+        
         Returns:
-            成功返回 Response 对象，失败返回 None
+            (成功的响应或 None, 失败类型或 None)
         """
+        headers = self._build_headers()
+        try:
+            read = deadline.timeout(read_timeout or self.timeout, "openclaw")
+        except DeadlineExceeded:
+            return None, FAILURE_TIMEOUT
+        timeout = (min(self.probe_timeout, read), read)
+        
         try:
-            headers = self._build_headers()
-            
             if method.upper() == "GET":
-                response = requests.get(url, headers=headers, timeout=5)
+                response = requests.get(url, headers=headers, timeout=timeout)
+            elif method.upper() == "OPTIONS":
+                response = requests.options(url, headers=headers, timeout=timeout)
             else:
-                response = requests.post(
-                    url, json=payload, headers=headers, timeout=self.timeout
-                )
-            
-            if response.status_code in [200, 201]:
-                return response
-            
-            logger.debug(f"请求返回非成功状态码: {response.status_code}")
-            return None
-            
+                response = requests.post(url, data=body, headers=headers, timeout=timeout)
+        except requests.exceptions.ConnectTimeout as e:
+            logger.debug("连接超时: %s: %s", url, e)
+            return None, FAILURE_CONNECT
+        except requests.exceptions.Timeout as e:
+            logger.debug("请求超时: %s: %s", url, e)
+            return None, FAILURE_TIMEOUT
         except requests.exceptions.RequestException as e:
-            logger.debug(f"请求失败: {str(e)}")
-            return None
+            logger.debug("请求失败: %s: %s", url, e)
+            return None, FAILURE_CONNECT
+        
+        if response.status_code in [200, 201]:
+            return response, None
+        
+        logger.debug("请求返回非成功状态码: %s: %s", url, response.status_code)
+        if response.status_code in [401, 403]:
+            return None, FAILURE_AUTH
+        if response.status_code == 404:
+            return None, FAILURE_NOT_FOUND
+        if response.status_code == 405:
+            return None, FAILURE_METHOD
+        if response.status_code >= 500:
+            return None, FAILURE_SERVER
+        return None, FAILURE_STATUS
     
     def _process_response(self, response: requests.Response, api_name: str) -> Dict[str, Any]:
         """处理成功响应的通用方法
@@ -110,53 +498,51 @@ class OpenClawBridge:
         Returns:
             处理结果字典
         """
-        logger.info(f"✅ OpenClaw {api_name} 调用成功")
+        logger.info("✅ OpenClaw %s 调用成功", api_name)
         
         try:
-            result = response.json()
+            result = codec.loads(response.content)
             reply = self._extract_reply(result)
-        except (json.JSONDecodeError, ValueError):
+        except ValueError:
             reply = response.text
             result = {"text": response.text}
         
         return {
             "success": True,
             "result": reply,
-            "raw_response": result
+            "raw_response": result,
+            "session_id": self._extract_session_id(response, result)
         }
     
-    def _try_endpoints(
+    def _extract_session_id(
         self,
-        endpoints: List[str],
-        payload: Dict[str, Any],
-        api_name: str
-    ) -> Dict[str, Any]:
-        """尝试多个端点的通用方法
+        response: requests.Response,
+        body: Any = None
+    ) -> Optional[str]:
+        """从响应头或响应体中提取网关返回的会话ID"""
+        for header in SESSION_HEADERS:
+            value = response.headers.get(header)
+            if value:
+                return str(value)
         
-        Args:
-            endpoints: 端点列表
-            payload: 请求体
-            api_name: API 名称
-            
-        Returns:
-            成功结果或 {"success": False}
-        """
-        for endpoint in endpoints:
-            url = f"{self.gateway_url}{endpoint}"
-            response = self._make_request(url, payload)
-            
-            if response:
-                logger.info(f"✅ OpenClaw {api_name} 调用成功: {endpoint}")
-                return self._process_response(response, api_name)
+        if isinstance(body, dict):
+            for field in SESSION_FIELDS:
+                value = self._get_nested_value(body, field)
+                if isinstance(value, (str, int)) and value != "":
+                    return str(value)
         
-        return {"success": False}
+        return None
     
-    def _try_rpc_api(
+    def _build_candidates(
         self, message: str, user_id: str, user_name: str,
-        chat_id: str, message_id: str
-    ) -> Dict[str, Any]:
-        """尝试使用 RPC API"""
-        payload = {
+        chat_id: str, message_id: str, session_id: Optional[str] = None
+    ) -> List[RouteCandidate]:
+        """构建所有候选端点（请求体只序列化一次）"""
+        candidates: List[RouteCandidate] = []
+        session = {"sessionId": session_id} if session_id else {}
+        
+        # RPC API
+        rpc = codec.dumps_bytes({
             "jsonrpc": "2.0",
             "method": "processMessage",
             "params": {
@@ -166,19 +552,16 @@ class OpenClawBridge:
                 "chatId": chat_id,
                 "messageId": message_id,
                 "channel": "feishu",
-                "agentId": self.agent_id
+                "agentId": self.agent_id,
+                **session
             },
             "id": 1
-        }
+        })
+        candidates.append(RouteCandidate("RPC API", "/rpc", (rpc,)))
         
-        return self._try_endpoints(["/rpc"], payload, "RPC API")
-    
-    def _try_webhook_api(
-        self, message: str, user_id: str, user_name: str,
-        chat_id: str, message_id: str
-    ) -> Dict[str, Any]:
-        """尝试使用 Webhook API"""
-        payload = {
+        # Webhook API
+        webhook = codec.dumps_bytes({
+            **session,
             "schema": "2.0",
             "header": {
                 "event_type": "im.message.receive_v1",
@@ -195,23 +578,15 @@ class OpenClawBridge:
                     "message_id": message_id,
                     "chat_id": chat_id,
                     "chat_type": "p2p",
-                    "content": json.dumps({"text": message})
+                    "content": codec.dumps({"text": message})
                 }
             }
-        }
+        })
+        for endpoint in ["/webhook", "/api/webhook", "/webhooks"]:
+            candidates.append(RouteCandidate("Webhook API", endpoint, (webhook,)))
         
-        endpoints = ["/webhook", "/api/webhook", "/webhooks"]
-        return self._try_endpoints(endpoints, payload, "Webhook API")
-    
-    def _try_message_api(
-        self, message: str, user_id: str, user_name: str,
-        chat_id: str, message_id: str
-    ) -> Dict[str, Any]:
-        """尝试使用 Message API"""
-        endpoints = ["/api/messages", "/messages", "/api/message"]
-        
-        # 尝试多种请求格式
-        payloads = [
+        # Message API（多种请求格式）
+        message_bodies = tuple(codec.dumps_bytes(payload) for payload in (
             {
                 "message": message,
                 "userId": user_id,
@@ -219,29 +594,18 @@ class OpenClawBridge:
                 "chatId": chat_id,
                 "messageId": message_id,
                 "channel": "feishu",
-                "agentId": self.agent_id
+                "agentId": self.agent_id,
+                **session
             },
-            {"text": message, "user": user_id, "channel": "feishu"},
-            {"message": message, "user": user_id}
-        ]
-        
-        for endpoint in endpoints:
-            for payload in payloads:
-                url = f"{self.gateway_url}{endpoint}"
-                response = self._make_request(url, payload)
-                
-                if response:
-                    logger.info(f"✅ OpenClaw Message API 调用成功: {endpoint}")
-                    return self._process_response(response, "Message API")
+            {"text": message, "user": user_id, "channel": "feishu", **session},
+            {"message": message, "user": user_id, **session}
+        ))
+        for endpoint in ["/api/messages", "/messages", "/api/message"]:
+            candidates.append(RouteCandidate("Message API", endpoint, message_bodies))
         
-        return {"success": False}
-    
-    def _try_chat_api(
-        self, message: str, user_id: str, user_name: str,
-        chat_id: str, message_id: str
-    ) -> Dict[str, Any]:
-        """尝试使用 Chat API"""
-        payload = {
+        # Chat API
+        chat = codec.dumps_bytes({
+            **session,
             "messages": [{"role": "user", "content": message}],
             "user": user_id,
             "metadata": {
@@ -251,15 +615,16 @@ class OpenClawBridge:
                 "channel": "feishu",
                 "agentId": self.agent_id
             }
-        }
+        })
+        for endpoint in ["/api/chat", "/chat", "/v1/chat/completions"]:
+            candidates.append(RouteCandidate("Chat API", endpoint, (chat,)))
         
-        endpoints = ["/api/chat", "/chat", "/v1/chat/completions"]
-        return self._try_endpoints(endpoints, payload, "Chat API")
+        return candidates
     
     def _build_headers(self) -> Dict[str, str]:
         """构建请求头"""
         headers = {
-            "Content-Type": "application/json",
+            "Content-Type": codec.JSON_CONTENT_TYPE,
             "User-Agent": "FeishuBot/1.1.0"
         }
         
@@ -285,7 +650,7 @@ class OpenClawBridge:
                 if value:
                     return str(value)
         
-        return json.dumps(response_data, ensure_ascii=False, indent=2)
+        return codec.dumps(response_data, pretty=True)
     
     def _get_nested_value(self, data: dict, path: str) -> Any:
         """获取嵌套字典的值"""
@@ -306,9 +671,10 @@ class OpenClawBridge:
         
         return value
     
-    def _build_error_message(self) -> str:
+    def _build_error_message(self, reason: str = "") -> str:
         """构建错误提示消息"""
-        return """⚠️ OpenClaw 服务暂时不可用
+        title = f"⚠️ OpenClaw 服务暂时不可用：{reason}" if reason else "⚠️ OpenClaw 服务暂时不可用"
+        return f"""{title}
 
 请检查：
 1. OpenClaw 网关是否运行
@@ -316,23 +682,35 @@ class OpenClawBridge:
 3. 网络连接是否正常
 
 管理员请查看服务器日志获取详细信息。"""
-    
+
     def health_check(self) -> Dict[str, Any]:
-        """检查 OpenClaw 网关健康状态"""
-        endpoints = ["/health", "/status", "/api/health", "/api/status", "/"]
-        
-        for endpoint in endpoints:
-            url = f"{self.gateway_url}{endpoint}"
-            response = self._make_request(url, {}, method="GET")
-            
-            if response:
-                logger.info(f"✅ OpenClaw 健康检查通过: {endpoint}")
+        """检查 OpenClaw 网关健康状态（并行探测所有健康检查端点）"""
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.discovery_fanout, len(HEALTH_ENDPOINTS)),
+            thread_name_prefix="openclaw-health"
+        )
+        try:
+            futures = {
+                executor.submit(
+                    self._request, f"{self.gateway_url}{endpoint}", None, "GET", 5
+                ): endpoint
+                for endpoint in HEALTH_ENDPOINTS
+            }
+            for future in as_completed(futures):
+                response, _ = future.result()
+                if response is None:
+                    continue
+                
+                endpoint = futures[future]
+                logger.debug("OpenClaw 健康检查通过: %s", endpoint)
                 return {
                     "healthy": True,
                     "status_code": response.status_code,
                     "endpoint": endpoint,
                     "gateway_url": self.gateway_url
                 }
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
         
         return {
             "healthy": False,
@@ -345,12 +723,20 @@ def create_openclaw_bridge(
     gateway_url: str = "http://localhost:18789",
     token: str = "",
     agent_id: str = "main",
-    timeout: int = 90
+    timeout: int = 90,
+    discovery_fanout: int = 8,
+    probe_timeout: float = 2.0,
+    session_max: int = 1000,
+    session_ttl: float = 1800.0
 ) -> OpenClawBridge:
     """创建 OpenClaw 桥接器实例"""
     return OpenClawBridge(
         gateway_url=gateway_url,
         token=token,
         agent_id=agent_id,
-        timeout=timeout
+        timeout=timeout,
+        discovery_fanout=discovery_fanout,
+        probe_timeout=probe_timeout,
+        session_max=session_max,
+        session_ttl=session_ttl
     )
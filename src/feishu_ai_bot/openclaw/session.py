@@ -0,0 +1,131 @@
+"""OpenClaw 会话亲和模块
+
+记录网关为每个用户返回的会话ID，后续请求携带该ID，让网关复用已构建的
+代理上下文，而不是每次都走冷启动路径。
+
+会话表有容量上限，按最近使用时间（LRU）淘汰，超过空闲时间的会话视为过期。
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 响应体中可能携带会话ID的字段（按优先级）
+SESSION_FIELDS = [
+    "sessionId", "session_id", "conversationId", "conversation_id",
+    "result.sessionId", "result.session_id", "data.sessionId", "data.session_id",
+]
+
+# 响应头中可能携带会话ID的字段
+SESSION_HEADERS = ["X-OpenClaw-Session-Id", "X-Session-Id"]
+
+
+@dataclass
+class SessionEntry:
+    """会话记录
+    
+    Attributes:
+        session_id: 网关返回的会话ID
+        created: 创建时间（monotonic）
+        last_used: 最近使用时间（monotonic）
+        uses: 复用次数
+    """
+    session_id: str
+    created: float
+    last_used: float
+    uses: int = 0
+
+
+class SessionStore:
+    """有界的用户会话表（LRU）
+    
+    Attributes:
+        max_sessions: 最多保留的会话数
+        ttl: 空闲过期时间（秒）
+    """
+    
+    def __init__(self, max_sessions: int = 1000, ttl: float = 1800.0):
+        """初始化会话表
+        
+        Args:
+            max_sessions: 最多保留的会话数
+            ttl: 空闲过期时间（秒）
+        """
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, SessionEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: str) -> Optional[str]:
+        """获取用户的会话ID（命中时刷新最近使用时间）
+        
+        Args:
+            key: 用户标识
+        
+        Returns:
+            会话ID，不存在或已过期时返回None
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and now - entry.last_used > self.ttl:
+                del self._sessions[key]
+                entry = None
+            
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            entry.last_used = now
+            entry.uses += 1
+            self._sessions.move_to_end(key)
+            self.hits += 1
+            return entry.session_id
+    
+    def put(self, key: str, session_id: str) -> None:
+        """记录用户的会话ID
+        
+        Args:
+            key: 用户标识
+            session_id: 会话ID
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and entry.session_id == session_id:
+                entry.last_used = now
+            else:
+                self._sessions[key] = SessionEntry(session_id, now, now)
+            self._sessions.move_to_end(key)
+            
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+    
+    def discard(self, key: str) -> None:
+        """删除用户的会话（会话失效时调用）"""
+        with self._lock:
+            self._sessions.pop(key, None)
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def stats(self) -> Dict[str, Any]:
+        """获取会话表统计"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
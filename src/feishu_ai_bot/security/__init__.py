@@ -1,5 +1,5 @@
 """安全模块"""
 
-from feishu_ai_bot.security.validator import SecurityValidator
+from feishu_ai_bot.security.validator import ReplayGuard, SecurityValidator
 
-__all__ = ["SecurityValidator"]
+__all__ = ["SecurityValidator", "ReplayGuard"]
@@ -0,0 +1,136 @@
+"""飞书事件加解密与签名模块
+
+按飞书开放平台规范实现：
+
+- 签名：``sha256(timestamp + nonce + encrypt_key + body)`` 的十六进制摘要，
+  通过请求头 ``X-Lark-Request-Timestamp``、``X-Lark-Request-Nonce``、``X-Lark-Signature`` 传递
+- 加密：请求体为 ``{"encrypt": "..."}``，密文 Base64 解码后前 16 字节为 IV，
+  密钥为 ``sha256(encrypt_key)``，AES-256-CBC + PKCS#7 填充
+
+解密依赖可选的 ``cryptography`` 包（``pip install .[crypto]``）；签名校验只用标准库。
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+from functools import lru_cache
+from typing import Union
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:  # pragma: no cover - 可选依赖
+    Cipher = None
+
+SIGNATURE_HEADER = "X-Lark-Signature"
+TIMESTAMP_HEADER = "X-Lark-Request-Timestamp"
+NONCE_HEADER = "X-Lark-Request-Nonce"
+
+AES_BLOCK_SIZE = 16
+
+
+class EventDecryptError(ValueError):
+    """事件解密失败"""
+
+
+@lru_cache(maxsize=8)
+def derive_key(encrypt_key: str) -> bytes:
+    """由 Encrypt Key 派生 AES 密钥（结果缓存，每个密钥只计算一次）"""
+    return hashlib.sha256(encrypt_key.encode("utf-8")).digest()
+
+
+def compute_signature(
+    timestamp: str,
+    nonce: str,
+    encrypt_key: str,
+    body: Union[str, bytes]
+) -> str:
+    """计算事件签名
+    
+    Args:
+        timestamp: 请求头中的时间戳
+        nonce: 请求头中的随机数
+        encrypt_key: 事件加密密钥
+        body: 原始请求体
+    
+    Returns:
+        十六进制签名
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    digest = hashlib.sha256(f"{timestamp}{nonce}{encrypt_key}".encode("utf-8"))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def verify_signature(
+    timestamp: str,
+    nonce: str,
+    encrypt_key: str,
+    body: Union[str, bytes],
+    signature: str
+) -> bool:
+    """以常量时间比较校验事件签名
+    
+    Args:
+        timestamp: 请求头中的时间戳
+        nonce: 请求头中的随机数
+        encrypt_key: 事件加密密钥
+        body: 原始请求体
+        signature: 请求头中的签名
+    
+    Returns:
+        是否验证通过
+    """
+    expected = compute_signature(timestamp, nonce, encrypt_key, body)
+    return hmac.compare_digest(expected, signature or "")
+
+
+class EventCipher:
+    """飞书事件解密器
+    
+    Attributes:
+        key: 派生后的 AES-256 密钥
+    """
+    
+    def __init__(self, encrypt_key: str):
+        """初始化解密器
+        
+        Args:
+            encrypt_key: 事件加密密钥
+        
+        Raises:
+            RuntimeError: 未安装 cryptography
+        """
+        if Cipher is None:
+            raise RuntimeError("事件解密需要安装 cryptography（pip install .[crypto]）")
+        self.key = derive_key(encrypt_key)
+        self._algorithm = algorithms.AES(self.key)
+    
+    def decrypt(self, encrypted: str) -> bytes:
+        """解密 ``encrypt`` 字段
+        
+        Args:
+            encrypted: Base64 编码的密文
+        
+        Returns:
+            明文（UTF-8 编码的事件 JSON）
+        
+        Raises:
+            EventDecryptError: 密文格式错误或密钥不匹配
+        """
+        try:
+            raw = base64.b64decode(encrypted)
+        except (binascii.Error, ValueError) as e:
+            raise EventDecryptError(f"密文不是有效的 Base64: {e}") from e
+        
+        if len(raw) < 2 * AES_BLOCK_SIZE or len(raw) % AES_BLOCK_SIZE:
+            raise EventDecryptError("密文长度无效")
+        
+        decryptor = Cipher(self._algorithm, modes.CBC(raw[:AES_BLOCK_SIZE])).decryptor()
+        padded = decryptor.update(raw[AES_BLOCK_SIZE:]) + decryptor.finalize()
+        
+        pad = padded[-1]
+        if not 1 <= pad <= AES_BLOCK_SIZE or padded[-pad:] != bytes([pad]) * pad:
+            raise EventDecryptError("填充无效，加密密钥可能不匹配")
+        return padded[:-pad]
@@ -3,16 +3,122 @@
 提供访问控制和验证功能
 """
 
+import bisect
+import functools
+import hashlib
+import ipaddress
 import logging
+import os
+import shutil
+import threading
 import time
 from collections import defaultdict
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 if TYPE_CHECKING:
     from feishu_ai_bot.bot.feishu import FeishuBot
 
 logger = logging.getLogger(__name__)
 
+FORWARDED_FOR_HEADER = "X-Forwarded-For"
+
+
+class IPAllowlist:
+    """IP/CIDR 白名单
+    
+    条目编译为按起始地址排序、已合并的区间表（IPv4 和 IPv6 各一张），
+    查找时对起始地址二分，复杂度 O(log n)。IPv4 映射的 IPv6 地址按 IPv4 匹配。
+    
+    Attributes:
+        entries: 成功解析的网段
+    """
+    
+    def __init__(self, entries: Iterable[str] = ()):
+        """编译白名单
+        
+        Args:
+            entries: IP 地址或 CIDR 网段，无法解析的条目会被忽略并记录警告
+        """
+        self.entries: List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]] = []
+        intervals: Dict[int, List[Tuple[int, int]]] = {4: [], 6: []}
+        for entry in entries:
+            entry = entry.strip()
+            if not entry:
+                continue
+            try:
+                network = ipaddress.ip_network(entry, strict=False)
+            except ValueError:
+                logger.warning("忽略无效的白名单条目: %s", entry)
+                continue
+            self.entries.append(network)
+            intervals[network.version].append(
+                (int(network.network_address), int(network.broadcast_address))
+            )
+        
+        self._tables = {version: self._merge(ranges) for version, ranges in intervals.items()}
+    
+    @staticmethod
+    def _merge(ranges: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+        """合并重叠或相邻的区间，返回 (起始地址表, 结束地址表)"""
+        starts: List[int] = []
+        ends: List[int] = []
+        for start, end in sorted(ranges):
+            if ends and start <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        return starts, ends
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def __contains__(self, ip: str) -> bool:
+        return self.contains(ip)
+    
+    def contains(self, ip: str) -> bool:
+        """检查地址是否在白名单中，无法解析的地址视为不在"""
+        try:
+            address = ipaddress.ip_address(ip.strip())
+        except (AttributeError, ValueError):
+            return False
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        
+        starts, ends = self._tables[address.version]
+        value = int(address)
+        index = bisect.bisect_right(starts, value) - 1
+        return index >= 0 and value <= ends[index]
+
+
+def resolve_client_ip(
+    remote_addr: str,
+    forwarded_for: Optional[str],
+    trusted_proxies: IPAllowlist
+) -> str:
+    """解析真实客户端地址
+    
+    只有直接对端是受信任代理时才读取 ``X-Forwarded-For``，并从右向左跳过
+    受信任代理，第一个不受信任的地址即为客户端；客户端伪造的左侧条目不会被采用。
+    
+    Args:
+        remote_addr: 直接对端地址
+        forwarded_for: X-Forwarded-For 头
+        trusted_proxies: 受信任代理网段
+    
+    Returns:
+        客户端地址
+    """
+    if not forwarded_for or not trusted_proxies.contains(remote_addr):
+        return remote_addr
+    
+    client = remote_addr
+    for hop in reversed(forwarded_for.split(",")):
+        client = hop.strip()
+        if not trusted_proxies.contains(client):
+            break
+    return client
+
 
 class SecurityValidator:
     """安全验证器
@@ -22,8 +128,9 @@ class SecurityValidator:
     Attributes:
         rate_limit_per_minute: 每分钟最大请求数
         enable_ip_whitelist: 是否启用IP白名单
-        ip_whitelist: IP白名单列表
+        ip_whitelist: IP白名单列表（支持 CIDR 网段）
         enable_event_verification: 是否启用事件验证
+        trusted_proxies: 受信任的反向代理网段
     """
     
     def __init__(
@@ -31,20 +138,24 @@ class SecurityValidator:
         rate_limit_per_minute: int = 30,
         enable_ip_whitelist: bool = False,
         ip_whitelist: list = None,
-        enable_event_verification: bool = True
+        enable_event_verification: bool = True,
+        trusted_proxies: list = None
     ):
         """初始化安全验证器
         
         Args:
             rate_limit_per_minute: 每分钟最大请求数
             enable_ip_whitelist: 是否启用IP白名单
-            ip_whitelist: IP白名单列表
+            ip_whitelist: IP白名单列表（支持 CIDR 网段）
             enable_event_verification: 是否启用事件验证
+            trusted_proxies: 受信任的反向代理网段，来自这些地址的请求按 X-Forwarded-For 解析客户端
         """
         self.rate_limit_per_minute = rate_limit_per_minute
         self.enable_ip_whitelist = enable_ip_whitelist
         self.ip_whitelist = ip_whitelist or []
         self.enable_event_verification = enable_event_verification
+        self.trusted_proxies = IPAllowlist(trusted_proxies or [])
+        self._allowlist = IPAllowlist(self.ip_whitelist)
         
         # 访问频率限制器 {identifier: [timestamp1, timestamp2, ...]}
         self._rate_limiter: dict = defaultdict(list)
@@ -93,12 +204,29 @@ class SecurityValidator:
         if not self.ip_whitelist:
             return True
         
-        if client_ip in self.ip_whitelist:
+        if self._allowlist.contains(client_ip):
             return True
         
-        logger.warning(f"IP不在白名单中: {client_ip}")
+        logger.warning("IP不在白名单中: %s", client_ip)
         return False
     
+    def check_request_ip(self, remote_addr: str, forwarded_for: Optional[str] = None) -> bool:
+        """按直接对端地址和代理链检查白名单
+        
+        Args:
+            remote_addr: 直接对端地址
+            forwarded_for: X-Forwarded-For 头
+            
+        Returns:
+            是否允许访问
+        """
+        if not self.enable_ip_whitelist or not self.ip_whitelist:
+            return True
+        
+        return self.check_ip_whitelist(
+            resolve_client_ip(remote_addr, forwarded_for, self.trusted_proxies)
+        )
+    
     def validate_event_token(self, bot: "FeishuBot", token: str) -> bool:
         """验证事件令牌
         
@@ -115,10 +243,163 @@ class SecurityValidator:
         return bot.verify_verification_token(token)
 
 
+class MemoryNonceStore:
+    """进程内的 nonce 存储，每个时间桶一个集合"""
+    
+    def __init__(self):
+        self._buckets: Dict[int, Set[str]] = {}
+    
+    def add(self, bucket: int, nonce: str) -> bool:
+        """登记 nonce，已存在时返回 False"""
+        seen = self._buckets.setdefault(bucket, set())
+        if nonce in seen:
+            return False
+        seen.add(nonce)
+        return True
+    
+    def drop_before(self, bucket: int) -> int:
+        """整桶丢弃早于 bucket 的记录，返回丢弃的条数"""
+        dropped = 0
+        for old in [b for b in self._buckets if b < bucket]:
+            dropped += len(self._buckets.pop(old))
+        return dropped
+
+
+class FileNonceStore:
+    """基于目录的 nonce 存储，供多个 worker 进程共享
+    
+    每个时间桶一个子目录，nonce 以 ``O_CREAT | O_EXCL`` 创建空文件登记，
+    由文件系统保证跨进程的原子性；过期时整目录删除。
+    建议放在 tmpfs（如 ``/dev/shm``）上。
+    """
+    
+    def __init__(self, directory: str):
+        """初始化存储
+        
+        Args:
+            directory: 共享目录
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+    
+    def add(self, bucket: int, nonce: str) -> bool:
+        """登记 nonce，已存在时返回 False"""
+        bucket_dir = os.path.join(self.directory, str(bucket))
+        os.makedirs(bucket_dir, exist_ok=True)
+        name = hashlib.blake2b(nonce.encode("utf-8"), digest_size=16).hexdigest()
+        try:
+            fd = os.open(os.path.join(bucket_dir, name), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        os.close(fd)
+        return True
+    
+    def drop_before(self, bucket: int) -> int:
+        """删除早于 bucket 的目录，返回删除的桶数"""
+        dropped = 0
+        for entry in os.listdir(self.directory):
+            if entry.lstrip("-").isdigit() and int(entry) < bucket:
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+                dropped += 1
+        return dropped
+
+
+class ReplayGuard:
+    """签名请求的防重放校验
+    
+    按请求时间戳划分宽度为 ``window`` 秒的时间桶，每个桶一个 nonce 集合。
+    时间戳偏差超过 ``window`` 的请求直接拒绝，因此早于
+    ``now - window`` 所在桶的记录不可能再被用到，进入新桶时整桶丢弃，
+    不需要逐条扫描过期项。
+    
+    Attributes:
+        window: 允许的时间戳偏差（秒），同时也是时间桶宽度
+        max_nonces: 本进程最多登记的 nonce 数，超出后拒绝新请求
+        stats: 各类拒绝的计数
+    """
+    
+    def __init__(
+        self,
+        window: float = 300.0,
+        max_nonces: int = 100000,
+        shared_dir: Optional[str] = None
+    ):
+        """初始化防重放校验
+        
+        Args:
+            window: 允许的时间戳偏差（秒）
+            max_nonces: 最多登记的 nonce 数
+            shared_dir: 多进程共享目录，为空时只在进程内去重
+        """
+        self.window = window
+        self.max_nonces = max_nonces
+        self.store = FileNonceStore(shared_dir) if shared_dir else MemoryNonceStore()
+        self._counts: Dict[int, int] = {}
+        self._oldest = 0
+        self._lock = threading.Lock()
+        self.stats = {"accepted": 0, "stale": 0, "duplicate": 0, "overflow": 0}
+    
+    def check(self, timestamp: str, nonce: str, now: Optional[float] = None) -> bool:
+        """校验时间戳偏差和 nonce 唯一性
+        
+        Args:
+            timestamp: 请求时间戳（秒）
+            nonce: 请求 nonce
+            now: 当前时间，默认取系统时间
+        
+        Returns:
+            是否放行
+        """
+        now = time.time() if now is None else now
+        try:
+            ts = float(timestamp)
+        except (TypeError, ValueError):
+            ts = None
+        if ts is None or not nonce or abs(now - ts) > self.window:
+            self._reject("stale", timestamp)
+            return False
+        
+        bucket = int(ts // self.window)
+        with self._lock:
+            self._expire(int((now - self.window) // self.window))
+            
+            if sum(self._counts.values()) >= self.max_nonces:
+                self._reject("overflow", timestamp)
+                return False
+            
+            if not self.store.add(bucket, nonce):
+                self._reject("duplicate", timestamp)
+                return False
+            
+            self._counts[bucket] = self._counts.get(bucket, 0) + 1
+            self.stats["accepted"] += 1
+        return True
+    
+    def _expire(self, oldest: int) -> None:
+        """丢弃早于 oldest 的时间桶（调用方需持有锁）"""
+        if oldest <= self._oldest:
+            return
+        self._oldest = oldest
+        self.store.drop_before(oldest)
+        for bucket in [b for b in self._counts if b < oldest]:
+            del self._counts[bucket]
+    
+    def _reject(self, reason: str, timestamp: str) -> None:
+        """记录拒绝原因"""
+        self.stats[reason] += 1
+        logger.warning("拒绝重放请求: reason=%s, timestamp=%s", reason, timestamp)
+
+
 # 向后兼容的函数接口
 _rate_limiter_global = defaultdict(list)
 
 
+@functools.lru_cache(maxsize=16)
+def _compile_allowlist(whitelist: Tuple[str, ...]) -> IPAllowlist:
+    """按白名单内容缓存编译结果"""
+    return IPAllowlist(whitelist)
+
+
 def check_rate_limit(identifier: str, rate_limit_per_minute: int = 30) -> bool:
     """检查访问频率限制（全局函数版本）
     
@@ -169,8 +450,8 @@ def check_ip_whitelist(client_ip: str, enable: bool = False, whitelist: list = N
     if not whitelist:
         return True
     
-    if client_ip in whitelist:
+    if _compile_allowlist(tuple(whitelist)).contains(client_ip):
         return True
     
-    logger.warning(f"IP不在白名单中: {client_ip}")
+    logger.warning("IP不在白名单中: %s", client_ip)
     return False
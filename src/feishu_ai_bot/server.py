@@ -1,135 +1,586 @@
 """飞书AI机器人 - 主服务
 
-新架构下的 Flask 主服务入口
-"""
-
-import json
-import logging
-import sys
-from pathlib import Path
+新架构下的 Flask 主服务入口。
 
-from flask import Flask, request, jsonify
+通过 ``create_app(config)`` 创建应用，导入本模块不会读取配置、
+创建客户端或访问任何上游服务。组件在第一次使用时构建，
+启动后由后台线程完成预热（令牌预取、OpenClaw 探测、连接预建立），
+之后由 ``HealthMonitor`` 定期探测各依赖，健康检查端点只读取其缓存结果。
 
-# 配置日志（在导入其他模块之前）
-from feishu_ai_bot.config import load_config
+gunicorn 可直接使用 ``feishu_ai_bot.server:app`` 或
+``feishu_ai_bot.server:create_app()``。
 
-config = load_config()
+配置可通过 SIGHUP 或 ``POST /admin/reload`` 热加载，变化的配置节对应的组件
+在下次访问时按新配置重建，进行中的请求继续使用旧组件直到完成。
 
-# 确保日志目录存在
-log_path = Path(config.server.log_file)
-log_path.parent.mkdir(parents=True, exist_ok=True)
+多进程部署（``gunicorn -c configs/gunicorn.conf.py``）时应用在 master 中预加载：
+``prepare_prefork`` 在 fork 前完成令牌预取、创建共享统计内存，
+``init_worker`` 在每个 worker 中重建连接池和后台线程。
+"""
 
-logging.basicConfig(
-    level=getattr(logging, config.server.log_level),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(config.server.log_file, encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-logger = logging.getLogger(__name__)
+import hmac
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
 
-logger.info("=" * 60)
-logger.info("🚀 飞书AI机器人服务启动中...")
-logger.info(f"版本: {config.version}")
-logger.info("=" * 60)
+from flask import Blueprint, Flask, current_app, jsonify, request
+from flask.json.provider import JSONProvider
 
-# 导入其他模块
+from feishu_ai_bot import codec, deadline
+from feishu_ai_bot.config import AppConfig, ConfigStore, get_config_store
+from feishu_ai_bot.logging_config import get_dropped_count, setup_logging
+from feishu_ai_bot.logging_config import restart_after_fork as restart_logging_after_fork
 from feishu_ai_bot.bot.feishu import FeishuBot
+from feishu_ai_bot.bot.streaming import StreamingReply
+from feishu_ai_bot.ai import accounting
 from feishu_ai_bot.ai.processor import AITaskProcessor
 from feishu_ai_bot.tasks.processor import is_complex_task, handle_task_async
-from feishu_ai_bot.security.validator import SecurityValidator
-from feishu_ai_bot.monitoring.stats import StatsCollector, update_stats
-from feishu_ai_bot.openclaw.bridge import create_openclaw_bridge
-
-# 初始化组件
-feishu_bot = FeishuBot(
-    app_id=config.feishu.app_id,
-    app_secret=config.feishu.app_secret,
-    encrypt_key=config.feishu.encrypt_key,
-    verification_token=config.feishu.verification_token
+from feishu_ai_bot.tasks import scheduler
+from feishu_ai_bot.security.validator import (
+    FORWARDED_FOR_HEADER, ReplayGuard, SecurityValidator
 )
-
-ai_processor = AITaskProcessor(
-    workspace_dir=config.workspace_dir,
-    config=config.ai
+from feishu_ai_bot.security.crypto import (
+    NONCE_HEADER, SIGNATURE_HEADER, TIMESTAMP_HEADER, EventDecryptError
 )
-
-security_validator = SecurityValidator(
-    rate_limit_per_minute=config.security.rate_limit_per_minute,
-    enable_ip_whitelist=config.security.enable_ip_whitelist,
-    ip_whitelist=config.security.ip_whitelist,
-    enable_event_verification=config.security.enable_event_verification
+from feishu_ai_bot.monitoring.shared import SharedStats
+from feishu_ai_bot.monitoring.stats import (
+    StatsCollector, enable_shared_stats, get_global_collector, get_latency_stats,
+    get_shared_stats, record_latency, render_prometheus, update_stats
+)
+from feishu_ai_bot.monitoring.capture import EventRecorder, create_event_recorder
+from feishu_ai_bot.monitoring import profiler, slowlog, tracing
+from feishu_ai_bot.monitoring.health import HealthMonitor
+from feishu_ai_bot.openclaw.bridge import (
+    OpenClawBridge, OpenClawStreamError, create_openclaw_bridge
 )
 
-stats_collector = StatsCollector()
+logger = logging.getLogger(__name__)
 
-# 初始化 OpenClaw 桥接器（可选）
-openclaw_bridge = None
-if config.openclaw.enabled:
-    try:
-        logger.info("🔧 正在初始化 OpenClaw 桥接器...")
-        openclaw_bridge = create_openclaw_bridge(
-            gateway_url=config.openclaw.gateway_url,
-            token=config.openclaw.token,
-            agent_id=config.openclaw.agent_id,
-            timeout=config.openclaw.timeout
+EXTENSION_KEY = "feishu_ai_bot"
+
+# 配置节变化时需要重建的组件
+RELOADABLE_COMPONENTS = {
+    "feishu": ("feishu_bot",),
+    "ai": ("ai_processor",),
+    "openclaw": ("openclaw_bridge",),
+    "security": ("security_validator",),
+}
+
+# fork 后必须在 worker 中重建的组件（持有连接池、后台线程或进程内锁）
+PER_WORKER_COMPONENTS = ("ai_processor", "openclaw_bridge", "health_monitor", "replay_guard")
+
+
+class CodecJSONProvider(JSONProvider):
+    """让 Flask 的 ``request.get_json`` 与 ``jsonify`` 使用项目统一的 JSON 编解码器"""
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return codec.dumps(obj, default=_json_default)
+    
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return codec.loads(s)
+    
+    def response(self, *args: Any, **kwargs: Any) -> Any:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            codec.dumps_bytes(obj, default=_json_default), mimetype="application/json"
+        )
+
+
+def _json_default(obj: Any) -> Any:
+    """序列化无法直接编码的对象"""
+    return str(obj)
+
+
+class BotServices:
+    """应用组件容器
+    
+    所有组件（飞书客户端、AI处理器、OpenClaw 桥接器等）在第一次访问时才构建，
+    构建过程加锁保证只执行一次。``start_warm_up`` 在后台线程中完成预热，
+    预热结束后 ``ready`` 置位，供就绪检查使用。
+    
+    Attributes:
+        config_store: 配置存储，``config`` 始终返回其当前快照
+        ready: 预热完成事件
+        warm_up_results: 各预热步骤的结果
+        startup_time: 容器创建时间
+    """
+    
+    def __init__(self, config: AppConfig, config_store: Optional[ConfigStore] = None):
+        """初始化组件容器
+        
+        Args:
+            config: 应用配置
+            config_store: 配置存储，为空时以 config 创建
+        """
+        self.config_store = config_store or ConfigStore(config)
+        self.config_store.subscribe(self._on_config_reload)
+        self.ready = threading.Event()
+        self.warm_up_results: Dict[str, Any] = {}
+        self.startup_time = time.time()
+        self.ready_time: Optional[float] = None
+        self._components: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._warm_up_thread: Optional[threading.Thread] = None
+        self.master_pid: Optional[int] = None
+        self.workers = 1
+    
+    @property
+    def config(self) -> AppConfig:
+        """当前配置快照"""
+        return self.config_store.get()
+    
+    def reload_config(self) -> Dict[str, Any]:
+        """重新加载配置，结果见 ``ConfigStore.reload``"""
+        return self.config_store.reload()
+    
+    def _on_config_reload(self, old: AppConfig, new: AppConfig, changed: List[str]) -> None:
+        """丢弃受影响的组件，下次访问时按新配置构建"""
+        if "tracing" in changed:
+            tracing.configure(new.tracing.sample_rate, new.tracing.buffer_size, new.tracing.export_file)
+        if "slow_log" in changed:
+            slowlog.install(slowlog.create_slow_log(new.slow_log))
+        if "scheduler" in changed:
+            scheduler.configure(new.scheduler)
+        if "usage" in changed:
+            accounting.install(accounting.create_ledger(new.usage))
+        with self._lock:
+            for section in changed:
+                for name in RELOADABLE_COMPONENTS.get(section, ()):
+                    if self._components.pop(name, None) is not None:
+                        logger.info("组件将按新配置重建: %s", name)
+    
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        """获取组件，不存在时构建"""
+        try:
+            return self._components[name]
+        except KeyError:
+            pass
+        
+        with self._lock:
+            if name not in self._components:
+                self._components[name] = factory()
+            return self._components[name]
+    
+    @property
+    def feishu_bot(self) -> FeishuBot:
+        """飞书机器人客户端"""
+        return self._get("feishu_bot", lambda: FeishuBot(
+            app_id=self.config.feishu.app_id,
+            app_secret=self.config.feishu.app_secret,
+            encrypt_key=self.config.feishu.encrypt_key,
+            verification_token=self.config.feishu.verification_token,
+            api_base=self.config.feishu.api_base,
+            rate_limit=self.config.feishu.rate_limit / self.workers,
+            bulk_concurrency=self.config.feishu.bulk_concurrency,
+            request_timeout=self.config.feishu.request_timeout
+        ))
+    
+    @property
+    def ai_processor(self) -> AITaskProcessor:
+        """AI任务处理器"""
+        return self._get("ai_processor", lambda: AITaskProcessor(
+            workspace_dir=self.config.workspace_dir,
+            config=self.config.ai
+        ))
+    
+    @property
+    def security_validator(self) -> SecurityValidator:
+        """安全验证器"""
+        return self._get("security_validator", lambda: SecurityValidator(
+            rate_limit_per_minute=self.config.security.rate_limit_per_minute,
+            enable_ip_whitelist=self.config.security.enable_ip_whitelist,
+            ip_whitelist=self.config.security.ip_whitelist,
+            enable_event_verification=self.config.security.enable_event_verification,
+            trusted_proxies=self.config.security.trusted_proxies
+        ))
+    
+    @property
+    def replay_guard(self) -> ReplayGuard:
+        """签名请求防重放校验"""
+        security = self.config.security
+        return self._get("replay_guard", lambda: ReplayGuard(
+            window=security.replay_window,
+            max_nonces=security.replay_max_nonces,
+            shared_dir=security.replay_shared_dir or None
+        ))
+    
+    @property
+    def stats_collector(self) -> StatsCollector:
+        """全局统计快照（多进程模式下为所有 worker 的合计）"""
+        return get_global_collector()
+    
+    @property
+    def event_recorder(self) -> Optional[EventRecorder]:
+        """流量录制器（未启用时为 None）"""
+        capture = self.config.capture
+        return self._get("event_recorder", lambda: create_event_recorder(
+            enabled=capture.enabled,
+            path=capture.file,
+            max_bytes=capture.max_bytes,
+            backup_count=capture.backup_count,
+            redact_mode=capture.redact_mode,
+            salt=capture.salt
+        ))
+    
+    @property
+    def health_monitor(self) -> HealthMonitor:
+        """依赖健康监控器"""
+        return self._get("health_monitor", self._create_health_monitor)
+    
+    def _create_health_monitor(self) -> HealthMonitor:
+        """创建健康监控器，只注册已配置的依赖"""
+        health = self.config.health
+        monitor = HealthMonitor(
+            interval=health.interval,
+            jitter=health.jitter,
+            window_size=health.window_size
+        )
+        if self.config.feishu.app_id:
+            monitor.register("feishu_auth", lambda: self.feishu_bot.get_tenant_access_token(
+                force_refresh=True
+            ) is not None)
+        if self.config.ai.api_key:
+            monitor.register("llm_api", lambda: self.ai_processor.ping())
+        if self.config.openclaw.enabled:
+            monitor.register("openclaw", self._probe_openclaw)
+        return monitor
+    
+    def _probe_openclaw(self) -> bool:
+        """探测 OpenClaw 网关"""
+        bridge = self.openclaw_bridge
+        if bridge is None:
+            raise RuntimeError("OpenClaw 桥接器未初始化")
+        health = bridge.health_check()
+        if not health.get("healthy"):
+            raise RuntimeError(health.get("error", "健康检查失败"))
+        return True
+    
+    @property
+    def openclaw_bridge(self) -> Optional[OpenClawBridge]:
+        """OpenClaw 桥接器（未启用或初始化失败时为 None）"""
+        return self._get("openclaw_bridge", self._create_openclaw_bridge)
+    
+    def _create_openclaw_bridge(self) -> Optional[OpenClawBridge]:
+        """创建 OpenClaw 桥接器（不做任何网络请求）"""
+        if not self.config.openclaw.enabled:
+            return None
+        
+        try:
+            logger.info("🔧 正在初始化 OpenClaw 桥接器...")
+            return create_openclaw_bridge(
+                gateway_url=self.config.openclaw.gateway_url,
+                token=self.config.openclaw.token,
+                agent_id=self.config.openclaw.agent_id,
+                timeout=self.config.openclaw.timeout,
+                discovery_fanout=self.config.openclaw.discovery_fanout,
+                probe_timeout=self.config.openclaw.probe_timeout,
+                session_max=self.config.openclaw.session_max,
+                session_ttl=self.config.openclaw.session_ttl
+            )
+        except Exception as e:
+            logger.error("❌ OpenClaw 桥接器初始化失败: %s", e)
+            return None
+    
+    def prepare_prefork(self, workers: int) -> None:
+        """在 master 中为多进程模式做准备（fork 之前调用）
+        
+        构建只读组件（安全验证器的编译结果等）并预取访问令牌，worker 通过写时复制共享；
+        创建共享统计内存，使各 worker 的计数可以汇总。不启动任何线程。
+        
+        Args:
+            workers: worker 进程数
+        """
+        self.master_pid = os.getpid()
+        self.workers = max(1, workers)
+        enable_shared_stats(SharedStats(max_workers=max(64, self.workers * 4)))
+        
+        self.security_validator
+        try:
+            self._warm_feishu_token()
+        except Exception as e:
+            logger.warning("预取访问令牌失败: %s", e)
+        logger.info("🧬 预加载完成，即将 fork %s 个 worker", self.workers)
+    
+    def after_fork(self) -> None:
+        """在 worker 中重建连接池和后台线程（fork 之后调用）"""
+        self._lock = threading.RLock()
+        self._warm_up_thread = None
+        self.ready = threading.Event()
+        self.startup_time = time.time()
+        for name in PER_WORKER_COMPONENTS:
+            self._components.pop(name, None)
+        
+        bot = self._components.get("feishu_bot")
+        if bot is not None:
+            rate = self.config.feishu.rate_limit
+            # 飞书按应用限频，限额在 worker 之间均分
+            bot.reset_connections(rate / self.workers if rate > 0 else 0)
+        
+        shared = get_shared_stats()
+        if shared is not None:
+            shared.attach()
+        restart_logging_after_fork()
+        # 每个 worker 各自累计并写入同一个合计文件，写入线程在首次记录用量时启动
+        accounting.install(accounting.create_ledger(self.config.usage))
+    
+    def start_warm_up(self) -> None:
+        """在后台线程中预热组件（重复调用无副作用）"""
+        with self._lock:
+            if self._warm_up_thread is not None:
+                return
+            self._warm_up_thread = threading.Thread(
+                target=self.warm_up, name="warm-up", daemon=True
+            )
+            self._warm_up_thread.start()
+    
+    def warm_up(self) -> Dict[str, Any]:
+        """预热组件
+        
+        依次执行令牌预取、AI服务连接预建立和 OpenClaw 路由探测。
+        单个步骤失败不影响其他步骤，全部执行完毕后置位 ``ready``。
+        
+        Returns:
+            各预热步骤的结果
+        """
+        # 组件在步骤内部才构建，构建失败同样按步骤失败记录
+        steps: Dict[str, Callable[[], Any]] = {
+            "feishu_token": lambda: self._warm_feishu_token(),
+            "ai_connection": lambda: self.ai_processor.warm_up(),
+            "openclaw": lambda: self._warm_openclaw(),
+        }
+        
+        for name, step in steps.items():
+            started = time.perf_counter()
+            try:
+                ok = bool(step())
+                error = None
+            except Exception as e:
+                ok = False
+                error = str(e)
+                logger.warning("预热步骤失败: %s: %s", name, error)
+            self.warm_up_results[name] = {
+                "ok": ok,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "error": error
+            }
+        
+        self.ready_time = time.time()
+        self.ready.set()
+        
+        if self.config.health.enabled:
+            self._seed_health_monitor()
+            self.health_monitor.start()
+        logger.info(
+            "✅ 预热完成，耗时 %.2fs: "
+            "%s",
+            self.ready_time - self.startup_time,
+            self.warm_up_results
         )
+        return self.warm_up_results
+    
+    def _seed_health_monitor(self) -> None:
+        """用预热结果作为第一轮探测，避免启动时重复请求上游"""
+        mapping = {"feishu_token": "feishu_auth", "ai_connection": "llm_api", "openclaw": "openclaw"}
+        monitor = self.health_monitor
+        for step, dependency in mapping.items():
+            result = self.warm_up_results.get(step)
+            if result is not None:
+                monitor.record(dependency, result["ok"], result["duration_ms"], result["error"])
+    
+    def _warm_feishu_token(self) -> bool:
+        """预取 tenant_access_token（同时建立到开放平台的连接）"""
+        if not self.config.feishu.app_id:
+            return False
+        return self.feishu_bot.get_tenant_access_token() is not None
+    
+    def _warm_openclaw(self) -> bool:
+        """探测 OpenClaw 网关"""
+        bridge = self.openclaw_bridge
+        if bridge is None:
+            return False
         
-        # 健康检查
-        health = openclaw_bridge.health_check()
+        health = bridge.health_check()
         if health.get("healthy"):
             logger.info("✅ OpenClaw 桥接器已启用")
         else:
-            logger.warning(f"⚠️ OpenClaw 健康检查失败: {health.get('error')}")
-    except Exception as e:
-        logger.error(f"❌ OpenClaw 桥接器初始化失败: {str(e)}")
-        openclaw_bridge = None
+            logger.warning("⚠️ OpenClaw 健康检查失败: %s", health.get('error'))
+        return bool(health.get("healthy"))
 
-# 创建 Flask 应用
-app = Flask(__name__)
 
 
-@app.route('/webhook/event', methods=['POST'])
+bp = Blueprint("feishu_ai_bot", __name__)
+
+
+def get_services() -> BotServices:
+    """获取当前应用的组件容器"""
+    return current_app.extensions[EXTENSION_KEY]
+
+
+@bp.route('/webhook/event', methods=['POST'])
 def handle_event():
-    """处理飞书事件"""
+    """处理飞书事件
+    
+    每个事件一条 trace（按 TRACE_SAMPLE_RATE 采样），并在接入时创建截止时间
+    （TASK_DEADLINE_SECONDS），由事件触发的后台任务和下游调用共用这一预算。
+    """
+    arrival = time.time()
+    services = get_services()
+    event_deadline = deadline.Deadline(services.config.server.task_deadline)
+    with tracing.trace("webhook.event", request_bytes=request.content_length) as root, \
+            profiler.thread_context(task_type="webhook"), event_deadline.scope():
+        response = current_app.make_response(process_event(services, arrival))
+        root.set(status=response.status_code)
+    return response
+
+
+def process_event(services: BotServices, arrival: float):
+    """校验并分发飞书事件"""
     try:
+        # IP 白名单在读取请求体之前检查
+        if not services.security_validator.check_request_ip(
+            request.remote_addr, request.headers.get(FORWARDED_FOR_HEADER)
+        ):
+            update_stats(success=False)
+            return jsonify({"code": -1, "msg": "Forbidden"}), 403
+        
         # 验证请求格式
         if not request.is_json:
             logger.warning("收到非JSON请求")
             return jsonify({"code": -1, "msg": "Content-Type must be application/json"}), 400
         
-        data = request.get_json(silent=True)
-        if data is None:
-            logger.warning("收到无效的JSON数据")
-            return jsonify({"code": -1, "msg": "Invalid JSON"}), 400
+        # 签名校验在 JSON 解析之前进行，伪造请求不产生解析开销
+        signed = verify_request_signature(services)
+        if signed is False:
+            update_stats(success=False)
+            return jsonify({"code": -1, "msg": "Invalid signature"}), 401
+        
+        # 签名覆盖时间戳和 nonce，校验通过后才能据此判断重放
+        if signed and not services.replay_guard.check(
+            request.headers.get(TIMESTAMP_HEADER, ""),
+            request.headers.get(NONCE_HEADER, "")
+        ):
+            update_stats(success=False)
+            return jsonify({"code": -1, "msg": "Replayed request"}), 401
+        
+        # 必须签名却未签名的请求只可能是 URL 验证；解密或校验失败一律返回同样的 401，
+        # 不向未认证的调用方暴露解密结果
+        unsigned = requires_signature(services) and not signed
+        
+        with tracing.span("parse") as parse_span:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                logger.warning("收到无效的JSON数据")
+                return jsonify({"code": -1, "msg": "Invalid JSON"}), 400
+            
+            # 加密事件解密
+            if "encrypt" in data:
+                parse_span.set(encrypted=True)
+                try:
+                    data = services.feishu_bot.decrypt_event(data["encrypt"])
+                except (EventDecryptError, RuntimeError) as e:
+                    logger.warning("事件解密失败: %s", e)
+                    update_stats(success=False)
+                    if unsigned:
+                        return jsonify({"code": -1, "msg": "Unauthorized"}), 401
+                    return jsonify({"code": -1, "msg": "Decrypt failed"}), 400
+                if not isinstance(data, dict):
+                    logger.warning("解密后的事件不是 JSON 对象")
+                    update_stats(success=False)
+                    if unsigned:
+                        return jsonify({"code": -1, "msg": "Unauthorized"}), 401
+                    return jsonify({"code": -1, "msg": "Invalid JSON"}), 400
+            parse_span.set(event_type=(data.get("header") or {}).get("event_type"))
+        
+        if not authenticate_event(services, data, signed):
+            update_stats(success=False)
+            return jsonify({"code": -1, "msg": "Unauthorized"}), 401
         
         # 更新统计
         update_stats()
         
-        logger.info(f"收到事件: {json.dumps(data, ensure_ascii=False)[:200]}...")
+        header = data.get("header") or {}
+        logger.info(
+            "收到事件: event_type=%s, event_id=%s",
+            header.get("event_type"), header.get("event_id")
+        )
         
         # 验证挑战请求（飞书首次配置时的验证）
         if "challenge" in data:
             logger.info("收到挑战请求")
             return jsonify({"challenge": data["challenge"]})
         
+        event_recorder = services.event_recorder
+        if event_recorder:
+            event_recorder.record(data, arrival)
+        
         # 解析事件数据
         event_type = data.get("header", {}).get("event_type")
         
         if event_type == "im.message.receive_v1":
-            return handle_message_event(data)
+            return handle_message_event(services, data)
         else:
-            logger.info(f"未处理的事件类型: {event_type}")
+            logger.info("未处理的事件类型: %s", event_type)
             return jsonify({"code": 0, "msg": "Event ignored"})
-            
+    
     except Exception as e:
-        logger.error(f"处理事件失败: {str(e)}", exc_info=True)
+        logger.error("处理事件失败: %s", e, exc_info=True)
         update_stats(success=False)
         return jsonify({"code": -1, "msg": str(e)}), 500
 
 
-def handle_message_event(data: dict):
+def verify_request_signature(services: BotServices) -> Optional[bool]:
+    """校验请求头中的飞书签名
+    
+    Returns:
+        True 签名正确；False 签名错误；None 未校验（未启用或请求未签名）
+    """
+    config = services.config
+    if not (config.security.enable_event_verification and config.feishu.encrypt_key):
+        return None
+    
+    signature = request.headers.get(SIGNATURE_HEADER)
+    if signature is None:
+        return None
+    
+    return services.feishu_bot.verify_event_signature(
+        request.get_data(cache=True),
+        signature,
+        request.headers.get(TIMESTAMP_HEADER, ""),
+        request.headers.get(NONCE_HEADER, "")
+    )
+
+
+def requires_signature(services: BotServices) -> bool:
+    """是否要求事件带签名（启用事件校验且配置了加密密钥，URL 验证请求除外）"""
+    config = services.config
+    return bool(config.security.enable_event_verification and config.feishu.encrypt_key)
+
+
+def authenticate_event(services: BotServices, data: dict, signed: Optional[bool]) -> bool:
+    """校验事件来源
+    
+    配置了加密密钥时，除 URL 验证请求（飞书不对其签名）外都必须带有效签名；
+    配置了 Verification Token 时校验事件中的 token。
+    """
+    config = services.config
+    if not config.security.enable_event_verification:
+        return True
+    
+    if requires_signature(services) and not signed and data.get("type") != "url_verification":
+        logger.warning("事件缺少签名")
+        return False
+    
+    if not config.feishu.verification_token:
+        return True
+    
+    token = (data.get("header") or {}).get("token") or data.get("token") or ""
+    return services.security_validator.validate_event_token(services.feishu_bot, token)
+
+
+def handle_message_event(services: BotServices, data: dict):
     """处理消息事件"""
     try:
         event = data.get("event", {})
@@ -140,7 +591,7 @@ def handle_message_event(data: dict):
         chat_id = message.get("chat_id")
         chat_type = message.get("chat_type")
         message_id = message.get("message_id")
-        content = json.loads(message.get("content", "{}"))
+        content = codec.loads(message.get("content") or "{}")
         text = content.get("text", "")
         
         # 获取发送者信息
@@ -149,83 +600,175 @@ def handle_message_event(data: dict):
         user_name = sender_id.get("user_id", "用户")
         
         # 过滤机器人自己的消息
-        if user_open_id == config.feishu.bot_open_id:
+        if user_open_id == services.config.feishu.bot_open_id:
             logger.info("忽略自己的消息")
             return jsonify({"code": 0, "msg": "Ignored"})
         
-        logger.info(f"收到任务: {text} (来自: {user_name}, 类型: {chat_type})")
+        logger.info("收到任务: %s (来自: %s, 类型: %s)", text, user_name, chat_type)
         
         # 处理私聊消息
         if chat_type == "p2p":
             return handle_private_message(
-                text, chat_id, user_name, user_open_id
+                services, text, chat_id, user_name, user_open_id, message_id
             )
         
         # 处理群聊消息
         elif chat_type == "group":
             return handle_group_message(
-                text, chat_id, user_name, message_id, user_open_id
+                services, text, chat_id, user_name, message_id, user_open_id
             )
         
         else:
-            logger.warning(f"未知的聊天类型: {chat_type}")
+            logger.warning("未知的聊天类型: %s", chat_type)
             return jsonify({"code": 0, "msg": "Unknown chat type"})
-            
+    
     except Exception as e:
-        logger.error(f"处理消息事件失败: {str(e)}", exc_info=True)
+        logger.error("处理消息事件失败: %s", e, exc_info=True)
         return jsonify({"code": -1, "msg": str(e)}), 500
 
 
 def handle_private_message(
+    services: BotServices,
     text: str,
     chat_id: str,
     user_name: str,
-    user_open_id: str
+    user_open_id: str,
+    message_id: str = ""
 ):
-    """处理私聊消息（转发到 OpenClaw）"""
+    """处理私聊消息（在后台线程中转发到 OpenClaw）"""
     logger.info("🔀 私聊消息，转发到 OpenClaw 处理")
     
-    if not openclaw_bridge:
+    if not services.openclaw_bridge:
         logger.error("OpenClaw 桥接器不可用")
-        feishu_bot.send_message(
+        services.feishu_bot.send_message(
             chat_id,
             "❌ OpenClaw 服务暂时不可用，请稍后重试"
         )
         return jsonify({"code": -1, "msg": "OpenClaw not available"})
     
+    scheduler.get_scheduler().submit(
+        scheduler.P2P,
+        profiler.bind_context(
+            tracing.bind(relay_private_message, "openclaw.relay"),
+            task_type="openclaw.relay", chat_id=chat_id, message_id=message_id
+        ),
+        (services, text, chat_id, user_name, user_open_id, message_id, deadline.current()),
+        name="openclaw-relay"
+    )
+    
+    return jsonify({"code": 0, "msg": "Processing"})
+
+
+@deadline.detached
+def relay_private_message(
+    services: BotServices,
+    text: str,
+    chat_id: str,
+    user_name: str,
+    user_open_id: str,
+    message_id: str = "",
+    task_deadline: Optional[deadline.Deadline] = None
+) -> None:
+    """把 OpenClaw 的回复写入一条渐进更新的私聊消息
+    
+    优先使用流式接口；网关确定没有处理流式请求（连接失败、不支持流式）时
+    回退到 ``send_message``，读超时或 5xx 等网关可能已在处理的失败不重发。用户看到第一段回复内容的耗时记录为
+    ``openclaw.first_byte``。调用 OpenClaw 受 ``task_deadline`` 限制，
+    最终回复的写入不受限制。
+    """
+    openclaw = services.config.openclaw
+    openclaw_bridge = services.openclaw_bridge
+    reply = StreamingReply(
+        services.feishu_bot,
+        chat_id,
+        min_interval=openclaw.stream_interval,
+        max_edits=openclaw.stream_max_edits
+    )
+    started = time.perf_counter()
+    reply.start("⏳ 正在处理，请稍候...")
+    
     try:
-        # 发送处理中提示
-        feishu_bot.send_message(chat_id, "⏳ 正在处理，请稍候...")
-        
-        # 调用 OpenClaw
-        result = openclaw_bridge.send_message(
-            user_message=text,
-            user_id=user_open_id,
-            user_name=user_name,
-            chat_id=chat_id
-        )
+        with deadline.scope(task_deadline):
+            streamed = (
+                openclaw.stream
+                and openclaw_bridge.stream_supported
+                and _stream_openclaw_reply(
+                    openclaw_bridge, reply, started, text, user_open_id, user_name, chat_id, message_id
+                )
+            )
+            if not streamed:
+                result = openclaw_bridge.send_message(
+                    user_message=text,
+                    user_id=user_open_id,
+                    user_name=user_name,
+                    chat_id=chat_id,
+                    message_id=message_id
+                )
+                record_latency("openclaw.first_byte", (time.perf_counter() - started) * 1000)
+        
+        if streamed:
+            reply.finish()
+            return
         
         if result.get("success"):
-            response_text = result.get("result", "处理完成")
             logger.info("✅ OpenClaw 处理成功")
-            feishu_bot.send_message(chat_id, response_text)
+            reply.finish(result.get("result") or "处理完成")
         else:
             error_msg = result.get("error", "未知错误")
-            logger.error(f"❌ OpenClaw 处理失败: {error_msg}")
-            feishu_bot.send_message(
-                chat_id,
-                f"❌ 处理失败：{error_msg}"
-            )
-        
-        return jsonify({"code": 0, "msg": "Processed"})
-        
+            logger.error("❌ OpenClaw 处理失败: %s", error_msg)
+            reply.finish(f"❌ 处理失败：{error_msg}")
+    
     except Exception as e:
-        logger.error(f"私聊处理异常: {str(e)}", exc_info=True)
-        feishu_bot.send_message(chat_id, f"❌ 处理异常：{str(e)}")
-        return jsonify({"code": -1, "msg": str(e)}), 500
+        logger.error("私聊处理异常: %s", e, exc_info=True)
+        reply.finish(f"❌ 处理异常：{str(e)}")
+
+
+def _stream_openclaw_reply(
+    openclaw_bridge: OpenClawBridge,
+    reply: StreamingReply,
+    started: float,
+    text: str,
+    user_open_id: str,
+    user_name: str,
+    chat_id: str,
+    message_id: str
+) -> bool:
+    """流式转发 OpenClaw 回复（不写入最终回复，由调用方 ``finish``）
+    
+    Returns:
+        是否已取得回复（False 表示网关没有处理请求，需要回退到普通调用）
+    
+    Raises:
+        OpenClawStreamError: 尚未取得任何内容且网关可能已在处理请求
+    """
+    stream = openclaw_bridge.stream_message(
+        user_message=text,
+        user_id=user_open_id,
+        user_name=user_name,
+        chat_id=chat_id,
+        message_id=message_id
+    )
+    try:
+        for delta in stream:
+            if not reply.text:
+                record_latency("openclaw.first_byte", (time.perf_counter() - started) * 1000)
+            reply.feed(delta)
+    except OpenClawStreamError as e:
+        if not reply.text:
+            if e.unprocessed:
+                logger.warning("OpenClaw 流式调用失败，回退到普通调用: %s", e)
+                return False
+            raise
+        logger.error("OpenClaw 流式回复中断: %s", e)
+        reply.feed("\n\n⚠️ 回复中断，内容可能不完整")
+    
+    record_latency("openclaw.stream_total", (time.perf_counter() - started) * 1000)
+    logger.info("✅ OpenClaw 流式回复完成: %d 字符, %d 次编辑", len(reply.text), reply.edits)
+    return True
 
 
 def handle_group_message(
+    services: BotServices,
     text: str,
     chat_id: str,
     user_name: str,
@@ -234,15 +777,18 @@ def handle_group_message(
 ):
     """处理群聊消息"""
     # 检查是否 @ 了机器人
-    mentions = json.loads(json.dumps({}))
     if "@_user_1" in text:
         # 移除 @ 标记
         text = text.replace("@_user_1", "").strip()
     
-    logger.info(f"💬 群聊消息: {text}")
+    logger.info("💬 群聊消息: %s", text)
     
     # 判断任务类型
-    if is_complex_task(text):
+    with tracing.span("classify") as classify_span:
+        complex_task = is_complex_task(text)
+        classify_span.set(task_type="complex" if complex_task else "simple")
+    
+    if complex_task:
         logger.info("📋 复杂任务，创建话题处理")
         handle_task_async(
             "complex",
@@ -251,8 +797,8 @@ def handle_group_message(
             user_name,
             message_id,
             user_open_id,
-            feishu_bot,
-            ai_processor
+            services.feishu_bot,
+            services.ai_processor
         )
     else:
         logger.info("💬 简单任务，直接回复")
@@ -263,35 +809,85 @@ def handle_group_message(
             user_name,
             message_id,
             user_open_id,
-            feishu_bot,
-            ai_processor
+            services.feishu_bot,
+            services.ai_processor
         )
     
     return jsonify({"code": 0, "msg": "Processing"})
 
 
-@app.route('/health', methods=['GET'])
+@bp.route('/health', methods=['GET'])
 def health_check():
-    """健康检查端点"""
-    health = stats_collector.get_health_status(ai_processor)
+    """存活检查端点
+    
+    依赖状态来自健康监控器的缓存快照，不会触发任何上游请求。
+    """
+    services = get_services()
+    monitor = services.health_monitor
+    health = services.stats_collector.get_health_status(services.ai_processor)
     health["openclaw"] = {
-        "enabled": config.openclaw.enabled,
-        "available": openclaw_bridge is not None
+        "enabled": services.config.openclaw.enabled,
+        "available": bool(monitor.get("openclaw").get("available"))
     }
+    health["dependencies"] = monitor.snapshot()
     return jsonify(health)
 
 
-@app.route('/stats', methods=['GET'])
+@bp.route('/ready', methods=['GET'])
+def readiness_check():
+    """就绪检查端点
+    
+    预热完成前返回 503，负载均衡器据此决定是否把流量导入本实例。
+    """
+    services = get_services()
+    ready = services.ready.is_set()
+    body = {
+        "ready": ready,
+        "startup_seconds": round(
+            (services.ready_time or time.time()) - services.startup_time, 3
+        ),
+        "warm_up": services.warm_up_results
+    }
+    return jsonify(body), 200 if ready else 503
+
+
+@bp.route('/stats', methods=['GET'])
 def get_stats():
     """统计信息端点"""
-    stats = stats_collector.get_detailed_stats(ai_processor, config)
+    services = get_services()
+    stats = services.stats_collector.get_detailed_stats(
+        services.ai_processor, services.config
+    )
+    stats["logging"] = {"dropped": get_dropped_count()}
+    stats["latency"] = get_latency_stats()
+    stats["scheduler"] = scheduler.get_scheduler().snapshot()
+    ledger = accounting.get_ledger()
+    if ledger is not None:
+        stats["usage"] = ledger.snapshot(request.args.get("top", 10, type=int))
+    if services.openclaw_bridge is not None:
+        stats["openclaw"] = {"sessions": services.openclaw_bridge.sessions.stats()}
+    if services.config.feishu.encrypt_key:
+        stats["replay"] = dict(services.replay_guard.stats)
+    shared = get_shared_stats()
+    if shared is not None:
+        stats["workers"] = shared.workers()
     return jsonify(stats)
 
 
-@app.route('/test/simulate', methods=['POST'])
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 指标端点"""
+    services = get_services()
+    if not services.config.server.enable_metrics:
+        return jsonify({"code": -1, "msg": "Metrics disabled"}), 404
+    return render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+@bp.route('/test/simulate', methods=['POST'])
 def test_simulate():
     """模拟飞书事件（仅测试用）"""
-    if config.env == "production":
+    services = get_services()
+    if services.config.env == "production":
         return jsonify({"code": -1, "msg": "Not available in production"}), 403
     
     data = request.get_json(silent=True)
@@ -308,7 +904,7 @@ def test_simulate():
                 "chat_id": data.get("chat_id", "test_chat"),
                 "chat_type": data.get("chat_type", "p2p"),
                 "message_id": data.get("message_id", "test_msg"),
-                "content": json.dumps({"text": data.get("message", "测试消息")})
+                "content": codec.dumps({"text": data.get("message", "测试消息")})
             },
             "sender": {
                 "sender_id": {
@@ -319,42 +915,235 @@ def test_simulate():
         }
     }
     
-    return handle_message_event(event_data)
+    return handle_message_event(services, event_data)
 
 
-@app.route('/test/openclaw', methods=['POST'])
+@bp.route('/test/openclaw', methods=['POST'])
 def test_openclaw():
-    """测试 OpenClaw 连接"""
-    if not openclaw_bridge:
+    """查看 OpenClaw 连接状态（读取后台探测的缓存结果）"""
+    services = get_services()
+    if not services.config.openclaw.enabled:
         return jsonify({
             "available": False,
             "error": "OpenClaw 桥接器未初始化"
         })
     
-    health = openclaw_bridge.health_check()
+    health = services.health_monitor.get("openclaw")
+    body = {
+        "available": bool(health.get("available")),
+        "health": health
+    }
+    if not body["available"]:
+        body["error"] = health.get("last_error") or "尚未完成探测"
+    return jsonify(body)
+
+
+def check_admin_token(services: BotServices) -> bool:
+    """校验管理接口的 Bearer 令牌（未配置 ADMIN_TOKEN 时管理接口不可用）"""
+    expected = services.config.server.admin_token
+    if not expected:
+        return False
+    provided = request.headers.get("Authorization", "")
+    return hmac.compare_digest(provided.encode("utf-8"), f"Bearer {expected}".encode("utf-8"))
+
+
+@bp.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """重新加载配置"""
+    services = get_services()
+    if not check_admin_token(services):
+        return jsonify({"code": -1, "msg": "Forbidden"}), 403
     
-    if health.get("healthy"):
-        # 尝试发送测试消息
-        test_result = openclaw_bridge.send_message(
-            user_message="Hello",
-            user_id="test_user"
-        )
-        
-        return jsonify({
-            "available": True,
-            "health": health,
-            "test_result": test_result.get("success", False)
-        })
+    result = services.reload_config()
+    if result["success"] and services.master_pid and services.master_pid != os.getpid():
+        # 多进程模式：由 master 平滑重启所有 worker，新 worker 在 fork 后加载配置
+        os.kill(services.master_pid, signal.SIGHUP)
+        result["workers_restarting"] = True
+    return jsonify(result), 200 if result["success"] else 400
+
+
+@bp.route('/admin/profile', methods=['GET'])
+def admin_profile():
+    """采样分析当前 worker 的所有线程
+    
+    查询参数：``seconds`` 采样时长（默认 5，上限 PROFILER_MAX_SECONDS，0 表示只返回线程快照）；
+    ``interval`` 采样间隔（默认 0.01）；``format=collapsed`` 输出折叠栈文本（flamegraph.pl / speedscope）。
+    """
+    services = get_services()
+    if not services.config.server.enable_profiler:
+        return jsonify({"code": -1, "msg": "Profiler disabled"}), 404
+    if not check_admin_token(services):
+        return jsonify({"code": -1, "msg": "Forbidden"}), 403
+    
+    seconds = min(
+        request.args.get("seconds", 5.0, type=float),
+        services.config.server.profiler_max_seconds
+    )
+    result = profiler.get_sampler().sample(seconds, request.args.get("interval", 0.01, type=float))
+    if result is None:
+        return jsonify({"code": -1, "msg": "Profiler busy"}), 409
+    
+    if request.args.get("format") == "collapsed":
+        return profiler.collapsed(result["stacks"]), 200, {"Content-Type": "text/plain; charset=utf-8"}
+    result["threads"] = profiler.thread_dump()
+    return jsonify(result)
+
+
+@bp.route('/debug/traces', methods=['GET'])
+def debug_traces():
+    """查看最近完成的 trace
+    
+    查询参数：``trace_id`` 查看单条；``limit`` 条数（默认 20）；
+    ``format=otlp`` 输出 OTLP JSON。
+    """
+    services = get_services()
+    if not check_admin_token(services):
+        return jsonify({"code": -1, "msg": "Forbidden"}), 403
+    
+    tracer = tracing.get_tracer()
+    trace_id = request.args.get("trace_id")
+    if trace_id:
+        found = tracer.get(trace_id)
+        if found is None:
+            return jsonify({"code": -1, "msg": "Trace not found"}), 404
+        traces = [found]
     else:
-        return jsonify({
-            "available": False,
-            "error": health.get("error", "Unknown error")
-        })
+        traces = tracer.traces()[:request.args.get("limit", 20, type=int)]
+    
+    if request.args.get("format") == "otlp":
+        return jsonify(tracing.to_otlp(traces))
+    return jsonify({
+        "sample_rate": tracer.sample_rate,
+        "traces": [trace.to_dict() for trace in traces]
+    })
+
+
+@bp.route('/debug/slow', methods=['GET'])
+def debug_slow():
+    """查看最近的慢操作记录（当前 worker）
+    
+    查询参数：``limit`` 条数（默认 20）。
+    """
+    services = get_services()
+    if not check_admin_token(services):
+        return jsonify({"code": -1, "msg": "Forbidden"}), 403
+    
+    slow_log = slowlog.get_slow_log()
+    if slow_log is None:
+        return jsonify({"code": -1, "msg": "Slow log disabled"}), 404
+    return jsonify({
+        "thresholds_ms": slow_log.thresholds,
+        "stats": dict(slow_log.stats),
+        "records": slow_log.records(request.args.get("limit", 20, type=int)),
+    })
+
+
+def install_reload_signal(app: Flask) -> bool:
+    """注册 SIGHUP 处理：收到信号后在后台线程重新加载配置
+    
+    Args:
+        app: Flask 应用
+    
+    Returns:
+        是否注册成功（非主线程或平台不支持 SIGHUP 时返回 False）
+    """
+    if not hasattr(signal, "SIGHUP") or threading.current_thread() is not threading.main_thread():
+        return False
+    
+    services: BotServices = app.extensions[EXTENSION_KEY]
+    
+    def _handle(signum: int, frame: Any) -> None:
+        threading.Thread(
+            target=services.reload_config, name="config-reload", daemon=True
+        ).start()
+    
+    signal.signal(signal.SIGHUP, _handle)
+    return True
+
+
+def prepare_prefork(app: Flask, workers: int) -> None:
+    """gunicorn master 在 fork 之前调用（见 configs/gunicorn.conf.py）"""
+    app.extensions[EXTENSION_KEY].prepare_prefork(workers)
+
+
+def init_worker(app: Flask) -> None:
+    """gunicorn worker 在 fork 之后调用：重建连接、加载最新配置并开始预热"""
+    services: BotServices = app.extensions[EXTENSION_KEY]
+    services.after_fork()
+    services.reload_config()
+    services.start_warm_up()
+
+
+def create_app(
+    config: Optional[AppConfig] = None,
+    warm_up: bool = True
+) -> Flask:
+    """创建 Flask 应用
+    
+    Args:
+        config: 应用配置，为空时从环境变量加载
+        warm_up: 是否启动后台预热线程
+    
+    Returns:
+        Flask 应用，组件容器位于 ``app.extensions["feishu_ai_bot"]``
+    """
+    if config is None:
+        config_store = get_config_store()
+        config = config_store.get()
+    else:
+        config_store = ConfigStore(config)
+    
+    setup_logging(config.server)
+    tracing.configure(
+        config.tracing.sample_rate, config.tracing.buffer_size, config.tracing.export_file
+    )
+    slowlog.install(slowlog.create_slow_log(config.slow_log))
+    scheduler.configure(config.scheduler)
+    accounting.install(accounting.create_ledger(config.usage))
+    
+    logger.info("=" * 60)
+    logger.info("🚀 飞书AI机器人服务启动中...")
+    logger.info("版本: %s", config.version)
+    logger.info("=" * 60)
+    
+    app = Flask(__name__)
+    app.json = CodecJSONProvider(app)
+    services = BotServices(config, config_store)
+    app.extensions[EXTENSION_KEY] = services
+    app.register_blueprint(bp)
+    
+    if warm_up:
+        services.start_warm_up()
+    
+    return app
+
+
+_app: Optional[Flask] = None
+_app_lock = threading.Lock()
+
+
+def __getattr__(name: str) -> Any:
+    """按需创建模块级 ``app``，兼容 ``feishu_ai_bot.server:app`` 的用法"""
+    global _app
+    if name == "app":
+        with _app_lock:
+            if _app is None:
+                _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_config(app: Flask) -> AppConfig:
+    """获取应用使用的配置"""
+    return app.extensions[EXTENSION_KEY].config
 
 
 def main():
     """主函数"""
-    logger.info(f"🚀 启动服务: {config.server.host}:{config.server.port}")
+    app = create_app()
+    config = get_config(app)
+    install_reload_signal(app)
+    logger.info("🚀 启动服务: %s:%s", config.server.host, config.server.port)
     
     app.run(
         host=config.server.host,
@@ -1,5 +1,6 @@
 """任务处理模块"""
 
 from feishu_ai_bot.tasks.processor import TaskProcessor, is_complex_task
+from feishu_ai_bot.tasks.scheduler import TaskScheduler
 
-__all__ = ["TaskProcessor", "is_complex_task"]
+__all__ = ["TaskProcessor", "TaskScheduler", "is_complex_task"]
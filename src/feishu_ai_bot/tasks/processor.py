@@ -5,22 +5,29 @@
 
 import re
 import logging
-from threading import Thread
 from typing import TYPE_CHECKING, Optional
 
 if TYPE_CHECKING:
     from feishu_ai_bot.bot.feishu import FeishuBot
     from feishu_ai_bot.ai.processor import AITaskProcessor
 
+from feishu_ai_bot import deadline
+from feishu_ai_bot.bot.streaming import CardUpdater
 from feishu_ai_bot.cards.builder import (
     create_simple_response_card,
     create_thread_header_card,
     create_progress_card
 )
+from feishu_ai_bot.deadline import Deadline
+from feishu_ai_bot.monitoring import profiler, tracing
 from feishu_ai_bot.monitoring.stats import increment_tasks_processed
+from feishu_ai_bot.tasks.scheduler import GROUP_COMPLEX, GROUP_SIMPLE, get_scheduler
 
 logger = logging.getLogger(__name__)
 
+# 状态卡片的写入间隔（秒），间隔内完成的多个阶段合并为一次写入
+STATUS_CARD_INTERVAL = 1.0
+
 
 def is_complex_task(task_description: str) -> bool:
     """判断任务是否为复杂任务
@@ -55,12 +62,15 @@ def is_complex_task(task_description: str) -> bool:
     return False
 
 
+@deadline.detached
 def process_simple_task(
     task_description: str,
     chat_id: str,
     user_name: str,
     bot: "FeishuBot",
-    ai_processor: "AITaskProcessor"
+    ai_processor: "AITaskProcessor",
+    task_deadline: Optional[Deadline] = None,
+    user_open_id: str = ""
 ) -> None:
     """处理简单任务（直接回复）
     
@@ -70,19 +80,23 @@ def process_simple_task(
         user_name: 用户名
         bot: 飞书机器人实例
         ai_processor: AI处理器实例
+        task_deadline: 任务截止时间（回复不受其限制，超时后仍会告知用户）
+        user_open_id: 用户Open ID（用量统计用）
     """
     try:
-        logger.info(f"处理简单任务: {task_description}")
+        logger.info("处理简单任务: %s", task_description)
         
-        user_info = {"name": user_name, "open_id": ""}
-        result = ai_processor.process_task(task_description, user_info)
+        user_info = {"name": user_name, "open_id": user_open_id, "chat_id": chat_id}
+        result = ai_processor.process_task(
+            task_description, user_info, task_deadline, batch=True, route="simple"
+        )
         
         if result.get("success"):
             response_text = result.get("result", "处理完成，但没有返回结果")
-            logger.info(f"AI处理成功: {task_description}")
+            logger.info("AI处理成功: %s", task_description)
         else:
             response_text = f"❌ 处理失败: {result.get('error', '未知错误')}"
-            logger.error(f"AI处理失败: {result.get('error')}")
+            logger.error("AI处理失败: %s", result.get('error'))
         
         # 发送回复卡片
         card = create_simple_response_card(task_description, response_text)
@@ -91,10 +105,11 @@ def process_simple_task(
         logger.info("简单任务处理完成")
         
     except Exception as e:
-        logger.error(f"简单任务处理失败: {str(e)}", exc_info=True)
+        logger.error("简单任务处理失败: %s", e, exc_info=True)
         bot.send_message(chat_id, f"❌ 处理失败：{str(e)}")
 
 
+@deadline.detached
 def process_complex_task(
     task_description: str,
     chat_id: str,
@@ -102,10 +117,14 @@ def process_complex_task(
     message_id: str,
     user_open_id: str,
     bot: "FeishuBot",
-    ai_processor: "AITaskProcessor"
+    ai_processor: "AITaskProcessor",
+    task_deadline: Optional[Deadline] = None
 ) -> None:
     """处理复杂任务（创建话题）
     
+    话题内只使用一张状态卡片，处理中的各个阶段和最终结果都原地更新到这张卡片上。
+    创建话题和调用大模型受任务截止时间限制，结果和错误的写入不受限制，超时后仍会告知用户。
+    
     Args:
         task_description: 任务描述
         chat_id: 群聊ID
@@ -114,20 +133,23 @@ def process_complex_task(
         user_open_id: 用户Open ID
         bot: 飞书机器人实例
         ai_processor: AI处理器实例
+        task_deadline: 任务截止时间
     """
     thread_id: Optional[str] = None
+    status_card: Optional[CardUpdater] = None
     
     try:
-        logger.info(f"处理复杂任务: {task_description}")
+        logger.info("处理复杂任务: %s", task_description)
         
         # 1. 创建话题
         header_card = create_thread_header_card(task_description, user_name)
-        thread_result = bot.reply_message(
-            message_id,
-            header_card,
-            msg_type="interactive",
-            reply_in_thread=True
-        )
+        with deadline.scope(task_deadline):
+            thread_result = bot.reply_message(
+                message_id,
+                header_card,
+                msg_type="interactive",
+                reply_in_thread=True
+            )
         
         if not thread_result or not thread_result.get("thread_id"):
             logger.error("创建话题失败")
@@ -135,34 +157,36 @@ def process_complex_task(
             return
         
         thread_id = thread_result["thread_id"]
-        logger.info(f"话题创建成功: {thread_id}")
+        logger.info("话题创建成功: %s", thread_id)
         
-        # 2. 发送处理中状态
-        progress_card = create_progress_card("processing", "正在分析任务需求...")
-        bot.send_card_message(chat_id, progress_card, root_id=thread_id)
+        # 2. 处理中状态（快速完成时与结果合并为一次写入）
+        status_card = CardUpdater(bot, chat_id, root_id=thread_id, min_interval=STATUS_CARD_INTERVAL)
+        status_card.update(create_progress_card("processing", "正在分析任务需求..."))
         
         # 3. 处理任务
-        user_info = {"name": user_name, "open_id": user_open_id}
-        result = ai_processor.process_task(task_description, user_info)
+        status_card.update(create_progress_card("processing", "正在调用 AI 处理任务..."))
+        user_info = {"name": user_name, "open_id": user_open_id, "chat_id": chat_id}
+        result = ai_processor.process_task(task_description, user_info, task_deadline, route="complex")
         
         if result.get("success"):
             result_content = result.get("result", "处理完成，但没有返回结果")
             increment_tasks_processed()
-            logger.info(f"AI处理成功: {task_description}")
+            logger.info("AI处理成功: %s", task_description)
         else:
             result_content = f"❌ 处理失败: {result.get('error', '未知错误')}"
-            logger.error(f"AI处理失败: {result.get('error')}")
+            logger.error("AI处理失败: %s", result.get('error'))
         
-        # 4. 发送结果
-        result_card = create_progress_card("completed", result_content)
-        bot.send_card_message(chat_id, result_card, root_id=thread_id)
+        # 4. 更新为结果
+        status_card.finish(create_progress_card("completed", result_content))
         
         logger.info("复杂任务处理完成")
         
     except Exception as e:
-        logger.error(f"复杂任务处理失败: {str(e)}", exc_info=True)
+        logger.error("复杂任务处理失败: %s", e, exc_info=True)
         error_card = create_progress_card("error", f"错误信息：\n```\n{str(e)}\n```")
-        if thread_id:
+        if status_card is not None:
+            status_card.finish(error_card)
+        elif thread_id:
             bot.send_card_message(chat_id, error_card, root_id=thread_id)
         else:
             bot.send_message(chat_id, f"❌ 处理失败：{str(e)}")
@@ -180,6 +204,9 @@ def handle_task_async(
 ) -> None:
     """异步处理任务
     
+    任务交给任务调度器按类别（群聊简单/复杂）排队执行，当前的截止时间（事件接入时创建）随任务传递，
+    排队时间也计入截止时间。
+    
     Args:
         task_type: 任务类型（simple/complex）
         task_description: 任务描述
@@ -190,22 +217,32 @@ def handle_task_async(
         bot: 飞书机器人实例
         ai_processor: AI处理器实例
     """
+    # 线程快照（/admin/profile）中显示的任务上下文
+    context = {
+        "task_type": task_type,
+        "chat_id": chat_id,
+        "message_id": message_id,
+        "task": task_description[:50],
+    }
+    task_deadline = deadline.current()
+    scheduler = get_scheduler()
     if task_type == "complex":
-        thread = Thread(
-            target=process_complex_task,
-            args=(
+        scheduler.submit(
+            GROUP_COMPLEX,
+            profiler.bind_context(tracing.bind(process_complex_task, "task.complex"), **context),
+            (
                 task_description, chat_id, user_name,
-                message_id, user_open_id, bot, ai_processor
-            )
+                message_id, user_open_id, bot, ai_processor, task_deadline
+            ),
+            name="task-complex"
         )
     else:
-        thread = Thread(
-            target=process_simple_task,
-            args=(task_description, chat_id, user_name, bot, ai_processor)
+        scheduler.submit(
+            GROUP_SIMPLE,
+            profiler.bind_context(tracing.bind(process_simple_task, "task.simple"), **context),
+            (task_description, chat_id, user_name, bot, ai_processor, task_deadline, user_open_id),
+            name="task-simple"
         )
-    
-    thread.daemon = True
-    thread.start()
 
 
 class TaskProcessor:
@@ -0,0 +1,275 @@
+"""任务调度模块
+
+后台任务按类别排队，由固定数量的工作线程执行：
+
+- ``p2p``：私聊（OpenClaw 转发），用户在等待回复
+- ``group-simple``：群聊简单任务，直接回复
+- ``group-complex``：群聊复杂任务，创建话题后慢慢处理
+
+调度规则：
+
+- 加权公平排队：每个类别有一个虚拟时间，每执行一个任务前进 1/权重，
+  总是先执行虚拟时间最小的类别；类别从空闲变为有任务时虚拟时间追上全局进度，空闲期间不积累额度
+- 并发预留：每个类别预留若干工作线程，其他类别不能占用，复杂任务再多也不会挤占私聊的名额
+- 老化：排队超过 ``aging_seconds`` 的任务不再按权重排序，按排队时间先后优先执行，低权重类别不会饿死
+
+各类别的排队时间记录为 ``scheduler.queue_wait.<类别>`` 延迟（``/stats``、``/metrics``）。
+未启用时与此前一样每个任务一个线程。多进程部署时每个 worker 独立调度。
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from feishu_ai_bot.config import SchedulerConfig
+from feishu_ai_bot.monitoring.stats import get_latency_stats, record_latency
+
+logger = logging.getLogger(__name__)
+
+P2P = "p2p"
+GROUP_SIMPLE = "group-simple"
+GROUP_COMPLEX = "group-complex"
+TASK_CLASSES = (P2P, GROUP_SIMPLE, GROUP_COMPLEX)
+
+DEFAULT_WEIGHTS = {P2P: 8.0, GROUP_SIMPLE: 4.0, GROUP_COMPLEX: 1.0}
+DEFAULT_RESERVED = {P2P: 2, GROUP_SIMPLE: 2, GROUP_COMPLEX: 0}
+
+QueuedTask = Tuple[float, Callable[..., Any], Tuple[Any, ...]]
+
+
+class _TaskClass:
+    """一个任务类别的队列与计数（由调度器的锁保护）"""
+    
+    def __init__(self, name: str, weight: float, reserved: int):
+        self.name = name
+        self.weight = weight
+        self.reserved = reserved
+        self.queue: Deque[QueuedTask] = deque()
+        self.running = 0
+        self.vtime = 0.0
+        self.stats = {"submitted": 0, "completed": 0, "aged": 0}
+
+
+class TaskScheduler:
+    """按类别加权公平排队的任务调度器
+    
+    Attributes:
+        enabled: 是否启用（未启用时每个任务一个线程）
+        workers: 工作线程数（同时执行的任务数上限）
+        aging_seconds: 排队超过该时间的任务优先执行
+    """
+    
+    def __init__(
+        self,
+        workers: int = 16,
+        weights: Optional[Dict[str, float]] = None,
+        reserved: Optional[Dict[str, int]] = None,
+        aging_seconds: float = 15.0,
+        enabled: bool = True
+    ):
+        """初始化调度器
+        
+        Args:
+            workers: 工作线程数
+            weights: 各类别的权重，默认 ``DEFAULT_WEIGHTS``
+            reserved: 各类别预留的工作线程数（合计不超过 workers），默认 ``DEFAULT_RESERVED``
+            aging_seconds: 老化时间（秒）
+            enabled: 是否启用
+        """
+        self._classes = {name: _TaskClass(name, 1.0, 0) for name in TASK_CLASSES}
+        self._cond = threading.Condition()
+        self._vtime = 0.0
+        self._running = 0
+        self._threads = 0
+        self._idle = 0
+        # 已唤醒但尚未重新取得锁的空闲线程数，突发提交时据此判断是否需要新建线程
+        self._wakeups = 0
+        self.configure(workers, weights, reserved, aging_seconds, enabled)
+    
+    def configure(
+        self,
+        workers: int,
+        weights: Optional[Dict[str, float]] = None,
+        reserved: Optional[Dict[str, int]] = None,
+        aging_seconds: float = 15.0,
+        enabled: bool = True
+    ) -> None:
+        """更新配置（热加载），已排队和执行中的任务不受影响，多余的工作线程空闲时退出"""
+        weights = DEFAULT_WEIGHTS if weights is None else weights
+        reserved = DEFAULT_RESERVED if reserved is None else reserved
+        with self._cond:
+            self.workers = max(1, workers)
+            self.aging_seconds = aging_seconds
+            self.enabled = enabled
+            for name, task_class in self._classes.items():
+                task_class.weight = weights.get(name, 1.0)
+                task_class.reserved = reserved.get(name, 0)
+            self._cond.notify_all()
+    
+    def submit(
+        self,
+        task_class: str,
+        func: Callable[..., Any],
+        args: Tuple[Any, ...] = (),
+        name: str = "task"
+    ) -> None:
+        """提交任务
+        
+        Args:
+            task_class: 任务类别（``TASK_CLASSES`` 之一）
+            func: 任务函数
+            args: 位置参数
+            name: 未启用调度时的线程名
+        """
+        if task_class not in self._classes:
+            raise ValueError(f"未知的任务类别: {task_class}")
+        
+        if not self.enabled:
+            threading.Thread(target=func, args=args, name=name, daemon=True).start()
+            return
+        
+        with self._cond:
+            queued = self._classes[task_class]
+            if not queued.queue:
+                queued.vtime = max(queued.vtime, self._vtime)
+            queued.queue.append((time.monotonic(), func, args))
+            queued.stats["submitted"] += 1
+            if self._idle > self._wakeups:
+                self._wakeups += 1
+                self._cond.notify()
+            elif self._threads < self.workers:
+                self._threads += 1
+                threading.Thread(
+                    target=self._work, name=f"task-worker-{self._threads}", daemon=True
+                ).start()
+    
+    def _may_start(self, task_class: _TaskClass) -> bool:
+        """该类别现在能否再执行一个任务（调用方需持有锁）"""
+        free = self.workers - self._running
+        if free <= 0:
+            return False
+        if task_class.running < task_class.reserved:
+            return True
+        held = sum(
+            max(0, other.reserved - other.running)
+            for other in self._classes.values() if other is not task_class
+        )
+        return free > held
+    
+    def _next(self) -> Optional[Tuple[_TaskClass, QueuedTask]]:
+        """选出下一个任务并计入执行中（调用方需持有锁）"""
+        ready = [
+            task_class for task_class in self._classes.values()
+            if task_class.queue and self._may_start(task_class)
+        ]
+        if not ready:
+            return None
+        
+        now = time.monotonic()
+        aged = [
+            task_class for task_class in ready
+            if now - task_class.queue[0][0] >= self.aging_seconds
+        ]
+        if aged:
+            chosen = min(aged, key=lambda task_class: task_class.queue[0][0])
+            chosen.stats["aged"] += 1
+        else:
+            chosen = min(ready, key=lambda task_class: task_class.vtime)
+        
+        self._vtime = max(self._vtime, chosen.vtime)
+        chosen.vtime += 1.0 / chosen.weight
+        chosen.running += 1
+        self._running += 1
+        return chosen, chosen.queue.popleft()
+    
+    def _work(self) -> None:
+        """工作线程主循环"""
+        while True:
+            with self._cond:
+                while True:
+                    if self._threads > self.workers:
+                        self._threads -= 1
+                        return
+                    picked = self._next()
+                    if picked is not None:
+                        break
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                    self._wakeups = max(0, self._wakeups - 1)
+            
+            task_class, (enqueued, func, args) = picked
+            record_latency(f"scheduler.queue_wait.{task_class.name}", (time.monotonic() - enqueued) * 1000)
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error("后台任务异常（%s）: %s", task_class.name, e, exc_info=True)
+            finally:
+                with self._cond:
+                    task_class.running -= 1
+                    task_class.stats["completed"] += 1
+                    self._running -= 1
+                    self._cond.notify_all()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """当前状态（含各类别的排队时间分位数）"""
+        latency = get_latency_stats()
+        now = time.monotonic()
+        with self._cond:
+            classes = {}
+            for name, task_class in self._classes.items():
+                oldest = task_class.queue[0][0] if task_class.queue else None
+                classes[name] = {
+                    "weight": task_class.weight,
+                    "reserved": task_class.reserved,
+                    "queued": len(task_class.queue),
+                    "running": task_class.running,
+                    "oldest_wait_ms": round((now - oldest) * 1000, 1) if oldest is not None else 0,
+                    "queue_wait_ms": latency.get(f"scheduler.queue_wait.{name}"),
+                    **task_class.stats,
+                }
+            return {
+                "enabled": self.enabled,
+                "workers": self.workers,
+                "threads": self._threads,
+                "running": self._running,
+                "aging_seconds": self.aging_seconds,
+                "classes": classes,
+            }
+
+
+_scheduler = TaskScheduler()
+
+
+def get_scheduler() -> TaskScheduler:
+    """获取进程内的任务调度器"""
+    return _scheduler
+
+
+def configure(config: SchedulerConfig) -> TaskScheduler:
+    """按配置更新进程内的任务调度器
+    
+    Args:
+        config: 任务调度配置
+    
+    Returns:
+        任务调度器
+    """
+    _scheduler.configure(
+        workers=config.workers,
+        weights={
+            P2P: config.p2p_weight,
+            GROUP_SIMPLE: config.simple_weight,
+            GROUP_COMPLEX: config.complex_weight,
+        },
+        reserved={
+            P2P: config.p2p_reserved,
+            GROUP_SIMPLE: config.simple_reserved,
+            GROUP_COMPLEX: config.complex_reserved,
+        },
+        aging_seconds=config.aging_seconds,
+        enabled=config.enabled
+    )
+    return _scheduler
@@ -0,0 +1,169 @@
+"""大模型用量统计测试"""
+
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+from feishu_ai_bot.ai import accounting
+from feishu_ai_bot.ai.accounting import Attribution, UsageLedger, parse_prices
+from feishu_ai_bot.ai.processor import AITaskProcessor
+from feishu_ai_bot.config import AIConfig
+
+USAGE = {"prompt_tokens": 1000, "completion_tokens": 200, "prompt_cache_hit_tokens": 600}
+
+
+@pytest.fixture
+def ledger():
+    """安装一个只在内存中累计的账本，测试结束后卸载"""
+    installed = accounting.install(UsageLedger(
+        prices=parse_prices({"chat": "1/2/0.1"}),
+        chat_daily_tokens=1000,
+        budget_model="mini"
+    ))
+    yield installed
+    accounting.install(None)
+
+
+@pytest.mark.unit
+class TestUsageLedger:
+    """测试 UsageLedger"""
+    
+    def test_record_and_cost(self, ledger):
+        """测试按模型、群聊、用户和类别累计，缓存命中按缓存价格计费"""
+        with accounting.attribute("oc_1", "ou_1", "code"):
+            ledger.record("deepseek", "chat", USAGE)
+        
+        snapshot = ledger.snapshot()
+        model = snapshot["models"]["deepseek/chat"]
+        assert model["requests"] == 1 and model["cached_tokens"] == 600
+        assert model["cost"] == pytest.approx((400 * 1 + 600 * 0.1 + 200 * 2) / 1_000_000)
+        assert snapshot["top_chats"]["oc_1"]["prompt_tokens"] == 1000
+        assert snapshot["top_users"]["ou_1"]["completion_tokens"] == 200
+        assert snapshot["categories"]["code"]["requests"] == 1
+        assert snapshot["total"]["prompt_tokens"] == 1000
+    
+    def test_shared_split(self, ledger):
+        """测试合并请求的用量由各归属平分"""
+        with accounting.shared((Attribution("oc_1", "", "general"), Attribution("oc_2", "", "general"))):
+            ledger.record("deepseek", "chat", {"prompt_tokens": 101, "completion_tokens": 10})
+        
+        chats = ledger.snapshot()["top_chats"]
+        assert chats["oc_1"]["prompt_tokens"] == 51 and chats["oc_2"]["prompt_tokens"] == 50
+        assert ledger.snapshot()["categories"]["general"]["requests"] == 2
+        assert ledger.snapshot()["models"]["deepseek/chat"]["requests"] == 1
+    
+    def test_keys_capped_without_file(self):
+        """测试未配置文件时群聊、用户维度不会无限增长，总量不变"""
+        ledger = UsageLedger(max_keys=2)
+        for index in range(10):
+            with accounting.attribute(f"oc_{index}", f"ou_{index}", "general"):
+                ledger.record("deepseek", "chat", {"prompt_tokens": 100 + index, "completion_tokens": 0})
+        
+        assert all(len(ledger._pending[dimension]) <= 5 for dimension in ("chats", "users"))
+        snapshot = ledger.snapshot(top=10)
+        assert "oc_9" in snapshot["top_chats"]
+        assert sum(row["prompt_tokens"] for row in snapshot["top_chats"].values()) == 1045
+        assert snapshot["total"]["requests"] == 10
+    
+    def test_daily_keeps_only_today(self, ledger):
+        """测试跨天后内存中只保留当天的每日用量"""
+        with accounting.attribute("oc_1", "", "general"):
+            with patch.object(UsageLedger, "_today", return_value="2026-01-01"):
+                ledger.record("deepseek", "chat", USAGE)
+            with patch.object(UsageLedger, "_today", return_value="2026-01-02"):
+                ledger.record("deepseek", "chat", USAGE)
+        
+        assert list(ledger._pending["daily"]) == ["2026-01-02"]
+    
+    def test_invalid_prices(self):
+        """测试价格格式错误"""
+        with pytest.raises(ValueError):
+            parse_prices({"chat": "1"})
+        with pytest.raises(ValueError):
+            parse_prices({"chat": "a/b"})
+
+
+@pytest.mark.unit
+class TestUsageFile:
+    """测试合计文件"""
+    
+    def test_workers_merge(self, tmp_path):
+        """测试多个账本写入同一个文件时合计相加，重新加载后保留"""
+        path = str(tmp_path / "usage.json")
+        first, second = UsageLedger(path=path), UsageLedger(path=path)
+        with accounting.attribute("oc_1", "", "search"):
+            first.record("deepseek", "chat", USAGE)
+            second.record("deepseek", "chat", USAGE)
+        
+        assert first.flush() and second.flush()
+        assert second.snapshot()["top_chats"]["oc_1"]["prompt_tokens"] == 2000
+        
+        stored = json.loads((tmp_path / "usage.json").read_text(encoding="utf-8"))
+        assert stored["models"]["deepseek/chat"][0] == 2
+        
+        restarted = UsageLedger(path=path)
+        restarted.load()
+        assert restarted.chat_tokens_today("oc_1") == 2400
+    
+    def test_file_keys_capped(self, tmp_path):
+        """测试合计文件中群聊、用户维度只保留用量最多的键，其余合并到 _other"""
+        path = tmp_path / "usage.json"
+        ledger = UsageLedger(path=str(path), max_keys=2)
+        for index in range(4):
+            with accounting.attribute(f"oc_{index}", f"ou_{index}", "general"):
+                ledger.record("deepseek", "chat", {"prompt_tokens": 100 * (index + 1), "completion_tokens": 0})
+            assert ledger.flush()
+        
+        stored = json.loads(path.read_text(encoding="utf-8"))
+        assert sorted(stored["chats"]) == ["_other", "oc_2", "oc_3"]
+        assert stored["users"]["_other"][1] == 300
+        assert stored["models"]["deepseek/chat"][0] == 4
+    
+    def test_flush_without_file_lock(self, tmp_path):
+        """测试没有 fcntl 的平台上不加锁写入"""
+        path = tmp_path / "usage.json"
+        ledger = UsageLedger(path=str(path))
+        ledger.record("deepseek", "chat", USAGE)
+        
+        with patch.object(accounting, "fcntl", None):
+            assert ledger.flush()
+        assert json.loads(path.read_text(encoding="utf-8"))["models"]["deepseek/chat"][0] == 1
+    
+    def test_failed_flush_keeps_counts(self, tmp_path):
+        """测试写入失败时计数保留到下次写入"""
+        target = tmp_path / "file"
+        target.write_text("", encoding="utf-8")
+        ledger = UsageLedger(path=str(target / "usage.json"))
+        ledger.record("deepseek", "chat", USAGE)
+        
+        assert not ledger.flush()
+        assert ledger.stats["flush_errors"] == 1
+        assert ledger.snapshot()["total"]["requests"] == 1
+
+
+@pytest.mark.unit
+class TestBudget:
+    """测试每群每日 token 预算"""
+    
+    def test_processor_downgrades_over_budget(self, ledger):
+        """测试群聊超出预算后改用降级模型，其他群聊不受影响"""
+        processor = AITaskProcessor("/tmp", AIConfig(
+            provider="test-accounting", api_key="k", api_base="http://llm.local/v1", model_name="chat"
+        ))
+        response = Mock(status_code=200, content=json.dumps({
+            "choices": [{"message": {"content": "好"}}],
+            "usage": USAGE,
+        }).encode())
+        
+        with patch.object(processor.session, "post", return_value=response) as post:
+            processor.process_task("你好", {"name": "u", "open_id": "ou_1", "chat_id": "oc_1"})
+            processor.process_task("你好", {"name": "u", "open_id": "ou_1", "chat_id": "oc_1"})
+            processor.process_task("你好", {"name": "u", "open_id": "ou_2", "chat_id": "oc_2"})
+        
+        models = [json.loads(call.kwargs["data"])["model"] for call in post.call_args_list]
+        assert models == ["chat", "mini", "chat"]
+        snapshot = ledger.snapshot()
+        assert snapshot["downgraded"] == 1
+        assert snapshot["models"]["test-accounting/mini"]["requests"] == 1
+        assert snapshot["budget"]["over_budget_chats"] == ["oc_1", "oc_2"]
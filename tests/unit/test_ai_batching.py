@@ -0,0 +1,193 @@
+"""大模型微批处理测试"""
+
+import json
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from feishu_ai_bot import deadline
+from feishu_ai_bot.ai import batching
+from feishu_ai_bot.ai.batching import (
+    MicroBatcher, UpstreamUnavailable, build_batch_prompt, parse_batch_reply
+)
+from feishu_ai_bot.ai.processor import AITaskProcessor
+from feishu_ai_bot.config import AIConfig
+from feishu_ai_bot.deadline import Deadline, DeadlineExceeded
+
+
+def _submit_concurrently(batcher: MicroBatcher, prompts, system_prompt="sys"):
+    """并发提交，返回按提交顺序排列的结果"""
+    results = [None] * len(prompts)
+    
+    def run(index, prompt):
+        try:
+            results[index] = batcher.submit(prompt, system_prompt)
+        except Exception as e:
+            results[index] = e
+    
+    threads = [threading.Thread(target=run, args=item) for item in enumerate(prompts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def _batch_complete(prompt, system_prompt, max_tokens):
+    """把合并提示词中的每个问题原样回答为 ``答:问题``"""
+    if prompt.startswith("下面的 JSON 数组"):
+        questions = json.loads(prompt[prompt.index("["):])
+        return json.dumps([f"答:{q}" for q in questions], ensure_ascii=False)
+    return f"单独:{prompt}"
+
+
+@pytest.mark.unit
+class TestBatchReply:
+    """测试合并提示词与回答拆分"""
+    
+    def test_round_trip(self):
+        """测试提示词包含全部问题，回答按顺序拆分"""
+        prompt = build_batch_prompt(["甲", "乙"])
+        assert '"甲"' in prompt and "2 个" in prompt
+        
+        assert parse_batch_reply('```json\n["a", "b"]\n```', 2) == ["a", "b"]
+        assert parse_batch_reply('["a"]', 2) is None
+        assert parse_batch_reply("不是 JSON", 2) is None
+        assert parse_batch_reply('["a", ""]', 2) is None
+
+
+@pytest.mark.unit
+class TestMicroBatcher:
+    """测试 MicroBatcher"""
+    
+    def test_batches_concurrent_calls(self):
+        """测试窗口内的调用合并为一次请求并按顺序分发"""
+        complete = Mock(side_effect=_batch_complete)
+        batcher = MicroBatcher(complete, window=5, max_size=3)
+        
+        results = _submit_concurrently(batcher, ["q1", "q2", "q3"])
+        
+        assert sorted(results) == ["答:q1", "答:q2", "答:q3"]
+        assert complete.call_count == 1
+        assert complete.call_args.args[2] == 6000
+        snapshot = batcher.snapshot()
+        assert snapshot["batches"] == 1 and snapshot["items"] == 3
+        assert snapshot["sizes"] == {"3": 1}
+    
+    def test_single_call_not_wrapped(self):
+        """测试窗口内只有一个调用时直接请求"""
+        complete = Mock(side_effect=_batch_complete)
+        batcher = MicroBatcher(complete, window=0.001)
+        
+        assert batcher.submit("q", "sys") == "单独:q"
+        assert batcher.snapshot()["batches"] == 0
+    
+    def test_unparsable_reply_falls_back(self):
+        """测试回答无法拆分时各调用单独请求"""
+        complete = Mock(side_effect=lambda prompt, system_prompt, max_tokens: (
+            "无法拆分" if prompt.startswith("下面的") else f"单独:{prompt}"
+        ))
+        batcher = MicroBatcher(complete, window=5, max_size=2)
+        
+        assert sorted(_submit_concurrently(batcher, ["a", "b"])) == ["单独:a", "单独:b"]
+        assert complete.call_count == 3
+        assert batcher.snapshot()["fallbacks"] == 1
+    
+    def test_error_reaches_every_waiter(self):
+        """测试合并请求失败时同一批的调用都收到异常"""
+        batcher = MicroBatcher(Mock(side_effect=Exception("AI服务响应超时")), window=5, max_size=2)
+        
+        results = _submit_concurrently(batcher, ["a", "b"])
+        assert all(isinstance(result, Exception) for result in results)
+
+    def test_deadline_exceeded_falls_back_for_others(self):
+        """测试合并请求按最紧的截止时间发出，超时后截止时间未到的调用改为单独请求"""
+        budgets = []
+        
+        def complete(prompt, system_prompt, max_tokens):
+            if not prompt.startswith("下面的 JSON 数组"):
+                return f"单独:{prompt}"
+            current = deadline.current()
+            budgets.append(current.budget)
+            time.sleep(current.remaining())
+            raise DeadlineExceeded("llm")
+        
+        batcher = MicroBatcher(complete, window=5, max_size=2)
+        results = {}
+        
+        def run(prompt, budget):
+            try:
+                with Deadline(budget).scope():
+                    results[prompt] = batcher.submit(prompt, "sys")
+            except Exception as e:
+                results[prompt] = e
+        
+        threads = [threading.Thread(target=run, args=args) for args in (("loose", 5.0), ("tight", 0.05))]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join(5)
+        
+        assert budgets == [0.05]
+        assert isinstance(results["tight"], DeadlineExceeded)
+        assert results["loose"] == "单独:loose"
+
+    def test_upstream_timeout_falls_back(self):
+        """测试合并请求超时或无法连接时各调用方改为单独请求"""
+        def complete(prompt, system_prompt, max_tokens):
+            if prompt.startswith("下面的 JSON 数组"):
+                raise UpstreamUnavailable("AI服务响应超时")
+            return f"单独:{prompt}"
+        
+        batcher = MicroBatcher(complete, window=5, max_size=2)
+        assert sorted(_submit_concurrently(batcher, ["a", "b"])) == ["单独:a", "单独:b"]
+
+
+@pytest.mark.unit
+class TestProcessorBatching:
+    """测试 AI 处理器接入微批处理"""
+    
+    def test_only_batchable_tasks(self):
+        """测试只有允许合并的任务经过微批处理"""
+        config = AIConfig(
+            provider="test-batching", api_key="k", api_base="http://llm.local/v1",
+            batch_enabled=True, batch_window_ms=1
+        )
+        processor = AITaskProcessor("/tmp", config)
+        processor.batcher.submit = Mock(return_value="合并")
+        processor._complete = Mock(return_value="直接")
+        
+        assert processor._call_ai_api("hello") == "直接"
+        with batching.batchable():
+            assert processor._call_ai_api("hello") == "合并"
+        
+        result = processor.process_task("你好", {"name": "u"}, batch=True)
+        assert "合并" in result["result"]
+
+    def test_single_fallback_keeps_prompt_label(self):
+        """测试改为单独请求时保留调用方的提示词标识"""
+        config = AIConfig(
+            provider="test-batching", api_key="k", api_base="http://llm.local/v1",
+            batch_enabled=True, batch_window_ms=1
+        )
+        processor = AITaskProcessor("/tmp", config)
+        processor._complete = Mock(return_value="直接")
+        
+        with batching.batchable():
+            assert processor._call_ai_api("hello", "sys", "search") == "直接"
+        processor._complete.assert_called_once_with("hello", "sys", prompt_label="search")
+    
+    def test_timeout_raises_upstream_unavailable(self):
+        """测试重试后仍然超时时抛出可改为单独请求的异常"""
+        config = AIConfig(
+            provider="test-batching", api_key="k", api_base="http://llm.local/v1", max_retries=1
+        )
+        processor = AITaskProcessor("/tmp", config)
+        processor.session.post = Mock(side_effect=requests.exceptions.Timeout())
+        
+        with pytest.raises(UpstreamUnavailable):
+            processor._complete("hello")
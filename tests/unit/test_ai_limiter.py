@@ -0,0 +1,154 @@
+"""大模型自适应并发限制测试"""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from feishu_ai_bot.ai.limiter import AdaptiveLimiter, LimiterTimeout, parse_retry_after
+from feishu_ai_bot.ai.processor import AITaskProcessor
+from feishu_ai_bot.config import AIConfig
+
+
+def _response(status: int, headers=None, content: bytes = b""):
+    """构造模拟响应"""
+    response = MagicMock()
+    response.status_code = status
+    response.headers = headers or {}
+    response.content = content
+    if status >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(str(status))
+    return response
+
+
+@pytest.mark.unit
+class TestAdaptiveLimiter:
+    """测试 AdaptiveLimiter"""
+    
+    def test_increases_under_load(self):
+        """测试满载且延迟正常时上限增长，空闲时不增长"""
+        limiter = AdaptiveLimiter("t", initial_limit=4, max_limit=10)
+        limiter.acquire()
+        limiter.release(latency=1.0)
+        for _ in range(20):
+            limiter.acquire()
+            limiter.release(latency=1.0)
+        assert limiter.limit == 4
+        
+        for _ in range(20):
+            limiter.acquire()
+            limiter.acquire()
+            limiter.release(latency=1.0)
+            limiter.release(latency=1.0)
+        assert limiter.limit > 4
+    
+    def test_decreases_on_slow_and_dropped(self):
+        """测试延迟超过基线或超时时乘性减小，不低于下界"""
+        limiter = AdaptiveLimiter("t", initial_limit=10, min_limit=2)
+        limiter.acquire()
+        limiter.release(latency=1.0)
+        
+        limiter.acquire()
+        limiter.release(latency=5.0)
+        assert limiter.limit == pytest.approx(9.0)
+        
+        for _ in range(50):
+            limiter.acquire()
+            limiter.release(dropped=True)
+        assert limiter.limit == 2
+    
+    def test_queue_timeout(self):
+        """测试达到上限后排队，超时返回失败"""
+        limiter = AdaptiveLimiter("t", initial_limit=1)
+        assert limiter.acquire(timeout=0.01)
+        assert not limiter.acquire(timeout=0.01)
+        with pytest.raises(LimiterTimeout):
+            with limiter.slot(timeout=0.01):
+                pass
+        assert limiter.stats["timeouts"] == 2
+    
+    def test_release_wakes_waiter(self):
+        """测试归还名额后唤醒排队的调用方"""
+        limiter = AdaptiveLimiter("t", initial_limit=1)
+        limiter.acquire()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(limiter.acquire(timeout=5)))
+        waiter.start()
+        while limiter.queued == 0:
+            pass
+        
+        limiter.release()
+        waiter.join(5)
+        assert results == [True]
+    
+    def test_throttle_pauses(self):
+        """测试 429 减半上限并在 Retry-After 期间暂停放行"""
+        limiter = AdaptiveLimiter("t", initial_limit=8)
+        limiter.throttle(retry_after=30)
+        
+        assert limiter.limit == 4
+        assert not limiter.acquire(timeout=0.01)
+        assert limiter.snapshot()["paused_for_s"] > 29
+    
+    def test_slot_drop_on(self):
+        """测试 drop_on 指定的异常视为过载，其他异常不参与调整"""
+        limiter = AdaptiveLimiter("t", initial_limit=10)
+        with pytest.raises(KeyError):
+            with limiter.slot(drop_on=(TimeoutError,)):
+                raise KeyError("x")
+        assert limiter.limit == 10
+        
+        with pytest.raises(TimeoutError):
+            with limiter.slot(drop_on=(TimeoutError,)):
+                raise TimeoutError()
+        assert limiter.limit == 9
+        assert limiter.inflight == 0
+    
+    def test_parse_retry_after(self):
+        """测试解析秒数和 HTTP 日期格式"""
+        assert parse_retry_after("3") == 3.0
+        assert parse_retry_after("3600") == 60.0
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:10 GMT", now=1445412480.0) == 10.0
+        assert parse_retry_after("soon") is None
+        assert parse_retry_after(None) is None
+
+
+@pytest.mark.unit
+class TestProcessorLimiter:
+    """测试 AI 处理器接入限制器"""
+    
+    @pytest.fixture
+    def processor(self, request):
+        """使用独立提供商名称的处理器"""
+        config = AIConfig(
+            provider=f"test-{request.node.name}", api_key="k", api_base="http://llm.local/v1"
+        )
+        return AITaskProcessor("/tmp", config)
+    
+    def test_retry_after_replaces_backoff(self, processor):
+        """测试 429 带 Retry-After 时由限制器暂停，不再额外退避"""
+        ok = _response(200, content=b'{"choices": [{"message": {"content": "hi"}}]}')
+        processor.session.post = MagicMock(side_effect=[
+            _response(429, headers={"Retry-After": "0"}), ok
+        ])
+        
+        with patch("feishu_ai_bot.deadline.time.sleep") as sleep:
+            assert processor._call_ai_api("hello") == "hi"
+        
+        sleep.assert_not_called()
+        snapshot = processor.limiter.snapshot()
+        assert snapshot["throttled"] == 1
+        assert snapshot["limit"] == 4
+        assert snapshot["inflight"] == 0
+    
+    def test_queue_timeout_fails_fast(self, processor):
+        """测试并发已满且排队超时时返回服务繁忙"""
+        processor.config.queue_timeout = 0.01
+        processor.limiter.configure(1, 1)
+        processor.limiter.acquire()
+        processor.session.post = MagicMock()
+        
+        with pytest.raises(Exception, match="繁忙"):
+            processor._call_ai_api("hello")
+        processor.session.post.assert_not_called()
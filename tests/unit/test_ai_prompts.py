@@ -0,0 +1,96 @@
+"""提示词模板测试"""
+
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+from feishu_ai_bot.ai import prompts
+from feishu_ai_bot.ai.processor import AITaskProcessor
+from feishu_ai_bot.ai.prompts import PromptTemplate, build_registry, cached_prompt_tokens
+from feishu_ai_bot.config import AIConfig, parse_name_map
+
+
+@pytest.mark.unit
+class TestPromptTemplate:
+    """测试模板编译与渲染"""
+    
+    def test_render(self):
+        """测试字段按位置填入，固定内容在前"""
+        rendered = build_registry().render("search", "天气", "小明")
+        
+        assert rendered.label == "search@v1"
+        assert rendered.user.startswith("请根据下面的搜索需求")
+        assert rendered.user.endswith("用户：小明\n搜索需求：天气")
+        assert "智能搜索助手" in rendered.system
+    
+    def test_unknown_name_uses_general(self):
+        """测试未知类别使用通用模板"""
+        assert build_registry().render("other", "x", "u").name == "general"
+    
+    def test_invalid_field(self):
+        """测试使用未知字段或格式错误的模板"""
+        with pytest.raises(ValueError):
+            PromptTemplate("search", "v2", "s", "{chat_id}")
+        with pytest.raises(ValueError):
+            PromptTemplate("search", "v2", "s", "{task")
+
+
+@pytest.mark.unit
+class TestPromptRegistry:
+    """测试模板文件与版本选择"""
+    
+    def test_file_versions(self, tmp_path):
+        """测试模板文件新增版本并按配置选用"""
+        path = tmp_path / "prompts.json"
+        path.write_text(json.dumps({
+            "search": {"v2": {"system": "新系统", "user": "说明\n{user_name}: {task}"}},
+        }), encoding="utf-8")
+        
+        registry = build_registry(str(path), parse_name_map("search=v2"))
+        rendered = registry.render("search", "天气", "u")
+        assert rendered.label == "search@v2"
+        assert rendered.user == "说明\nu: 天气"
+        assert registry.active_versions()["general"] == "v1"
+    
+    def test_invalid_config(self, tmp_path):
+        """测试不存在的版本、文件或缺少字段"""
+        with pytest.raises(ValueError):
+            build_registry(versions={"search": "v9"})
+        with pytest.raises(ValueError):
+            build_registry(str(tmp_path / "missing.json"))
+        
+        path = tmp_path / "prompts.json"
+        path.write_text(json.dumps({"search": {"v2": {"system": "s"}}}), encoding="utf-8")
+        with pytest.raises(ValueError):
+            build_registry(str(path))
+
+
+@pytest.mark.unit
+class TestPromptCache:
+    """测试前缀缓存命中统计"""
+    
+    def test_cached_tokens_formats(self):
+        """测试 DeepSeek 与 OpenAI 两种字段"""
+        assert cached_prompt_tokens({"prompt_cache_hit_tokens": 64}) == 64
+        assert cached_prompt_tokens({"prompt_tokens_details": {"cached_tokens": 32}}) == 32
+        assert cached_prompt_tokens({"prompt_tokens": 10}) == 0
+    
+    def test_processor_records_usage(self):
+        """测试处理器按模板累计响应中的缓存命中"""
+        processor = AITaskProcessor("/tmp", AIConfig(
+            provider="test-prompts", api_key="k", api_base="http://llm.local/v1"
+        ))
+        response = Mock(status_code=200, content=json.dumps({
+            "choices": [{"message": {"content": "好"}}],
+            "usage": {"prompt_tokens": 100, "prompt_cache_hit_tokens": 80},
+        }).encode())
+        
+        with patch.object(processor.session, "post", return_value=response):
+            before = prompts.cache_stats().get("code@v1", {"requests": 0, "cached_tokens": 0})
+            result = processor.process_task("帮我写一段代码", {"name": "u"})
+        
+        assert result["task_type"] == "code"
+        stats = prompts.cache_stats()["code@v1"]
+        assert stats["requests"] == before["requests"] + 1
+        assert stats["cached_tokens"] == before["cached_tokens"] + 80
@@ -0,0 +1,83 @@
+"""批量发送与出站限速测试"""
+
+import json
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from feishu_ai_bot.bot.feishu import FeishuBot
+from feishu_ai_bot.bot.ratelimit import RateGovernor
+
+
+@pytest.fixture
+def bot():
+    """令牌已缓存、会话被模拟的飞书机器人"""
+    bot = FeishuBot(app_id="cli_test", app_secret="secret")
+    bot.access_token = "t-test"
+    bot.token_expire_time = time.time() + 3600
+    bot.session = Mock()
+    return bot
+
+
+def _response(payload):
+    return Mock(content=json.dumps(payload).encode("utf-8"))
+
+
+@pytest.mark.unit
+class TestRateGovernor:
+    """测试 RateGovernor 类"""
+    
+    def test_burst_then_throttle(self):
+        """测试突发额度用完后按速率放行"""
+        governor = RateGovernor(rate=50, burst=2)
+        started = time.perf_counter()
+        for _ in range(4):
+            assert governor.acquire() is True
+        elapsed = time.perf_counter() - started
+        
+        # 第 3、4 个请求各需等待约 20ms
+        assert elapsed >= 0.035
+    
+    def test_acquire_timeout(self):
+        """测试超时后放弃获取"""
+        governor = RateGovernor(rate=1, burst=1)
+        assert governor.acquire() is True
+        assert governor.acquire(timeout=0.01) is False
+
+
+@pytest.mark.unit
+class TestBulkSend:
+    """测试批量发送"""
+    
+    def test_per_target_results_in_order(self, bot):
+        """测试返回与输入顺序一致的逐目标结果"""
+        def post(url, headers=None, params=None, data=None, timeout=None):
+            chat_id = json.loads(data)["receive_id"]
+            if chat_id == "oc_bad":
+                return _response({"code": 230002, "msg": "bot not in chat"})
+            return _response({"code": 0, "data": {"message_id": f"om_{chat_id}"}})
+        
+        bot.session.post.side_effect = post
+        results = bot.send_bulk([("oc_1", "a"), ("oc_bad", "b"), ("oc_2", "c")], max_workers=3)
+        
+        assert [r["chat_id"] for r in results] == ["oc_1", "oc_bad", "oc_2"]
+        assert [r["success"] for r in results] == [True, False, True]
+        assert results[0]["message_id"] == "om_oc_1"
+        assert "230002" in results[1]["error"]
+    
+    def test_batch_send_chunks_users(self, bot):
+        """测试按用户批量发送超过上限时分批"""
+        bot.session.post.return_value = _response({
+            "code": 0,
+            "data": {"message_id": "bm_1", "invalid_open_ids": ["ou_x"]}
+        })
+        open_ids = [f"ou_{i}" for i in range(250)]
+        
+        result = bot.batch_send_to_users(open_ids, "公告")
+        
+        assert bot.session.post.call_count == 2
+        sizes = [len(json.loads(call.kwargs["data"])["open_ids"]) for call in bot.session.post.call_args_list]
+        assert sizes == [200, 50]
+        assert result["success"] is True
+        assert result["invalid_open_ids"] == ["ou_x", "ou_x"]
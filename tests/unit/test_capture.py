@@ -0,0 +1,102 @@
+"""流量录制模块测试"""
+
+import json
+import time
+
+import pytest
+
+from feishu_ai_bot.monitoring.capture import EventRecorder, read_capture
+
+
+@pytest.mark.unit
+class TestEventRecorder:
+    """测试 EventRecorder 类"""
+
+    def test_record_redacts_text(self, tmp_path, sample_feishu_event):
+        """测试录制时用户文本被脱敏"""
+        path = tmp_path / "capture.jsonl"
+        recorder = EventRecorder(str(path), salt="test")
+        recorder.record(sample_feishu_event, 1000.5)
+        recorder.close()
+
+        raw = path.read_text(encoding="utf-8")
+        assert "测试消息" not in raw
+        assert "test-user-id" not in raw
+
+        records = list(read_capture(str(path)))
+        assert len(records) == 1
+        assert records[0]["t"] == 1000.5
+        content = json.loads(records[0]["e"]["event"]["message"]["content"])
+        assert content["len"] == len("测试消息")
+        assert "sha" in content
+
+    def test_redact_does_not_modify_original(self, tmp_path, sample_feishu_event):
+        """测试脱敏不修改原始事件"""
+        recorder = EventRecorder(str(tmp_path / "capture.jsonl"), redact_mode="redact")
+        redacted = recorder.redact(sample_feishu_event)
+        recorder.close()
+
+        assert sample_feishu_event["event"]["message"]["content"] == '{"text": "测试消息"}'
+        assert "sha" not in json.loads(redacted["event"]["message"]["content"])
+
+    def test_redact_ids_and_mentions(self, tmp_path, sample_feishu_event):
+        """测试令牌、租户、消息标识和提及被脱敏"""
+        event = sample_feishu_event
+        event["token"] = "legacy-token"
+        event["header"].update({"token": "verify-token", "tenant_key": "tenant-1"})
+        event["event"]["message"].update({
+            "root_id": "om_root",
+            "parent_id": "om_parent",
+            "mentions": [{
+                "key": "@_user_1",
+                "id": {"open_id": "ou_mentioned", "union_id": "on_mentioned"},
+                "name": "张三",
+                "tenant_key": "tenant-1"
+            }]
+        })
+        recorder = EventRecorder(str(tmp_path / "capture.jsonl"), salt="test")
+        redacted = recorder.redact(event)
+        recorder.close()
+
+        raw = json.dumps(redacted, ensure_ascii=False)
+        for secret in ("verify-token", "legacy-token", "tenant-1", "test-msg-id", "om_root",
+                       "om_parent", "ou_mentioned", "on_mentioned", "张三"):
+            assert secret not in raw
+        assert redacted["event"]["message"]["mentions"][0]["key"] == "@_user_1"
+        assert event["header"]["token"] == "verify-token"
+
+    def test_record_writes_in_background(self, tmp_path, sample_feishu_event):
+        """测试写入在后台线程完成，队列满时丢弃"""
+        path = tmp_path / "capture.jsonl"
+        recorder = EventRecorder(str(path), queue_size=2)
+        with recorder._file._lock:
+            # 持有文件锁阻塞写入线程：第一条被取出后队列最多再容纳2条
+            recorder.record(sample_feishu_event, 0.0)
+            while not recorder._writer._queue.empty():
+                time.sleep(0.001)
+            for i in range(1, 5):
+                recorder.record(sample_feishu_event, float(i))
+            assert recorder.records_written == 0
+        recorder.close()
+
+        assert recorder.dropped == 2
+        assert recorder.records_written == 3
+        assert len(list(read_capture(str(path)))) == 3
+
+    def test_rotation(self, tmp_path, sample_feishu_event):
+        """测试文件超过大小后滚动"""
+        path = tmp_path / "capture.jsonl"
+        recorder = EventRecorder(str(path), max_bytes=600, backup_count=2)
+        for i in range(10):
+            recorder.record(sample_feishu_event, float(i))
+        recorder.close()
+
+        assert path.exists()
+        assert (tmp_path / "capture.jsonl.1").exists()
+        assert not (tmp_path / "capture.jsonl.3").exists()
+        assert path.stat().st_size <= 600
+
+    def test_invalid_redact_mode(self, tmp_path):
+        """测试不支持的脱敏模式"""
+        with pytest.raises(ValueError):
+            EventRecorder(str(tmp_path / "capture.jsonl"), redact_mode="plain")
@@ -0,0 +1,57 @@
+"""JSON 编解码模块测试"""
+
+import pytest
+
+from feishu_ai_bot import codec
+from feishu_ai_bot.codec import JsonCodec, OrjsonCodec, create_codec
+
+
+@pytest.mark.unit
+class TestCodec:
+    """测试 JSON 编解码器"""
+    
+    @pytest.mark.parametrize("name", ["json", "auto"])
+    def test_round_trip(self, name):
+        """测试序列化与反序列化互逆"""
+        c = create_codec(name)
+        obj = {"text": "你好", "n": [1, 2.5, None, True]}
+        
+        assert c.loads(c.dumps(obj)) == obj
+        assert c.loads(c.dumps_bytes(obj)) == obj
+        assert "你好" in c.dumps(obj)
+    
+    @pytest.mark.parametrize("obj", [
+        {"config": {"wide_screen_mode": True}, "text": "测试"},
+        {1: "int", 2.5: "float", True: "bool", None: "null"},
+        {"sizes": {1: 3, 8: 1}, "nested": [{"k": {10: [1, 2]}}]},
+        {"text": "换行\n\"引号\"\t", "empty": {}, "list": []},
+        [1, -2, 0.5, None, False, "中文"],
+    ])
+    def test_backends_produce_same_output(self, obj):
+        """测试不同后端输出一致（卡片内容不因后端变化，非字符串键同样转为字符串）"""
+        pytest.importorskip("orjson")
+        stdlib, fast = JsonCodec(), OrjsonCodec()
+        
+        assert stdlib.dumps(obj) == fast.dumps(obj)
+        assert stdlib.dumps(obj, pretty=True) == fast.dumps(obj, pretty=True)
+        assert stdlib.dumps_bytes(obj) == fast.dumps_bytes(obj)
+        assert stdlib.loads(fast.dumps_bytes(obj)) == fast.loads(stdlib.dumps_bytes(obj))
+    
+    def test_invalid_json_raises_value_error(self):
+        """测试非法输入统一抛出 ValueError"""
+        with pytest.raises(ValueError):
+            codec.loads(b"{not json")
+    
+    def test_set_codec(self):
+        """测试替换全局编解码器"""
+        previous = codec.get_codec()
+        try:
+            assert codec.set_codec("json").name == "json"
+            assert codec.dumps({"a": 1}) == '{"a":1}'
+        finally:
+            codec.set_codec(previous)
+    
+    def test_unknown_codec(self):
+        """测试不支持的编解码器名称"""
+        with pytest.raises(ValueError):
+            create_codec("yaml")
@@ -10,6 +10,8 @@ from feishu_ai_bot.config import (
     AIConfig,
     OpenClawConfig,
     AppConfig,
+    ConfigStore,
+    check_config_values,
     load_config
 )
 
@@ -81,3 +83,54 @@ class TestConfig:
         config = load_config()
         assert config.ai.api_base == "https://api.deepseek.com/v1"
         assert config.ai.model_name == "deepseek-chat"
+
+
+@pytest.mark.unit
+class TestConfigStore:
+    """测试配置热加载"""
+    
+    def test_check_config_values(self):
+        """测试配置取值校验"""
+        config = AppConfig()
+        assert check_config_values(config) == []
+        
+        config.openclaw.gateway_url = "localhost:18789"
+        config.security.ip_whitelist = ["10.0.0.0/33"]
+        config.health.jitter = 1.5
+        errors = check_config_values(config)
+        assert len(errors) == 3
+    
+    @patch.dict(os.environ, {"AI_MODEL_NAME": "model-a", "RATE_LIMIT_PER_MINUTE": "30"})
+    def test_reload_swaps_snapshot(self, tmp_path):
+        """测试重新加载后替换快照并通知订阅者"""
+        env_file = tmp_path / ".env"
+        store = ConfigStore(load_config(), env_file=str(env_file))
+        old = store.get()
+        notified = []
+        store.subscribe(lambda before, after, changed: notified.append(changed))
+        
+        env_file.write_text("AI_MODEL_NAME=model-b\nRATE_LIMIT_PER_MINUTE=60\n")
+        result = store.reload()
+        
+        assert result["success"] is True
+        assert result["changed"] == ["ai", "security"]
+        assert store.get() is not old
+        assert store.get().ai.model_name == "model-b"
+        assert old.ai.model_name == "model-a"
+        assert store.version == 2
+        assert notified == [["ai", "security"]]
+    
+    @patch.dict(os.environ, {"HEALTH_CHECK_JITTER": "0.2"})
+    def test_invalid_reload_keeps_snapshot(self, tmp_path):
+        """测试校验失败时保留当前配置"""
+        env_file = tmp_path / ".env"
+        store = ConfigStore(load_config(), env_file=str(env_file))
+        old = store.get()
+        
+        env_file.write_text("HEALTH_CHECK_JITTER=2\n")
+        assert store.reload()["success"] is False
+        
+        env_file.write_text("SERVER_PORT=not-a-number\n")
+        assert store.reload()["success"] is False
+        assert store.get() is old
+        assert store.version == 1
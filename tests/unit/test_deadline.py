@@ -0,0 +1,143 @@
+"""截止时间测试"""
+
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from feishu_ai_bot import deadline
+from feishu_ai_bot.ai.processor import AITaskProcessor
+from feishu_ai_bot.bot.feishu import FeishuBot
+from feishu_ai_bot.config import AIConfig
+from feishu_ai_bot.deadline import Deadline, DeadlineExceeded
+from feishu_ai_bot.openclaw.bridge import FAILURE_TIMEOUT, OpenClawBridge
+from feishu_ai_bot.tasks.processor import process_simple_task
+
+
+@pytest.mark.unit
+class TestDeadline:
+    """测试 Deadline"""
+    
+    def test_timeout_uses_remaining_budget(self):
+        """测试超时取剩余预算与默认值中的较小值，不在截止时间内时使用默认值"""
+        assert deadline.timeout(10, "test") == 10
+        
+        with Deadline(2).scope():
+            assert 1.9 < deadline.timeout(10, "test") <= 2
+            assert deadline.timeout(1, "test") == 1
+        assert deadline.current() is None
+    
+    def test_expired_raises_and_counts(self):
+        """测试过期后抛出 DeadlineExceeded 并按阶段计数"""
+        before = deadline.exceeded_counts().get("test.expired", 0)
+        expired = Deadline(1, started=time.monotonic() - 2)
+        
+        with expired.scope(), pytest.raises(DeadlineExceeded):
+            deadline.timeout(10, "test.expired")
+        assert deadline.exceeded_counts()["test.expired"] == before + 1
+    
+    def test_backoff_stops_when_budget_short(self):
+        """测试剩余预算不足以退避后重试时不再等待"""
+        with patch("feishu_ai_bot.deadline.time.sleep") as sleep:
+            deadline.backoff(1, "test")
+            sleep.assert_called_once_with(1)
+            
+            with Deadline(0.5).scope(), pytest.raises(DeadlineExceeded):
+                deadline.backoff(1, "test")
+            sleep.assert_called_once()
+
+
+@pytest.mark.unit
+class TestDeadlinePropagation:
+    """测试下游客户端读取当前截止时间"""
+    
+    def test_llm_retries_stop_at_deadline(self):
+        """测试大模型调用超时后，剩余预算不足时不再重试"""
+        config = AIConfig(provider="test-deadline", api_key="k", api_base="http://llm.local/v1")
+        processor = AITaskProcessor("/tmp", config)
+        processor.session.post = MagicMock(side_effect=requests.exceptions.Timeout())
+        
+        with patch("feishu_ai_bot.deadline.time.sleep") as sleep, \
+                Deadline(0.5).scope(), pytest.raises(DeadlineExceeded):
+            processor._call_ai_api("hello")
+        
+        sleep.assert_not_called()
+        processor.session.post.assert_called_once()
+        assert processor.session.post.call_args.kwargs["timeout"] <= 0.5
+        # 被截短的超时不视为过载
+        assert processor.limiter.snapshot()["dropped"] == 0
+    
+    def test_llm_last_attempt_counts_deadline(self):
+        """测试最后一次尝试的超时被截短时按截止时间超限抛出并计数"""
+        config = AIConfig(
+            provider="test-deadline", api_key="k", api_base="http://llm.local/v1", max_retries=1
+        )
+        processor = AITaskProcessor("/tmp", config)
+        processor.session.post = MagicMock(side_effect=requests.exceptions.Timeout())
+        before = deadline.exceeded_counts().get("llm", 0)
+        
+        with Deadline(0.5).scope(), pytest.raises(DeadlineExceeded):
+            processor._complete("hello")
+        assert deadline.exceeded_counts()["llm"] == before + 1
+    
+    def test_feishu_requests_have_timeout(self):
+        """测试飞书请求都带超时，过期时不发请求"""
+        bot = FeishuBot("app", "secret", request_timeout=3)
+        bot.session.post = MagicMock(return_value=MagicMock(
+            content=b'{"code": 0, "tenant_access_token": "t", "expire": 7200}'
+        ))
+        
+        bot.get_tenant_access_token()
+        assert bot.session.post.call_args.kwargs["timeout"] == 3
+        
+        with Deadline(1, started=time.monotonic() - 2).scope():
+            assert bot.send_message("oc_1", "hi") is None
+        assert bot.session.post.call_count == 1
+    
+    def test_feishu_throttle_respects_deadline(self):
+        """测试出站限速的等待不超过截止时间"""
+        bot = FeishuBot("app", "secret", rate_limit=0.1)
+        bot.get_tenant_access_token = MagicMock(return_value="t")
+        bot.session.post = MagicMock(return_value=MagicMock(content=b'{"code": 0, "data": {}}'))
+        assert bot.send_message("oc_1", "hi") is not None
+        before = deadline.exceeded_counts().get("feishu", 0)
+        
+        started = time.monotonic()
+        with Deadline(0.1).scope():
+            assert bot.send_message("oc_1", "hi") is None
+        assert time.monotonic() - started < 1
+        assert bot.session.post.call_count == 1
+        assert deadline.exceeded_counts()["feishu"] == before + 1
+    
+    def test_openclaw_request_expired(self):
+        """测试预算用完时 OpenClaw 请求按超时失败"""
+        bridge = OpenClawBridge("http://openclaw.local")
+        
+        with patch("feishu_ai_bot.openclaw.bridge.requests.post") as post, \
+                Deadline(1, started=time.monotonic() - 2).scope():
+            assert bridge._perform_request("http://openclaw.local/api", b"{}") == (None, FAILURE_TIMEOUT)
+        post.assert_not_called()
+
+
+@pytest.mark.unit
+class TestBackgroundTasks:
+    """测试后台任务不继承事件的截止时间"""
+    
+    def test_expired_deadline_still_delivers_result(self):
+        """测试任务截止时间已过（且仍是当前截止时间）时结果卡片照常发送"""
+        bot = FeishuBot("app", "secret", request_timeout=3)
+        bot.session.post = MagicMock(return_value=MagicMock(
+            content=b'{"code": 0, "tenant_access_token": "t", "expire": 7200, "data": {}}'
+        ))
+        ai_processor = MagicMock()
+        ai_processor.process_task.return_value = {"success": True, "result": "完成"}
+        expired = Deadline(1, started=time.monotonic() - 2)
+        
+        # 提交任务时复制的上下文带有事件的截止时间
+        with expired.scope():
+            process_simple_task("你好", "oc_1", "u", bot, ai_processor, expired)
+        
+        urls = [call.args[0] for call in bot.session.post.call_args_list]
+        assert any("/im/v1/messages" in url for url in urls)
+        assert all(call.kwargs["timeout"] == 3 for call in bot.session.post.call_args_list)
@@ -0,0 +1,132 @@
+"""事件签名与解密测试"""
+
+import base64
+import hashlib
+import json
+import os
+import time
+
+import pytest
+
+from feishu_ai_bot.bot.feishu import FeishuBot
+from feishu_ai_bot.config import AppConfig
+from feishu_ai_bot.security import crypto
+from feishu_ai_bot.server import create_app
+
+ENCRYPT_KEY = "test-encrypt-key"
+
+
+def _encrypt(plaintext: bytes) -> str:
+    """按飞书规范加密"""
+    ciphers = pytest.importorskip("cryptography.hazmat.primitives.ciphers")
+    iv = os.urandom(16)
+    pad = 16 - len(plaintext) % 16
+    encryptor = ciphers.Cipher(
+        ciphers.algorithms.AES(crypto.derive_key(ENCRYPT_KEY)), ciphers.modes.CBC(iv)
+    ).encryptor()
+    body = encryptor.update(plaintext + bytes([pad]) * pad) + encryptor.finalize()
+    return base64.b64encode(iv + body).decode("ascii")
+
+
+def _signed_headers(body: bytes, key: str = ENCRYPT_KEY, nonce: str = "nonce-1") -> dict:
+    timestamp = str(int(time.time()))
+    return {
+        "Content-Type": "application/json",
+        crypto.TIMESTAMP_HEADER: timestamp,
+        crypto.NONCE_HEADER: nonce,
+        crypto.SIGNATURE_HEADER: crypto.compute_signature(timestamp, nonce, key, body),
+    }
+
+
+@pytest.fixture
+def encrypted_app(tmp_path):
+    """配置了加密密钥的测试应用"""
+    config = AppConfig()
+    config.server.log_file = str(tmp_path / "bot.log")
+    config.openclaw.enabled = False
+    config.feishu.encrypt_key = ENCRYPT_KEY
+    return create_app(config, warm_up=False)
+
+
+@pytest.mark.unit
+class TestSignature:
+    """测试签名计算与校验"""
+    
+    def test_signature_matches_spec(self):
+        """测试签名为 sha256(timestamp + nonce + key + body)"""
+        expected = hashlib.sha256(b"1700000000nonce-1" + ENCRYPT_KEY.encode() + b"{}").hexdigest()
+        assert crypto.compute_signature("1700000000", "nonce-1", ENCRYPT_KEY, b"{}") == expected
+    
+    def test_bot_verify_event_signature(self):
+        """测试 FeishuBot 校验签名"""
+        bot = FeishuBot(app_id="a", app_secret="b", encrypt_key=ENCRYPT_KEY)
+        signature = crypto.compute_signature("1700000000", "nonce-1", ENCRYPT_KEY, b"{}")
+        
+        assert bot.verify_event_signature(b"{}", signature, "1700000000", "nonce-1") is True
+        assert bot.verify_event_signature(b"{}", signature, "1700000000", "nonce-2") is False
+    
+    def test_webhook_rejects_bad_signature(self, encrypted_app):
+        """测试签名错误的请求在解析前被拒绝"""
+        body = b'{"header": {"event_type": "x"}}'
+        response = encrypted_app.test_client().post(
+            "/webhook/event", data=body, headers=_signed_headers(body, key="wrong")
+        )
+        assert response.status_code == 401
+    
+    def test_webhook_rejects_unsigned_event(self, encrypted_app):
+        """测试配置加密密钥后未签名的事件被拒绝"""
+        response = encrypted_app.test_client().post(
+            "/webhook/event", json={"header": {"event_type": "x"}}
+        )
+        assert response.status_code == 401
+    
+    def test_webhook_accepts_signed_event(self, encrypted_app):
+        """测试签名正确的事件被接受"""
+        body = b'{"header": {"event_type": "x"}}'
+        response = encrypted_app.test_client().post(
+            "/webhook/event", data=body, headers=_signed_headers(body)
+        )
+        assert response.status_code == 200
+    
+    def test_webhook_rejects_replay(self, encrypted_app):
+        """测试重放的签名请求被拒绝"""
+        client = encrypted_app.test_client()
+        body = b'{"header": {"event_type": "x"}}'
+        headers = _signed_headers(body, nonce="replay-1")
+        
+        assert client.post("/webhook/event", data=body, headers=headers).status_code == 200
+        assert client.post("/webhook/event", data=body, headers=headers).status_code == 401
+
+
+@pytest.mark.unit
+class TestDecrypt:
+    """测试事件解密"""
+    
+    def test_decrypt_event(self):
+        """测试解密得到原始事件"""
+        event = {"header": {"event_type": "im.message.receive_v1"}, "text": "你好"}
+        encrypted = _encrypt(json.dumps(event).encode("utf-8"))
+        bot = FeishuBot(app_id="a", app_secret="b", encrypt_key=ENCRYPT_KEY)
+        
+        assert bot.decrypt_event(encrypted) == event
+    
+    def test_encrypted_challenge(self, encrypted_app):
+        """测试加密的 URL 验证请求（飞书不对其签名）"""
+        encrypted = _encrypt(json.dumps({"type": "url_verification", "challenge": "c1"}).encode())
+        response = encrypted_app.test_client().post("/webhook/event", json={"encrypt": encrypted})
+        
+        assert response.get_json() == {"challenge": "c1"}
+
+    @pytest.mark.parametrize("plaintext", [
+        None,
+        b"[1, 2, 3]",
+        b'"text"',
+        json.dumps({"header": {"event_type": "im.message.receive_v1"}}).encode(),
+    ])
+    def test_unsigned_failures_are_uniform(self, encrypted_app, plaintext):
+        """测试未签名请求的解密失败、非对象明文和非 URL 验证事件都返回同样的 401"""
+        encrypted = _encrypt(plaintext) if plaintext is not None else base64.b64encode(b"0" * 48).decode()
+        response = encrypted_app.test_client().post("/webhook/event", json={"encrypt": encrypted})
+        
+        assert response.status_code == 401
+        assert response.get_json() == {"code": -1, "msg": "Unauthorized"}
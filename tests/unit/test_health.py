@@ -0,0 +1,57 @@
+"""依赖健康监控测试"""
+
+import pytest
+
+from feishu_ai_bot.monitoring.health import HealthMonitor
+
+
+@pytest.mark.unit
+class TestHealthMonitor:
+    """测试 HealthMonitor 类"""
+    
+    def test_snapshot_before_probe(self):
+        """测试未探测时依赖状态未知"""
+        monitor = HealthMonitor()
+        monitor.register("llm_api", lambda: True)
+        
+        assert monitor.get("llm_api") == {"available": None, "checked": False}
+        assert monitor.snapshot()["healthy"] is True
+    
+    def test_rolling_window(self):
+        """测试滚动窗口的可用率和连续失败计数"""
+        results = iter([True, False, False, True, False])
+        monitor = HealthMonitor(window_size=4)
+        monitor.register("openclaw", lambda: next(results))
+        
+        for _ in range(5):
+            monitor.probe("openclaw")
+        
+        health = monitor.get("openclaw")
+        assert health["samples"] == 4
+        assert health["availability"] == 0.25
+        assert health["available"] is False
+        assert health["consecutive_failures"] == 1
+        assert monitor.snapshot()["healthy"] is False
+    
+    def test_probe_exception_is_failure(self):
+        """测试探测抛出异常时记录为失败"""
+        def probe():
+            raise RuntimeError("connection refused")
+        
+        monitor = HealthMonitor()
+        monitor.register("feishu_auth", probe)
+        
+        assert monitor.probe("feishu_auth") is False
+        assert monitor.get("feishu_auth")["last_error"] == "connection refused"
+    
+    def test_record_delays_next_probe(self):
+        """测试外部记录的结果会推迟下一次探测"""
+        calls = []
+        monitor = HealthMonitor(interval=60, jitter=0.1)
+        monitor.register("llm_api", lambda: calls.append(1) or True)
+        monitor.record("llm_api", True, 12.0)
+        
+        monitor.run_once()
+        
+        assert calls == []
+        assert monitor.get("llm_api")["last_latency_ms"] == 12.0
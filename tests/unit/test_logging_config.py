@@ -0,0 +1,49 @@
+"""日志管道测试"""
+
+import logging
+import queue
+
+import pytest
+
+from feishu_ai_bot.config import parse_rate_map
+from feishu_ai_bot.logging_config import NonBlockingQueueHandler, SamplingFilter
+
+
+def make_record(name: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, "msg %s", ("arg",), None)
+
+
+@pytest.mark.unit
+class TestLoggingPipeline:
+    """测试异步日志组件"""
+    
+    def test_queue_full_drops_without_blocking(self):
+        """测试队列满时丢弃而不是阻塞"""
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+        for _ in range(5):
+            handler.handle(make_record("feishu_ai_bot.server"))
+        
+        assert handler.queue.qsize() == 2
+        assert handler.dropped == 3
+    
+    def test_record_is_not_formatted_on_caller_thread(self):
+        """测试入队时不格式化消息"""
+        handler = NonBlockingQueueHandler(queue.Queue())
+        record = make_record("feishu_ai_bot.server")
+        handler.handle(record)
+        
+        queued = handler.queue.get_nowait()
+        assert queued.msg == "msg %s"
+        assert queued.args == ("arg",)
+    
+    def test_sampling_uses_longest_prefix(self):
+        """测试采样按最长前缀匹配"""
+        sampler = SamplingFilter({"feishu_ai_bot": 1.0, "feishu_ai_bot.server": 0.0})
+        
+        assert sampler.filter(make_record("feishu_ai_bot.bot.feishu")) is True
+        assert sampler.filter(make_record("feishu_ai_bot.server")) is False
+        assert sampler.filter(make_record("feishu_ai_bot.server", logging.ERROR)) is True
+    
+    def test_parse_rate_map(self):
+        """测试采样配置解析"""
+        assert parse_rate_map("a=0.5, b.c=2,invalid") == {"a": 0.5, "b.c": 1.0}
@@ -0,0 +1,96 @@
+"""模型档位测试"""
+
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+from feishu_ai_bot.ai import accounting
+from feishu_ai_bot.ai.accounting import UsageLedger
+from feishu_ai_bot.ai.processor import AITaskProcessor
+from feishu_ai_bot.config import AIConfig, AppConfig, ModelProfile, check_config_values, parse_model_profiles
+from feishu_ai_bot.monitoring.stats import get_latency_stats
+
+PROFILES = {
+    "simple": ModelProfile(model="fast", max_tokens=500, temperature=0.2, timeout=10),
+    "complex": ModelProfile(model="strong", max_tokens=4000),
+    "code": ModelProfile(temperature=0.0),
+    "simple.code": ModelProfile(max_tokens=1500),
+}
+
+
+def _processor() -> AITaskProcessor:
+    """默认模型为 base 的处理器"""
+    return AITaskProcessor("/tmp", AIConfig(
+        provider="test-tiers", api_key="k", api_base="http://llm.local/v1",
+        model_name="base", timeout=30, model_profiles=PROFILES
+    ))
+
+
+@pytest.mark.unit
+class TestResolveProfile:
+    """测试档位选择"""
+    
+    def test_layering(self):
+        """测试路由、任务类型和组合档位依次覆盖"""
+        processor = _processor()
+        
+        assert processor.resolve_profile() == ("default", ModelProfile("base", 2000, 0.7, 30))
+        assert processor.resolve_profile("complex", "search") == (
+            "complex", ModelProfile("strong", 4000, 0.7, 30)
+        )
+        assert processor.resolve_profile("complex", "code") == (
+            "code", ModelProfile("strong", 4000, 0.0, 30)
+        )
+        assert processor.resolve_profile("simple", "code") == (
+            "simple.code", ModelProfile("fast", 1500, 0.0, 10)
+        )
+        assert processor.tier_snapshot()["code"]["temperature"] == 0.0
+    
+    def test_request_uses_profile(self):
+        """测试请求体与超时取档位设置，用量和耗时按档位记录"""
+        processor = _processor()
+        response = Mock(status_code=200, content=json.dumps({
+            "choices": [{"message": {"content": "好"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5},
+        }).encode())
+        ledger = accounting.install(UsageLedger())
+        try:
+            with patch.object(processor.session, "post", return_value=response) as post:
+                processor.process_task("你好", {"name": "u", "chat_id": "oc_1"}, route="simple")
+        finally:
+            accounting.install(None)
+        
+        body = json.loads(post.call_args.kwargs["data"])
+        assert (body["model"], body["max_tokens"], body["temperature"]) == ("fast", 500, 0.2)
+        assert post.call_args.kwargs["timeout"] == 10
+        assert ledger.snapshot()["tiers"]["simple"]["requests"] == 1
+        assert get_latency_stats()["llm.tier.simple"]["count"] >= 1
+
+
+@pytest.mark.unit
+class TestProfileConfig:
+    """测试档位配置解析与校验"""
+    
+    def test_parse(self):
+        """测试 JSON 解析与未知字段"""
+        profiles = parse_model_profiles('{"simple": {"model": "fast", "max_tokens": 800}}')
+        assert profiles == {"simple": ModelProfile(model="fast", max_tokens=800)}
+        assert parse_model_profiles("") == {}
+        with pytest.raises(ValueError):
+            parse_model_profiles('{"simple": {"size": 1}}')
+        with pytest.raises(ValueError):
+            parse_model_profiles("[1]")
+    
+    def test_validation(self):
+        """测试未知档位与越界取值"""
+        config = AppConfig()
+        config.ai.model_profiles = {
+            "simple.code": ModelProfile(),
+            "batch": ModelProfile(),
+            "complex": ModelProfile(temperature=3.0),
+        }
+        errors = check_config_values(config)
+        assert any("batch" in error for error in errors)
+        assert any("temperature" in error for error in errors)
+        assert not any("simple.code" in error for error in errors)
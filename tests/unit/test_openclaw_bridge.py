@@ -2,6 +2,7 @@
 
 import pytest
 import json
+import time
 from unittest.mock import Mock, patch, MagicMock
 import requests
 
@@ -43,8 +44,10 @@ class TestOpenClawBridge:
                 }
             ]
         }
+        mock_response.content = json.dumps(mock_response.json.return_value).encode("utf-8")
         
-        with patch('requests.post', return_value=mock_response):
+        with patch('requests.options', side_effect=_route_options), \
+                patch('requests.post', return_value=mock_response):
             result = bridge.send_message(
                 user_message="测试消息",
                 user_id="test-user-id"
@@ -65,7 +68,8 @@ class TestOpenClawBridge:
         mock_response.status_code = 401
         mock_response.text = "Unauthorized"
         
-        with patch('requests.post', return_value=mock_response):
+        with patch('requests.options', side_effect=_route_options), \
+                patch('requests.post', return_value=mock_response):
             result = bridge.send_message(
                 user_message="测试消息",
                 user_id="test-user-id"
@@ -81,7 +85,8 @@ class TestOpenClawBridge:
             token="test-token"
         )
         
-        with patch('requests.post', side_effect=requests.exceptions.ConnectionError()):
+        with patch('requests.options', side_effect=requests.exceptions.ConnectionError()), \
+                patch('requests.post', side_effect=requests.exceptions.ConnectionError()) as post:
             result = bridge.send_message(
                 user_message="测试消息",
                 user_id="test-user-id"
@@ -89,6 +94,8 @@ class TestOpenClawBridge:
         
         assert result["success"] is False
         assert "无法连接" in result["result"]
+        # 所有端点都不可达时不发送消息
+        post.assert_not_called()
     
     def test_send_message_timeout(self):
         """测试超时"""
@@ -97,7 +104,8 @@ class TestOpenClawBridge:
             token="test-token"
         )
         
-        with patch('requests.post', side_effect=requests.exceptions.Timeout()):
+        with patch('requests.options', side_effect=_route_options), \
+                patch('requests.post', side_effect=requests.exceptions.Timeout()) as post:
             result = bridge.send_message(
                 user_message="测试消息",
                 user_id="test-user-id"
@@ -105,6 +113,8 @@ class TestOpenClawBridge:
         
         assert result["success"] is False
         assert "超时" in result["result"]
+        # 网关可能仍在处理，超时后不再发往其他端点
+        post.assert_called_once()
     
     def test_health_check_success(self):
         """测试健康检查成功"""
@@ -135,6 +145,116 @@ class TestOpenClawBridge:
         assert result["healthy"] is False
 
 
+def _route_options(url, **kwargs):
+    """所有端点都存在的模拟网关（OPTIONS 返回 204）"""
+    return Mock(status_code=204)
+
+
+def _chat_options(url, **kwargs):
+    """只有 /api/chat 存在的模拟网关（仅接受 POST，OPTIONS 返回 405）"""
+    return Mock(status_code=405 if url.endswith("/api/chat") else 404)
+
+
+def _route_response(url, **kwargs):
+    """只有 /api/chat 可用的模拟网关"""
+    response = Mock()
+    if url.endswith("/api/chat"):
+        response.status_code = 200
+        response.content = json.dumps({"reply": "路由回复"}).encode("utf-8")
+    else:
+        response.status_code = 404
+    return response
+
+
+@pytest.mark.unit
+class TestRouteDiscovery:
+    """测试路由发现"""
+    
+    def test_discovers_and_caches_route(self):
+        """测试发现可用路由后直接使用已知路由"""
+        bridge = OpenClawBridge(gateway_url="http://localhost:18789")
+        
+        with patch('requests.options', side_effect=_chat_options) as options, \
+                patch('requests.post', side_effect=_route_response) as post:
+            result = bridge.send_message(user_message="测试消息", user_id="test-user-id")
+            assert result["success"] is True
+            assert result["result"] == "路由回复"
+            assert bridge._route == ("Chat API", "/api/chat", 0)
+            # 探测只用 OPTIONS，消息只发往存在的端点
+            post.assert_called_once()
+            
+            post.reset_mock()
+            options.reset_mock()
+            bridge.send_message(user_message="第二条", user_id="test-user-id")
+        
+        options.assert_not_called()
+        post.assert_called_once()
+        assert post.call_args.args[0] == "http://localhost:18789/api/chat"
+    
+    def test_stale_route_is_rediscovered(self):
+        """测试已知路由返回 404 时重新发现"""
+        bridge = OpenClawBridge(gateway_url="http://localhost:18789")
+        bridge._route = ("RPC API", "/rpc", 0)
+        
+        with patch('requests.options', side_effect=_chat_options), \
+                patch('requests.post', side_effect=_route_response):
+            result = bridge.send_message(user_message="测试消息", user_id="test-user-id")
+        
+        assert result["success"] is True
+        assert bridge._route == ("Chat API", "/api/chat", 0)
+    
+    def test_message_sent_to_one_route(self):
+        """测试多个端点可用时消息只发往优先级最高的一个"""
+        bridge = OpenClawBridge(gateway_url="http://localhost:18789")
+        
+        def respond(url, **kwargs):
+            if url.endswith(("/api/chat", "/v1/chat/completions")):
+                return Mock(status_code=200, headers={}, content=b'{"reply": "ok"}')
+            return Mock(status_code=404)
+        
+        with patch('requests.options', side_effect=_route_options), \
+                patch('requests.post', side_effect=respond) as post:
+            result = bridge.send_message(user_message="测试消息", user_id="test-user-id")
+        
+        assert result["success"] is True
+        accepted = [
+            call.args[0] for call in post.call_args_list
+            if call.args[0].endswith(("/api/chat", "/v1/chat/completions"))
+        ]
+        assert accepted == ["http://localhost:18789/api/chat"]
+    
+    def test_server_error_is_not_retried_elsewhere(self):
+        """测试端点返回 5xx 时不再发往其他端点（网关可能已执行代理）"""
+        bridge = OpenClawBridge(gateway_url="http://localhost:18789")
+        
+        with patch('requests.options', side_effect=_route_options), \
+                patch('requests.post', return_value=Mock(status_code=502)) as post:
+            result = bridge.send_message(user_message="测试消息", user_id="test-user-id")
+        
+        assert result["success"] is False
+        post.assert_called_once()
+        assert bridge._route is None
+    
+    def test_probes_run_in_parallel(self):
+        """测试探测并行执行，总耗时约为两次往返（探测一次、发送一次）"""
+        def slow_options(url, **kwargs):
+            time.sleep(0.05)
+            return _chat_options(url, **kwargs)
+        
+        bridge = OpenClawBridge(gateway_url="http://localhost:18789", discovery_fanout=16)
+        
+        started = time.perf_counter()
+        with patch('requests.options', side_effect=slow_options) as options, \
+                patch('requests.post', side_effect=_route_response):
+            result = bridge.send_message(user_message="测试消息", user_id="test-user-id")
+        elapsed = time.perf_counter() - started
+        
+        assert result["success"] is True
+        # 探测的读超时很短，不会占用完整的请求超时
+        assert options.call_args.kwargs["timeout"] == (2.0, 2.0)
+        # 逐个探测需要 10 次以上往返
+        assert elapsed < 0.3
+
 @pytest.mark.unit
 def test_create_openclaw_bridge():
     """测试工厂函数"""
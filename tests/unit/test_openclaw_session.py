@@ -0,0 +1,75 @@
+"""OpenClaw 会话亲和测试"""
+
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+from feishu_ai_bot.openclaw.bridge import OpenClawBridge
+from feishu_ai_bot.openclaw.session import SessionStore
+
+
+@pytest.mark.unit
+class TestSessionStore:
+    """测试 SessionStore 类"""
+    
+    def test_lru_eviction(self):
+        """测试超过容量时淘汰最久未使用的会话"""
+        store = SessionStore(max_sessions=2)
+        store.put("a", "s-a")
+        store.put("b", "s-b")
+        assert store.get("a") == "s-a"
+        
+        store.put("c", "s-c")
+        
+        assert store.get("b") is None
+        assert store.get("a") == "s-a"
+        assert store.get("c") == "s-c"
+        assert store.stats()["evictions"] == 1
+    
+    def test_idle_sessions_expire(self):
+        """测试空闲超时的会话失效"""
+        store = SessionStore(ttl=0)
+        store.put("a", "s-a")
+        
+        with patch("feishu_ai_bot.openclaw.session.time.monotonic", return_value=1e12):
+            assert store.get("a") is None
+        assert len(store) == 0
+
+
+@pytest.mark.unit
+class TestBridgeSessions:
+    """测试桥接器的会话复用"""
+    
+    @staticmethod
+    def _response(session_id):
+        response = Mock(status_code=200, headers={})
+        response.content = json.dumps({"reply": "好的", "sessionId": session_id}).encode("utf-8")
+        return response
+    
+    def test_session_is_reused(self):
+        """测试网关返回的会话ID在下一次请求中携带"""
+        bridge = OpenClawBridge(gateway_url="http://localhost:18789")
+        
+        with patch('requests.options', return_value=Mock(status_code=204)), \
+                patch('requests.post', return_value=self._response("sess-1")) as post:
+            bridge.send_message(user_message="第一条", user_id="user-1")
+            assert "sessionId" not in json.loads(post.call_args.kwargs["data"])
+            
+            bridge.send_message(user_message="第二条", user_id="user-1")
+            # RPC 请求的会话ID在 params 中
+            assert json.loads(post.call_args.kwargs["data"])["params"]["sessionId"] == "sess-1"
+        
+        assert bridge.sessions.stats()["hits"] == 1
+    
+    def test_failed_request_drops_session(self):
+        """测试携带会话的请求失败后丢弃会话"""
+        bridge = OpenClawBridge(gateway_url="http://localhost:18789")
+        bridge.sessions.put("user-1", "sess-1")
+        
+        with patch('requests.options', return_value=Mock(status_code=204)), \
+                patch('requests.post', return_value=Mock(status_code=500, headers={})):
+            result = bridge.send_message(user_message="测试", user_id="user-1")
+        
+        assert result["success"] is False
+        assert len(bridge.sessions) == 0
@@ -0,0 +1,116 @@
+"""采样分析器测试"""
+
+import threading
+
+import pytest
+
+from feishu_ai_bot.config import AppConfig
+from feishu_ai_bot.monitoring import profiler
+from feishu_ai_bot.monitoring.profiler import StackSampler
+from feishu_ai_bot.server import create_app
+
+
+def _busy_worker(stop: threading.Event) -> None:
+    """持续运行直到 stop 被设置"""
+    while not stop.is_set():
+        stop.wait(0.001)
+
+
+@pytest.fixture
+def worker():
+    """登记了任务上下文的后台线程"""
+    stop = threading.Event()
+    started = threading.Event()
+    
+    def run():
+        with profiler.thread_context(task_type="complex", chat_id="oc_1"):
+            started.set()
+            _busy_worker(stop)
+    
+    thread = threading.Thread(target=run, name="task-complex", daemon=True)
+    thread.start()
+    started.wait(5)
+    yield thread
+    stop.set()
+    thread.join(5)
+
+
+@pytest.mark.unit
+class TestStackSampler:
+    """测试 StackSampler"""
+    
+    def test_collapsed_stacks(self, worker):
+        """测试采样结果包含工作线程的折叠栈"""
+        result = StackSampler().sample(0.05, interval=0.005)
+        
+        assert result["samples"] >= 2
+        stacks = [stack for stack in result["stacks"] if stack.startswith("task-complex;")]
+        assert stacks and "_busy_worker (test_profiler.py:" in stacks[0]
+        
+        text = profiler.collapsed(result["stacks"])
+        assert text.splitlines()[0].rsplit(" ", 1)[1].isdigit()
+    
+    def test_one_sample_at_a_time(self):
+        """测试已有采样进行时拒绝新的采样"""
+        sampler = StackSampler()
+        results = []
+        thread = threading.Thread(target=lambda: results.append(sampler.sample(0.2)))
+        thread.start()
+        while not sampler.busy:
+            pass
+        
+        assert sampler.sample(0.01) is None
+        thread.join(5)
+        assert results[0] is not None
+    
+    def test_thread_dump_has_context(self, worker):
+        """测试线程快照包含任务上下文，上下文退出后清除"""
+        [entry] = [item for item in profiler.thread_dump() if item["ident"] == worker.ident]
+        assert entry["context"]["task_type"] == "complex"
+        assert entry["context"]["chat_id"] == "oc_1"
+        assert any("_busy_worker" in frame for frame in entry["stack"])
+        
+        [current] = [
+            item for item in profiler.thread_dump()
+            if item["ident"] == threading.get_ident()
+        ]
+        assert current["context"] is None
+
+
+@pytest.mark.unit
+class TestProfileEndpoint:
+    """测试 /admin/profile 接口"""
+    
+    @pytest.fixture
+    def config(self, tmp_path):
+        """配置了管理令牌的测试配置"""
+        config = AppConfig()
+        config.server.log_file = str(tmp_path / "bot.log")
+        config.server.admin_token = "secret"
+        config.openclaw.enabled = False
+        return config
+    
+    def test_disabled_by_default(self, config):
+        """测试未开启时接口不存在"""
+        client = create_app(config, warm_up=False).test_client()
+        response = client.get("/admin/profile", headers={"Authorization": "Bearer secret"})
+        assert response.status_code == 404
+    
+    def test_profile(self, config, worker):
+        """测试鉴权、JSON 与折叠栈输出"""
+        config.server.enable_profiler = True
+        config.server.profiler_max_seconds = 0.05
+        client = create_app(config, warm_up=False).test_client()
+        assert client.get("/admin/profile").status_code == 403
+        
+        headers = {"Authorization": "Bearer secret"}
+        result = client.get("/admin/profile?seconds=10", headers=headers).get_json()
+        assert result["duration_s"] < 1
+        assert any(
+            thread["context"] and thread["context"]["chat_id"] == "oc_1"
+            for thread in result["threads"]
+        )
+        
+        response = client.get("/admin/profile?format=collapsed", headers=headers)
+        assert response.mimetype == "text/plain"
+        assert "task-complex;" in response.get_data(as_text=True)
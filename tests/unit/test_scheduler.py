@@ -0,0 +1,131 @@
+"""任务调度测试"""
+
+import threading
+import time
+
+import pytest
+
+from feishu_ai_bot.tasks.scheduler import GROUP_COMPLEX, GROUP_SIMPLE, P2P, TaskScheduler
+
+
+def _fill(scheduler: TaskScheduler, task_class: str, count: int, release: threading.Event) -> None:
+    """提交 count 个阻塞到 release 的任务，并等待它们都开始执行"""
+    started = threading.Semaphore(0)
+    
+    def block():
+        started.release()
+        release.wait(5)
+    
+    for _ in range(count):
+        scheduler.submit(task_class, block)
+    for _ in range(count):
+        assert started.acquire(timeout=5)
+
+
+def _wait_idle(scheduler: TaskScheduler) -> None:
+    """等待所有任务执行完毕"""
+    deadline = time.monotonic() + 5
+    while scheduler.snapshot()["running"] or any(
+        item["queued"] for item in scheduler.snapshot()["classes"].values()
+    ):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.mark.unit
+class TestTaskScheduler:
+    """测试 TaskScheduler"""
+    
+    def test_weighted_order(self):
+        """测试积压时按权重交替执行各类别"""
+        scheduler = TaskScheduler(
+            workers=1,
+            weights={P2P: 4, GROUP_SIMPLE: 2, GROUP_COMPLEX: 1},
+            reserved={}
+        )
+        release = threading.Event()
+        _fill(scheduler, GROUP_COMPLEX, 1, release)
+        
+        order = []
+        for task_class in (GROUP_COMPLEX, GROUP_SIMPLE, P2P):
+            for _ in range(4):
+                scheduler.submit(task_class, order.append, (task_class,))
+        release.set()
+        _wait_idle(scheduler)
+        
+        # 私聊最先排完；占用过线程的复杂任务要等其他类别各执行若干个之后才轮到
+        assert order[:6].count(P2P) == 4
+        assert GROUP_COMPLEX not in order[:7]
+        assert len(order) == 12
+    
+    def test_burst_starts_workers(self):
+        """测试只有一个空闲线程时突发提交的任务仍并发执行"""
+        scheduler = TaskScheduler(workers=8, reserved={})
+        warm = threading.Event()
+        scheduler.submit(GROUP_SIMPLE, warm.set)
+        assert warm.wait(5)
+        _wait_idle(scheduler)
+        
+        release = threading.Event()
+        _fill(scheduler, GROUP_SIMPLE, 6, release)
+        snapshot = scheduler.snapshot()
+        assert snapshot["running"] == 6
+        assert snapshot["classes"][GROUP_SIMPLE]["queued"] == 0
+        release.set()
+        _wait_idle(scheduler)
+    
+    def test_reservation_protects_p2p(self):
+        """测试复杂任务占满非预留线程后，私聊仍能立即执行"""
+        scheduler = TaskScheduler(
+            workers=3,
+            reserved={P2P: 1, GROUP_SIMPLE: 0, GROUP_COMPLEX: 0}
+        )
+        release = threading.Event()
+        _fill(scheduler, GROUP_COMPLEX, 2, release)
+        scheduler.submit(GROUP_COMPLEX, lambda: None)
+        assert scheduler.snapshot()["classes"][GROUP_COMPLEX]["queued"] == 1
+        
+        done = threading.Event()
+        scheduler.submit(P2P, done.set)
+        assert done.wait(5)
+        assert scheduler.snapshot()["classes"][GROUP_COMPLEX]["queued"] == 1
+        
+        release.set()
+        _wait_idle(scheduler)
+        assert scheduler.snapshot()["classes"][GROUP_COMPLEX]["completed"] == 3
+    
+    def test_aging_prevents_starvation(self):
+        """测试排队超过老化时间的低权重任务先于新到的高权重任务执行"""
+        scheduler = TaskScheduler(
+            workers=1,
+            weights={P2P: 100, GROUP_SIMPLE: 1, GROUP_COMPLEX: 1},
+            reserved={},
+            aging_seconds=0.05
+        )
+        release = threading.Event()
+        _fill(scheduler, P2P, 1, release)
+        
+        order = []
+        scheduler.submit(GROUP_COMPLEX, order.append, (GROUP_COMPLEX,))
+        time.sleep(0.1)
+        scheduler.submit(P2P, order.append, (P2P,))
+        release.set()
+        _wait_idle(scheduler)
+        
+        assert order == [GROUP_COMPLEX, P2P]
+        snapshot = scheduler.snapshot()["classes"][GROUP_COMPLEX]
+        assert snapshot["aged"] == 1
+        assert snapshot["queue_wait_ms"]["count"] >= 1
+    
+    def test_disabled_runs_immediately(self):
+        """测试未启用时每个任务一个线程，不排队"""
+        scheduler = TaskScheduler(workers=1, enabled=False)
+        release = threading.Event()
+        _fill(scheduler, GROUP_COMPLEX, 2, release)
+        release.set()
+        assert scheduler.snapshot()["threads"] == 0
+    
+    def test_unknown_class(self):
+        """测试未知类别"""
+        with pytest.raises(ValueError):
+            TaskScheduler().submit("batch", lambda: None)
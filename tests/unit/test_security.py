@@ -0,0 +1,135 @@
+"""安全验证测试"""
+
+import pytest
+
+from feishu_ai_bot.config import AppConfig
+from feishu_ai_bot.security.validator import (
+    IPAllowlist, ReplayGuard, SecurityValidator, check_ip_whitelist, resolve_client_ip
+)
+from feishu_ai_bot.server import create_app
+
+NOW = 1_700_000_000.0
+
+
+@pytest.mark.unit
+class TestReplayGuard:
+    """测试防重放校验"""
+    
+    def test_rejects_duplicate_nonce(self):
+        """测试相同 nonce 第二次被拒绝"""
+        guard = ReplayGuard(window=300)
+        
+        assert guard.check(str(int(NOW)), "n1", now=NOW) is True
+        assert guard.check(str(int(NOW)), "n1", now=NOW + 1) is False
+        assert guard.check(str(int(NOW)), "n2", now=NOW + 1) is True
+        assert guard.stats["duplicate"] == 1
+    
+    def test_rejects_skewed_timestamp(self):
+        """测试时间戳偏差过大或格式错误被拒绝"""
+        guard = ReplayGuard(window=300)
+        
+        assert guard.check(str(int(NOW - 301)), "n1", now=NOW) is False
+        assert guard.check(str(int(NOW + 301)), "n2", now=NOW) is False
+        assert guard.check("abc", "n3", now=NOW) is False
+        assert guard.check(str(int(NOW)), "", now=NOW) is False
+        assert guard.stats["stale"] == 4
+    
+    def test_expires_whole_buckets(self):
+        """测试过期时间桶整体丢弃"""
+        guard = ReplayGuard(window=300)
+        for i in range(10):
+            guard.check(str(int(NOW)), f"n{i}", now=NOW)
+        
+        later = NOW + 1000
+        assert guard.check(str(int(later)), "n0", now=later) is True
+        assert sum(guard._counts.values()) == 1
+        assert guard.store._buckets.keys() == {int(later // 300)}
+    
+    def test_bounded_nonce_count(self):
+        """测试超过上限后拒绝新的 nonce"""
+        guard = ReplayGuard(window=300, max_nonces=3)
+        results = [guard.check(str(int(NOW)), f"n{i}", now=NOW) for i in range(5)]
+        
+        assert results == [True, True, True, False, False]
+        assert guard.stats["overflow"] == 2
+    
+    def test_shared_directory(self, tmp_path):
+        """测试共享目录在多个实例间去重"""
+        first = ReplayGuard(window=300, shared_dir=str(tmp_path))
+        second = ReplayGuard(window=300, shared_dir=str(tmp_path))
+        
+        assert first.check(str(int(NOW)), "a/b", now=NOW) is True
+        assert second.check(str(int(NOW)), "a/b", now=NOW) is False
+        
+        later = NOW + 1000
+        assert second.check(str(int(later)), "a/b", now=later) is True
+        assert [p.name for p in tmp_path.iterdir()] == [str(int(later // 300))]
+
+
+@pytest.mark.unit
+class TestIPAllowlist:
+    """测试 CIDR 白名单"""
+    
+    def test_cidr_and_exact_entries(self):
+        """测试网段、单个地址和 IPv6"""
+        allowlist = IPAllowlist(["10.0.0.0/8", "192.168.1.5", "2001:db8::/32", "bad-entry"])
+        
+        assert "10.20.30.40" in allowlist
+        assert "192.168.1.5" in allowlist
+        assert "192.168.1.6" not in allowlist
+        assert "11.0.0.1" not in allowlist
+        assert "2001:db8::1" in allowlist
+        assert "2001:db9::1" not in allowlist
+        assert "::ffff:10.1.2.3" in allowlist
+        assert "not-an-ip" not in allowlist
+        assert len(allowlist) == 3
+    
+    def test_overlapping_ranges_are_merged(self):
+        """测试重叠和相邻的网段合并为一个区间"""
+        allowlist = IPAllowlist(["10.0.0.0/25", "10.0.0.128/25", "10.0.0.64/26", "10.0.2.0/24"])
+        
+        assert allowlist._tables[4][0] == [167772160, 167772672]
+        assert "10.0.0.200" in allowlist
+        assert "10.0.1.1" not in allowlist
+    
+    def test_resolve_client_behind_trusted_proxy(self):
+        """测试只在受信任代理后读取 X-Forwarded-For"""
+        proxies = IPAllowlist(["127.0.0.1", "10.0.0.0/8"])
+        
+        assert resolve_client_ip("127.0.0.1", "1.2.3.4, 10.0.0.2", proxies) == "1.2.3.4"
+        assert resolve_client_ip("127.0.0.1", "6.6.6.6, 1.2.3.4", proxies) == "1.2.3.4"
+        assert resolve_client_ip("5.5.5.5", "1.2.3.4", proxies) == "5.5.5.5"
+        assert resolve_client_ip("127.0.0.1", None, proxies) == "127.0.0.1"
+    
+    def test_validator_and_legacy_function(self):
+        """测试 SecurityValidator 和全局函数支持网段"""
+        validator = SecurityValidator(
+            enable_ip_whitelist=True,
+            ip_whitelist=["203.0.113.0/24"],
+            trusted_proxies=["127.0.0.1"]
+        )
+        
+        assert validator.check_ip_whitelist("203.0.113.9") is True
+        assert validator.check_request_ip("127.0.0.1", "203.0.113.9") is True
+        assert validator.check_request_ip("198.51.100.1", "203.0.113.9") is False
+        assert check_ip_whitelist("203.0.113.9", enable=True, whitelist=["203.0.113.0/24"]) is True
+        assert check_ip_whitelist("203.0.114.9", enable=True, whitelist=["203.0.113.0/24"]) is False
+    
+    def test_webhook_rejects_before_parsing(self, tmp_path):
+        """测试白名单外的请求在解析前被拒绝"""
+        config = AppConfig()
+        config.server.log_file = str(tmp_path / "bot.log")
+        config.openclaw.enabled = False
+        config.security.enable_ip_whitelist = True
+        config.security.ip_whitelist = ["203.0.113.0/24"]
+        client = create_app(config, warm_up=False).test_client()
+        
+        response = client.post("/webhook/event", data="not json", content_type="application/json")
+        assert response.status_code == 403
+        
+        response = client.post(
+            "/webhook/event",
+            json={"type": "url_verification", "challenge": "c1"},
+            environ_base={"REMOTE_ADDR": "203.0.113.7"}
+        )
+        assert response.get_json() == {"challenge": "c1"}
@@ -0,0 +1,126 @@
+"""主服务（应用工厂）测试"""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from feishu_ai_bot import server
+from feishu_ai_bot.config import AppConfig
+from feishu_ai_bot.server import EXTENSION_KEY, create_app
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    """不访问任何上游的测试配置"""
+    config = AppConfig()
+    config.server.log_file = str(tmp_path / "bot.log")
+    config.openclaw.enabled = False
+    return config
+
+
+@pytest.fixture
+def app(app_config):
+    """未启动预热的测试应用"""
+    return create_app(app_config, warm_up=False)
+
+
+@pytest.mark.unit
+class TestCreateApp:
+    """测试 create_app 应用工厂"""
+    
+    def test_import_has_no_side_effects(self):
+        """测试导入模块不会创建应用"""
+        assert server._app is None
+    
+    def test_components_are_lazy(self, app):
+        """测试组件在首次访问前不会构建"""
+        services = app.extensions[EXTENSION_KEY]
+        assert services._components == {}
+        
+        assert services.feishu_bot is services.feishu_bot
+        assert set(services._components) == {"feishu_bot"}
+    
+    def test_ready_after_warm_up(self, app):
+        """测试预热完成后就绪检查通过"""
+        client = app.test_client()
+        assert client.get("/ready").status_code == 503
+        
+        app.extensions[EXTENSION_KEY].warm_up()
+        
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.get_json()["ready"] is True
+    
+    def test_warm_up_records_construction_failure(self, app):
+        """测试组件构建失败时记录为步骤失败且仍然就绪"""
+        services = app.extensions[EXTENSION_KEY]
+        with patch.object(server, "AITaskProcessor", side_effect=RuntimeError("bad config")):
+            results = services.warm_up()
+        
+        assert results["ai_connection"] == {
+            "ok": False,
+            "duration_ms": results["ai_connection"]["duration_ms"],
+            "error": "bad config"
+        }
+        assert "openclaw" in results
+        assert services.ready.is_set()
+    
+    def test_health_is_liveness(self, app):
+        """测试存活检查不依赖预热"""
+        response = app.test_client().get("/health")
+        assert response.status_code == 200
+        assert response.get_json()["openclaw"]["available"] is False
+    
+    def test_health_serves_cached_dependencies(self, app):
+        """测试存活检查返回缓存的依赖状态且不触发探测"""
+        services = app.extensions[EXTENSION_KEY]
+        calls = []
+        services.health_monitor.register("openclaw", lambda: calls.append(1) or True)
+        services.health_monitor.record("openclaw", True, 5.0)
+        
+        body = app.test_client().get("/health").get_json()
+        
+        assert calls == []
+        assert body["openclaw"]["available"] is True
+        assert body["dependencies"]["dependencies"]["openclaw"]["samples"] == 1
+
+
+@pytest.mark.unit
+class TestAdminReload:
+    """测试配置热加载接口"""
+    
+    def test_requires_admin_token(self, app_config):
+        """测试未配置或令牌错误时拒绝"""
+        client = create_app(app_config, warm_up=False).test_client()
+        assert client.post("/admin/reload").status_code == 403
+        
+        app_config.server.admin_token = "secret"
+        client = create_app(app_config, warm_up=False).test_client()
+        response = client.post("/admin/reload", headers={"Authorization": "Bearer wrong"})
+        assert response.status_code == 403
+    
+    def test_reload_rebuilds_changed_components(self, app_config):
+        """测试变化的配置节对应的组件被重建"""
+        app_config.server.admin_token = "secret"
+        app = create_app(app_config, warm_up=False)
+        services = app.extensions[EXTENSION_KEY]
+        validator = services.security_validator
+        bot = services.feishu_bot
+        
+        new_config = AppConfig()
+        new_config.server = app_config.server
+        new_config.openclaw = app_config.openclaw
+        new_config.security.rate_limit_per_minute = 99
+        with patch("feishu_ai_bot.config.load_config", return_value=new_config), \
+                patch.dict(os.environ, {}):
+            response = app.test_client().post(
+                "/admin/reload", headers={"Authorization": "Bearer secret"}
+            )
+        
+        assert response.status_code == 200
+        assert response.get_json()["changed"] == ["security"]
+        assert services.config is new_config
+        assert services.security_validator is not validator
+        assert services.security_validator.rate_limit_per_minute == 99
+        assert services.feishu_bot is bot
@@ -0,0 +1,141 @@
+"""多进程共享统计测试"""
+
+import logging
+import os
+
+import pytest
+
+from feishu_ai_bot import logging_config
+from feishu_ai_bot.ai import accounting
+from feishu_ai_bot.config import AppConfig
+from feishu_ai_bot.monitoring import stats
+from feishu_ai_bot.monitoring.shared import SharedStats
+from feishu_ai_bot.server import EXTENSION_KEY, create_app, init_worker, prepare_prefork
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="需要 fork")
+
+
+@pytest.fixture
+def shared_stats():
+    """启用共享计数，测试结束后恢复进程内计数"""
+    shared = SharedStats(max_workers=8)
+    stats.enable_shared_stats(shared)
+    yield shared
+    stats.enable_shared_stats(None)
+
+
+def _run_in_child(func) -> None:
+    """在子进程中执行 func 并等待退出"""
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            func()
+        except BaseException:
+            code = 1
+        os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+
+
+@pytest.mark.unit
+class TestSharedStats:
+    """测试共享内存计数"""
+    
+    def test_children_write_separate_slots(self, shared_stats):
+        """测试多个子进程的计数汇总"""
+        def work():
+            for _ in range(10):
+                stats.update_stats()
+            stats.update_stats(success=False)
+            stats.increment_tasks_processed()
+        
+        for _ in range(3):
+            _run_in_child(work)
+        
+        totals = shared_stats.totals()
+        assert totals == {
+            "total_requests": 33,
+            "successful_requests": 30,
+            "failed_requests": 3,
+            "tasks_processed": 3,
+        }
+        assert stats.get_global_collector().total_requests == 33
+    
+    def test_dead_worker_slot_is_reused(self, shared_stats):
+        """测试退出进程的槽位被复用且计数不回退"""
+        _run_in_child(lambda: stats.update_stats())
+        _run_in_child(lambda: stats.update_stats())
+        
+        workers = shared_stats.workers()
+        assert len(workers) == 1
+        assert workers[0]["total_requests"] == 2
+        assert workers[0]["alive"] is False
+    
+    def test_metrics_are_aggregated(self, shared_stats, tmp_path):
+        """测试 /metrics 输出整个实例的合计"""
+        _run_in_child(lambda: stats.update_stats())
+        stats.update_stats(success=False)
+        
+        config = AppConfig()
+        config.server.log_file = str(tmp_path / "bot.log")
+        config.openclaw.enabled = False
+        body = create_app(config, warm_up=False).test_client().get("/metrics").get_data(as_text=True)
+        
+        assert 'feishu_bot_requests_total{result="success"} 1' in body
+        assert 'feishu_bot_requests_total{result="failure"} 1' in body
+
+
+@pytest.mark.unit
+class TestPrefork:
+    """测试预加载与 worker 初始化"""
+    
+    def test_prefork_and_worker_init(self, tmp_path):
+        """测试 fork 前后的组件处理"""
+        config = AppConfig()
+        config.server.log_file = str(tmp_path / "bot.log")
+        config.openclaw.enabled = False
+        config.feishu.rate_limit = 40
+        app = create_app(config, warm_up=False)
+        services = app.extensions[EXTENSION_KEY]
+        
+        try:
+            prepare_prefork(app, workers=4)
+            validator = services.security_validator
+            bot = services.feishu_bot
+            session = bot.session
+            assert services.master_pid == os.getpid()
+            assert stats.get_shared_stats() is not None
+            
+            services.start_warm_up = lambda: None
+            services.reload_config = lambda: {"success": True}
+            init_worker(app)
+            
+            assert services.security_validator is validator
+            assert services.feishu_bot is bot
+            assert bot.session is not session
+            assert bot.rate_governor.rate == 10
+            assert stats.get_shared_stats().slot is not None
+        finally:
+            stats.enable_shared_stats(None)
+
+    def test_background_threads_restart_in_child(self, tmp_path):
+        """测试 master 中启动的日志写入线程在子进程中重新启动，用量写入线程不在 master 中启动"""
+        config = AppConfig()
+        config.server.log_file = str(tmp_path / "bot.log")
+        config.usage.file = str(tmp_path / "usage.json")
+        logging_config.stop_logging()
+        logging_config.setup_logging(config.server)
+        ledger = accounting.install(accounting.create_ledger(config.usage))
+        
+        def child():
+            logging.getLogger("feishu_ai_bot.test").warning("child record %s", os.getpid())
+            logging_config.stop_logging()
+        
+        try:
+            assert ledger._thread is None
+            _run_in_child(child)
+            assert "child record" in (tmp_path / "bot.log").read_text(encoding="utf-8")
+        finally:
+            logging_config.stop_logging()
+            accounting.install(None)
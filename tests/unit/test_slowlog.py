@@ -0,0 +1,155 @@
+"""慢操作记录测试"""
+
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from feishu_ai_bot import codec
+from feishu_ai_bot.config import AppConfig
+from feishu_ai_bot.monitoring.capture import RotatingFile
+from feishu_ai_bot.monitoring import slowlog, tracing
+from feishu_ai_bot.monitoring.slowlog import SlowLog
+from feishu_ai_bot.monitoring.tracing import Tracer
+from feishu_ai_bot.server import create_app
+
+# 上游调用一律视为慢操作，webhook 和任务不会触发
+UPSTREAM_ONLY = {"webhook": 1e9, "task": 1e9, "upstream": 0.001}
+
+
+@pytest.fixture
+def tracer():
+    """不采样的全局追踪器（测试后恢复）"""
+    previous = tracing.get_tracer()
+    yield tracing.set_tracer(Tracer(sample_rate=0.0))
+    tracing.set_tracer(previous)
+
+
+def _relay(tracer: Tracer) -> None:
+    """模拟一次带重试和路由发现的处理过程"""
+    with tracer.trace("webhook.event"):
+        with tracer.span("llm.attempt", attempt=1) as attempt:
+            attempt.fail("timeout")
+        with tracer.span("llm.attempt", attempt=2):
+            pass
+        with tracer.span("openclaw.discover"):
+            with tracer.span("openclaw.request", endpoint="/api/chat") as request:
+                request.fail("not_found")
+            with tracer.span("openclaw.request", endpoint="/v1/chat/completions", status=200):
+                pass
+            tracing.annotate(route="openai /v1/chat/completions")
+
+
+@pytest.mark.unit
+class TestSlowLog:
+    """测试 SlowLog"""
+    
+    def test_records_unsampled_slow_trace(self, tracer, tmp_path):
+        """测试未被采样的 trace 也会检查，记录包含重试次数与路由"""
+        slow_log = SlowLog(UPSTREAM_ONLY, path=str(tmp_path / "slow-{pid}.jsonl"))
+        tracer.add_listener(slow_log.observe)
+        
+        _relay(tracer)
+        
+        assert tracer.traces() == []
+        [record] = slow_log.records()
+        assert {item["category"] for item in record["slow"]} == {"upstream"}
+        assert record["retries"] == {"llm": 1, "openclaw": 1}
+        assert record["openclaw_route"] == "openai /v1/chat/completions"
+        stage = next(s for s in record["stages"] if s.get("status") == 200)
+        assert stage["endpoint"] == "/v1/chat/completions"
+        
+        slow_log.flush()
+        path = tmp_path / f"slow-{os.getpid()}.jsonl"
+        assert codec.loads(path.read_bytes().splitlines()[0])["trace_id"] == record["trace_id"]
+    
+    def test_writes_off_request_thread(self, tracer, tmp_path):
+        """测试记录文件由后台线程写入"""
+        slow_log = SlowLog(UPSTREAM_ONLY, path=str(tmp_path / "slow.jsonl"))
+        tracer.add_listener(slow_log.observe)
+        writers = []
+        write = RotatingFile.write
+        
+        def record_thread(self, line):
+            writers.append(threading.current_thread().name)
+            return write(self, line)
+        
+        with patch.object(RotatingFile, "write", record_thread):
+            _relay(tracer)
+            slow_log.close()
+        
+        assert writers == ["slowlog-writer"]
+    
+    def test_fast_trace_writes_nothing(self, tracer, tmp_path):
+        """测试未超过阈值时不产生记录和文件"""
+        slow_log = SlowLog(
+            {"webhook": 1e9, "task": 1e9, "upstream": 1e9}, path=str(tmp_path / "slow.jsonl")
+        )
+        tracer.add_listener(slow_log.observe)
+        
+        _relay(tracer)
+        
+        assert slow_log.records() == []
+        assert slow_log.stats["detected"] == 0
+        assert not (tmp_path / "slow.jsonl").exists()
+    
+    def test_rate_limited(self, tracer):
+        """测试每分钟记录数有上限"""
+        slow_log = SlowLog(UPSTREAM_ONLY, max_per_minute=2)
+        tracer.add_listener(slow_log.observe)
+        
+        for _ in range(5):
+            _relay(tracer)
+        
+        assert slow_log.stats == {"detected": 5, "recorded": 2, "dropped": 3}
+        assert len(slow_log.records()) == 2
+    
+    def test_install_replaces_listener(self, tracer):
+        """测试替换记录器时移除旧的回调"""
+        first = slowlog.install(SlowLog(UPSTREAM_ONLY))
+        second = slowlog.install(SlowLog(UPSTREAM_ONLY))
+        slowlog.install(None)
+        
+        _relay(tracer)
+        
+        assert first.records() == [] and second.records() == []
+        assert slowlog.get_slow_log() is None
+
+
+@pytest.mark.unit
+class TestDebugSlow:
+    """测试 /debug/slow 接口"""
+    
+    def test_lists_records(self, tracer, tmp_path):
+        """测试鉴权和记录列表"""
+        config = AppConfig()
+        config.server.log_file = str(tmp_path / "bot.log")
+        config.server.admin_token = "secret"
+        config.openclaw.enabled = False
+        config.slow_log.enabled = True
+        config.slow_log.file = ""
+        config.slow_log.webhook_ms = 0.001
+        client = create_app(config, warm_up=False).test_client()
+        
+        client.post("/webhook/event", json={"challenge": "abc"})
+        assert client.get("/debug/slow").status_code == 403
+        
+        result = client.get("/debug/slow", headers={"Authorization": "Bearer secret"}).get_json()
+        [record] = result["records"]
+        assert record["slow"][0]["span"] == "webhook.event"
+        assert result["stats"]["recorded"] == 1
+        slowlog.install(None)
+
+    def test_disabled_by_default(self, tracer, tmp_path):
+        """测试默认不注册回调，未采样的事件不记录 span"""
+        config = AppConfig()
+        config.server.log_file = str(tmp_path / "bot.log")
+        config.openclaw.enabled = False
+        config.tracing.sample_rate = 0.0
+        client = create_app(config, warm_up=False).test_client()
+        
+        client.post("/webhook/event", json={"challenge": "abc"})
+        assert slowlog.get_slow_log() is None
+        assert tracer._listeners == []
+        assert tracer.traces() == []
@@ -0,0 +1,240 @@
+"""流式回复测试"""
+
+import json
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+from feishu_ai_bot.bot.streaming import CURSOR, CardUpdater, StreamingReply
+from feishu_ai_bot.config import OpenClawConfig
+from feishu_ai_bot.openclaw.bridge import OpenClawBridge, OpenClawStreamError
+from feishu_ai_bot.server import relay_private_message
+
+
+@pytest.fixture
+def streaming_bot(mock_feishu_bot):
+    """能返回消息ID并支持编辑的模拟飞书机器人"""
+    mock_feishu_bot.send_message = Mock(return_value={"code": 0, "data": {"message_id": "om_1"}})
+    mock_feishu_bot.update_message = Mock(return_value={"code": 0})
+    mock_feishu_bot.send_card_message = Mock(return_value={"code": 0, "data": {"message_id": "om_card"}})
+    mock_feishu_bot.update_card_message = Mock(return_value={"code": 0})
+    return mock_feishu_bot
+
+
+@pytest.mark.unit
+class TestStreamingReply:
+    """测试 StreamingReply 类"""
+    
+    def test_edits_are_capped(self, streaming_bot):
+        """测试编辑次数不超过上限且最终结果完整"""
+        reply = StreamingReply(streaming_bot, "chat", min_interval=0, max_edits=3)
+        assert reply.start("⏳") is True
+        
+        for word in ["a", "b", "c", "d", "e"]:
+            reply.feed(word)
+        assert reply.finish() is True
+        
+        assert reply.edits == 3
+        calls = [call.args for call in streaming_bot.update_message.call_args_list]
+        assert calls[0] == ("om_1", "a" + CURSOR)
+        assert calls[-1] == ("om_1", "abcde")
+    
+    def test_updates_are_coalesced(self, streaming_bot):
+        """测试最小间隔内的片段合并为一次编辑"""
+        reply = StreamingReply(streaming_bot, "chat", min_interval=60)
+        reply.start("⏳")
+        
+        for word in ["a", "b", "c"]:
+            reply.feed(word)
+        reply.finish()
+        
+        streaming_bot.update_message.assert_called_once_with("om_1", "abc")
+    
+    def test_falls_back_to_new_message(self, streaming_bot):
+        """测试编辑失败后改为发送新消息"""
+        streaming_bot.update_message.return_value = None
+        reply = StreamingReply(streaming_bot, "chat", min_interval=0)
+        reply.start("⏳")
+        
+        reply.feed("partial")
+        reply.finish("final")
+        
+        assert streaming_bot.update_message.call_count == 1
+        streaming_bot.send_message.assert_called_with("chat", "final")
+
+
+@pytest.mark.unit
+class TestCardUpdater:
+    """测试 CardUpdater 类"""
+    
+    def test_fast_task_writes_once(self, streaming_bot):
+        """测试快速完成的任务只发送一次最终卡片"""
+        card = CardUpdater(streaming_bot, "chat", root_id="omt_1", min_interval=60)
+        card.update("stage-1")
+        card.update("stage-2")
+        card.finish("done")
+        
+        streaming_bot.send_card_message.assert_called_once_with("chat", "done", root_id="omt_1")
+        streaming_bot.update_card_message.assert_not_called()
+        assert card.writes == 1
+    
+    def test_slow_task_updates_in_place(self, streaming_bot):
+        """测试耗时任务先发送状态卡片，结果原地更新"""
+        card = CardUpdater(streaming_bot, "chat", min_interval=0)
+        card.update("stage-1")
+        card.update("stage-2")
+        # 等待定时器线程把状态写出，再结束任务
+        deadline = time.monotonic() + 2
+        while not streaming_bot.send_card_message.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+        card.finish("done")
+        
+        streaming_bot.send_card_message.assert_called_once()
+        streaming_bot.update_card_message.assert_called_with("om_card", "done")
+        assert card.writes == 2
+    
+    def test_complex_task_uses_one_status_card(self, streaming_bot):
+        """测试复杂任务的话题内只有一张状态卡片"""
+        from feishu_ai_bot.tasks.processor import process_complex_task
+        
+        streaming_bot.reply_message = Mock(return_value={"code": 0, "thread_id": "omt_1"})
+        ai_processor = Mock()
+        ai_processor.process_task.return_value = {"success": True, "result": "结果"}
+        
+        process_complex_task("分析数据", "chat", "user", "om_0", "ou_1", streaming_bot, ai_processor)
+        
+        # 话题头部 1 次 + 状态卡片 1 次
+        assert streaming_bot.reply_message.call_count == 1
+        assert streaming_bot.send_card_message.call_count == 1
+        assert "结果" in streaming_bot.send_card_message.call_args.args[1]
+
+
+@pytest.mark.unit
+class TestStreamMessage:
+    """测试 OpenClawBridge.stream_message"""
+    
+    def test_parses_sse(self):
+        """测试解析 SSE 增量文本"""
+        lines = [
+            b'data: ' + json.dumps({"choices": [{"delta": {"content": "你好"}}]}).encode("utf-8"),
+            b'',
+            b': keep-alive',
+            b'data: ' + json.dumps({"choices": [{"delta": {"content": "世界"}}]}).encode("utf-8"),
+            b'data: [DONE]',
+            b'data: ' + json.dumps({"choices": [{"delta": {"content": "忽略"}}]}).encode("utf-8"),
+        ]
+        response = Mock(status_code=200, headers={"Content-Type": "text/event-stream"})
+        response.iter_lines.return_value = iter(lines)
+        
+        bridge = OpenClawBridge(gateway_url="http://localhost:18789")
+        with patch('requests.post', return_value=response) as post:
+            chunks = list(bridge.stream_message("测试", "user"))
+        
+        assert chunks == ["你好", "世界"]
+        assert json.loads(post.call_args.kwargs["data"])["stream"] is True
+        response.close.assert_called()
+    
+    def test_error_status_raises(self):
+        """测试非成功状态码抛出 OpenClawStreamError"""
+        response = Mock(status_code=404, headers={})
+        bridge = OpenClawBridge(gateway_url="http://localhost:18789")
+        
+        with patch('requests.post', return_value=response):
+            with pytest.raises(OpenClawStreamError):
+                list(bridge.stream_message("测试", "user"))
+    
+    def test_unsupported_status_is_remembered(self):
+        """测试 404/405 后记住网关不支持流式，之后不再发起流式请求"""
+        bridge = OpenClawBridge(gateway_url="http://localhost:18789")
+        
+        with patch('requests.post', return_value=Mock(status_code=405, headers={})) as post:
+            with pytest.raises(OpenClawStreamError) as error:
+                list(bridge.stream_message("测试", "user"))
+            assert error.value.unprocessed is True
+            with pytest.raises(OpenClawStreamError):
+                list(bridge.stream_message("测试", "user"))
+        
+        assert post.call_count == 1
+        assert bridge.stream_supported is False
+    
+    def test_non_sse_response_is_remembered(self):
+        """测试返回普通 JSON 时照常产出回复，但之后不再尝试流式"""
+        response = Mock(status_code=200, headers={"Content-Type": "application/json"})
+        response.content = json.dumps({"choices": [{"message": {"content": "完整回复"}}]}).encode("utf-8")
+        bridge = OpenClawBridge(gateway_url="http://localhost:18789")
+        
+        with patch('requests.post', return_value=response):
+            assert list(bridge.stream_message("测试", "user")) == ["完整回复"]
+        
+        assert bridge.stream_supported is False
+    
+    @pytest.mark.parametrize("outcome, unprocessed", [
+        (requests.exceptions.ConnectionError("refused"), True),
+        (requests.exceptions.ReadTimeout("read timed out"), False),
+        (Mock(status_code=502, headers={}), False),
+    ])
+    def test_unprocessed_only_when_not_delivered(self, outcome, unprocessed):
+        """测试只有连接失败时标记为未处理，读超时和 5xx 不标记且不影响流式支持"""
+        bridge = OpenClawBridge(gateway_url="http://localhost:18789")
+        kwargs = {"side_effect": outcome} if isinstance(outcome, Exception) else {"return_value": outcome}
+        
+        with patch('requests.post', **kwargs):
+            with pytest.raises(OpenClawStreamError) as error:
+                list(bridge.stream_message("测试", "user"))
+        
+        assert error.value.unprocessed is unprocessed
+        assert bridge.stream_supported is True
+
+
+def _failing_stream(error):
+    """与 stream_message 一样在迭代时才抛出异常"""
+    raise error
+    yield
+
+
+@pytest.mark.unit
+class TestRelayPrivateMessage:
+    """测试私聊流式转发的回退"""
+    
+    @pytest.fixture
+    def services(self, streaming_bot, mock_openclaw_bridge):
+        """流式开启的服务集合"""
+        mock_openclaw_bridge.stream_supported = True
+        return Mock(
+            config=Mock(openclaw=OpenClawConfig(stream_interval=0)),
+            feishu_bot=streaming_bot,
+            openclaw_bridge=mock_openclaw_bridge
+        )
+    
+    def test_falls_back_when_unprocessed(self, services):
+        """测试网关未处理流式请求时改用普通调用"""
+        services.openclaw_bridge.stream_message.return_value = _failing_stream(
+            OpenClawStreamError("OpenClaw 返回状态码 404", unprocessed=True)
+        )
+        
+        relay_private_message(services, "你好", "chat", "用户", "ou_1")
+        
+        services.openclaw_bridge.send_message.assert_called_once()
+        assert services.feishu_bot.update_message.call_args.args == ("om_1", "测试回复")
+    
+    def test_no_resend_after_server_error(self, services):
+        """测试 5xx/读超时等可能已处理的失败不重发消息"""
+        services.openclaw_bridge.stream_message.return_value = _failing_stream(
+            OpenClawStreamError("OpenClaw 返回状态码 502")
+        )
+        
+        relay_private_message(services, "你好", "chat", "用户", "ou_1")
+        
+        services.openclaw_bridge.send_message.assert_not_called()
+        assert "502" in services.feishu_bot.update_message.call_args.args[1]
+    
+    def test_skips_stream_when_unsupported(self, services):
+        """测试已知网关不支持流式时直接使用普通调用"""
+        services.openclaw_bridge.stream_supported = False
+        
+        relay_private_message(services, "你好", "chat", "用户", "ou_1")
+        
+        services.openclaw_bridge.stream_message.assert_not_called()
+        services.openclaw_bridge.send_message.assert_called_once()
@@ -0,0 +1,223 @@
+"""链路追踪测试"""
+
+import os
+import threading
+
+import pytest
+import requests
+
+from feishu_ai_bot import codec
+from feishu_ai_bot.config import AppConfig
+from feishu_ai_bot.monitoring import tracing
+from feishu_ai_bot.monitoring.tracing import NOOP_SPAN, TracedSession, Tracer
+from feishu_ai_bot.server import create_app
+
+
+@pytest.fixture
+def tracer():
+    """全量采样的全局追踪器（测试后恢复）"""
+    previous = tracing.get_tracer()
+    yield tracing.set_tracer(Tracer(sample_rate=1.0))
+    tracing.set_tracer(previous)
+
+
+@pytest.mark.unit
+class TestTracer:
+    """测试 Tracer"""
+    
+    def test_nested_spans(self, tracer):
+        """测试嵌套 span 记录父子关系，根 span 结束后 trace 完成"""
+        with tracing.trace("root", kind="test") as root:
+            with tracing.span("child") as child:
+                child.set(size=3)
+        
+        [trace] = tracer.traces()
+        assert [span.name for span in trace.spans] == ["root", "child"]
+        assert trace.spans[1].parent_id == root.span_id
+        assert trace.spans[1].attributes == {"size": 3}
+        assert tracing.current_span() is None
+    
+    def test_exception_marks_span_failed(self, tracer):
+        """测试异常记录在 span 上并继续抛出"""
+        with pytest.raises(ValueError):
+            with tracing.trace("root"):
+                raise ValueError("boom")
+        
+        assert tracer.traces()[0].spans[0].error == "boom"
+    
+    def test_not_sampled_is_noop(self, tracer):
+        """测试未采样时不记录任何内容"""
+        tracer.sample_rate = 0.0
+        with tracing.trace("root") as root:
+            with tracing.span("child") as child:
+                pass
+        
+        assert root is NOOP_SPAN and child is NOOP_SPAN
+        assert tracer.traces() == []
+        assert tracing.bind(len, "task") is len
+    
+    def test_bind_keeps_trace_open(self, tracer):
+        """测试后台任务结束后 trace 才完成，并记录排队等待"""
+        started = threading.Event()
+        release = threading.Event()
+        
+        def work():
+            started.set()
+            release.wait(5)
+            with tracing.span("inner"):
+                pass
+        
+        with tracing.trace("root"):
+            thread = threading.Thread(target=tracing.bind(work, "task"))
+            thread.start()
+        
+        started.wait(5)
+        assert tracer.traces() == []
+        
+        release.set()
+        thread.join(5)
+        [trace] = tracer.traces()
+        names = [span.name for span in trace.spans]
+        assert names == ["root", "queue.wait", "task", "inner"]
+        spans = {span.name: span for span in trace.spans}
+        assert spans["inner"].parent_id == spans["task"].span_id
+    
+    def test_otlp_export_file(self, tracer, tmp_path):
+        """测试完成的 trace 以 OTLP JSON Lines 写入导出文件"""
+        export_file = tmp_path / "traces" / "otlp.jsonl"
+        tracer.configure(1.0, 10, str(export_file))
+        
+        for _ in range(2):
+            with tracing.trace("root"):
+                with tracing.span("child") as child:
+                    child.fail("timeout")
+        
+        assert tracer.flush()
+        lines = export_file.read_bytes().splitlines()
+        assert len(lines) == 2
+        spans = codec.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+        assert spans[1]["status"] == {"code": 2, "message": "timeout"}
+    
+    def test_export_off_request_thread(self, tracer, tmp_path):
+        """测试导出文件由后台线程写入，请求线程不写文件"""
+        tracer.configure(1.0, 10, str(tmp_path / "otlp.jsonl"))
+        exporters = []
+        export = tracer._exporter._sink
+        
+        def record(item):
+            exporters.append(threading.current_thread().name)
+            export(item)
+        
+        tracer._exporter._sink = record
+        with tracing.trace("root"):
+            pass
+        
+        assert tracer.flush()
+        assert exporters == ["trace-exporter"]
+    
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="需要 fork")
+    def test_export_after_fork(self, tracer, tmp_path):
+        """测试 fork 后子进程重新启动导出线程"""
+        export_file = tmp_path / "otlp.jsonl"
+        tracer.configure(1.0, 10, str(export_file))
+        with tracing.trace("parent"):
+            pass
+        assert tracer.flush()
+        
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                with tracing.trace("child"):
+                    pass
+                code = 0 if tracer.flush() else 1
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        
+        assert os.WEXITSTATUS(status) == 0
+        assert len(export_file.read_bytes().splitlines()) == 2
+    
+    def test_buffer_is_bounded(self, tracer):
+        """测试环形缓冲区只保留最近的 trace"""
+        tracer.configure(1.0, 3)
+        for index in range(5):
+            with tracing.trace(f"t{index}"):
+                pass
+        
+        assert [trace.name for trace in tracer.traces()] == ["t4", "t3", "t2"]
+
+
+class _StubAdapter(requests.adapters.BaseAdapter):
+    """直接返回 200 的传输适配器"""
+    
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Length"] = "2"
+        response._content = b"{}"
+        response.request = request
+        return response
+    
+    def close(self):
+        pass
+
+
+@pytest.mark.unit
+class TestTracedSession:
+    """测试 TracedSession"""
+    
+    def test_records_request_span(self, tracer):
+        """测试每个请求记录路径、状态码和大小"""
+        session = TracedSession("feishu")
+        session.mount("https://", _StubAdapter())
+        
+        with tracing.trace("root"):
+            session.post("https://open.feishu.cn/open-apis/im/v1/messages?x=1", data=b"abc")
+        
+        span = tracer.traces()[0].spans[1]
+        assert span.name == "feishu.POST"
+        assert span.attributes == {
+            "path": "/open-apis/im/v1/messages",
+            "request_bytes": 3,
+            "status": 200,
+            "response_bytes": "2",
+        }
+
+
+@pytest.mark.unit
+class TestDebugTraces:
+    """测试 /debug/traces 接口"""
+    
+    @pytest.fixture
+    def client(self, tmp_path):
+        """全量采样、配置了管理令牌的测试客户端"""
+        config = AppConfig()
+        config.server.log_file = str(tmp_path / "bot.log")
+        config.server.admin_token = "secret"
+        config.openclaw.enabled = False
+        config.tracing.sample_rate = 1.0
+        previous = tracing.get_tracer()
+        tracing.set_tracer(Tracer())
+        yield create_app(config, warm_up=False).test_client()
+        tracing.set_tracer(previous)
+    
+    def test_webhook_event_is_traced(self, client):
+        """测试事件请求生成 trace 并可按 ID 查询"""
+        assert client.post("/webhook/event", json={"challenge": "abc"}).status_code == 200
+        assert client.get("/debug/traces").status_code == 403
+        
+        headers = {"Authorization": "Bearer secret"}
+        listing = client.get("/debug/traces", headers=headers).get_json()
+        [trace] = listing["traces"]
+        assert [span["name"] for span in trace["spans"]] == ["webhook.event", "parse"]
+        assert trace["spans"][0]["attributes"]["status"] == 200
+        
+        response = client.get(
+            f"/debug/traces?trace_id={trace['trace_id']}&format=otlp", headers=headers
+        )
+        spans = response.get_json()["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert {span["traceId"] for span in spans} == {trace["trace_id"]}
+        
+        assert client.get("/debug/traces?trace_id=missing", headers=headers).status_code == 404